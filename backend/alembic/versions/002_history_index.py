@@ -0,0 +1,60 @@
+"""History keyset index
+
+Revision ID: 002_history_index
+Revises: 001_initial
+Create Date: 2026-10-18 10:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '002_history_index'
+down_revision: Union[str, None] = '001_initial'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEX_NAME = 'ix_calculations_user_created_id'
+
+# Колонки ответа истории, которые PostgreSQL хранит в листьях индекса
+INCLUDE_COLUMNS = [
+    'total_water',
+    'junior_count',
+    'middle_count',
+    'senior_count',
+    'staff_count',
+    'season',
+    'activity',
+]
+
+
+def upgrade() -> None:
+    columns = ['user_id', sa.text('created_at DESC'), sa.text('id DESC')]
+
+    if op.get_bind().dialect.name == 'postgresql':
+        # CONCURRENTLY не блокирует запись в таблицу, но не работает
+        # внутри транзакции
+        with op.get_context().autocommit_block():
+            op.create_index(
+                INDEX_NAME,
+                'calculations',
+                columns,
+                postgresql_concurrently=True,
+                postgresql_include=INCLUDE_COLUMNS
+            )
+    else:
+        op.create_index(INDEX_NAME, 'calculations', columns)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.drop_index(
+                INDEX_NAME,
+                table_name='calculations',
+                postgresql_concurrently=True
+            )
+    else:
+        op.drop_index(INDEX_NAME, table_name='calculations')
@@ -0,0 +1,88 @@
+"""Calculation rollups
+
+Revision ID: 003_calculation_rollups
+Revises: 002_history_index
+Create Date: 2026-10-18 11:00:00
+
+Агрегаты заполняются из существующих calculations, а дальше их обновляет
+код приложения. Строки, записанные старой версией после заполнения,
+в агрегаты не попадут, поэтому миграцию нужно выполнять в окно
+обслуживания: запись расчётов остановлена до выката новой версии.
+В PostgreSQL миграция сама блокирует запись в calculations до конца
+своей транзакции, чтобы заполнение не разошлось с таблицей.
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+revision: str = '003_calculation_rollups'
+down_revision: Union[str, None] = '002_history_index'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Диапазон id calculations, агрегируемый одним запросом
+BACKFILL_CHUNK = 50_000
+
+# Начало месяца created_at в виде даты
+MONTH_EXPRESSION = {
+    'postgresql': "date_trunc('month', created_at)::date",
+    'sqlite': "date(created_at, 'start of month')",
+}
+
+BACKFILL_SQL = """
+INSERT INTO calculation_rollups (user_id, month, season, activity, count, total_water)
+SELECT user_id, {month}, season, activity, count(*), sum(total_water)
+FROM calculations
+WHERE user_id IS NOT NULL AND id > :low AND id <= :high
+GROUP BY user_id, {month}, season, activity
+ON CONFLICT (user_id, month, season, activity) DO UPDATE SET
+    count = calculation_rollups.count + excluded.count,
+    total_water = calculation_rollups.total_water + excluded.total_water
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        'calculation_rollups',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('month', sa.Date(), nullable=False),
+        sa.Column('season', sa.String(length=10), nullable=False),
+        sa.Column('activity', sa.String(length=10), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.Column('total_water', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'month', 'season', 'activity')
+    )
+
+    # Заполнение по диапазонам id: каждый запрос группирует не больше
+    # BACKFILL_CHUNK строк. Миграцию нужно выполнить до выката кода,
+    # который сам обновляет агрегаты, иначе новые строки учтутся дважды.
+    bind = op.get_bind()
+    backfill = sa.text(BACKFILL_SQL.format(month=MONTH_EXPRESSION[bind.dialect.name]))
+    if bind.dialect.name == 'postgresql':
+        # SHARE не пускает INSERT/UPDATE/DELETE до конца транзакции
+        # миграции, чтение истории продолжает работать
+        op.execute('LOCK TABLE calculations IN SHARE MODE')
+    if context.is_offline_mode():
+        # В SQL-скрипте max(id) неизвестен: один запрос на всю таблицу
+        op.execute(backfill.bindparams(low=0, high=2 ** 31 - 1))
+        return
+
+    # Проходы повторяются от последнего учтённого id, пока таблица
+    # растёт: так строки, вставленные во время заполнения (если запись
+    # не заблокирована), тоже попадают в агрегаты, и ни одна строка
+    # не учитывается дважды
+    done = 0
+    while True:
+        max_id = bind.execute(sa.text('SELECT max(id) FROM calculations')).scalar() or 0
+        if max_id <= done:
+            break
+        for low in range(done, max_id, BACKFILL_CHUNK):
+            bind.execute(backfill, {'low': low, 'high': min(low + BACKFILL_CHUNK, max_id)})
+        done = max_id
+
+
+def downgrade() -> None:
+    op.drop_table('calculation_rollups')
@@ -0,0 +1,134 @@
+"""Partition calculations by month
+
+Revision ID: 004_partition_calculations
+Revises: 003_calculation_rollups
+Create Date: 2026-10-18 12:00:00
+
+Только PostgreSQL: calculations пересоздаётся как таблица, секционированная
+по диапазону created_at, с партицией на каждый месяц и партицией
+по умолчанию. Данные копируются порциями по id. Миграция держит
+эксклюзивную блокировку calculations до конца копирования, поэтому
+её нужно выполнять в окно обслуживания. Дальше партиции создаёт
+и архивирует python -m app.maintenance partitions.
+
+В остальных БД таблица остаётся обычной.
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+revision: str = '004_partition_calculations'
+down_revision: Union[str, None] = '003_calculation_rollups'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COPY_CHUNK = 50_000
+MONTHS_AHEAD = 3
+
+COLUMNS = (
+    'id, user_id, junior_count, middle_count, senior_count, staff_count, '
+    'season, activity, total_water, created_at'
+)
+
+COLUMNS_DDL = """(
+    id INTEGER NOT NULL DEFAULT nextval('calculations_id_seq'),
+    user_id INTEGER REFERENCES users (id) ON DELETE CASCADE,
+    junior_count INTEGER NOT NULL,
+    middle_count INTEGER NOT NULL,
+    senior_count INTEGER NOT NULL,
+    staff_count INTEGER NOT NULL,
+    season VARCHAR(10) NOT NULL,
+    activity VARCHAR(10) NOT NULL,
+    total_water FLOAT NOT NULL,
+    created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    PRIMARY KEY ({primary_key})
+)"""
+
+HISTORY_INDEX = (
+    'CREATE INDEX ix_calculations_user_created_id ON calculations '
+    '(user_id, created_at DESC, id DESC) '
+    'INCLUDE (total_water, junior_count, middle_count, senior_count, '
+    'staff_count, season, activity)'
+)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def create_month_partition(month: date) -> None:
+    op.execute(
+        f"CREATE TABLE calculations_y{month.year:04d}m{month.month:02d} "
+        f"PARTITION OF calculations "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    )
+
+
+def copy_rows(source: str, target: str) -> None:
+    """Копирует строки порциями по диапазонам id."""
+    statement = sa.text(
+        f'INSERT INTO {target} ({COLUMNS}) '
+        f'SELECT {COLUMNS} FROM {source} WHERE id > :low AND id <= :high'
+    )
+    if context.is_offline_mode():
+        op.execute(statement.bindparams(low=0, high=2 ** 31 - 1))
+        return
+    bind = op.get_bind()
+    max_id = bind.execute(sa.text(f'SELECT max(id) FROM {source}')).scalar() or 0
+    for low in range(0, max_id, COPY_CHUNK):
+        bind.execute(statement, {'low': low, 'high': low + COPY_CHUNK})
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('ALTER TABLE calculations RENAME TO calculations_legacy')
+    op.execute('ALTER TABLE calculations_legacy RENAME CONSTRAINT calculations_pkey TO calculations_legacy_pkey')
+    op.execute('ALTER INDEX ix_calculations_user_created_id RENAME TO ix_calculations_legacy_user_created_id')
+
+    # Ключ партиционирования обязан входить в первичный ключ
+    op.execute(
+        'CREATE TABLE calculations '
+        + COLUMNS_DDL.format(primary_key='id, created_at')
+        + ' PARTITION BY RANGE (created_at)'
+    )
+    op.execute(HISTORY_INDEX)
+    op.execute('CREATE TABLE calculations_default PARTITION OF calculations DEFAULT')
+
+    current = date.today().replace(day=1)
+    first = current
+    if not context.is_offline_mode():
+        oldest = op.get_bind().execute(
+            sa.text('SELECT min(created_at) FROM calculations_legacy')
+        ).scalar()
+        if oldest is not None:
+            first = min(first, date(oldest.year, oldest.month, 1))
+    month = first
+    while month <= add_months(current, MONTHS_AHEAD):
+        create_month_partition(month)
+        month = add_months(month, 1)
+
+    copy_rows('calculations_legacy', 'calculations')
+    op.execute('ALTER SEQUENCE calculations_id_seq OWNED BY calculations.id')
+    op.execute('DROP TABLE calculations_legacy')
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('ALTER TABLE calculations RENAME TO calculations_partitioned')
+    op.execute('ALTER INDEX ix_calculations_user_created_id RENAME TO ix_calculations_partitioned_user_created_id')
+    op.execute('ALTER TABLE calculations_partitioned RENAME CONSTRAINT calculations_pkey TO calculations_partitioned_pkey')
+
+    op.execute('CREATE TABLE calculations ' + COLUMNS_DDL.format(primary_key='id'))
+    op.execute(HISTORY_INDEX)
+    copy_rows('calculations_partitioned', 'calculations')
+    op.execute('ALTER SEQUENCE calculations_id_seq OWNED BY calculations.id')
+    # Вместе с родительской таблицей удаляются все присоединённые партиции
+    op.execute('DROP TABLE calculations_partitioned')
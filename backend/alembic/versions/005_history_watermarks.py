@@ -0,0 +1,45 @@
+"""History watermarks
+
+Revision ID: 005_history_watermarks
+Revises: 004_partition_calculations
+Create Date: 2026-10-18 14:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '005_history_watermarks'
+down_revision: Union[str, None] = '004_partition_calculations'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_SQL = """
+INSERT INTO history_watermarks (user_id, row_count, updated_at)
+SELECT user_id, count(*), max(created_at)
+FROM calculations
+WHERE user_id IS NOT NULL
+GROUP BY user_id
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        'history_watermarks',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('row_count', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+
+    # Один проход по индексу (user_id, created_at, id). Миграцию нужно
+    # выполнить до выката кода, который сам обновляет водяные знаки:
+    # пользователь без строки считается пользователем без истории.
+    op.execute(BACKFILL_SQL)
+
+
+def downgrade() -> None:
+    op.drop_table('history_watermarks')
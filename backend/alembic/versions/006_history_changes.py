@@ -0,0 +1,66 @@
+"""History change sequence and tombstones
+
+Revision ID: 006_history_changes
+Revises: 005_history_watermarks
+Create Date: 2026-10-18 15:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '006_history_changes'
+down_revision: Union[str, None] = '005_history_watermarks'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Существующие расчёты нумеруются в порядке создания внутри пользователя
+BACKFILL_SQL = """
+UPDATE calculations SET change_seq = numbered.seq
+FROM (
+    SELECT id, created_at,
+           row_number() OVER (PARTITION BY user_id ORDER BY created_at, id) AS seq
+    FROM calculations
+    WHERE user_id IS NOT NULL
+) AS numbered
+WHERE calculations.id = numbered.id AND calculations.created_at = numbered.created_at
+"""
+
+
+def upgrade() -> None:
+    op.add_column(
+        'history_watermarks',
+        sa.Column('change_seq', sa.BigInteger(), nullable=False, server_default='0')
+    )
+    op.add_column('calculations', sa.Column('change_seq', sa.BigInteger(), nullable=True))
+
+    # Один проход по calculations: миграцию нужно выполнить в окно
+    # обслуживания, до выката кода, который сам выдаёт номера изменений.
+    # После 005 row_count совпадает с числом расчётов пользователя,
+    # так что последний выданный номер равен row_count.
+    op.execute(BACKFILL_SQL)
+    op.execute('UPDATE history_watermarks SET change_seq = row_count')
+    op.create_index(
+        'ix_calculations_user_change_seq',
+        'calculations',
+        ['user_id', 'change_seq']
+    )
+
+    op.create_table(
+        'calculation_tombstones',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('change_seq', sa.BigInteger(), nullable=False),
+        sa.Column('calculation_id', sa.Integer(), nullable=False),
+        sa.Column('deleted_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'change_seq')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('calculation_tombstones')
+    op.drop_index('ix_calculations_user_change_seq', table_name='calculations')
+    op.drop_column('calculations', 'change_seq')
+    op.drop_column('history_watermarks', 'change_seq')
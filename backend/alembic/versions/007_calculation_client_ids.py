@@ -0,0 +1,32 @@
+"""Client ids of offline calculations
+
+Revision ID: 007_calculation_client_ids
+Revises: 006_history_changes
+Create Date: 2026-10-18 16:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '007_calculation_client_ids'
+down_revision: Union[str, None] = '006_history_changes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'calculation_client_ids',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('client_id', sa.String(length=64), nullable=False),
+        sa.Column('change_seq', sa.BigInteger(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'client_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('calculation_client_ids')
@@ -0,0 +1,28 @@
+"""Request fingerprint of idempotency client ids
+
+Revision ID: 008_client_id_fingerprint
+Revises: 007_calculation_client_ids
+Create Date: 2026-10-18 18:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '008_client_id_fingerprint'
+down_revision: Union[str, None] = '007_calculation_client_ids'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'calculation_client_ids',
+        sa.Column('fingerprint', sa.String(length=64), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('calculation_client_ids', 'fingerprint')
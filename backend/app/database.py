@@ -1,25 +1,535 @@
+import itertools
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Callable, List, Optional
+
+import anyio
+from fastapi import Depends, Request
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine
+)
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from starlette.concurrency import run_in_threadpool
 from app.config import get_settings
+from app.pool import InstrumentedAsyncQueuePool, InstrumentedQueuePool
+from app.security import get_token_user_id
+
+if TYPE_CHECKING:
+    from app.services.cache import CacheBackend
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+def pool_options(url: str, async_: bool = False) -> dict:
+    """
+    Параметры пула соединений из настроек db_pool_*.
+
+    SQLite в памяти и aiosqlite работают со своими пулами
+    (StaticPool/NullPool), для них параметры не передаются.
+    """
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and (
+        async_ or parsed.database in (None, "", ":memory:")
+    ):
+        return {}
+    return {
+        "poolclass": InstrumentedAsyncQueuePool if async_ else InstrumentedQueuePool,
+        "pool_pre_ping": True,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+    }
 
-engine = create_engine(
-    settings.database_url,
-    pool_pre_ping=True,
-    pool_size=5,
-    max_overflow=10
-)
+
+engine = create_engine(settings.database_url, **pool_options(settings.database_url))
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+# Sync-драйверы и их async-замены для одной и той же БД
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+# Слоты запросов к основной БД (создаются в lifespan, в event loop)
+_request_slots: Optional[anyio.CapacityLimiter] = None
+
+
+def request_slots_total() -> int:
+    """Число слотов: db_request_slots или вся ёмкость пула."""
+    return settings.db_request_slots or settings.db_pool_size + settings.db_max_overflow
+
+
+def init_request_slots() -> anyio.CapacityLimiter:
+    """
+    Создаёт лимитер слотов запросов; вызывается из lifespan.
 
-def get_db():
+    Запрос занимает слот в event loop до того, как получит поток
+    и соединение. Без лимитера потоки sync-маршрутов блокируются
+    на выдаче соединения, а запросы, уже держащие соединения,
+    не могут получить поток, чтобы их вернуть, - до pool_timeout.
+    """
+    global _request_slots
+    _request_slots = anyio.CapacityLimiter(request_slots_total())
+    return _request_slots
+
+
+def get_request_slots() -> Optional[anyio.CapacityLimiter]:
+    return _request_slots
+
+
+@asynccontextmanager
+async def hold_request_slot(request: Optional[Request] = None):
+    """
+    Занять слот запроса к БД (без лимитера - без ограничения).
+
+    С request слот повторно входим в пределах HTTP-запроса: если запрос
+    уже держит слот, второй не занимается. Иначе два обращения к БД
+    одного запроса могли бы ждать друг друга при занятых слотах.
+    """
+    slots = _request_slots
+    if slots is None or (request is not None and getattr(request.state, "db_slot", False)):
+        yield
+        return
+    # Завершение зависимости может выполняться в другой задаче,
+    # поэтому слот занимается от имени отдельного объекта
+    borrower = object()
+    await slots.acquire_on_behalf_of(borrower)
+    if request is not None:
+        request.state.db_slot = True
+    try:
+        yield
+    finally:
+        if request is not None:
+            request.state.db_slot = False
+        slots.release_on_behalf_of(borrower)
+
+
+async def request_slot(request: Request):
+    """
+    Слот запроса к БД как зависимость.
+
+    Зависимость кэшируется FastAPI в пределах запроса: get_db
+    и get_read_db одного запроса занимают один слот.
+    """
+    async with hold_request_slot(request):
+        yield
+
+
+async def get_db(_slot: None = Depends(request_slot)):
     """Получить сессию БД для dependency injection."""
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
+        await run_in_threadpool(db.close)
+
+
+class LazySession:
+    """
+    Сессия, которая создаётся при первом обращении к ней.
+
+    Атрибуты проксируются в настоящую сессию (Session или
+    AsyncSession), поэтому объект передаётся в сервисы как обычная
+    сессия. Если маршрут к БД не обратился, сессия не создаётся
+    и соединение из пула не берётся.
+    """
+
+    def __init__(self, factory: Callable[[], Any]):
+        self._factory = factory
+        self._session = None
+
+    @property
+    def created(self) -> bool:
+        return self._session is not None
+
+    @property
+    def session(self):
+        if self._session is None:
+            self._session = self._factory()
+        return self._session
+
+    def __getattr__(self, name: str):
+        return getattr(self.session, name)
+
+    def close(self):
+        """Закрывает сессию; для AsyncSession возвращает корутину."""
+        return self._session.close() if self._session is not None else None
+
+
+def get_session_factory() -> sessionmaker:
+    """
+    Фабрика сессий для dependency injection.
+
+    Для потоковых ответов: сессия из get_db закрывается до отправки тела,
+    поэтому генератор ответа открывает свою.
+    """
+    return SessionLocal
+
+
+def to_async_url(url: str) -> str:
+    """
+    Заменяет sync-драйвер в URL на async.
+
+    URL, где драйвер уже async или неизвестен, возвращается как есть.
+    """
+    scheme, sep, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+
+@lru_cache
+def get_async_engine() -> AsyncEngine:
+    """
+    Async-движок (создаётся при первом обращении).
+
+    URL берётся из async_database_url, а если он не задан -
+    из database_url с заменой драйвера.
+    """
+    return _create_async_engine(
+        settings.async_database_url or to_async_url(settings.database_url)
+    )
+
+
+@lru_cache
+def get_async_sessionmaker() -> async_sessionmaker:
+    """
+    Фабрика async-сессий.
+
+    expire_on_commit отключён: после commit атрибуты нельзя
+    подгрузить лениво без await.
+    """
+    return async_sessionmaker(
+        get_async_engine(),
+        autoflush=False,
+        expire_on_commit=False
+    )
+
+
+async def get_async_db():
+    """Получить async-сессию БД для dependency injection."""
+    async with get_async_sessionmaker()() as db:
+        yield db
+
+
+def get_async_session_factory() -> async_sessionmaker:
+    """Async-версия get_session_factory."""
+    return get_async_sessionmaker()
+
+
+async def get_lazy_db(factory: sessionmaker = Depends(get_session_factory)):
+    """
+    Ленивая сессия БД для dependency injection.
+
+    Слот запроса не занимается: маршрут берёт его сам
+    (hold_request_slot), когда действительно идёт в БД.
+    """
+    db = LazySession(factory)
+    try:
+        yield db
+    finally:
+        if db.created:
+            await run_in_threadpool(db.close)
+
+
+async def get_lazy_async_db(
+    factory: async_sessionmaker = Depends(get_async_session_factory)
+):
+    """Async-версия get_lazy_db: AsyncSession создаётся при первом обращении."""
+    db = LazySession(factory)
+    try:
+        yield db
+    finally:
+        if db.created:
+            await db.close()
+
+
+def _create_async_engine(url: str) -> AsyncEngine:
+    """Async-движок с пулом по настройкам db_pool_*."""
+    return create_async_engine(url, **pool_options(url, async_=True))
+
+
+class Replica:
+    """Реплика для чтения: движки и состояние доступности."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.engine = create_engine(url, **pool_options(url))
+        self.session_factory = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self._async_session_factory: Optional[async_sessionmaker] = None
+        self.down_until = 0.0
+        self.reads = 0
+        self.failures = 0
+
+    @property
+    def async_session_factory(self) -> async_sessionmaker:
+        """Фабрика async-сессий (движок создаётся при первом обращении)."""
+        if self._async_session_factory is None:
+            self._async_session_factory = async_sessionmaker(
+                _create_async_engine(to_async_url(self.url)),
+                autoflush=False,
+                expire_on_commit=False
+            )
+        return self._async_session_factory
+
+    @property
+    def name(self) -> str:
+        """URL реплики без пароля - для логов, не для ответов API."""
+        return self.engine.url.render_as_string(hide_password=True)
+
+    def stats(self) -> dict:
+        return {
+            "healthy": self.down_until <= time.monotonic(),
+            "reads": self.reads,
+            "failures": self.failures,
+        }
+
+
+class ReplicaRouter:
+    """
+    Маршрутизация чтения по репликам.
+
+    Реплики выбираются по кругу. Реплика, к которой не удалось
+    подключиться, исключается на retry_after секунд, а чтение уходит
+    на следующую; если доступных реплик нет - на основную БД.
+    После записи пользователь read_your_writes секунд читает
+    с основной БД, чтобы видеть свои изменения несмотря на отставание
+    реплик. Отметка о записи хранится в отдельном хранилище без
+    вытеснения по размеру (и в Redis, если он настроен, - тогда она
+    действует во всех воркерах), см. create_write_marks.
+    """
+
+    def __init__(
+        self,
+        replica_urls: List[str],
+        retry_after: float = 5.0,
+        read_your_writes: float = 0.0,
+        primary: Optional[sessionmaker] = None,
+        async_primary: Optional[async_sessionmaker] = None,
+        write_marks: Optional["CacheBackend"] = None
+    ):
+        self.replicas = [Replica(url) for url in replica_urls]
+        self._write_marks = write_marks
+        self._primary = primary
+        self._async_primary = async_primary
+        self.retry_after = retry_after
+        self.read_your_writes = read_your_writes
+        self._order = itertools.cycle(range(len(self.replicas)))
+        self._lock = threading.Lock()
+        self.primary_reads = 0
+        self.fallbacks = 0
+
+    def primary(self) -> Session:
+        """Сессия основной БД."""
+        return (self._primary or SessionLocal)()
+
+    def async_primary(self) -> AsyncSession:
+        """Async-сессия основной БД."""
+        return (self._async_primary or get_async_sessionmaker())()
+
+    @staticmethod
+    def _write_key(user_id: int) -> str:
+        return f"last_write:{user_id}"
+
+    def _marks(self):
+        """Хранилище отметок о записи (создаётся при первом обращении)."""
+        if self._write_marks is None:
+            # app.services импортирует app.database, поэтому импорт отложен
+            from app.services.cache import create_write_marks
+
+            with self._lock:
+                if self._write_marks is None:
+                    self._write_marks = create_write_marks(self.read_your_writes)
+        return self._write_marks
+
+    def _tracks_writes(self, user_id: Optional[int]) -> bool:
+        return bool(self.replicas) and bool(self.read_your_writes) and user_id is not None
+
+    def _within_window(self, written: Optional[bytes]) -> bool:
+        return written is not None and time.time() - float(written) < self.read_your_writes
+
+    def note_write(self, user_id: Optional[int]) -> None:
+        """Отмечает запись пользователя для окна read-your-writes."""
+        if not self._tracks_writes(user_id):
+            return
+        self._marks().set(
+            self._write_key(user_id),
+            repr(time.time()).encode(),
+            self.read_your_writes
+        )
+
+    async def note_write_async(self, user_id: Optional[int]) -> None:
+        """note_write для event loop: запись в Redis идёт в пуле потоков."""
+        if not self._tracks_writes(user_id):
+            return
+        await self._marks().set_async(
+            self._write_key(user_id),
+            repr(time.time()).encode(),
+            self.read_your_writes
+        )
+
+    def _recent_write(self, user_id: Optional[int]) -> bool:
+        if not self._tracks_writes(user_id):
+            return False
+        return self._within_window(self._marks().get(self._write_key(user_id)))
+
+    async def _recent_write_async(self, user_id: Optional[int]) -> bool:
+        if not self._tracks_writes(user_id):
+            return False
+        return self._within_window(await self._marks().get_async(self._write_key(user_id)))
+
+    def _candidates(
+        self,
+        user_id: Optional[int],
+        recent_write: Optional[bool] = None
+    ) -> Optional[List[Replica]]:
+        """
+        Доступные реплики в порядке обхода.
+
+        None - читать с основной БД: реплик нет или действует окно
+        read-your-writes. recent_write - уже проверенное окно
+        (async-путь проверяет его без блокировки event loop).
+        """
+        if not self.replicas:
+            return None
+        if recent_write is None:
+            recent_write = self._recent_write(user_id)
+        if recent_write:
+            with self._lock:
+                self.primary_reads += 1
+            return None
+        now = time.monotonic()
+        with self._lock:
+            start = next(self._order)
+        ordered = self.replicas[start:] + self.replicas[:start]
+        return [replica for replica in ordered if replica.down_until <= now]
+
+    def _mark(self, replica: Replica, ok: bool, exc: Optional[Exception] = None) -> None:
+        with self._lock:
+            if ok:
+                replica.reads += 1
+                return
+            replica.failures += 1
+            replica.down_until = time.monotonic() + self.retry_after
+        logger.warning("Реплика %s недоступна: %s", replica.name, exc)
+
+    def _fallback(self) -> None:
+        with self._lock:
+            self.fallbacks += 1
+
+    def read_session(
+        self,
+        user_id: Optional[int] = None,
+        primary_session: Optional[Session] = None
+    ) -> Session:
+        """
+        Сессия для чтения: реплика или основная БД.
+
+        primary_session - уже открытая сессия основной БД, которую
+        нужно вернуть вместо новой (одно соединение на запрос).
+        """
+        candidates = self._candidates(user_id)
+        if candidates is None:
+            return primary_session or self.primary()
+        for replica in candidates:
+            db = replica.session_factory()
+            try:
+                db.connection()
+            except DBAPIError as exc:
+                db.close()
+                self._mark(replica, False, exc)
+                continue
+            self._mark(replica, True)
+            return db
+        self._fallback()
+        return primary_session or self.primary()
+
+    async def read_session_async(self, user_id: Optional[int] = None) -> AsyncSession:
+        """Async-версия read_session."""
+        candidates = self._candidates(user_id, await self._recent_write_async(user_id))
+        if candidates is None:
+            return self.async_primary()
+        for replica in candidates:
+            db = replica.async_session_factory()
+            try:
+                await db.connection()
+            except DBAPIError as exc:
+                await db.close()
+                self._mark(replica, False, exc)
+                continue
+            self._mark(replica, True)
+            return db
+        self._fallback()
+        return self.async_primary()
+
+    def stats(self) -> dict:
+        """Состояние реплик для мониторинга."""
+        with self._lock:
+            return {
+                "replicas": [replica.stats() for replica in self.replicas],
+                "primary_reads": self.primary_reads,
+                "fallbacks": self.fallbacks,
+            }
+
+
+@lru_cache
+def get_replica_router() -> ReplicaRouter:
+    """Маршрутизатор чтения по настройкам database_replica_urls."""
+    return ReplicaRouter(
+        [url.strip() for url in settings.database_replica_urls.split(",") if url.strip()],
+        retry_after=settings.replica_retry_seconds,
+        read_your_writes=settings.read_your_writes_seconds
+    )
+
+
+def note_user_write(user_id: Optional[int]) -> None:
+    """Отмечает запись пользователя для окна read-your-writes."""
+    get_replica_router().note_write(user_id)
+
+
+async def note_user_write_async(user_id: Optional[int]) -> None:
+    """note_user_write для async-маршрутов."""
+    await get_replica_router().note_write_async(user_id)
+
+
+async def get_read_db(
+    user_id: Optional[int] = Depends(get_token_user_id),
+    primary_db: Session = Depends(get_db)
+):
+    """
+    Сессия только для чтения: реплика, если она настроена и доступна.
+
+    Чтение с основной БД идёт через сессию get_db того же запроса:
+    запрос держит не больше одного соединения основной БД, и слоты
+    request_slot совпадают с ёмкостью пула.
+    """
+    # Выбор реплики проверяет соединение - это блокирующий вызов
+    db = await run_in_threadpool(get_replica_router().read_session, user_id, primary_db)
+    try:
+        yield db
+    finally:
+        if db is not primary_db:
+            await run_in_threadpool(db.close)
+
+
+async def get_async_read_db(user_id: Optional[int] = Depends(get_token_user_id)):
+    """Async-версия get_read_db."""
+    db = await get_replica_router().read_session_async(user_id)
+    try:
+        yield db
+    finally:
+        await db.close()
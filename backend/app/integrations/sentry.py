@@ -1,8 +1,9 @@
-"""Интеграция с Sentry для мониторинга ошибок."""
+"""
+Интеграция с Sentry для мониторинга ошибок.
 
-import sentry_sdk
-from sentry_sdk.integrations.fastapi import FastApiIntegration
-from sentry_sdk.integrations.sqlalchemy import SqlalchemyIntegration
+sentry_sdk импортируется только при заданном SENTRY_DSN:
+без него импорт лишь замедляет старт воркера.
+"""
 
 from app.config import get_settings
 
@@ -19,6 +20,10 @@ def init_sentry() -> None:
     if not settings.sentry_dsn:
         return
 
+    import sentry_sdk
+    from sentry_sdk.integrations.fastapi import FastApiIntegration
+    from sentry_sdk.integrations.sqlalchemy import SqlalchemyIntegration
+
     sentry_sdk.init(
         dsn=settings.sentry_dsn,
         integrations=[
@@ -1,28 +1,125 @@
-from contextlib import asynccontextmanager
+import asyncio
+import logging
+from contextlib import asynccontextmanager, suppress
 
-from fastapi import FastAPI
+import anyio.to_thread
+
+from fastapi import FastAPI, Response, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from starlette.concurrency import run_in_threadpool
 
-from app.routers import auth_router, calculate_router, history_router
+from app.routers import (
+    auth_router,
+    calculate_router,
+    history_router,
+    metrics_router,
+    planner_router
+)
+from app.routers import aio
 from app.integrations import init_sentry
-from app.database import engine, Base
+from app.startup import check_schema_revision, warmup
+from app.config import get_settings
+from app.database import (
+    engine,
+    Base,
+    SessionLocal,
+    get_async_engine,
+    init_request_slots
+)
+from app.services.hashing import shutdown_hashing_executor
+from app.services.write_behind import (
+    get_write_behind,
+    start_write_behind,
+    stop_write_behind
+)
 
 # Инициализация Sentry (до создания приложения)
 init_sentry()
 
+logger = logging.getLogger(__name__)
+
+
+def configure_concurrency(settings) -> None:
+    """
+    Согласует потоки sync-маршрутов со слотами запросов к БД.
+
+    Потоков должно быть больше, чем слотов: иначе маршруты без БД
+    ждут, пока освободятся потоки, занятые запросами к БД.
+    """
+    slots = init_request_slots()
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.threadpool_tokens
+    if settings.threadpool_tokens <= slots.total_tokens:
+        logger.warning(
+            "threadpool_tokens (%s) <= db_request_slots (%s): "
+            "маршруты без БД будут ждать свободный поток",
+            settings.threadpool_tokens,
+            slots.total_tokens
+        )
+
+
+async def run_warmup(app: FastAPI, settings) -> None:
+    """
+    Прогревает пул и код в фоне и переводит воркер в готовность.
+
+    При недоступной БД прогрев повторяется раз в секунду: /health
+    уже отвечает, а /ready - нет, и трафик на воркер не идёт.
+    """
+    connections = settings.warmup_connections or settings.db_pool_size
+    while True:
+        try:
+            await run_in_threadpool(warmup, engine, connections)
+        except Exception:
+            logger.exception("Прогрев не удался, повтор через 1 с")
+            await asyncio.sleep(1)
+            continue
+        app.state.ready = True
+        return
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Создаёт таблицы при старте приложения."""
-    Base.metadata.create_all(bind=engine)
+    """
+    Создаёт таблицы при старте приложения и настраивает
+    пул потоков и слоты запросов к БД.
+
+    В режиме fast_startup таблицы не создаются: проверяется только
+    ревизия Alembic. Прогрев идёт в фоне, /ready ждёт его окончания.
+
+    Если включён write-behind, запускает очередь записи расчётов,
+    а при остановке выгружает её в БД до завершения процесса.
+    """
+    settings = get_settings()
+    if settings.fast_startup:
+        await run_in_threadpool(check_schema_revision, engine)
+    else:
+        Base.metadata.create_all(bind=engine)
+    configure_concurrency(settings)
+    if settings.write_behind_enabled:
+        start_write_behind(SessionLocal)
+    app.state.ready = not settings.startup_warmup
+    warmup_task = None
+    if settings.startup_warmup:
+        warmup_task = asyncio.create_task(run_warmup(app, settings))
     yield
+    if warmup_task is not None:
+        warmup_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await warmup_task
+    if get_write_behind() is not None:
+        await run_in_threadpool(stop_write_behind)
+    await run_in_threadpool(shutdown_hashing_executor)
+    if settings.db_async:
+        await get_async_engine().dispose()
 
 
 app = FastAPI(
     title="HydroCalc API",
     description="API для расчёта потребления воды в школе",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    # orjson быстрее стандартного json и сам сериализует datetime
+    default_response_class=ORJSONResponse
 )
 
 # Настройка CORS для веб-клиента
@@ -31,13 +128,24 @@ app.add_middleware(
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
-    allow_headers=["*"]
+    allow_headers=["*"],
+    # Курсор следующей страницы истории, валидаторы истории и признак повтора
+    expose_headers=["X-Next-Cursor", "ETag", "Last-Modified", "Idempotent-Replayed"]
 )
 
+# Async-маршруты с БД регистрируются первыми и перекрывают sync-версии
+# с теми же путями; в схеме OpenAPI остаются sync-описания того же контракта
+if get_settings().db_async:
+    app.include_router(aio.auth_router, prefix="/api/v1", include_in_schema=False)
+    app.include_router(aio.calculate_router, prefix="/api/v1", include_in_schema=False)
+    app.include_router(aio.history_router, prefix="/api/v1", include_in_schema=False)
+
 # Подключение роутеров с префиксом /api/v1
 app.include_router(auth_router, prefix="/api/v1")
 app.include_router(calculate_router, prefix="/api/v1")
 app.include_router(history_router, prefix="/api/v1")
+app.include_router(planner_router, prefix="/api/v1")
+app.include_router(metrics_router, prefix="/api/v1")
 
 
 @app.get("/health")
@@ -46,6 +154,15 @@ def health_check():
     return {"status": "ok"}
 
 
+@app.get("/ready")
+async def readiness_check(response: Response):
+    """Готовность принимать трафик: 503, пока идёт прогрев после старта."""
+    if not getattr(app.state, "ready", False):
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        return {"status": "warming_up"}
+    return {"status": "ready"}
+
+
 @app.get("/")
 def root():
     """Корневой endpoint с информацией об API."""
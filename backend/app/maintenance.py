@@ -0,0 +1,95 @@
+"""
+Команды обслуживания БД.
+
+Запуск из каталога backend:
+    python -m app.maintenance partitions
+    python -m app.maintenance partitions --dry-run
+    python -m app.maintenance partitions --ahead 6 --retention-months 24 --archive drop
+    python -m app.maintenance revoke-users 12 15
+
+partitions создаёт помесячные партиции calculations на несколько месяцев
+вперёд и архивирует партиции старше срока хранения (см.
+app.services.partitions). Рассчитан на запуск по расписанию, например
+раз в сутки; повторный запуск безопасен.
+
+revoke-users отзывает доступ по уже выданным токенам (блокировка
+аккаунта). Отзыв общий для воркеров только при заданном REDIS_URL.
+"""
+import argparse
+import sys
+from datetime import date
+
+from app.config import get_settings
+from app.database import engine
+from app.services.partitions import ARCHIVE_DETACH, ARCHIVE_DROP, PartitionService, partition_name
+
+
+def run_partitions(args: argparse.Namespace) -> int:
+    """Обслуживание партиций calculations."""
+    with engine.begin() as conn:
+        plan = PartitionService.maintain(
+            conn,
+            date.today(),
+            args.ahead,
+            args.retention_months,
+            args.archive,
+            args.dry_run
+        )
+
+    if plan is None:
+        print("calculations не секционирована, обслуживание не требуется")
+        return 0
+
+    prefix = "будет " if args.dry_run else ""
+    for month in plan.create:
+        print(f"{prefix}создана {partition_name(month)}")
+    for month in plan.archive:
+        action = "удалена" if args.archive == ARCHIVE_DROP else "перенесена в archive"
+        print(f"{prefix}{action} {partition_name(month)}")
+    if not plan.create and not plan.archive:
+        print("партиции в порядке")
+    return 0
+
+
+def run_revoke_users(args: argparse.Namespace) -> int:
+    """Отзыв токенов пользователей."""
+    from app.services.auth import AuthService
+
+    if not get_settings().redis_url:
+        print("REDIS_URL не задан: отзыв не дойдёт до воркеров приложения", file=sys.stderr)
+        return 1
+    AuthService.revoke_users(args.user_ids)
+    print(f"отозван доступ: {', '.join(map(str, args.user_ids))}")
+    return 0
+
+
+def main(argv=None) -> int:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(prog="python -m app.maintenance", description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    partitions = commands.add_parser("partitions", help="партиции calculations")
+    partitions.add_argument("--ahead", type=int, default=settings.partition_months_ahead)
+    partitions.add_argument(
+        "--retention-months",
+        type=int,
+        default=settings.partition_retention_months
+    )
+    partitions.add_argument(
+        "--archive",
+        choices=[ARCHIVE_DETACH, ARCHIVE_DROP],
+        default=settings.partition_archive_mode
+    )
+    partitions.add_argument("--dry-run", action="store_true")
+    partitions.set_defaults(handler=run_partitions)
+
+    revoke = commands.add_parser("revoke-users", help="отзыв токенов пользователей")
+    revoke.add_argument("user_ids", type=int, nargs="+")
+    revoke.set_defaults(handler=run_revoke_users)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
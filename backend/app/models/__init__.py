@@ -1,4 +1,15 @@
 from app.models.user import User
 from app.models.calculation import Calculation
+from app.models.calculation_client_id import CalculationClientId
+from app.models.calculation_rollup import CalculationRollup
+from app.models.calculation_tombstone import CalculationTombstone
+from app.models.history_watermark import HistoryWatermark
 
-__all__ = ["User", "Calculation"]
+__all__ = [
+    "User",
+    "Calculation",
+    "CalculationClientId",
+    "CalculationRollup",
+    "CalculationTombstone",
+    "HistoryWatermark"
+]
@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import Optional, TYPE_CHECKING
-from sqlalchemy import String, Float, Integer, DateTime, ForeignKey
+from sqlalchemy import BigInteger, String, Float, Integer, DateTime, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.database import Base
 
@@ -9,7 +9,12 @@ if TYPE_CHECKING:
 
 
 class Calculation(Base):
-    """Модель сохранённого расчёта потребления воды."""
+    """
+    Модель сохранённого расчёта потребления воды.
+
+    В PostgreSQL таблица секционирована по месяцам created_at
+    (миграция 004, app.services.partitions).
+    """
 
     __tablename__ = "calculations"
 
@@ -37,5 +42,32 @@ class Calculation(Base):
         default=datetime.utcnow
     )
 
+    # Номер изменения в истории пользователя (history_watermarks.change_seq),
+    # у анонимных расчётов NULL
+    change_seq: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
+
     # Связь с пользователем
     user: Mapped[Optional["User"]] = relationship(back_populates="calculations")
+
+
+# Лента истории пользователя: фильтр по user_id и порядок (created_at, id)
+# по убыванию, как у keyset-пагинации. В PostgreSQL индекс покрывающий:
+# остальные колонки ответа лежат в INCLUDE, и страница читается index-only.
+Index(
+    "ix_calculations_user_created_id",
+    Calculation.user_id,
+    Calculation.created_at.desc(),
+    Calculation.id.desc(),
+    postgresql_include=[
+        "total_water",
+        "junior_count",
+        "middle_count",
+        "senior_count",
+        "staff_count",
+        "season",
+        "activity",
+    ]
+)
+
+# Лента изменений истории (/history/changes): диапазон change_seq пользователя
+Index("ix_calculations_user_change_seq", Calculation.user_id, Calculation.change_seq)
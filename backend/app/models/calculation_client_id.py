@@ -0,0 +1,27 @@
+from typing import Optional
+from sqlalchemy import BigInteger, String, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column
+from app.database import Base
+
+
+class CalculationClientId(Base):
+    """
+    Идентификатор расчёта, выданный клиентом при офлайн-выгрузке.
+
+    Первичный ключ (user_id, client_id) не даёт сохранить расчёт дважды
+    при повторной выгрузке. Сам расчёт находится по change_seq
+    (индекс ix_calculations_user_change_seq): в секционированной
+    calculations уникальный индекс по client_id невозможен.
+    fingerprint - отпечаток запроса для client_id из Idempotency-Key:
+    тот же ключ с другим запросом отклоняется и при промахе хранилища.
+    """
+
+    __tablename__ = "calculation_client_ids"
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+    client_id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    change_seq: Mapped[int] = mapped_column(BigInteger)
+    fingerprint: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
@@ -0,0 +1,26 @@
+from datetime import date
+from sqlalchemy import String, Float, Integer, Date, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column
+from app.database import Base
+
+
+class CalculationRollup(Base):
+    """
+    Агрегат расчётов пользователя по месяцу, сезону и активности.
+
+    Обновляется вместе с вставкой расчётов в той же транзакции,
+    поэтому статистика читается по корзинам, а не по всем расчётам.
+    """
+
+    __tablename__ = "calculation_rollups"
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+    month: Mapped[date] = mapped_column(Date, primary_key=True)  # первое число месяца
+    season: Mapped[str] = mapped_column(String(10), primary_key=True)
+    activity: Mapped[str] = mapped_column(String(10), primary_key=True)
+
+    count: Mapped[int] = mapped_column(Integer, default=0)
+    total_water: Mapped[float] = mapped_column(Float, default=0.0)
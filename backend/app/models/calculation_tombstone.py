@@ -0,0 +1,23 @@
+from datetime import datetime
+from sqlalchemy import BigInteger, Integer, DateTime, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column
+from app.database import Base
+
+
+class CalculationTombstone(Base):
+    """
+    Запись об удалённом расчёте для ленты изменений истории.
+
+    change_seq - номер удаления в истории пользователя (history_watermarks),
+    по нему клиенты /history/changes узнают об удалениях после своего курсора.
+    """
+
+    __tablename__ = "calculation_tombstones"
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+    change_seq: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    calculation_id: Mapped[int] = mapped_column(Integer)
+    deleted_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,27 @@
+from datetime import datetime
+from sqlalchemy import BigInteger, Integer, DateTime, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column
+from app.database import Base
+
+
+class HistoryWatermark(Base):
+    """
+    Водяной знак истории пользователя: число расчётов, время последней
+    записи и номер последнего изменения.
+
+    Обновляется вместе с вставкой и удалением расчётов в той же транзакции.
+    change_seq растёт на единицу с каждым созданным или удалённым расчётом,
+    и эти номера получают строки calculations и calculation_tombstones.
+    Пока он не изменился, не изменилась и история, поэтому по нему
+    строятся ETag/Last-Modified, ключи кэша страниц и курсор /history/changes.
+    """
+
+    __tablename__ = "history_watermarks"
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+    row_count: Mapped[int] = mapped_column(Integer, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime)
+    change_seq: Mapped[int] = mapped_column(BigInteger, default=0)
@@ -0,0 +1,106 @@
+"""
+Инструментированный пул соединений и учёт ожидания соединения.
+
+Пул считает ожидания при выдаче соединения (гистограмма времени),
+таймауты и текущую занятость; данные отдаются в /metrics/pool,
+чтобы подбирать размеры пула и число воркеров по измерениям.
+"""
+import bisect
+import threading
+import time
+from typing import List, Sequence
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Верхние границы корзин гистограммы ожидания, миллисекунды
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class WaitHistogram:
+    """Потокобезопасная гистограмма времени ожидания с фиксированными корзинами."""
+
+    def __init__(self, buckets_ms: Sequence[float] = WAIT_BUCKETS_MS):
+        self.buckets_ms = tuple(buckets_ms)
+        self._counts: List[int] = [0] * (len(self.buckets_ms) + 1)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms: float) -> None:
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets_ms, ms)] += 1
+            self.count += 1
+            self.total_ms += ms
+            self.max_ms = max(self.max_ms, ms)
+
+    def snapshot(self) -> dict:
+        """Счётчики по корзинам ("le" - верхняя граница, мс)."""
+        with self._lock:
+            labels = [str(bound) for bound in self.buckets_ms] + ["inf"]
+            return {
+                "count": self.count,
+                "avg_ms": self.total_ms / self.count if self.count else 0.0,
+                "max_ms": self.max_ms,
+                "buckets": dict(zip(labels, self._counts)),
+            }
+
+
+class PoolStats:
+    """Счётчики пула, общие для пересозданных экземпляров пула одного движка."""
+
+    def __init__(self):
+        self.wait = WaitHistogram()
+        self.timeouts = 0
+        self._lock = threading.Lock()
+
+    def timed_out(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool, который измеряет время выдачи соединения.
+
+    Время включает ожидание свободного соединения и, если пул
+    расширяется, открытие нового.
+    """
+
+    def __init__(self, *args, **kw):
+        self.stats = kw.pop("stats", None) or PoolStats()
+        super().__init__(*args, **kw)
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.stats.timed_out()
+            raise
+        finally:
+            self.stats.wait.observe((time.perf_counter() - start) * 1000)
+
+    def recreate(self) -> "InstrumentedQueuePool":
+        # Пул пересоздаётся при invalidate; счётчики сохраняются
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def metrics(self) -> dict:
+        """Текущее состояние пула и накопленные счётчики."""
+        return {
+            "size": self.size(),
+            "max_overflow": self._max_overflow,
+            "timeout": self.timeout(),
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+            "timeouts": self.stats.timeouts,
+            "checkout_wait_ms": self.stats.wait.snapshot(),
+        }
+
+
+class InstrumentedAsyncQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    """InstrumentedQueuePool для async-движков."""
@@ -1,5 +1,13 @@
 from app.routers.auth import router as auth_router
 from app.routers.calculate import router as calculate_router
 from app.routers.history import router as history_router
+from app.routers.metrics import router as metrics_router
+from app.routers.planner import router as planner_router
 
-__all__ = ["auth_router", "calculate_router", "history_router"]
+__all__ = [
+    "auth_router",
+    "calculate_router",
+    "history_router",
+    "metrics_router",
+    "planner_router"
+]
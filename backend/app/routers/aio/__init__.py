@@ -0,0 +1,15 @@
+"""
+Async-версии маршрутов, работающих с БД.
+
+Подключаются при db_async=true перед sync-роутерами и перекрывают
+их маршруты с теми же путями; контракт API не меняется.
+"""
+from app.routers.aio.auth import router as auth_router
+from app.routers.aio.calculate import router as calculate_router
+from app.routers.aio.history import router as history_router
+
+__all__ = [
+    "auth_router",
+    "calculate_router",
+    "history_router"
+]
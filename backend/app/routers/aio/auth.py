@@ -0,0 +1,68 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_async_db
+from app.routers.auth import check_rate_limit, hashing_overloaded
+from app.schemas.user import UserCreate, Token
+from app.services.auth import AuthService
+from app.services.hashing import HashingOverloaded
+
+router = APIRouter(prefix="/auth", tags=["auth"])
+
+
+@router.post(
+    "/register",
+    response_model=Token,
+    status_code=status.HTTP_201_CREATED
+)
+async def register(
+    user_data: UserCreate,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Регистрация нового пользователя (async)."""
+    check_rate_limit(request, user_data.email)
+    existing = await AuthService.get_user_by_email_async(db, user_data.email)
+    if existing:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Пользователь с таким email уже существует"
+        )
+    # Соединение не держится, пока считается bcrypt
+    await db.commit()
+
+    try:
+        user = await AuthService.create_user_async(db, user_data.email, user_data.password)
+    except HashingOverloaded:
+        raise hashing_overloaded()
+    token = AuthService.create_access_token(user.id)
+    return Token(access_token=token)
+
+
+@router.post("/login", response_model=Token)
+async def login(
+    request: Request,
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Вход в систему (async)."""
+    check_rate_limit(request, form_data.username)
+    try:
+        user = await AuthService.authenticate_user_async(
+            db,
+            form_data.username,  # username = email
+            form_data.password
+        )
+    except HashingOverloaded:
+        raise hashing_overloaded()
+
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Неверный email или пароль",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+
+    token = AuthService.create_access_token(user.id)
+    return Token(access_token=token)
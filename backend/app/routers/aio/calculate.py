@@ -0,0 +1,86 @@
+from typing import Optional
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.database import LazySession, get_lazy_async_db, note_user_write_async
+from app.routers.calculate import idempotency_key, run_idempotent
+from app.schemas.calculation import CalculationRequest, CalculationResponse
+from app.services.auth import Principal, get_current_principal_optional_async
+from app.services.calculator import CalculatorService
+from app.services.idempotency import client_id, fingerprint_digest, get_idempotency_store
+from app.services.write_behind import WriteBehindFull, get_write_behind
+
+router = APIRouter(tags=["calculate"])
+
+
+async def save_for_user(
+    db: AsyncSession,
+    request: CalculationRequest,
+    body: bytes,
+    user_id: int,
+    key: Optional[str] = None
+) -> bool:
+    """
+    Сохраняет расчёт в историю пользователя (async).
+
+    Очередь write-behind может писать в БД синхронно при переполнении,
+    поэтому постановка в неё идёт через пул потоков. Расчёт с ключом
+    идемпотентности пишется сразу; False - ключ уже занят этим же
+    запросом, IdempotencyKeyReused - другим.
+    """
+    total_water = orjson.loads(body)["total_water"]
+    if key is not None:
+        return await CalculatorService.save_calculation_async(
+            db, request, total_water, user_id, client_id(key),
+            fingerprint_digest(CalculatorService.cache_key(request))
+        ) is not None
+    write_behind = get_write_behind()
+    if write_behind is None:
+        await CalculatorService.save_calculation_async(db, request, total_water, user_id)
+    else:
+        try:
+            await run_in_threadpool(
+                write_behind.submit,
+                CalculatorService.calculation_row(request, total_water, user_id)
+            )
+        except WriteBehindFull:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Сервис перегружен, повторите запрос позже",
+                headers={"Retry-After": "1"}
+            )
+    return True
+
+
+@router.post("/calculate", response_model=CalculationResponse)
+async def calculate_water(
+    request: CalculationRequest,
+    key: Optional[str] = Depends(idempotency_key),
+    db: LazySession = Depends(get_lazy_async_db),
+    current_user: Optional[Principal] = Depends(get_current_principal_optional_async)
+):
+    """
+    Расчёт потребления воды (async).
+
+    Расчёт и попадание в L1-кэш выполняются прямо в event loop,
+    обращения к Redis (L2, ключи идемпотентности, окно read-your-writes)
+    уходят в пул потоков: клиент Redis синхронный.
+    Пользователь проверяется без запроса к БД (кэш principal
+    и список отзыва), AsyncSession создаётся только для сохранения.
+    Idempotency-Key - как у sync-версии.
+    """
+    async def save(body: bytes) -> bool:
+        created = await save_for_user(db, request, body, current_user.id, key)
+        await note_user_write_async(current_user.id)
+        return created
+
+    if current_user and key is not None:
+        return await run_idempotent(get_idempotency_store(), current_user.id, key, request, save)
+
+    body = await CalculatorService.calculate_cached_async(request)
+    if current_user:
+        await save(body)
+
+    return Response(content=body, media_type="application/json")
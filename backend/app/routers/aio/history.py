@@ -0,0 +1,196 @@
+from datetime import datetime
+from typing import List, Literal, Optional
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import get_settings
+from app.database import (
+    get_async_db,
+    get_async_read_db,
+    get_async_session_factory,
+    note_user_write_async
+)
+from app.routers.history import (
+    _detail_item,
+    bulk_conflict,
+    cached_page_async,
+    changes_response,
+    detail_cache_key,
+    export_response,
+    history_limit,
+    not_modified,
+    page_cache_key,
+    parse_change_cursor,
+    parse_cursor,
+    store_page_async,
+    validator_headers
+)
+from app.schemas.calculation import (
+    BulkUploadRequest,
+    BulkUploadResponse,
+    CalculationHistoryItem,
+    CalculationDetail,
+    HistoryChanges,
+    HistoryStats
+)
+from app.services.auth import Principal, get_current_principal_async
+from app.services.bulk import BulkUploadConflict, BulkUploadService
+from app.services.cache import get_history_cache
+from app.services.calculator import CalculatorService
+from app.services.changes import ChangesService
+from app.services.export import ExportService
+from app.services.rollup import RollupService
+from app.services.watermark import WatermarkService
+
+settings = get_settings()
+router = APIRouter(prefix="/history", tags=["history"])
+
+
+@router.get("", response_model=List[CalculationHistoryItem])
+async def get_history(
+    request: Request,
+    limit: int = Depends(history_limit),
+    before: Optional[str] = Query(None),
+    since: Optional[datetime] = Query(None),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(get_current_principal_async)
+):
+    """Получение страницы истории расчётов пользователя (async, ETag и кэш страниц)."""
+    cursor = parse_cursor(before)
+    watermark = await WatermarkService.get_async(db, current_user.id)
+    response = not_modified(request, watermark)
+    if response is not None:
+        return response
+
+    headers = validator_headers(watermark)
+    key = page_cache_key(watermark, limit, before, since)
+    response = await cached_page_async(key, headers)
+    if response is not None:
+        return response
+
+    calculations = []
+    if watermark.row_count:
+        calculations = await CalculatorService.get_user_history_rows_async(
+            db,
+            current_user.id,
+            limit + 1,
+            cursor,
+            since
+        )
+    return await store_page_async(key, calculations, limit, headers)
+
+
+@router.get("/stats", response_model=HistoryStats)
+async def get_history_stats(
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(get_current_principal_async)
+):
+    """Статистика истории по агрегатам (async)."""
+    return ORJSONResponse(await RollupService.get_stats_async(db, current_user.id))
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_history(
+    format: Literal["csv", "ndjson"] = Query("csv"),
+    since: Optional[datetime] = Query(None),
+    session_factory: async_sessionmaker = Depends(get_async_session_factory),
+    current_user: Principal = Depends(get_current_principal_async)
+):
+    """Выгрузка всей истории пользователя (async, AsyncSession.stream)."""
+    return export_response(
+        ExportService.aiter_export(
+            session_factory,
+            current_user.id,
+            format,
+            settings.export_batch_size,
+            since
+        ),
+        format
+    )
+
+
+@router.post("/bulk", response_model=BulkUploadResponse)
+async def upload_history(
+    upload: BulkUploadRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal_async)
+):
+    """Офлайн-выгрузка расчётов в историю (async)."""
+    try:
+        result = await BulkUploadService.upload_async(db, current_user.id, upload.items)
+    except BulkUploadConflict:
+        raise bulk_conflict()
+    if result["created"]:
+        await note_user_write_async(current_user.id)
+    return ORJSONResponse(result)
+
+
+@router.get("/changes", response_model=HistoryChanges)
+async def get_history_changes(
+    since: Optional[str] = Query(None),
+    limit: int = Depends(history_limit),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(get_current_principal_async)
+):
+    """Изменения истории после курсора (async)."""
+    return changes_response(await ChangesService.get_changes_async(
+        db,
+        current_user.id,
+        parse_change_cursor(since),
+        limit
+    ))
+
+
+@router.get("/{calculation_id}", response_model=CalculationDetail)
+async def get_calculation_detail(
+    calculation_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(get_current_principal_async)
+):
+    """Получение детальной информации о расчёте (async)."""
+    watermark = await WatermarkService.get_async(db, current_user.id)
+    response = not_modified(request, watermark)
+    if response is not None:
+        return response
+
+    headers = validator_headers(watermark)
+    cache = get_history_cache()
+    cache_key = detail_cache_key(watermark, calculation_id)
+    cached = await cache.get_async(cache_key)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json", headers=headers)
+
+    calculation = await CalculatorService.get_calculation_by_id_async(
+        db,
+        calculation_id,
+        current_user.id
+    )
+
+    if not calculation:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Расчёт не найден"
+        )
+
+    body = orjson.dumps(_detail_item(calculation))
+    await cache.set_async(cache_key, body)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.delete("/{calculation_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_calculation(
+    calculation_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal_async)
+):
+    """Удаление расчёта из истории (async)."""
+    if not await CalculatorService.delete_calculation_async(db, calculation_id, current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Расчёт не найден"
+        )
+    await note_user_write_async(current_user.id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
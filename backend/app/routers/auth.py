@@ -1,60 +1,175 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import math
+from functools import lru_cache
+from ipaddress import ip_address, ip_network
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
-from app.database import get_db
+from app.config import get_settings
+from app.database import LazySession, get_lazy_db, hold_request_slot
 from app.schemas.user import UserCreate, Token
 from app.services.auth import AuthService
+from app.services.hashing import HashingOverloaded, RateLimited, get_auth_rate_limiter
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
+@lru_cache
+def trusted_proxies() -> Tuple[bool, tuple]:
+    """
+    Доверенные прокси из auth_trusted_proxies.
+
+    Возвращает (доверять любому адресу соединения, подсети прокси).
+    """
+    any_peer = False
+    networks = []
+    for item in get_settings().auth_trusted_proxies.split(","):
+        item = item.strip()
+        if item == "*":
+            any_peer = True
+        elif item:
+            networks.append(ip_network(item, strict=False))
+    return any_peer, tuple(networks)
+
+
+def is_trusted_proxy(host: str) -> bool:
+    """Входит ли адрес в подсети доверенных прокси."""
+    try:
+        address = ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in trusted_proxies()[1])
+
+
+def client_ip(request: Request) -> Optional[str]:
+    """
+    IP клиента для лимита попыток.
+
+    Если соединение пришло от доверенного прокси, IP берётся
+    из X-Forwarded-For: адреса просматриваются справа налево,
+    адреса доверенных прокси пропускаются, первый остальной -
+    клиент. "*" доверяет только самому соединению, но не адресам
+    в заголовке. От остальных соединений заголовок игнорируется:
+    его мог подставить сам клиент.
+    """
+    host = request.client.host if request.client else None
+    any_peer, _ = trusted_proxies()
+    if host is None or not (any_peer or is_trusted_proxy(host)):
+        return host
+    forwarded = ",".join(request.headers.getlist("x-forwarded-for"))
+    for candidate in reversed(forwarded.split(",")):
+        candidate = candidate.strip()
+        if not candidate:
+            continue
+        host = candidate
+        if not is_trusted_proxy(candidate):
+            break
+    return host
+
+
+def check_rate_limit(request: Request, email: str) -> None:
+    """Лимит попыток по IP и email; при превышении - 429."""
+    try:
+        get_auth_rate_limiter().check(client_ip(request), email)
+    except RateLimited as exc:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Слишком много попыток, повторите позже",
+            headers={"Retry-After": str(math.ceil(exc.retry_after))}
+        )
+
+
+def hashing_overloaded() -> HTTPException:
+    """503 при заполненной очереди хеширования паролей."""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Сервис перегружен, повторите запрос позже",
+        headers={"Retry-After": "1"}
+    )
+
+
 @router.post(
     "/register",
     response_model=Token,
     status_code=status.HTTP_201_CREATED
 )
-def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(
+    user_data: UserCreate,
+    request: Request,
+    db: LazySession = Depends(get_lazy_db)
+):
     """
     Регистрация нового пользователя.
 
     Проверяет уникальность email и создаёт аккаунт.
     Сразу возвращает токен для автоматической авторизации.
+
+    Хеш пароля считается в пуле хеширования, без соединения с БД
+    и без потоков, нужных остальным маршрутам.
     """
-    existing = AuthService.get_user_by_email(db, user_data.email)
+    check_rate_limit(request, user_data.email)
+    async with hold_request_slot(request):
+        existing = await run_in_threadpool(AuthService.get_credentials, db, user_data.email)
     if existing:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Пользователь с таким email уже существует"
         )
 
-    user = AuthService.create_user(db, user_data.email, user_data.password)
+    try:
+        password_hash = await AuthService.hash_password_async(user_data.password)
+    except HashingOverloaded:
+        raise hashing_overloaded()
+    async with hold_request_slot(request):
+        user = await run_in_threadpool(
+            AuthService.create_user_hashed, db, user_data.email, password_hash
+        )
     token = AuthService.create_access_token(user.id)
     return Token(access_token=token)
 
 
 @router.post("/login", response_model=Token)
-def login(
+async def login(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: LazySession = Depends(get_lazy_db)
 ):
     """
     Вход в систему.
 
     Принимает email (как username) и пароль, возвращает JWT токен.
+    Если хеш пароля посчитан с другим bcrypt_rounds, он заменяется
+    новым.
     """
-    user = AuthService.authenticate_user(
-        db,
-        form_data.username,  # username = email
-        form_data.password
-    )
+    check_rate_limit(request, form_data.username)
+    async with hold_request_slot(request):
+        credentials = await run_in_threadpool(
+            AuthService.get_credentials,
+            db,
+            form_data.username  # username = email
+        )
+
+    verified = False
+    if credentials:
+        user_id, password_hash = credentials
+        try:
+            verified, new_hash = await AuthService.verify_and_update_async(
+                form_data.password, password_hash
+            )
+        except HashingOverloaded:
+            raise hashing_overloaded()
 
-    if not user:
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Неверный email или пароль",
             headers={"WWW-Authenticate": "Bearer"}
         )
 
-    token = AuthService.create_access_token(user.id)
+    if new_hash:
+        async with hold_request_slot(request):
+            await run_in_threadpool(AuthService.update_password_hash, db, user_id, new_hash)
+    token = AuthService.create_access_token(user_id)
     return Token(access_token=token)
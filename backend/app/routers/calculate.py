@@ -1,37 +1,262 @@
-from typing import Optional
-from fastapi import APIRouter, Depends
+from typing import Literal, Optional
+import orjson
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
-from app.database import get_db
-from app.models.user import User
-from app.schemas.calculation import CalculationRequest, CalculationResponse
-from app.services.auth import get_current_user_optional
+from app.config import get_settings
+from app.database import LazySession, get_lazy_db, hold_request_slot, note_user_write_async
+from app.schemas.calculation import (
+    CalculationRequest,
+    CalculationResponse,
+    BatchCalculationRequest,
+    BatchCalculationResponse
+)
+from app.services.auth import Principal, get_current_principal_optional
+from app.schemas.sweep import SweepRequest, SweepResponse
 from app.services.calculator import CalculatorService
+from app.services.idempotency import (
+    IDEMPOTENCY_HEADER,
+    MAX_KEY_LENGTH,
+    REPLAYED_HEADER,
+    IdempotencyKeyReused,
+    IdempotencyStore,
+    client_id,
+    fingerprint_digest,
+    get_idempotency_store
+)
+from app.services.streaming import (
+    RESPONSE_MEDIA_TYPES,
+    BodyStreamingResponse,
+    detect_format,
+    stream_calculations
+)
+from app.services.sweep import SweepGrid, SweepService, SweepTooLarge
+from app.services.write_behind import WriteBehindFull, get_write_behind
 
+settings = get_settings()
 router = APIRouter(tags=["calculate"])
 
 
+def save_for_user(
+    db: Session,
+    request: CalculationRequest,
+    body: bytes,
+    user_id: int,
+    key: Optional[str] = None
+) -> bool:
+    """
+    Сохраняет расчёт в историю пользователя.
+
+    В режиме write-behind сохранение ставится в очередь
+    и пишется в БД пачкой в фоне. Расчёт с ключом идемпотентности
+    пишется сразу: ключ занимается в той же транзакции.
+    Возвращает False, если расчёт с этим ключом уже сохранён;
+    ключ, занятый другим запросом, - IdempotencyKeyReused.
+    """
+    total_water = orjson.loads(body)["total_water"]
+    if key is not None:
+        return CalculatorService.save_calculation(
+            db, request, total_water, user_id, client_id(key),
+            fingerprint_digest(CalculatorService.cache_key(request))
+        ) is not None
+    write_behind = get_write_behind()
+    if write_behind is None:
+        CalculatorService.save_calculation(db, request, total_water, user_id)
+    else:
+        try:
+            write_behind.submit(CalculatorService.calculation_row(request, total_water, user_id))
+        except WriteBehindFull:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Сервис перегружен, повторите запрос позже",
+                headers={"Retry-After": "1"}
+            )
+    return True
+
+
+async def idempotency_key(
+    key: Optional[str] = Header(
+        None,
+        alias=IDEMPOTENCY_HEADER,
+        description="Ключ повтора запроса: тот же ключ - тот же ответ без новой записи"
+    )
+) -> Optional[str]:
+    """Значение Idempotency-Key; некорректное - 400."""
+    if key is not None and (
+        not 0 < len(key) <= MAX_KEY_LENGTH or not key.isascii() or not key.isprintable()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{IDEMPOTENCY_HEADER}: от 1 до {MAX_KEY_LENGTH} печатных ASCII-символов"
+        )
+    return key
+
+
+async def run_idempotent(
+    store: IdempotencyStore,
+    user_id: int,
+    key: str,
+    request: CalculationRequest,
+    save
+) -> Response:
+    """
+    Ответ на запрос с ключом идемпотентности.
+
+    save(body) сохраняет расчёт и возвращает False, если ключ уже занят
+    в БД. Повтор отдаётся с заголовком Idempotent-Replayed: true;
+    тот же ключ с другим запросом - 422.
+    """
+    async def produce():
+        body = await CalculatorService.calculate_cached_async(request)
+        return body, await save(body)
+
+    try:
+        body, replayed = await store.run(
+            IdempotencyStore.scope(user_id, key),
+            CalculatorService.cache_key(request),
+            produce
+        )
+    except IdempotencyKeyReused:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"{IDEMPOTENCY_HEADER} уже использован с другим запросом"
+        )
+    headers = {REPLAYED_HEADER: "true"} if replayed else {}
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
 @router.post("/calculate", response_model=CalculationResponse)
-def calculate_water(
+async def calculate_water(
     request: CalculationRequest,
-    db: Session = Depends(get_db),
-    current_user: Optional[User] = Depends(get_current_user_optional)
+    http_request: Request,
+    key: Optional[str] = Depends(idempotency_key),
+    db: LazySession = Depends(get_lazy_db),
+    current_user: Optional[Principal] = Depends(get_current_principal_optional)
 ):
     """
     Расчёт потребления воды.
 
     Доступен всем, но если пользователь авторизован -
-    расчёт сохраняется в историю.
+    расчёт сохраняется в историю. Ответ берётся из кэша
+    сериализованных результатов и не проходит повторную валидацию.
+
+    Анонимный расчёт при попадании в L1-кэш выполняется в event loop
+    без пула потоков и без сессии БД; обращения к Redis (L2) идут
+    в пуле потоков. Пользователь проверяется без запроса к БД
+    (кэш principal и список отзыва), сессия создаётся только для
+    сохранения, которое идёт в пуле потоков со слотом запроса к БД.
+
+    С заголовком Idempotency-Key повтор запроса пользователя
+    получает сохранённый ответ без расчёта и без записи.
     """
-    result = CalculatorService.calculate(request)
+    async def save(body: bytes) -> bool:
+        async with hold_request_slot(http_request):
+            created = await run_in_threadpool(save_for_user, db, request, body, current_user.id, key)
+        await note_user_write_async(current_user.id)
+        return created
+
+    if current_user and key is not None:
+        return await run_idempotent(get_idempotency_store(), current_user.id, key, request, save)
 
-    # Сохраняем в БД если пользователь авторизован
+    body = await CalculatorService.calculate_cached_async(request)
     if current_user:
-        CalculatorService.save_calculation(
-            db,
-            request,
-            result.total_water,
-            current_user.id
+        await save(body)
+
+    return Response(content=body, media_type="application/json")
+
+
+@router.post("/calculate/batch", response_model=BatchCalculationResponse)
+def calculate_water_batch(batch: BatchCalculationRequest):
+    """
+    Пакетный расчёт потребления воды.
+
+    Считает все строки за один проход над массивами NumPy.
+    Результаты идут в том же порядке, что и строки запроса,
+    и в историю не сохраняются. Ответ собирается из готовых словарей
+    без повторной валидации через response_model.
+    """
+    results = CalculatorService.calculate_batch(batch.items)
+    return ORJSONResponse({"results": results, "count": len(results)})
+
+
+@router.post(
+    "/calculate/stream",
+    response_class=BodyStreamingResponse,
+    responses={
+        200: {"content": {media_type: {} for media_type in RESPONSE_MEDIA_TYPES.values()}},
+        415: {"description": "Неподдерживаемый Content-Type"}
+    }
+)
+async def calculate_water_stream(request: Request):
+    """
+    Потоковый расчёт потребления воды для NDJSON или CSV.
+
+    Формат определяется по Content-Type (application/x-ndjson или text/csv),
+    ответ отдаётся в том же формате по мере обработки блоков.
+    Строки с ошибками валидации попадают в ответ с номером строки
+    и не прерывают обработку. В историю ничего не сохраняется.
+    """
+    fmt = detect_format(request.headers.get("content-type"))
+    if fmt is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Поддерживаются application/x-ndjson и text/csv"
+        )
+
+    return BodyStreamingResponse(
+        stream_calculations(
+            request.stream(),
+            fmt,
+            chunk_size=settings.stream_chunk_size,
+            max_line_bytes=settings.stream_max_line_bytes
+        ),
+        media_type=RESPONSE_MEDIA_TYPES[fmt]
+    )
+
+
+@router.post(
+    "/calculate/sweep",
+    response_model=SweepResponse,
+    responses={
+        200: {"content": {"application/x-ndjson": {}}},
+        413: {"description": "Сетка превышает допустимый размер"}
+    }
+)
+def calculate_water_sweep(
+    sweep: SweepRequest,
+    format: Literal["columnar", "ndjson"] = Query(
+        "columnar",
+        description="columnar - один JSON со столбцом total_water, ndjson - поток строк"
+    )
+):
+    """
+    Перебор сценариев по сетке параметров.
+
+    Для каждого поля задаётся список значений или диапазон,
+    результат считается для всего декартова произведения.
+    Размер сетки ограничен настройкой sweep_max_points.
+    """
+    grid = SweepGrid(sweep)
+    try:
+        grid.check_limit(settings.sweep_max_points)
+    except SweepTooLarge as exc:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(exc)
+        )
+
+    if format == "ndjson":
+        return StreamingResponse(
+            SweepService.iter_ndjson(grid, chunk_points=settings.stream_chunk_size),
+            media_type="application/x-ndjson"
         )
 
-    return result
+    return Response(
+        content=orjson.dumps(
+            SweepService.columnar(grid),
+            option=orjson.OPT_SERIALIZE_NUMPY
+        ),
+        media_type="application/json"
+    )
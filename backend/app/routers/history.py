@@ -1,73 +1,459 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import List, Literal, Optional, Sequence, Tuple
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy import Row
+from sqlalchemy.orm import Session, sessionmaker
 
-from app.database import get_db
-from app.models.user import User
+from app.config import get_settings
+from app.database import get_db, get_read_db, get_session_factory, note_user_write
+from app.models.calculation import Calculation
 from app.schemas.calculation import (
+    BulkUploadRequest,
+    BulkUploadResponse,
     CalculationHistoryItem,
     CalculationDetail,
-    CalculationParams,
-    Breakdown,
-    CategoryBreakdown,
-    Coefficients
+    HistoryChanges,
+    HistoryStats
 )
-from app.services.auth import get_current_user
+from app.services.auth import Principal, get_current_principal
+from app.services.bulk import BulkUploadConflict, BulkUploadService
+from app.services.cache import get_history_cache
+from app.services.changes import ChangesService
+from app.services.export import ExportService
+from app.services.rollup import RollupService
+from app.services.watermark import Watermark, WatermarkService
 from app.services.calculator import (
     CalculatorService,
+    CATEGORIES,
     WATER_NORMS,
     SEASON_COEFFICIENTS,
     ACTIVITY_COEFFICIENTS
 )
 
+settings = get_settings()
 router = APIRouter(prefix="/history", tags=["history"])
 
+# Заголовок с курсором следующей страницы истории
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def parse_cursor(before: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    """
+    Разбирает курсор вида "<created_at в ISO 8601>,<id>".
+
+    Некорректный курсор - ошибка 400.
+    """
+    if before is None:
+        return None
+    created_at, _, calculation_id = before.rpartition(",")
+    try:
+        return datetime.fromisoformat(created_at), int(calculation_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Некорректный курсор before"
+        )
+
+
+def parse_change_cursor(since: Optional[str]) -> int:
+    """
+    Разбирает курсор ленты изменений (неотрицательное целое).
+
+    Без курсора лента начинается с начала истории. Некорректный курсор - 400.
+    """
+    if since is None:
+        return 0
+    if not since.isdigit():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Некорректный курсор since"
+        )
+    return int(since)
+
+
+async def history_limit(
+    limit: Optional[int] = Query(
+        None,
+        ge=1,
+        le=settings.history_max_page_size,
+        description="Размер страницы"
+    )
+) -> int:
+    """Размер страницы истории (по умолчанию history_page_size)."""
+    return limit or settings.history_page_size
+
+
+def serialize_page(calculations: Sequence[Row], limit: int) -> Tuple[bytes, Optional[str]]:
+    """
+    Тело страницы истории из строк HISTORY_COLUMNS и курсор следующей страницы.
+
+    calculations запрошены с limit + 1: лишняя строка означает,
+    что есть следующая страница, и её курсор уходит в X-Next-Cursor.
+    Для последней страницы курсор None.
+    """
+    page = calculations[:limit]
+    cursor = None
+    if len(calculations) > limit:
+        last = page[-1]
+        cursor = f"{last.created_at.isoformat()},{last.id}"
+    return orjson.dumps([_history_item(calc) for calc in page]), cursor
+
+
+def page_response(body: bytes, cursor: Optional[str], headers: Optional[dict] = None) -> Response:
+    """Ответ с готовым телом страницы истории."""
+    headers = dict(headers or {})
+    if cursor is not None:
+        headers[NEXT_CURSOR_HEADER] = cursor
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def changes_response(changes: dict) -> ORJSONResponse:
+    """Ответ ленты изменений в формате HistoryChanges."""
+    changes["created"] = [_history_item(row) for row in changes["created"]]
+    return ORJSONResponse(changes)
+
+
+def detail_cache_key(watermark: Watermark, calculation_id: int) -> str:
+    """
+    Ключ кэша деталей расчёта.
+
+    Сохранённые расчёты не меняются, но могут быть удалены: в ключ
+    входит число удалений, чтобы удалённый расчёт не отдавался
+    из кэша других воркеров.
+    """
+    return f"history_detail:{watermark.user_id}:{calculation_id}:{watermark.deletions}"
+
+
+def bulk_conflict() -> HTTPException:
+    """Ошибка 409: те же client_id сохраняет параллельная выгрузка."""
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Расчёты с этими client_id сохраняются другим запросом, повторите выгрузку"
+    )
+
+
+def validator_headers(watermark: Watermark) -> dict:
+    """
+    ETag и Last-Modified по водяному знаку истории.
+
+    no-cache: клиент хранит ответ, но перед использованием
+    переспрашивает сервер с If-None-Match.
+    """
+    headers = {"ETag": watermark.etag, "Cache-Control": "private, no-cache"}
+    if watermark.last_modified is not None:
+        headers["Last-Modified"] = watermark.last_modified
+    return headers
+
+
+def not_modified(request: Request, watermark: Watermark) -> Optional[Response]:
+    """Ответ 304, если история не менялась с версии клиента, иначе None."""
+    if WatermarkService.not_modified(
+        watermark,
+        request.headers.get("if-none-match"),
+        request.headers.get("if-modified-since")
+    ):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validator_headers(watermark))
+    return None
+
+
+def page_cache_key(
+    watermark: Watermark,
+    limit: int,
+    before: Optional[str],
+    since: Optional[datetime]
+) -> str:
+    """
+    Ключ кэша страницы истории.
+
+    Версия водяного знака входит в ключ: после записи в историю
+    старые страницы не читаются и вытесняются LRU и TTL.
+    """
+    return (
+        f"history_page:{watermark.version}:{limit}:"
+        f"{before or ''}:{since.isoformat() if since else ''}"
+    )
+
+
+def _cached_page_response(cached: Optional[bytes], headers: dict) -> Optional[Response]:
+    if cached is None:
+        return None
+    cursor, _, body = cached.partition(b"\n")
+    return page_response(body, cursor.decode() or None, headers)
+
+
+def cached_page(key: str, headers: dict) -> Optional[Response]:
+    """Страница истории из кэша; значение - курсор, перевод строки и тело."""
+    return _cached_page_response(get_history_cache().get(key), headers)
+
+
+async def cached_page_async(key: str, headers: dict) -> Optional[Response]:
+    """cached_page для async-маршрутов: Redis читается в пуле потоков."""
+    return _cached_page_response(await get_history_cache().get_async(key), headers)
+
+
+def store_page(key: str, calculations: Sequence[Row], limit: int, headers: dict) -> Response:
+    """Сериализует страницу истории, кладёт её в кэш и возвращает ответ."""
+    body, cursor = serialize_page(calculations, limit)
+    get_history_cache().set(key, (cursor or "").encode() + b"\n" + body)
+    return page_response(body, cursor, headers)
+
+
+async def store_page_async(
+    key: str,
+    calculations: Sequence[Row],
+    limit: int,
+    headers: dict
+) -> Response:
+    """store_page для async-маршрутов: Redis пишется в пуле потоков."""
+    body, cursor = serialize_page(calculations, limit)
+    await get_history_cache().set_async(key, (cursor or "").encode() + b"\n" + body)
+    return page_response(body, cursor, headers)
+
+
+def export_response(body, fmt: str) -> StreamingResponse:
+    """Потоковый ответ с выгрузкой истории в виде файла."""
+    return StreamingResponse(
+        body,
+        media_type=ExportService.media_type(fmt),
+        headers={"Content-Disposition": f'attachment; filename="history.{fmt}"'}
+    )
+
+
+def _params(calc: Calculation | Row) -> dict:
+    """Параметры расчёта в формате CalculationParams."""
+    return {
+        "junior_count": calc.junior_count,
+        "middle_count": calc.middle_count,
+        "senior_count": calc.senior_count,
+        "staff_count": calc.staff_count,
+        "season": calc.season,
+        "activity": calc.activity
+    }
+
+
+def _history_item(calc: Calculation | Row) -> dict:
+    """
+    Элемент истории в формате CalculationHistoryItem.
+
+    Словарь собирается напрямую из строки БД (объекта ORM или строки
+    HISTORY_COLUMNS): данные уже прошли валидацию при сохранении,
+    повторно проверять их незачем.
+    """
+    return {
+        "id": calc.id,
+        "total_water": calc.total_water,
+        "created_at": calc.created_at,
+        "params": _params(calc)
+    }
+
+
+def _detail_item(calc: Calculation) -> dict:
+    """Полная информация о расчёте в формате CalculationDetail."""
+    params = _params(calc)
+
+    # Пересчитываем детализацию
+    breakdown = {}
+    for category in CATEGORIES:
+        count = params[f"{category}_count"]
+        breakdown[category] = {
+            "count": count,
+            "norm": WATER_NORMS[category],
+            "subtotal": round(count * WATER_NORMS[category], 2)
+        }
+
+    return {
+        "id": calc.id,
+        "total_water": calc.total_water,
+        "created_at": calc.created_at,
+        "params": params,
+        "breakdown": breakdown,
+        "coefficients": {
+            "season": SEASON_COEFFICIENTS[calc.season],
+            "activity": ACTIVITY_COEFFICIENTS[calc.activity]
+        },
+        "total_people": (
+            calc.junior_count +
+            calc.middle_count +
+            calc.senior_count +
+            calc.staff_count
+        )
+    }
+
 
 @router.get("", response_model=List[CalculationHistoryItem])
 def get_history(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    limit: int = Depends(history_limit),
+    before: Optional[str] = Query(
+        None,
+        description="Курсор из X-Next-Cursor предыдущей страницы"
+    ),
+    since: Optional[datetime] = Query(
+        None,
+        description="Только расчёты не раньше этого момента"
+    ),
+    db: Session = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """
     Получение истории расчётов пользователя.
 
-    Требует авторизации. Возвращает список расчётов
-    в хронологическом порядке (новые сначала).
-    """
-    calculations = CalculatorService.get_user_calculations(db, current_user.id)
-
-    result = []
-    for calc in calculations:
-        item = CalculationHistoryItem(
-            id=calc.id,
-            total_water=calc.total_water,
-            created_at=calc.created_at,
-            params=CalculationParams(
-                junior_count=calc.junior_count,
-                middle_count=calc.middle_count,
-                senior_count=calc.senior_count,
-                staff_count=calc.staff_count,
-                season=calc.season,
-                activity=calc.activity
-            )
+    Требует авторизации. Возвращает страницу расчётов
+    в хронологическом порядке (новые сначала). Читается с реплики,
+    если они настроены. Если есть
+    следующая страница, её курсор передаётся в заголовке
+    X-Next-Cursor, и его нужно передать в параметре before.
+    since ограничивает историю снизу по времени и позволяет
+    не читать партиции старых месяцев.
+    Ответ сериализуется orjson напрямую из строк БД,
+    response_model используется только для документации.
+
+    Сначала читается водяной знак истории: если ETag клиента
+    совпадает, ответ 304 без обращения к calculations, иначе
+    страница берётся из кэша по версии водяного знака.
+    """
+    cursor = parse_cursor(before)
+    watermark = WatermarkService.get(db, current_user.id)
+    response = not_modified(request, watermark)
+    if response is not None:
+        return response
+
+    headers = validator_headers(watermark)
+    key = page_cache_key(watermark, limit, before, since)
+    response = cached_page(key, headers)
+    if response is not None:
+        return response
+
+    calculations = []
+    if watermark.row_count:
+        calculations = CalculatorService.get_user_history_rows(
+            db,
+            current_user.id,
+            limit + 1,
+            cursor,
+            since
         )
-        result.append(item)
+    return store_page(key, calculations, limit, headers)
+
+
+@router.get("/stats", response_model=HistoryStats)
+def get_history_stats(
+    db: Session = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """
+    Статистика истории: расход по месяцам и по сезону и активности.
+
+    Требует авторизации. Считается по агрегатам calculation_rollups,
+    а не по всем расчётам пользователя.
+    """
+    return ORJSONResponse(RollupService.get_stats(db, current_user.id))
+
+
+@router.get("/export", response_class=StreamingResponse)
+def export_history(
+    format: Literal["csv", "ndjson"] = Query("csv", description="Формат выгрузки"),
+    since: Optional[datetime] = Query(None),
+    session_factory: sessionmaker = Depends(get_session_factory),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """
+    Выгрузка всей истории пользователя в CSV или NDJSON.
+
+    Требует авторизации. Строки читаются серверным курсором
+    порциями по export_batch_size и отправляются по мере чтения,
+    поэтому память не зависит от размера истории.
+    """
+    return export_response(
+        ExportService.iter_export(
+            session_factory,
+            current_user.id,
+            format,
+            settings.export_batch_size,
+            since
+        ),
+        format
+    )
+
+
+@router.post("/bulk", response_model=BulkUploadResponse)
+def upload_history(
+    upload: BulkUploadRequest,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """
+    Офлайн-выгрузка расчётов в историю.
+
+    Требует авторизации. Расчёты пересчитываются на сервере векторно,
+    уже сохранённые client_id пропускаются, остальные вставляются
+    одним INSERT в одной транзакции. Повтор выгрузки безопасен:
+    ответ тот же, с duplicate = true, и ничего не записывается.
+    """
+    try:
+        result = BulkUploadService.upload(db, current_user.id, upload.items)
+    except BulkUploadConflict:
+        raise bulk_conflict()
+    if result["created"]:
+        note_user_write(current_user.id)
+    return ORJSONResponse(result)
+
+
+@router.get("/changes", response_model=HistoryChanges)
+def get_history_changes(
+    since: Optional[str] = Query(
+        None,
+        description="Курсор из поля cursor предыдущего ответа"
+    ),
+    limit: int = Depends(history_limit),
+    db: Session = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """
+    Изменения истории после курсора: созданные и удалённые расчёты.
 
-    return result
+    Требует авторизации. Без since отдаёт историю с начала.
+    Новый курсор передаётся в следующем запросе; has_more - изменений
+    больше limit, и за остальными нужно прийти сразу. Если изменений
+    нет, ответ строится по водяному знаку истории без чтения calculations.
+    """
+    return changes_response(ChangesService.get_changes(
+        db,
+        current_user.id,
+        parse_change_cursor(since),
+        limit
+    ))
 
 
 @router.get("/{calculation_id}", response_model=CalculationDetail)
 def get_calculation_detail(
     calculation_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    db: Session = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """
     Получение детальной информации о расчёте.
 
     Требует авторизации. Возвращает полную информацию
-    включая breakdown по категориям.
+    включая breakdown по категориям. Сохранённые расчёты не меняются,
+    поэтому готовый ответ кэшируется по (пользователь, id) и числу удалений.
+    ETag - версия водяного знака истории, как у списка.
     """
+    watermark = WatermarkService.get(db, current_user.id)
+    response = not_modified(request, watermark)
+    if response is not None:
+        return response
+
+    headers = validator_headers(watermark)
+    cache = get_history_cache()
+    cache_key = detail_cache_key(watermark, calculation_id)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json", headers=headers)
+
     calculation = CalculatorService.get_calculation_by_id(
         db,
         calculation_id,
@@ -80,58 +466,28 @@ def get_calculation_detail(
             detail="Расчёт не найден"
         )
 
-    # Пересчитываем детализацию
-    junior_subtotal = calculation.junior_count * WATER_NORMS["junior"]
-    middle_subtotal = calculation.middle_count * WATER_NORMS["middle"]
-    senior_subtotal = calculation.senior_count * WATER_NORMS["senior"]
-    staff_subtotal = calculation.staff_count * WATER_NORMS["staff"]
-
-    ks = SEASON_COEFFICIENTS[calculation.season]
-    ka = ACTIVITY_COEFFICIENTS[calculation.activity]
-
-    total_people = (
-        calculation.junior_count +
-        calculation.middle_count +
-        calculation.senior_count +
-        calculation.staff_count
-    )
+    body = orjson.dumps(_detail_item(calculation))
+    cache.set(cache_key, body)
+    return Response(content=body, media_type="application/json", headers=headers)
 
-    breakdown = Breakdown(
-        junior=CategoryBreakdown(
-            count=calculation.junior_count,
-            norm=WATER_NORMS["junior"],
-            subtotal=round(junior_subtotal, 2)
-        ),
-        middle=CategoryBreakdown(
-            count=calculation.middle_count,
-            norm=WATER_NORMS["middle"],
-            subtotal=round(middle_subtotal, 2)
-        ),
-        senior=CategoryBreakdown(
-            count=calculation.senior_count,
-            norm=WATER_NORMS["senior"],
-            subtotal=round(senior_subtotal, 2)
-        ),
-        staff=CategoryBreakdown(
-            count=calculation.staff_count,
-            norm=WATER_NORMS["staff"],
-            subtotal=round(staff_subtotal, 2)
-        )
-    )
 
-    return CalculationDetail(
-        id=calculation.id,
-        total_water=calculation.total_water,
-        created_at=calculation.created_at,
-        params=CalculationParams(
-            junior_count=calculation.junior_count,
-            middle_count=calculation.middle_count,
-            senior_count=calculation.senior_count,
-            staff_count=calculation.staff_count,
-            season=calculation.season,
-            activity=calculation.activity
-        ),
-        breakdown=breakdown,
-        coefficients=Coefficients(season=ks, activity=ka),
-        total_people=total_people
-    )
+@router.delete("/{calculation_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_calculation(
+    calculation_id: int,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """
+    Удаление расчёта из истории.
+
+    Требует авторизации. Вычитает расчёт из статистики, сдвигает
+    водяной знак (ETag истории меняется) и оставляет надгробие,
+    по которому клиенты узнают об удалении из /history/changes.
+    """
+    if not CalculatorService.delete_calculation(db, calculation_id, current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Расчёт не найден"
+        )
+    note_user_write(current_user.id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
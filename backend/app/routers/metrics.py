@@ -0,0 +1,150 @@
+import secrets
+from typing import Optional
+
+import anyio.to_thread
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+
+from app.config import get_settings
+from app.database import engine, get_async_engine, get_replica_router, get_request_slots
+from app.services.auth import get_principal_cache
+from app.services.cache import get_cache, get_history_cache
+from app.services.hashing import get_auth_rate_limiter, get_hashing_executor
+from app.services.idempotency import get_idempotency_store
+from app.services.revocation import get_revocation_list
+from app.services.write_behind import get_write_behind
+
+METRICS_TOKEN_HEADER = "X-Metrics-Token"
+
+
+async def require_metrics_token(
+    token: Optional[str] = Header(None, alias=METRICS_TOKEN_HEADER)
+) -> None:
+    """
+    Доступ к метрикам только с токеном metrics_token.
+
+    Метрики раскрывают внутреннее состояние воркера, а CORS открыт
+    для любых origin, поэтому без токена они недоступны; если токен
+    не настроен, эндпоинтов как будто нет (404).
+    """
+    expected = get_settings().metrics_token
+    if not expected:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if token is None or not secrets.compare_digest(token.encode(), expected.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=f"Нужен заголовок {METRICS_TOKEN_HEADER}"
+        )
+
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["metrics"],
+    dependencies=[Depends(require_metrics_token)]
+)
+
+
+@router.get("/cache")
+def get_cache_metrics():
+    """
+    Статистика кэша результатов.
+
+    Счётчики локальны для воркера uvicorn, включая счётчики L2.
+    """
+    return get_cache().stats()
+
+
+@router.get("/history-cache")
+def get_history_cache_metrics():
+    """Статистика кэша страниц и расчётов истории (локальна для воркера)."""
+    return get_history_cache().stats()
+
+
+@router.get("/write-behind")
+def get_write_behind_metrics():
+    """Состояние очереди отложенной записи (null, если она выключена)."""
+    write_behind = get_write_behind()
+    return write_behind.stats() if write_behind is not None else None
+
+
+@router.get("/auth")
+def get_auth_metrics():
+    """Кэш principal и список отзыва (счётчики локальны для воркера)."""
+    return {
+        "principals": get_principal_cache().stats(),
+        "revocations": get_revocation_list().stats(),
+    }
+
+
+@router.get("/hashing")
+def get_hashing_metrics():
+    """
+    Пул хеширования паролей и лимиты попыток входа.
+
+    queue_wait_ms растёт раньше, чем появляются отказы: по нему
+    подбирается bcrypt_rounds под число hash_workers.
+    """
+    return {
+        **get_hashing_executor().stats(),
+        "rate_limits": get_auth_rate_limiter().stats(),
+    }
+
+
+@router.get("/idempotency")
+def get_idempotency_metrics():
+    """
+    Ключи идемпотентности POST /calculate (счётчики локальны для воркера).
+
+    replays - повторы, отданные из хранилища, coalesced - ожидания
+    параллельного запроса с тем же ключом, conflicts - ключ с другим запросом.
+    """
+    return get_idempotency_store().stats()
+
+
+@router.get("/replicas")
+def get_replica_metrics():
+    """Состояние реплик для чтения (в порядке DATABASE_REPLICA_URLS) и чтения с основной БД."""
+    return get_replica_router().stats()
+
+
+def _pool_metrics(pool) -> dict | None:
+    """Метрики пула; null для пулов без учёта (SQLite в памяти, NullPool)."""
+    return pool.metrics() if hasattr(pool, "metrics") else None
+
+
+@router.get("/pool")
+async def get_pool_metrics():
+    """
+    Пулы соединений, пул потоков и слоты запросов к БД.
+
+    Значения локальны для воркера uvicorn. connections_per_worker -
+    максимум соединений одного воркера с основной БД: число воркеров
+    на всех подах, умноженное на него, должно укладываться
+    в max_connections PostgreSQL.
+    """
+    settings = get_settings()
+    threads = anyio.to_thread.current_default_thread_limiter()
+    slots = get_request_slots()
+    per_worker = settings.db_pool_size + settings.db_max_overflow
+    async_pool = None
+    if settings.db_async:
+        async_pool = _pool_metrics(get_async_engine().pool)
+        per_worker *= 2
+    return {
+        "primary": _pool_metrics(engine.pool),
+        "async": async_pool,
+        # Реплики в порядке DATABASE_REPLICA_URLS, без адресов
+        "replicas": [
+            {"pool": _pool_metrics(replica.engine.pool)}
+            for replica in get_replica_router().replicas
+        ],
+        "threadpool": {
+            "total": threads.total_tokens,
+            "borrowed": threads.borrowed_tokens,
+        },
+        "request_slots": None if slots is None else {
+            "total": slots.total_tokens,
+            "borrowed": slots.borrowed_tokens,
+            "waiting": slots.statistics().tasks_waiting,
+        },
+        "connections_per_worker": per_worker,
+    }
@@ -0,0 +1,34 @@
+import orjson
+from fastapi import APIRouter, HTTPException, Response, status
+
+from app.config import get_settings
+from app.schemas.planner import PlanRequest, PlanResponse
+from app.services.planner import PlannerService, PlanTooLarge
+
+settings = get_settings()
+router = APIRouter(prefix="/plan", tags=["plan"])
+
+
+@router.post(
+    "",
+    response_model=PlanResponse,
+    responses={413: {"description": "План превышает допустимый размер"}}
+)
+def calculate_plan(plan: PlanRequest):
+    """
+    Расчёт потребления воды за период по календарю школ.
+
+    Календарь задаётся сегментами дат с переопределением сезона,
+    активности и выходных, численность - изменениями с даты.
+    Возвращает итоги по неделям и за весь период для каждой школы
+    и суммарно. Размер ограничен настройкой plan_max_cells.
+    """
+    try:
+        result = PlannerService.plan(plan, max_cells=settings.plan_max_cells)
+    except PlanTooLarge as exc:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(exc)
+        )
+
+    return Response(content=orjson.dumps(result), media_type="application/json")
@@ -2,9 +2,14 @@ from app.schemas.user import UserCreate, UserResponse, Token
 from app.schemas.calculation import (
     CalculationRequest,
     CalculationResponse,
+    BatchCalculationRequest,
+    BatchCalculationResponse,
     CalculationHistoryItem,
-    CalculationDetail
+    CalculationDetail,
+    HistoryStats
 )
+from app.schemas.planner import PlanRequest, PlanResponse
+from app.schemas.sweep import SweepRange, SweepRequest, SweepResponse
 
 __all__ = [
     "UserCreate",
@@ -12,6 +17,14 @@ __all__ = [
     "Token",
     "CalculationRequest",
     "CalculationResponse",
+    "BatchCalculationRequest",
+    "BatchCalculationResponse",
     "CalculationHistoryItem",
-    "CalculationDetail"
+    "CalculationDetail",
+    "HistoryStats",
+    "PlanRequest",
+    "PlanResponse",
+    "SweepRange",
+    "SweepRequest",
+    "SweepResponse"
 ]
@@ -1,7 +1,18 @@
-from datetime import datetime
+from datetime import date, datetime
 from enum import Enum
+from typing import List, Optional
 from pydantic import BaseModel, ConfigDict, Field
 
+# Максимальное количество строк в одном пакетном запросе
+MAX_BATCH_SIZE = 10_000
+
+# Максимальное количество расчётов в одной офлайн-выгрузке в историю
+MAX_BULK_SIZE = 1000
+
+# Верхняя граница численности одной категории: с запасом покрывает
+# любой реальный лагерь и держит векторный расчёт в пределах int64
+MAX_PEOPLE_COUNT = 100_000
+
 
 class Season(str, Enum):
     """Сезон года для расчёта."""
@@ -18,10 +29,10 @@ class Activity(str, Enum):
 
 class CalculationRequest(BaseModel):
     """Схема запроса на расчёт потребления воды."""
-    junior_count: int = Field(ge=0, default=0, description="Дети 7-10 лет")
-    middle_count: int = Field(ge=0, default=0, description="Подростки 11-14 лет")
-    senior_count: int = Field(ge=0, default=0, description="Старшеклассники 15-17 лет")
-    staff_count: int = Field(ge=0, default=0, description="Персонал 18+ лет")
+    junior_count: int = Field(ge=0, le=MAX_PEOPLE_COUNT, default=0, description="Дети 7-10 лет")
+    middle_count: int = Field(ge=0, le=MAX_PEOPLE_COUNT, default=0, description="Подростки 11-14 лет")
+    senior_count: int = Field(ge=0, le=MAX_PEOPLE_COUNT, default=0, description="Старшеклассники 15-17 лет")
+    staff_count: int = Field(ge=0, le=MAX_PEOPLE_COUNT, default=0, description="Персонал 18+ лет")
     season: Season = Field(description="Сезон: cold или warm")
     activity: Activity = Field(description="Активность: normal, sport или trip")
 
@@ -56,6 +67,58 @@ class CalculationResponse(BaseModel):
     total_people: int = Field(description="Общее количество людей")
 
 
+class BatchCalculationRequest(BaseModel):
+    """Схема пакетного запроса на расчёт."""
+    items: List[CalculationRequest] = Field(
+        min_length=1,
+        max_length=MAX_BATCH_SIZE,
+        description="Строки для расчёта"
+    )
+
+
+class BatchCalculationResponse(BaseModel):
+    """Схема ответа на пакетный расчёт (порядок совпадает с запросом)."""
+    results: List[CalculationResponse]
+    count: int = Field(description="Количество рассчитанных строк")
+
+
+class BulkCalculationItem(CalculationRequest):
+    """Расчёт, выполненный клиентом офлайн."""
+    client_id: str = Field(
+        min_length=1,
+        max_length=64,
+        description="Идентификатор расчёта, выданный клиентом (например, UUID)"
+    )
+    created_at: Optional[datetime] = Field(
+        default=None,
+        description="Время расчёта на клиенте, по умолчанию время выгрузки"
+    )
+
+
+class BulkUploadRequest(BaseModel):
+    """Схема офлайн-выгрузки расчётов в историю."""
+    items: List[BulkCalculationItem] = Field(
+        min_length=1,
+        max_length=MAX_BULK_SIZE,
+        description="Расчёты для сохранения"
+    )
+
+
+class BulkUploadResult(BaseModel):
+    """Результат сохранения одного расчёта выгрузки."""
+    client_id: str
+    id: Optional[int] = Field(description="id в истории; None, если расчёт уже удалён")
+    total_water: Optional[float]
+    duplicate: bool = Field(description="Расчёт с этим client_id уже был сохранён")
+
+
+class BulkUploadResponse(BaseModel):
+    """Схема ответа офлайн-выгрузки (порядок совпадает с запросом)."""
+    items: List[BulkUploadResult]
+    created: int = Field(description="Количество сохранённых расчётов")
+    duplicates: int = Field(description="Количество повторов")
+
+
 class CalculationParams(BaseModel):
     """Параметры расчёта для истории."""
     junior_count: int
@@ -76,6 +139,14 @@ class CalculationHistoryItem(BaseModel):
     params: CalculationParams
 
 
+class HistoryChanges(BaseModel):
+    """Изменения истории после курсора (GET /history/changes)."""
+    created: List[CalculationHistoryItem]
+    deleted: List[int]
+    cursor: str = Field(..., description="Курсор для следующего запроса since")
+    has_more: bool
+
+
 class CalculationDetail(BaseModel):
     """Полная информация о расчёте."""
     model_config = ConfigDict(from_attributes=True)
@@ -87,3 +158,26 @@ class CalculationDetail(BaseModel):
     breakdown: Breakdown
     coefficients: Coefficients
     total_people: int
+
+
+class MonthlyStats(BaseModel):
+    """Расход воды за месяц."""
+    month: date
+    count: int
+    total_water: float
+
+
+class SeasonActivityStats(BaseModel):
+    """Расход воды по сочетанию сезона и активности."""
+    season: Season
+    activity: Activity
+    count: int
+    total_water: float
+
+
+class HistoryStats(BaseModel):
+    """Сводная статистика истории расчётов пользователя."""
+    count: int
+    total_water: float
+    by_month: List[MonthlyStats]
+    by_season_activity: List[SeasonActivityStats]
@@ -0,0 +1,89 @@
+from datetime import date
+from typing import List, Optional
+from pydantic import BaseModel, Field, model_validator
+
+from app.schemas.calculation import Activity, Season
+
+
+class CalendarSegment(BaseModel):
+    """
+    Период календаря с переопределением параметров (границы включительно).
+
+    Сегменты применяются по порядку: более поздний перекрывает более ранний.
+    """
+    start: date
+    end: date
+    season: Optional[Season] = None
+    activity: Optional[Activity] = None
+    closed: bool = Field(default=False, description="Нет занятий (каникулы, праздники)")
+
+    @model_validator(mode="after")
+    def check_dates(self) -> "CalendarSegment":
+        if self.end < self.start:
+            raise ValueError("end должен быть не раньше start")
+        return self
+
+
+class HeadcountChange(BaseModel):
+    """Новая численность категорий начиная с даты (не заданные не меняются)."""
+    date: date
+    junior_count: Optional[int] = Field(ge=0, default=None)
+    middle_count: Optional[int] = Field(ge=0, default=None)
+    senior_count: Optional[int] = Field(ge=0, default=None)
+    staff_count: Optional[int] = Field(ge=0, default=None)
+
+
+class SchoolPlan(BaseModel):
+    """Школа в плане: начальная численность и собственный календарь."""
+    name: str = Field(max_length=255)
+    junior_count: int = Field(ge=0, default=0)
+    middle_count: int = Field(ge=0, default=0)
+    senior_count: int = Field(ge=0, default=0)
+    staff_count: int = Field(ge=0, default=0)
+    headcount_changes: List[HeadcountChange] = []
+    segments: List[CalendarSegment] = Field(
+        default=[],
+        description="Сегменты школы, применяются после общих"
+    )
+
+
+class PlanRequest(BaseModel):
+    """Схема запроса на расчёт плана за период (четверть, семестр)."""
+    start: date
+    end: date
+    season: Season = Field(description="Сезон по умолчанию")
+    activity: Activity = Field(default=Activity.normal, description="Активность по умолчанию")
+    segments: List[CalendarSegment] = Field(default=[], description="Общий календарь")
+    schools: List[SchoolPlan] = Field(min_length=1)
+    skip_weekends: bool = Field(default=False, description="Не учитывать субботу и воскресенье")
+    include_daily: bool = Field(default=False, description="Вернуть значения по дням")
+
+    @model_validator(mode="after")
+    def check_dates(self) -> "PlanRequest":
+        if self.end < self.start:
+            raise ValueError("end должен быть не раньше start")
+        return self
+
+
+class PlanSchoolResult(BaseModel):
+    """Итоги плана по школе."""
+    name: str
+    total_water: float
+    weekly: List[float] = Field(description="Итоги по неделям в порядке week_starts")
+    daily: Optional[List[float]] = Field(default=None, description="Значения по дням периода")
+
+
+class PlanResponse(BaseModel):
+    """
+    Итоги плана по всем школам.
+
+    Недельные итоги - списки, выровненные по week_starts
+    (неделя начинается в понедельник, первая может быть неполной).
+    """
+    start: date
+    end: date
+    days: int
+    week_starts: List[date]
+    total_water: float
+    weekly: List[float]
+    schools: List[PlanSchoolResult]
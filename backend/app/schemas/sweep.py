@@ -0,0 +1,69 @@
+from typing import Annotated, List, Union
+from pydantic import BaseModel, Field, model_validator
+
+from app.schemas.calculation import MAX_PEOPLE_COUNT, Activity, Season
+
+# Значение оси: те же границы, что у полей CalculationRequest
+PeopleCount = Annotated[int, Field(ge=0, le=MAX_PEOPLE_COUNT)]
+
+
+class SweepRange(BaseModel):
+    """Диапазон значений параметра (границы включительно)."""
+    start: int = Field(ge=0, le=MAX_PEOPLE_COUNT)
+    end: int = Field(ge=0, le=MAX_PEOPLE_COUNT)
+    step: int = Field(ge=1, default=1)
+
+    @model_validator(mode="after")
+    def check_bounds(self) -> "SweepRange":
+        if self.end < self.start:
+            raise ValueError("end должен быть не меньше start")
+        return self
+
+
+# Значения параметра: явный список или диапазон
+CountAxis = Union[List[PeopleCount], SweepRange]
+
+
+class SweepRequest(BaseModel):
+    """
+    Схема запроса на перебор сценариев.
+
+    Для каждого поля CalculationRequest задаётся список значений
+    или диапазон. Расчёт выполняется для декартова произведения всех осей.
+    """
+    junior_count: CountAxis = Field(default=[0], description="Дети 7-10 лет")
+    middle_count: CountAxis = Field(default=[0], description="Подростки 11-14 лет")
+    senior_count: CountAxis = Field(default=[0], description="Старшеклассники 15-17 лет")
+    staff_count: CountAxis = Field(default=[0], description="Персонал 18+ лет")
+    season: List[Season] = Field(
+        default=list(Season),
+        min_length=1,
+        description="Сезоны (по умолчанию все)"
+    )
+    activity: List[Activity] = Field(
+        default=list(Activity),
+        min_length=1,
+        description="Активности (по умолчанию все)"
+    )
+
+    @model_validator(mode="after")
+    def check_lists(self) -> "SweepRequest":
+        for name in ("junior_count", "middle_count", "senior_count", "staff_count"):
+            axis = getattr(self, name)
+            if isinstance(axis, list) and not axis:
+                raise ValueError(f"{name}: список значений пуст")
+        return self
+
+
+class SweepResponse(BaseModel):
+    """
+    Столбцовый ответ перебора сценариев.
+
+    total_water - плоский массив в C-порядке осей из axes
+    (junior_count, middle_count, senior_count, staff_count, season, activity):
+    последняя ось меняется быстрее всего.
+    """
+    axes: dict = Field(description="Значения по каждой оси")
+    shape: List[int] = Field(description="Размер сетки по осям")
+    size: int = Field(description="Количество точек сетки")
+    total_water: List[float] = Field(description="Итоговое потребление по точкам")
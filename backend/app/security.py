@@ -0,0 +1,46 @@
+"""
+Разбор JWT токенов без обращения к БД.
+
+Вынесено из app.services.auth, чтобы токен можно было прочитать
+на уровне зависимостей БД (app.database) без циклических импортов.
+jose импортируется при первом разборе токена, а не при старте воркера.
+"""
+from typing import Optional
+
+from fastapi import Header
+
+from app.config import get_settings
+
+settings = get_settings()
+
+
+def decode_user_id(token: str) -> Optional[int]:
+    """Возвращает user_id из JWT токена или None, если токен невалиден."""
+    from jose import JWTError, jwt
+
+    try:
+        payload = jwt.decode(
+            token,
+            settings.secret_key,
+            algorithms=[settings.algorithm]
+        )
+    except JWTError:
+        return None
+    user_id = payload.get("sub")
+    if user_id is None:
+        return None
+    return int(user_id)
+
+
+def get_token_user_id(
+    x_auth_token: Optional[str] = Header(None, alias="X-Auth-Token")
+) -> Optional[int]:
+    """
+    user_id из заголовка X-Auth-Token без проверки пользователя в БД.
+
+    Годится только для маршрутизации (например, выбора реплики);
+    доступ проверяет get_current_principal.
+    """
+    if not x_auth_token:
+        return None
+    return decode_user_id(x_auth_token)
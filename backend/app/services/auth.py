@@ -1,21 +1,72 @@
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from functools import lru_cache
+from typing import Iterable, Optional, Tuple
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from fastapi import Depends, HTTPException, status, Header
+from fastapi import Depends, HTTPException, Request, status, Header
 from fastapi.security import OAuth2PasswordBearer
+from starlette.concurrency import run_in_threadpool
 
 from app.config import get_settings
-from app.database import get_db
+from app.database import (
+    LazySession,
+    get_lazy_async_db,
+    get_lazy_db,
+    hold_request_slot
+)
 from app.models.user import User
+from app.security import decode_user_id
+from app.services.cache import LRUCache
+from app.services.hashing import get_hashing_executor
+from app.services.revocation import get_revocation_list
 
 settings = get_settings()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # OAuth2 для login endpoint
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login", auto_error=False)
 
 
+@dataclass(frozen=True)
+class Principal:
+    """
+    Аутентифицированный пользователь без ORM-объекта и сессии.
+
+    email равен None, если principal построен из подписанного токена
+    без обращения к БД (auth_trust_claims).
+    """
+    id: int
+    email: Optional[str] = None
+
+
+@lru_cache
+def get_principal_cache() -> LRUCache:
+    """Кэш principal по user_id: LRU с TTL auth_principal_ttl_seconds."""
+    return LRUCache(
+        maxsize=settings.auth_principal_cache_size,
+        ttl=settings.auth_principal_ttl_seconds
+    )
+
+
+@lru_cache
+def get_pwd_context():
+    """
+    Контекст хеширования паролей.
+
+    passlib и bcrypt загружаются при первом обращении (или в прогреве
+    после старта), а не при импорте приложения. Хеши с другим числом
+    раундов, чем bcrypt_rounds, считаются устаревшими и обновляются
+    при входе.
+    """
+    from passlib.context import CryptContext
+
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__rounds=settings.bcrypt_rounds
+    )
+
+
 def get_token_from_header(
     x_auth_token: Optional[str] = Header(None, alias="X-Auth-Token")
 ) -> Optional[str]:
@@ -33,12 +84,42 @@ class AuthService:
     @staticmethod
     def hash_password(password: str) -> str:
         """Хеширует пароль с использованием bcrypt."""
-        return pwd_context.hash(password)
+        return get_pwd_context().hash(password)
 
     @staticmethod
     def verify_password(plain_password: str, hashed_password: str) -> bool:
         """Проверяет соответствие пароля хешу."""
-        return pwd_context.verify(plain_password, hashed_password)
+        return get_pwd_context().verify(plain_password, hashed_password)
+
+    @staticmethod
+    def verify_and_update(
+        plain_password: str,
+        hashed_password: str
+    ) -> Tuple[bool, Optional[str]]:
+        """
+        Проверяет пароль и, если хеш устарел (другой bcrypt_rounds),
+        возвращает новый хеш того же пароля.
+        """
+        return get_pwd_context().verify_and_update(plain_password, hashed_password)
+
+    @staticmethod
+    async def hash_password_async(password: str) -> str:
+        """
+        hash_password в пуле хеширования.
+
+        Бросает HashingOverloaded, если очередь пула заполнена.
+        """
+        return await get_hashing_executor().run(AuthService.hash_password, password)
+
+    @staticmethod
+    async def verify_and_update_async(
+        plain_password: str,
+        hashed_password: str
+    ) -> Tuple[bool, Optional[str]]:
+        """verify_and_update в пуле хеширования (HashingOverloaded при заполненной очереди)."""
+        return await get_hashing_executor().run(
+            AuthService.verify_and_update, plain_password, hashed_password
+        )
 
     @staticmethod
     def create_access_token(user_id: int) -> str:
@@ -47,6 +128,8 @@ class AuthService:
 
         Токен содержит user_id и время истечения.
         """
+        from jose import jwt
+
         expire = datetime.utcnow() + timedelta(
             minutes=settings.access_token_expire_minutes
         )
@@ -60,11 +143,99 @@ class AuthService:
             algorithm=settings.algorithm
         )
 
+    @staticmethod
+    async def verified_user_id_async(token: str) -> Optional[int]:
+        """
+        user_id из токена, если подпись верна и доступ не отозван.
+
+        Отзыв проверяется по локальному фильтру Блума без обращения
+        к БД (см. app.services.revocation), Redis - в пуле потоков.
+        """
+        user_id = AuthService.decode_user_id(token)
+        if user_id is None or await get_revocation_list().is_revoked_async(user_id):
+            return None
+        return user_id
+
+    @staticmethod
+    def cached_principal(user_id: int) -> Optional[Principal]:
+        """
+        Principal без запроса к БД: из подписанного токена
+        (auth_trust_claims) или из кэша. None - нужен запрос к БД.
+        """
+        if settings.auth_trust_claims:
+            return Principal(id=user_id)
+        return get_principal_cache().get(user_id)
+
+    @staticmethod
+    def _remember_principal(user: Optional[User]) -> Optional[Principal]:
+        if user is None:
+            return None
+        principal = Principal(id=user.id, email=user.email)
+        get_principal_cache().set(user.id, principal)
+        return principal
+
+    @staticmethod
+    def load_principal(db: Session, user_id: int) -> Optional[Principal]:
+        """Principal из БД (None - пользователь удалён); кладётся в кэш."""
+        return AuthService._remember_principal(AuthService.get_user_by_id(db, user_id))
+
+    @staticmethod
+    async def load_principal_async(db: AsyncSession, user_id: int) -> Optional[Principal]:
+        """Async-версия load_principal."""
+        return AuthService._remember_principal(
+            await AuthService.get_user_by_id_async(db, user_id)
+        )
+
+    @staticmethod
+    def revoke_users(user_ids: Iterable[int]) -> None:
+        """
+        Отзывает доступ пользователей по уже выданным токенам.
+
+        Нужно при удалении или блокировке аккаунта: без этого токен
+        принимается до истечения кэша principal (или до истечения
+        самого токена при auth_trust_claims).
+        """
+        user_ids = list(user_ids)
+        get_revocation_list().revoke(user_ids)
+        cache = get_principal_cache()
+        for user_id in user_ids:
+            cache.delete(user_id)
+
+    @staticmethod
+    def delete_user(db: Session, user_id: int) -> bool:
+        """Удаляет пользователя с его расчётами и отзывает его токены."""
+        user = AuthService.get_user_by_id(db, user_id)
+        if user is None:
+            return False
+        db.delete(user)
+        db.commit()
+        AuthService.revoke_users([user_id])
+        return True
+
+    @staticmethod
+    def decode_user_id(token: str) -> Optional[int]:
+        """Возвращает user_id из JWT токена или None, если токен невалиден."""
+        return decode_user_id(token)
+
     @staticmethod
     def get_user_by_email(db: Session, email: str) -> Optional[User]:
         """Находит пользователя по email."""
         return db.query(User).filter(User.email == email).first()
 
+    @staticmethod
+    def get_credentials(db: Session, email: str) -> Optional[Tuple[int, str]]:
+        """
+        (id, хеш пароля) пользователя по email.
+
+        Транзакция сразу завершается: соединение возвращается в пул
+        до проверки пароля, которая занимает сотни миллисекунд.
+        """
+        row = db.execute(
+            select(User.id, User.password_hash).where(User.email == email)
+        ).first()
+        db.rollback()
+        return tuple(row) if row is not None else None
+
     @staticmethod
     def get_user_by_id(db: Session, user_id: int) -> Optional[User]:
         """Находит пользователя по ID."""
@@ -77,13 +248,23 @@ class AuthService:
 
         Хеширует пароль и сохраняет в БД.
         """
-        hashed = AuthService.hash_password(password)
-        user = User(email=email, password_hash=hashed)
+        return AuthService.create_user_hashed(db, email, AuthService.hash_password(password))
+
+    @staticmethod
+    def create_user_hashed(db: Session, email: str, password_hash: str) -> User:
+        """Создаёт пользователя с уже посчитанным хешем пароля."""
+        user = User(email=email, password_hash=password_hash)
         db.add(user)
         db.commit()
         db.refresh(user)
         return user
 
+    @staticmethod
+    def update_password_hash(db: Session, user_id: int, password_hash: str) -> None:
+        """Заменяет хеш пароля (после смены bcrypt_rounds)."""
+        db.execute(update(User).where(User.id == user_id).values(password_hash=password_hash))
+        db.commit()
+
     @staticmethod
     def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
         """
@@ -94,69 +275,138 @@ class AuthService:
         user = AuthService.get_user_by_email(db, email)
         if not user:
             return None
-        if not AuthService.verify_password(password, user.password_hash):
+        verified, new_hash = AuthService.verify_and_update(password, user.password_hash)
+        if not verified:
             return None
+        if new_hash:
+            AuthService.update_password_hash(db, user.id, new_hash)
         return user
 
+    @staticmethod
+    async def get_user_by_email_async(db: AsyncSession, email: str) -> Optional[User]:
+        """Async-версия get_user_by_email."""
+        return await db.scalar(select(User).where(User.email == email))
 
-def get_current_user(
-    token: Optional[str] = Depends(get_token_from_header),
-    db: Session = Depends(get_db)
-) -> User:
-    """
-    Получает текущего пользователя из JWT токена.
+    @staticmethod
+    async def get_user_by_id_async(db: AsyncSession, user_id: int) -> Optional[User]:
+        """Async-версия get_user_by_id."""
+        return await db.get(User, user_id)
 
-    Используется как зависимость для защищённых endpoints.
-    """
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Не удалось проверить учётные данные",
-        headers={"WWW-Authenticate": "Bearer"}
-    )
+    @staticmethod
+    async def create_user_async(db: AsyncSession, email: str, password: str) -> User:
+        """
+        Async-версия create_user.
 
-    if not token:
-        raise credentials_exception
+        bcrypt нагружает CPU, поэтому хеш считается в пуле хеширования,
+        а не в event loop.
+        """
+        hashed = await AuthService.hash_password_async(password)
+        user = User(email=email, password_hash=hashed)
+        db.add(user)
+        await db.commit()
+        return user
 
-    try:
-        payload = jwt.decode(
-            token,
-            settings.secret_key,
-            algorithms=[settings.algorithm]
+    @staticmethod
+    async def authenticate_user_async(
+        db: AsyncSession,
+        email: str,
+        password: str
+    ) -> Optional[User]:
+        """
+        Async-версия authenticate_user (проверка bcrypt в пуле хеширования).
+
+        Транзакция завершается до проверки пароля, чтобы соединение
+        не простаивало, пока считается bcrypt.
+        """
+        user = await AuthService.get_user_by_email_async(db, email)
+        if not user:
+            return None
+        await db.commit()
+        verified, new_hash = await AuthService.verify_and_update_async(
+            password, user.password_hash
         )
-        user_id = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
+        if not verified:
+            return None
+        if new_hash:
+            await AuthService.update_password_hash_async(db, user.id, new_hash)
+        return user
 
-    user = AuthService.get_user_by_id(db, int(user_id))
-    if user is None:
-        raise credentials_exception
+    @staticmethod
+    async def update_password_hash_async(
+        db: AsyncSession,
+        user_id: int,
+        password_hash: str
+    ) -> None:
+        """Async-версия update_password_hash."""
+        await db.execute(
+            update(User).where(User.id == user_id).values(password_hash=password_hash)
+        )
+        await db.commit()
 
-    return user
 
+def credentials_error() -> HTTPException:
+    """Ошибка 401 для зависимостей principal."""
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Не удалось проверить учётные данные",
+        headers={"WWW-Authenticate": "Bearer"}
+    )
 
-def get_current_user_optional(
+
+async def get_current_principal_optional(
+    request: Request,
     token: Optional[str] = Depends(get_token_from_header),
-    db: Session = Depends(get_db)
-) -> Optional[User]:
+    db: LazySession = Depends(get_lazy_db)
+) -> Optional[Principal]:
     """
-    Получает текущего пользователя если токен предоставлен.
+    Principal из токена без запроса к БД на каждый запрос.
 
-    Возвращает None если токен отсутствует или невалиден.
+    Подпись и отзыв проверяются в памяти процесса, пользователь
+    берётся из кэша principal. В БД (в пуле потоков, со слотом
+    запроса) идёт только промах кэша - не чаще раза
+    в auth_principal_ttl_seconds на пользователя и воркер.
     """
     if not token:
         return None
+    user_id = await AuthService.verified_user_id_async(token)
+    if user_id is None:
+        return None
+    principal = AuthService.cached_principal(user_id)
+    if principal is None:
+        async with hold_request_slot(request):
+            principal = await run_in_threadpool(AuthService.load_principal, db, user_id)
+    return principal
 
-    try:
-        payload = jwt.decode(
-            token,
-            settings.secret_key,
-            algorithms=[settings.algorithm]
-        )
-        user_id = payload.get("sub")
-        if user_id is None:
-            return None
-        return AuthService.get_user_by_id(db, int(user_id))
-    except JWTError:
+
+async def get_current_principal(
+    principal: Optional[Principal] = Depends(get_current_principal_optional)
+) -> Principal:
+    """Как get_current_principal_optional, но без principal - 401."""
+    if principal is None:
+        raise credentials_error()
+    return principal
+
+
+async def get_current_principal_optional_async(
+    token: Optional[str] = Depends(get_token_from_header),
+    db: LazySession = Depends(get_lazy_async_db)
+) -> Optional[Principal]:
+    """Async-версия get_current_principal_optional для маршрутов на AsyncSession."""
+    if not token:
         return None
+    user_id = await AuthService.verified_user_id_async(token)
+    if user_id is None:
+        return None
+    principal = AuthService.cached_principal(user_id)
+    if principal is None:
+        principal = await AuthService.load_principal_async(db, user_id)
+    return principal
+
+
+async def get_current_principal_async(
+    principal: Optional[Principal] = Depends(get_current_principal_optional_async)
+) -> Principal:
+    """Async-версия get_current_principal."""
+    if principal is None:
+        raise credentials_error()
+    return principal
@@ -0,0 +1,214 @@
+"""
+Офлайн-выгрузка расчётов в историю (POST /history/bulk).
+
+Клиент считает офлайн и при подключении присылает пачку расчётов
+со своими идентификаторами. Сервер пересчитывает их векторно (клиенту
+не доверяем), отбрасывает уже сохранённые client_id и вставляет
+остальные одним многострочным INSERT в одной транзакции.
+
+Повтор той же выгрузки - одно чтение calculation_client_ids и одно
+чтение calculations по change_seq, без расчёта и без записи.
+
+Параллельные выгрузки одного пользователя упорядочены блокировкой
+строки водяного знака. Если между проверкой и блокировкой другая
+выгрузка успела сохранить те же client_id, вставка идентификаторов
+сообщит о конфликте: транзакция откатывается и выгрузка повторяется
+с новой проверкой.
+"""
+from datetime import datetime, timezone
+from typing import Dict, List, Sequence
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.calculation import Calculation
+from app.models.calculation_client_id import CalculationClientId
+from app.schemas.calculation import BulkCalculationItem
+from app.services.calculator import CalculatorService
+from app.services.rollup import RollupService
+from app.services.watermark import WatermarkService
+
+# Сколько раз повторять выгрузку при конфликте client_id
+CLAIM_ATTEMPTS = 3
+
+
+class BulkUploadConflict(Exception):
+    """Те же client_id всё время сохраняются параллельной выгрузкой."""
+
+
+def client_time(moment: datetime, now: datetime) -> datetime:
+    """Время расчёта клиента в UTC без часового пояса, не позже now."""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return min(moment, now)
+
+
+class BulkUploadService:
+    """Сервис офлайн-выгрузки расчётов."""
+
+    @staticmethod
+    def known_query(user_id: int, client_ids: Sequence[str]):
+        """Уже сохранённые client_id пользователя и их change_seq."""
+        return select(CalculationClientId.client_id, CalculationClientId.change_seq).where(
+            CalculationClientId.user_id == user_id,
+            CalculationClientId.client_id.in_(client_ids)
+        )
+
+    @staticmethod
+    def stored_query(user_id: int, change_seqs: Sequence[int]):
+        """Сохранённые расчёты по change_seq."""
+        return select(Calculation.change_seq, Calculation.id, Calculation.total_water).where(
+            Calculation.user_id == user_id,
+            Calculation.change_seq.in_(change_seqs)
+        )
+
+    @staticmethod
+    def fresh_items(
+        items: Sequence[BulkCalculationItem],
+        known: Dict[str, int]
+    ) -> List[BulkCalculationItem]:
+        """Несохранённые расчёты; повторы client_id внутри запроса отбрасываются."""
+        seen = set(known)
+        fresh = []
+        for item in items:
+            if item.client_id not in seen:
+                seen.add(item.client_id)
+                fresh.append(item)
+        return fresh
+
+    @staticmethod
+    def rows(items: Sequence[BulkCalculationItem], user_id: int) -> List[dict]:
+        """Строки calculations: расход пересчитывается векторно по всей пачке."""
+        if not items:
+            return []
+        columns = CalculatorService.calculate_columns(
+            *CalculatorService.requests_to_arrays(items)
+        )
+        now = datetime.utcnow()
+        rows = []
+        for item, total_water in zip(items, columns.total_water.tolist()):
+            row = CalculatorService.calculation_row(item, total_water, user_id)
+            if item.created_at is not None:
+                row["created_at"] = client_time(item.created_at, now)
+            rows.append(row)
+        return rows
+
+    @staticmethod
+    def insert_statement(rows: Sequence[dict]):
+        """Многострочный INSERT расчётов; возвращает (change_seq, id)."""
+        return insert(Calculation).values(rows).returning(Calculation.change_seq, Calculation.id)
+
+    @staticmethod
+    def build(
+        items: Sequence[BulkCalculationItem],
+        fresh: Sequence[BulkCalculationItem],
+        rows: Sequence[dict],
+        inserted: Dict[int, int],
+        known: Dict[str, int],
+        stored: Dict[int, tuple]
+    ) -> dict:
+        """Ответ в формате BulkUploadResponse в порядке запроса."""
+        results = {
+            item.client_id: {
+                "client_id": item.client_id,
+                "id": inserted[row["change_seq"]],
+                "total_water": row["total_water"],
+                "duplicate": False
+            }
+            for item, row in zip(fresh, rows)
+        }
+        for client_id, change_seq in known.items():
+            calculation_id, total_water = stored.get(change_seq, (None, None))
+            results[client_id] = {
+                "client_id": client_id,
+                "id": calculation_id,
+                "total_water": total_water,
+                "duplicate": True
+            }
+
+        response = []
+        reported = set()
+        for item in items:
+            result = results[item.client_id]
+            if item.client_id in reported:
+                result = {**result, "duplicate": True}
+            reported.add(item.client_id)
+            response.append(result)
+        return {
+            "items": response,
+            "created": len(fresh),
+            "duplicates": len(items) - len(fresh)
+        }
+
+    @staticmethod
+    def upload(db: Session, user_id: int, items: Sequence[BulkCalculationItem]) -> dict:
+        """
+        Сохраняет несохранённые расчёты пачки одной транзакцией.
+
+        Водяной знак, client_id, расчёты и агрегаты пишутся
+        в одной транзакции; commit выполняется здесь.
+        """
+        client_ids = list({item.client_id for item in items})
+        for _ in range(CLAIM_ATTEMPTS):
+            known = dict(db.execute(BulkUploadService.known_query(user_id, client_ids)).all())
+            fresh = BulkUploadService.fresh_items(items, known)
+            rows = BulkUploadService.rows(fresh, user_id)
+            fresh_ids = [item.client_id for item in fresh]
+            inserted = {}
+            if rows:
+                WatermarkService.apply(db, rows)
+                if not CalculatorService.claim(db, user_id, fresh_ids, rows):
+                    db.rollback()
+                    continue
+                inserted = dict(db.execute(BulkUploadService.insert_statement(rows)).all())
+                RollupService.apply(db, rows)
+                db.commit()
+            stored = {}
+            if known:
+                stored = {
+                    change_seq: (calculation_id, total_water)
+                    for change_seq, calculation_id, total_water in db.execute(
+                        BulkUploadService.stored_query(user_id, list(known.values()))
+                    )
+                }
+            return BulkUploadService.build(items, fresh, rows, inserted, known, stored)
+        raise BulkUploadConflict()
+
+    @staticmethod
+    async def upload_async(
+        db: AsyncSession,
+        user_id: int,
+        items: Sequence[BulkCalculationItem]
+    ) -> dict:
+        """Async-версия upload."""
+        client_ids = list({item.client_id for item in items})
+        for _ in range(CLAIM_ATTEMPTS):
+            known = dict(
+                (await db.execute(BulkUploadService.known_query(user_id, client_ids))).all()
+            )
+            fresh = BulkUploadService.fresh_items(items, known)
+            rows = BulkUploadService.rows(fresh, user_id)
+            fresh_ids = [item.client_id for item in fresh]
+            inserted = {}
+            if rows:
+                await WatermarkService.apply_async(db, rows)
+                if not await CalculatorService.claim_async(db, user_id, fresh_ids, rows):
+                    await db.rollback()
+                    continue
+                inserted = dict(
+                    (await db.execute(BulkUploadService.insert_statement(rows))).all()
+                )
+                await RollupService.apply_async(db, rows)
+                await db.commit()
+            stored = {}
+            if known:
+                result = await db.execute(
+                    BulkUploadService.stored_query(user_id, list(known.values()))
+                )
+                stored = {
+                    change_seq: (calculation_id, total_water)
+                    for change_seq, calculation_id, total_water in result
+                }
+            return BulkUploadService.build(items, fresh, rows, inserted, known, stored)
+        raise BulkUploadConflict()
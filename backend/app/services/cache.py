@@ -0,0 +1,407 @@
+"""
+Кэш результатов: L1 в памяти процесса и необязательный L2 в Redis.
+
+L1 - потокобезопасный LRU внутри воркера uvicorn, L2 - Redis, общий
+для всех воркеров и подов. Без REDIS_URL работает только L1.
+Ошибки Redis не ломают запросы: обращение считается промахом,
+а L2 временно отключается.
+
+Клиент Redis синхронный: в async-коде нужно использовать get_async
+и set_async - L1 читается прямо в event loop, а обращения к Redis
+уходят в пул потоков.
+"""
+import logging
+import sys
+import threading
+from abc import ABC, abstractmethod
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Hashable, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend(ABC):
+    """Интерфейс бэкенда кэша: байтовые значения по строковым ключам."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        return [self.get(key) for key in keys]
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        ...
+
+    def set_many(self, items: Dict[str, bytes], ttl: Optional[float] = None) -> None:
+        for key, value in items.items():
+            self.set(key, value, ttl)
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def stats(self) -> dict:
+        ...
+
+    async def get_async(self, key: str) -> Optional[bytes]:
+        """get для event loop; сетевые бэкенды уводят его в пул потоков."""
+        return self.get(key)
+
+    async def set_async(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        """set для event loop; сетевые бэкенды уводят его в пул потоков."""
+        self.set(key, value, ttl)
+
+
+class LRUCache(CacheBackend):
+    """
+    Потокобезопасный LRU-кэш с ограничением размера и необязательным TTL.
+
+    Считает попадания, промахи, вытеснения по размеру и истечения по TTL.
+    Размер 0 отключает хранение, но статистика промахов продолжает вестись.
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        """Возвращает значение по ключу или None."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: bytes, ttl: Optional[float] = None) -> None:
+        """
+        Сохраняет значение, вытесняя самые старые записи при переполнении.
+
+        TTL записи - меньший из переданного и заданного для кэша.
+        """
+        if self.maxsize <= 0:
+            return
+        ttls = [t for t in (ttl, self.ttl) if t]
+        expires_at = time.monotonic() + min(ttls) if ttls else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        """Удаляет значение по ключу, если оно есть."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Очищает кэш и сбрасывает счётчики."""
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """Счётчики кэша для мониторинга."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class RedisCache(CacheBackend):
+    """
+    Кэш в Redis, общий для воркеров и подов.
+
+    Пакетные операции выполняются за один round-trip (MGET и pipeline).
+    После ошибки соединения L2 отключается на retry_after секунд,
+    чтобы недоступный Redis не добавлял таймаут к каждому запросу.
+    """
+
+    def __init__(
+        self,
+        client,
+        prefix: str = "hydrocalc:",
+        default_ttl: Optional[float] = None,
+        retry_after: float = 5.0
+    ):
+        self.client = client
+        self.prefix = prefix
+        self.default_ttl = default_ttl
+        self.retry_after = retry_after
+        self._down_until = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _available(self) -> bool:
+        return time.monotonic() >= self._down_until
+
+    def _failed(self, exc: Exception) -> None:
+        self.errors += 1
+        self._down_until = time.monotonic() + self.retry_after
+        logger.warning("Redis недоступен, L2-кэш отключён на %ss: %s", self.retry_after, exc)
+
+    def _ttl_ms(self, ttl: Optional[float]) -> Optional[int]:
+        ttl = ttl or self.default_ttl
+        return int(ttl * 1000) if ttl else None
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.get_many([key])[0]
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        """Читает несколько ключей одним MGET."""
+        from redis import RedisError
+
+        if not keys or not self._available():
+            self.misses += len(keys)
+            return [None] * len(keys)
+        try:
+            values = self.client.mget([self.prefix + key for key in keys])
+        except RedisError as exc:
+            self._failed(exc)
+            self.misses += len(keys)
+            return [None] * len(keys)
+        found = sum(value is not None for value in values)
+        self.hits += found
+        self.misses += len(keys) - found
+        return values
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        self.set_many({key: value}, ttl)
+
+    async def get_async(self, key: str) -> Optional[bytes]:
+        return await run_in_threadpool(self.get, key)
+
+    async def set_async(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        await run_in_threadpool(self.set, key, value, ttl)
+
+    def set_many(self, items: Dict[str, bytes], ttl: Optional[float] = None) -> None:
+        """Записывает несколько ключей одним pipeline."""
+        from redis import RedisError
+
+        if not items or not self._available():
+            return
+        ttl_ms = self._ttl_ms(ttl)
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for key, value in items.items():
+                pipe.set(self.prefix + key, value, px=ttl_ms)
+            pipe.execute()
+        except RedisError as exc:
+            self._failed(exc)
+
+    def delete(self, key: str) -> None:
+        from redis import RedisError
+
+        if not self._available():
+            return
+        try:
+            self.client.delete(self.prefix + key)
+        except RedisError as exc:
+            self._failed(exc)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "available": self._available(),
+        }
+
+
+class TTLCache(LRUCache):
+    """
+    Кэш без вытеснения по размеру: запись живёт ровно свой TTL.
+
+    Для отметок, потеря которых раньше срока нарушает гарантию
+    (окно read-your-writes), - LRU мог бы вытеснить их при нагрузке.
+    Истёкшие записи удаляются при чтении и проходом не чаще раза
+    в TTL при записи, поэтому размер ограничен записями за TTL.
+    """
+
+    def __init__(self, ttl: float):
+        super().__init__(maxsize=sys.maxsize, ttl=ttl)
+        self._next_sweep = time.monotonic() + ttl
+
+    def set(self, key: Hashable, value: bytes, ttl: Optional[float] = None) -> None:
+        super().set(key, value, ttl)
+        now = time.monotonic()
+        if now < self._next_sweep:
+            return
+        with self._lock:
+            expired = [
+                k for k, (_, expires_at) in self._data.items()
+                if expires_at is not None and expires_at <= now
+            ]
+            for k in expired:
+                del self._data[k]
+            self.expirations += len(expired)
+            self._next_sweep = now + self.ttl
+
+
+class TieredCache(CacheBackend):
+    """
+    Двухуровневый кэш: L1 в процессе, затем L2 (Redis).
+
+    Попадание в L2 прогревает L1. Запись идёт в оба уровня.
+    """
+
+    def __init__(self, l1: LRUCache, l2: Optional[CacheBackend] = None):
+        self.l1 = l1
+        self.l2 = l2
+
+    def get(self, key: str) -> Optional[bytes]:
+        value = self.l1.get(key)
+        if value is None and self.l2 is not None:
+            value = self.l2.get(key)
+            if value is not None:
+                self.l1.set(key, value)
+        return value
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        """Читает ключи из L1, промахи добираются из L2 одним запросом."""
+        values = [self.l1.get(key) for key in keys]
+        missing = [i for i, value in enumerate(values) if value is None]
+        if missing and self.l2 is not None:
+            found = self.l2.get_many([keys[i] for i in missing])
+            for i, value in zip(missing, found):
+                if value is not None:
+                    values[i] = value
+                    self.l1.set(keys[i], value)
+        return values
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        self.l1.set(key, value, ttl)
+        if self.l2 is not None:
+            self.l2.set(key, value, ttl)
+
+    def set_many(self, items: Dict[str, bytes], ttl: Optional[float] = None) -> None:
+        for key, value in items.items():
+            self.l1.set(key, value, ttl)
+        if self.l2 is not None:
+            self.l2.set_many(items, ttl)
+
+    async def get_async(self, key: str) -> Optional[bytes]:
+        """Как get, но L2 читается в пуле потоков; попадание в L1 не покидает event loop."""
+        value = self.l1.get(key)
+        if value is None and self.l2 is not None:
+            value = await self.l2.get_async(key)
+            if value is not None:
+                self.l1.set(key, value)
+        return value
+
+    async def set_async(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        self.l1.set(key, value, ttl)
+        if self.l2 is not None:
+            await self.l2.set_async(key, value, ttl)
+
+    def delete(self, key: str) -> None:
+        self.l1.delete(key)
+        if self.l2 is not None:
+            self.l2.delete(key)
+
+    def clear_local(self) -> None:
+        """Очищает L1 этого процесса (L2 не трогается)."""
+        self.l1.clear()
+
+    def stats(self) -> dict:
+        return {
+            "l1": self.l1.stats(),
+            "l2": self.l2.stats() if self.l2 is not None else None,
+        }
+
+
+def create_redis_client(url: str):
+    """Создаёт клиент Redis с короткими таймаутами для кэша."""
+    import redis
+
+    settings = get_settings()
+    return redis.Redis.from_url(
+        url,
+        socket_timeout=settings.redis_socket_timeout,
+        socket_connect_timeout=settings.redis_socket_timeout
+    )
+
+
+@lru_cache
+def get_cache() -> TieredCache:
+    """Общий кэш процесса: L1 в памяти и L2 в Redis, если задан REDIS_URL."""
+    settings = get_settings()
+    l1 = LRUCache(
+        maxsize=settings.calc_cache_size,
+        ttl=settings.calc_cache_ttl_seconds
+    )
+    l2 = None
+    if settings.redis_url:
+        l2 = RedisCache(
+            create_redis_client(settings.redis_url),
+            default_ttl=settings.cache_ttl_seconds
+        )
+    return TieredCache(l1, l2)
+
+
+def create_write_marks(ttl: float) -> TieredCache:
+    """
+    Хранилище отметок о записи пользователей для окна read-your-writes.
+
+    L1 - TTLCache этого процесса, L2 - Redis, если задан REDIS_URL:
+    отметка видна всем воркерам и не вытесняется кэшем результатов.
+    """
+    settings = get_settings()
+    l2 = None
+    if settings.redis_url:
+        l2 = RedisCache(create_redis_client(settings.redis_url), default_ttl=ttl)
+    return TieredCache(TTLCache(ttl), l2)
+
+
+@lru_cache
+def get_history_cache() -> TieredCache:
+    """
+    Кэш страниц и расчётов истории: L1 в памяти и L2 в Redis.
+
+    Отделён от get_cache, чтобы страницы истории не вытесняли
+    результаты /calculate и не искажали их счётчики.
+    """
+    settings = get_settings()
+    l1 = LRUCache(maxsize=settings.history_cache_size)
+    l2 = None
+    if settings.redis_url:
+        l2 = RedisCache(
+            create_redis_client(settings.redis_url),
+            default_ttl=settings.cache_ttl_seconds
+        )
+    return TieredCache(l1, l2)
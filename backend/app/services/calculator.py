@@ -1,7 +1,21 @@
-from typing import List, Optional
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime
+from typing import AsyncIterator, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import Row, delete, insert, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.models.calculation import Calculation
+from app.models.calculation_client_id import CalculationClientId
+from app.models.calculation_tombstone import CalculationTombstone
+from app.services.cache import get_cache
+from app.services.idempotency import IdempotencyKeyReused
+from app.services.rollup import RollupService
+from app.services.watermark import WatermarkService
 from app.schemas.calculation import (
     CalculationRequest,
     CalculationResponse,
@@ -32,6 +46,126 @@ ACTIVITY_COEFFICIENTS = {
     "trip": 2.0
 }
 
+# Табличное представление норм и коэффициентов для векторных расчётов.
+# Сезон и активность кодируются индексом в соответствующем массиве.
+CATEGORIES = ("junior", "middle", "senior", "staff")
+SEASONS = tuple(SEASON_COEFFICIENTS)
+ACTIVITIES = tuple(ACTIVITY_COEFFICIENTS)
+SEASON_INDEX = {name: i for i, name in enumerate(SEASONS)}
+ACTIVITY_INDEX = {name: i for i, name in enumerate(ACTIVITIES)}
+
+_NORMS_VECTOR = np.array([WATER_NORMS[c] for c in CATEGORIES])
+_SEASON_VECTOR = np.array([SEASON_COEFFICIENTS[s] for s in SEASONS])
+_ACTIVITY_VECTOR = np.array([ACTIVITY_COEFFICIENTS[a] for a in ACTIVITIES])
+
+# Версия таблиц норм: входит в ключи кэша, чтобы после изменения
+# норм общий кэш в Redis не отдавал старые результаты
+TABLES_VERSION = hashlib.sha1(
+    repr((WATER_NORMS, SEASON_COEFFICIENTS, ACTIVITY_COEFFICIENTS)).encode()
+).hexdigest()[:8]
+
+# Колонки элемента истории: лента читает только их, без объектов ORM
+HISTORY_COLUMNS = (
+    Calculation.id,
+    Calculation.total_water,
+    Calculation.created_at,
+    Calculation.junior_count,
+    Calculation.middle_count,
+    Calculation.senior_count,
+    Calculation.staff_count,
+    Calculation.season,
+    Calculation.activity,
+)
+
+_DIALECT_INSERT = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+# Константа разбиения Veltkamp (2^27 + 1) для точного произведения
+_SPLIT = 134217729.0
+
+
+def round2(values: np.ndarray) -> np.ndarray:
+    """
+    Векторное округление до 2 знаков, совпадающее с round(x, 2).
+
+    np.round считает rint(x * 100) и ошибается, когда произведение
+    округляется ровно к половине. Здесь ошибка произведения вычисляется
+    точно (TwoProduct Деккера), и спорные половины решаются по её знаку.
+    """
+    x = np.asarray(values, dtype=np.float64)
+    product = x * 100.0
+    c = _SPLIT * x
+    high = c - (c - x)
+    low = x - high
+    error = (high * 100.0 - product) + low * 100.0
+
+    rounded = np.rint(product)
+    half = np.abs(product - rounded) == 0.5
+    rounded = np.where(half & (error > 0), np.ceil(product), rounded)
+    rounded = np.where(half & (error < 0), np.floor(product), rounded)
+    return rounded / 100.0
+
+
+@dataclass(frozen=True)
+class CalculationColumns:
+    """
+    Результаты векторного расчёта в виде столбцов.
+
+    counts - матрица (n, 4) в порядке CATEGORIES, subtotals уже округлены.
+    """
+    counts: np.ndarray
+    subtotals: np.ndarray
+    base_total: np.ndarray
+    total_water: np.ndarray
+    season_coefficient: np.ndarray
+    activity_coefficient: np.ndarray
+    total_people: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.total_water)
+
+    def to_dicts(self) -> List[dict]:
+        """
+        Преобразует столбцы в словари формата CalculationResponse.
+
+        Значения уже проверены при разборе запроса, поэтому pydantic-модели
+        не создаются: на больших пакетах это в разы дешевле.
+        """
+        junior_norm, middle_norm, senior_norm, staff_norm = _NORMS_VECTOR.tolist()
+        return [
+            {
+                "total_water": total,
+                "base_total": base,
+                "breakdown": {
+                    "junior": {"count": junior, "norm": junior_norm, "subtotal": junior_sub},
+                    "middle": {"count": middle, "norm": middle_norm, "subtotal": middle_sub},
+                    "senior": {"count": senior, "norm": senior_norm, "subtotal": senior_sub},
+                    "staff": {"count": staff, "norm": staff_norm, "subtotal": staff_sub}
+                },
+                "coefficients": {"season": ks, "activity": ka},
+                "total_people": people
+            }
+            for (
+                total,
+                base,
+                (junior, middle, senior, staff),
+                (junior_sub, middle_sub, senior_sub, staff_sub),
+                ks,
+                ka,
+                people
+            ) in zip(
+                self.total_water.tolist(),
+                self.base_total.tolist(),
+                self.counts.tolist(),
+                self.subtotals.tolist(),
+                self.season_coefficient.tolist(),
+                self.activity_coefficient.tolist(),
+                self.total_people.tolist()
+            )
+        ]
+
 
 class CalculatorService:
     """Сервис расчёта потребления воды."""
@@ -106,43 +240,502 @@ class CalculatorService:
             total_people=total_people
         )
 
+    @staticmethod
+    def cache_key(request: CalculationRequest) -> str:
+        """
+        Нормализованный ключ запроса для кэша результатов.
+
+        Строится из (junior, middle, senior, staff, season, activity)
+        и версии таблиц норм.
+        """
+        return (
+            f"calc:{TABLES_VERSION}:{request.junior_count}:{request.middle_count}:"
+            f"{request.senior_count}:{request.staff_count}:"
+            f"{request.season.value}:{request.activity.value}"
+        )
+
+    @staticmethod
+    def calculate_cached(request: CalculationRequest) -> bytes:
+        """
+        Рассчитывает потребление воды и возвращает готовый JSON ответа.
+
+        Результат сериализуется один раз и хранится в общем кэше
+        (L1 в процессе, L2 в Redis), повторные запросы с теми же
+        параметрами не строят CalculationResponse.
+        """
+        cache = get_cache()
+        key = CalculatorService.cache_key(request)
+        body = cache.get(key)
+        if body is None:
+            body = CalculatorService.calculate(request).model_dump_json().encode()
+            cache.set(key, body)
+        return body
+
+    @staticmethod
+    async def calculate_cached_async(request: CalculationRequest) -> bytes:
+        """
+        calculate_cached для event loop.
+
+        Попадание в L1 и сам расчёт выполняются на месте, а обращения
+        к Redis (L2) - в пуле потоков, чтобы не блокировать event loop.
+        """
+        cache = get_cache()
+        key = CalculatorService.cache_key(request)
+        body = await cache.get_async(key)
+        if body is None:
+            body = CalculatorService.calculate(request).model_dump_json().encode()
+            await cache.set_async(key, body)
+        return body
+
+    @staticmethod
+    def calculate_columns(
+        counts: np.ndarray,
+        season_index: np.ndarray,
+        activity_index: np.ndarray
+    ) -> CalculationColumns:
+        """
+        Векторный расчёт по той же формуле для многих строк сразу.
+
+        counts - матрица (n, 4) количества людей в порядке CATEGORIES,
+        season_index и activity_index - индексы в SEASONS и ACTIVITIES.
+        Порядок операций повторяет calculate, поэтому результаты
+        совпадают со скалярным расчётом бит в бит.
+        """
+        counts = np.asarray(counts, dtype=np.int64).reshape(-1, len(CATEGORIES))
+        ks = _SEASON_VECTOR[season_index]
+        ka = _ACTIVITY_VECTOR[activity_index]
+
+        subtotals = counts * _NORMS_VECTOR
+        base_total = (
+            subtotals[:, 0] + subtotals[:, 1] + subtotals[:, 2] + subtotals[:, 3]
+        )
+        total_water = base_total * ks * ka
+
+        return CalculationColumns(
+            counts=counts,
+            subtotals=round2(subtotals),
+            base_total=round2(base_total),
+            total_water=round2(total_water),
+            season_coefficient=ks,
+            activity_coefficient=ka,
+            total_people=counts.sum(axis=1)
+        )
+
+    @staticmethod
+    def requests_to_arrays(
+        requests: Sequence[CalculationRequest]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Раскладывает запросы в массивы для calculate_columns."""
+        counts = np.array(
+            [
+                (r.junior_count, r.middle_count, r.senior_count, r.staff_count)
+                for r in requests
+            ],
+            dtype=np.int64
+        ).reshape(-1, len(CATEGORIES))
+        season_index = np.fromiter(
+            (SEASON_INDEX[r.season.value] for r in requests),
+            dtype=np.intp,
+            count=len(requests)
+        )
+        activity_index = np.fromiter(
+            (ACTIVITY_INDEX[r.activity.value] for r in requests),
+            dtype=np.intp,
+            count=len(requests)
+        )
+        return counts, season_index, activity_index
+
+    @staticmethod
+    def calculate_batch(requests: Sequence[CalculationRequest]) -> List[dict]:
+        """
+        Рассчитывает потребление воды для множества запросов.
+
+        Возвращает словари формата CalculationResponse, совпадающие
+        с calculate(request).model_dump() для каждой строки,
+        но вычисления выполняются над столбцами NumPy.
+        """
+        columns = CalculatorService.calculate_columns(
+            *CalculatorService.requests_to_arrays(requests)
+        )
+        return columns.to_dicts()
+
     @staticmethod
     def save_calculation(
         db: Session,
         request: CalculationRequest,
         total_water: float,
-        user_id: Optional[int] = None
-    ) -> Calculation:
+        user_id: Optional[int] = None,
+        client_id: Optional[str] = None,
+        fingerprint: Optional[str] = None
+    ) -> Optional[Calculation]:
         """
         Сохраняет расчёт в базу данных.
 
         Если user_id передан, привязывает расчёт к пользователю.
+        Агрегаты статистики и водяной знак истории обновляются
+        в той же транзакции. С client_id расчёт пользователя
+        сохраняется не больше одного раза: если client_id уже занят,
+        транзакция откатывается и возвращается None. fingerprint
+        сохраняется рядом с client_id; если client_id занят запросом
+        с другим отпечатком - IdempotencyKeyReused.
         """
-        calculation = Calculation(
-            user_id=user_id,
-            junior_count=request.junior_count,
-            middle_count=request.middle_count,
-            senior_count=request.senior_count,
-            staff_count=request.staff_count,
-            season=request.season.value,
-            activity=request.activity.value,
-            total_water=total_water
-        )
+        row = CalculatorService.calculation_row(request, total_water, user_id)
+        WatermarkService.apply(db, [row])
+        if client_id is not None and not CalculatorService.claim(
+            db, user_id, [client_id], [row], fingerprint
+        ):
+            stored = db.execute(
+                CalculatorService.claimed_fingerprint(user_id, client_id)
+            ).scalar_one_or_none()
+            db.rollback()
+            CalculatorService.check_fingerprint(fingerprint, stored)
+            return None
+        calculation = Calculation(**row)
         db.add(calculation)
+        RollupService.apply(db, [row])
         db.commit()
         db.refresh(calculation)
         return calculation
 
     @staticmethod
-    def get_user_calculations(db: Session, user_id: int) -> List[Calculation]:
-        """Получает все расчёты пользователя, отсортированные по дате."""
-        return (
-            db.query(Calculation)
-            .filter(Calculation.user_id == user_id)
-            .order_by(Calculation.created_at.desc())
-            .all()
+    async def save_calculation_async(
+        db: AsyncSession,
+        request: CalculationRequest,
+        total_water: float,
+        user_id: Optional[int] = None,
+        client_id: Optional[str] = None,
+        fingerprint: Optional[str] = None
+    ) -> Optional[Calculation]:
+        """Async-версия save_calculation."""
+        row = CalculatorService.calculation_row(request, total_water, user_id)
+        await WatermarkService.apply_async(db, [row])
+        if client_id is not None and not await CalculatorService.claim_async(
+            db, user_id, [client_id], [row], fingerprint
+        ):
+            stored = (await db.execute(
+                CalculatorService.claimed_fingerprint(user_id, client_id)
+            )).scalar_one_or_none()
+            await db.rollback()
+            CalculatorService.check_fingerprint(fingerprint, stored)
+            return None
+        calculation = Calculation(**row)
+        db.add(calculation)
+        await RollupService.apply_async(db, [row])
+        await db.commit()
+        return calculation
+
+    @staticmethod
+    def claim_statement(
+        dialect_name: str,
+        user_id: int,
+        client_ids: Sequence[str],
+        rows: Sequence[dict],
+        fingerprint: Optional[str] = None
+    ):
+        """
+        Вставка client_id с номерами изменений строк (calculation_client_ids).
+
+        Занятые client_id пропускаются; возвращает вставленные client_id.
+        """
+        statement = _DIALECT_INSERT[dialect_name](CalculationClientId).values([
+            {
+                "user_id": user_id,
+                "client_id": client_id,
+                "change_seq": row["change_seq"],
+                "fingerprint": fingerprint
+            }
+            for client_id, row in zip(client_ids, rows)
+        ])
+        return statement.on_conflict_do_nothing().returning(CalculationClientId.client_id)
+
+    @staticmethod
+    def claim(
+        db: Session,
+        user_id: int,
+        client_ids: Sequence[str],
+        rows: Sequence[dict],
+        fingerprint: Optional[str] = None
+    ) -> bool:
+        """
+        Занимает client_id для строк с уже выданными change_seq.
+
+        Вызывается после WatermarkService.apply: строка водяного знака
+        заблокирована, и client_id, занятые параллельными транзакциями
+        пользователя, уже видны. False - часть client_id занята.
+        """
+        statement = CalculatorService.claim_statement(
+            db.get_bind().dialect.name, user_id, client_ids, rows, fingerprint
+        )
+        return len(db.execute(statement).all()) == len(client_ids)
+
+    @staticmethod
+    async def claim_async(
+        db: AsyncSession,
+        user_id: int,
+        client_ids: Sequence[str],
+        rows: Sequence[dict],
+        fingerprint: Optional[str] = None
+    ) -> bool:
+        """Async-версия claim."""
+        statement = CalculatorService.claim_statement(
+            db.get_bind().dialect.name, user_id, client_ids, rows, fingerprint
+        )
+        return len((await db.execute(statement)).all()) == len(client_ids)
+
+    @staticmethod
+    def claimed_fingerprint(user_id: int, client_id: str):
+        """Отпечаток запроса, которым занят client_id."""
+        return select(CalculationClientId.fingerprint).where(
+            CalculationClientId.user_id == user_id,
+            CalculationClientId.client_id == client_id
         )
 
+    @staticmethod
+    def check_fingerprint(fingerprint: Optional[str], stored: Optional[str]) -> None:
+        """
+        IdempotencyKeyReused, если client_id занят другим запросом.
+
+        Записи без отпечатка (офлайн-выгрузка, ключи до миграции 008)
+        не сравниваются.
+        """
+        if fingerprint is not None and stored is not None and stored != fingerprint:
+            raise IdempotencyKeyReused()
+
+    @staticmethod
+    def calculation_row(
+        request: CalculationRequest,
+        total_water: float,
+        user_id: Optional[int] = None
+    ) -> dict:
+        """
+        Строка таблицы calculations для пакетной вставки.
+
+        Время создания фиксируется сразу, а не в момент записи,
+        change_seq выдаётся при записи (WatermarkService.apply).
+        """
+        return {
+            "user_id": user_id,
+            "junior_count": request.junior_count,
+            "middle_count": request.middle_count,
+            "senior_count": request.senior_count,
+            "staff_count": request.staff_count,
+            "season": request.season.value,
+            "activity": request.activity.value,
+            "total_water": total_water,
+            "created_at": datetime.utcnow(),
+            "change_seq": None
+        }
+
+    @staticmethod
+    def insert_calculations(db: Session, rows: List[dict]) -> None:
+        """
+        Сохраняет пачку расчётов одним многострочным INSERT и фиксирует транзакцию.
+
+        Объекты ORM не создаются, поэтому id строк не возвращаются.
+        Агрегаты статистики и водяные знаки истории обновляются
+        в той же транзакции.
+        """
+        if not rows:
+            return
+        WatermarkService.apply(db, rows)
+        db.execute(insert(Calculation).values(rows))
+        RollupService.apply(db, rows)
+        db.commit()
+
+    @staticmethod
+    def deletion_target(calculation_id: int, user_id: int):
+        """Запрос удаляемого расчёта: колонки для агрегатов и ключ партиции."""
+        return select(
+            Calculation.id,
+            Calculation.user_id,
+            Calculation.season,
+            Calculation.activity,
+            Calculation.total_water,
+            Calculation.created_at
+        ).where(Calculation.id == calculation_id, Calculation.user_id == user_id)
+
+    @staticmethod
+    def delete_statement(target: Row):
+        """
+        DELETE расчёта, возвращающий id удалённой строки.
+
+        Условие на created_at позволяет в секционированной calculations
+        удалять только из партиции нужного месяца. Параллельный DELETE
+        той же строки ждёт первого и не возвращает ничего.
+        """
+        return delete(Calculation).where(
+            Calculation.id == target.id,
+            Calculation.user_id == target.user_id,
+            Calculation.created_at == target.created_at
+        ).returning(Calculation.id)
+
+    @staticmethod
+    def tombstone_statement(target: Row, change_seq: int):
+        """Вставка надгробия удалённого расчёта."""
+        return insert(CalculationTombstone).values(
+            user_id=target.user_id,
+            change_seq=change_seq,
+            calculation_id=target.id,
+            deleted_at=datetime.utcnow()
+        )
+
+    @staticmethod
+    def delete_calculation(db: Session, calculation_id: int, user_id: int) -> bool:
+        """
+        Удаляет расчёт пользователя и фиксирует транзакцию.
+
+        В той же транзакции вычитается из агрегатов статистики, сдвигает
+        водяной знак истории и оставляет надгробие для ленты изменений -
+        только если DELETE действительно удалил строку: из двух
+        параллельных удалений одного расчёта учитывается одно.
+        Строка водяного знака блокируется первой, как при вставке
+        (см. WatermarkService.lock_statement).
+        Возвращает False, если расчёта нет или он чужой.
+        """
+        WatermarkService.lock(db, user_id)
+        target = db.execute(CalculatorService.deletion_target(calculation_id, user_id)).first()
+        if target is None:
+            db.rollback()
+            return False
+        if db.execute(CalculatorService.delete_statement(target)).first() is None:
+            db.rollback()
+            return False
+        change_seq = WatermarkService.remove(db, user_id)
+        db.execute(CalculatorService.tombstone_statement(target, change_seq))
+        RollupService.subtract(db, [target._asdict()])
+        db.commit()
+        return True
+
+    @staticmethod
+    async def delete_calculation_async(db: AsyncSession, calculation_id: int, user_id: int) -> bool:
+        """Async-версия delete_calculation."""
+        await WatermarkService.lock_async(db, user_id)
+        target = (
+            await db.execute(CalculatorService.deletion_target(calculation_id, user_id))
+        ).first()
+        if target is None:
+            await db.rollback()
+            return False
+        if (await db.execute(CalculatorService.delete_statement(target))).first() is None:
+            await db.rollback()
+            return False
+        change_seq = await WatermarkService.remove_async(db, user_id)
+        await db.execute(CalculatorService.tombstone_statement(target, change_seq))
+        await RollupService.subtract_async(db, [target._asdict()])
+        await db.commit()
+        return True
+
+    @staticmethod
+    def history_query(
+        user_id: int,
+        limit: Optional[int] = None,
+        before: Optional[Tuple[datetime, int]] = None,
+        columns: Optional[Sequence] = None,
+        since: Optional[datetime] = None
+    ):
+        """
+        Запрос страницы истории пользователя, новые сначала.
+
+        Порядок (created_at, id) по убыванию совпадает с индексом
+        ix_calculations_user_created_id. before - ключ последнего
+        элемента предыдущей страницы: страница начинается строго после
+        него, без OFFSET, поэтому стоимость не растёт с номером страницы.
+        Если переданы columns, выбираются только они, а не объекты ORM.
+
+        Условия на created_at (since снизу, курсор before сверху) в
+        секционированной calculations отсекают партиции других месяцев
+        ещё при планировании запроса.
+        """
+        query = (
+            (select(*columns) if columns else select(Calculation))
+            .where(Calculation.user_id == user_id)
+            .order_by(Calculation.created_at.desc(), Calculation.id.desc())
+        )
+        if before is not None:
+            query = query.where(
+                tuple_(Calculation.created_at, Calculation.id) < tuple_(*before),
+                # Дублирует курсор условием только на ключ партиционирования:
+                # по сравнению кортежей планировщик партиции не отсекает
+                Calculation.created_at <= before[0]
+            )
+        if since is not None:
+            query = query.where(Calculation.created_at >= since)
+        if limit is not None:
+            query = query.limit(limit)
+        return query
+
+    @staticmethod
+    def get_user_calculations(
+        db: Session,
+        user_id: int,
+        limit: Optional[int] = None,
+        before: Optional[Tuple[datetime, int]] = None
+    ) -> List[Calculation]:
+        """
+        Получает расчёты пользователя, отсортированные по дате.
+
+        Без limit возвращает все расчёты.
+        """
+        return list(
+            db.scalars(CalculatorService.history_query(user_id, limit, before))
+        )
+
+    @staticmethod
+    def get_user_history_rows(
+        db: Session,
+        user_id: int,
+        limit: Optional[int] = None,
+        before: Optional[Tuple[datetime, int]] = None,
+        since: Optional[datetime] = None
+    ) -> List[Row]:
+        """
+        Страница истории как строки Core только с колонками ответа.
+
+        В отличие от get_user_calculations объекты ORM не создаются
+        и не попадают в identity map сессии.
+        """
+        return db.execute(
+            CalculatorService.history_query(user_id, limit, before, HISTORY_COLUMNS, since)
+        ).all()
+
+    @staticmethod
+    def iter_user_history_batches(
+        db: Session,
+        user_id: int,
+        before: Optional[Tuple[datetime, int]] = None,
+        batch_size: int = 1000,
+        since: Optional[datetime] = None
+    ) -> Iterator[Sequence[Row]]:
+        """
+        Вся история пользователя порциями строк Core.
+
+        yield_per включает серверный курсор (в PostgreSQL) и выбирает
+        строки порциями по batch_size, так что память не зависит
+        от размера истории.
+        """
+        result = db.execute(
+            CalculatorService.history_query(user_id, None, before, HISTORY_COLUMNS, since),
+            execution_options={"yield_per": batch_size}
+        )
+        try:
+            yield from result.partitions()
+        finally:
+            result.close()
+
+    @staticmethod
+    def iter_user_history_rows(
+        db: Session,
+        user_id: int,
+        before: Optional[Tuple[datetime, int]] = None,
+        batch_size: int = 1000,
+        since: Optional[datetime] = None
+    ) -> Iterator[Row]:
+        """Вся история пользователя потоком строк Core."""
+        for batch in CalculatorService.iter_user_history_batches(
+            db, user_id, before, batch_size, since
+        ):
+            yield from batch
+
     @staticmethod
     def get_calculation_by_id(
         db: Session,
@@ -158,3 +751,62 @@ class CalculatorService:
             )
             .first()
         )
+
+    @staticmethod
+    async def get_user_calculations_async(
+        db: AsyncSession,
+        user_id: int,
+        limit: Optional[int] = None,
+        before: Optional[Tuple[datetime, int]] = None
+    ) -> List[Calculation]:
+        """Async-версия get_user_calculations."""
+        result = await db.scalars(
+            CalculatorService.history_query(user_id, limit, before)
+        )
+        return list(result)
+
+    @staticmethod
+    async def get_user_history_rows_async(
+        db: AsyncSession,
+        user_id: int,
+        limit: Optional[int] = None,
+        before: Optional[Tuple[datetime, int]] = None,
+        since: Optional[datetime] = None
+    ) -> List[Row]:
+        """Async-версия get_user_history_rows."""
+        result = await db.execute(
+            CalculatorService.history_query(user_id, limit, before, HISTORY_COLUMNS, since)
+        )
+        return result.all()
+
+    @staticmethod
+    async def get_calculation_by_id_async(
+        db: AsyncSession,
+        calculation_id: int,
+        user_id: int
+    ) -> Optional[Calculation]:
+        """Async-версия get_calculation_by_id."""
+        return await db.scalar(
+            select(Calculation).where(
+                Calculation.id == calculation_id,
+                Calculation.user_id == user_id
+            )
+        )
+
+    @staticmethod
+    async def iter_user_history_batches_async(
+        db: AsyncSession,
+        user_id: int,
+        batch_size: int = 1000,
+        since: Optional[datetime] = None
+    ) -> AsyncIterator[Sequence[Row]]:
+        """Async-версия iter_user_history_batches (AsyncSession.stream)."""
+        result = await db.stream(
+            CalculatorService.history_query(user_id, None, None, HISTORY_COLUMNS, since),
+            execution_options={"yield_per": batch_size}
+        )
+        try:
+            async for batch in result.partitions():
+                yield batch
+        finally:
+            await result.close()
@@ -0,0 +1,129 @@
+"""
+Лента изменений истории расчётов (GET /history/changes).
+
+Клиент хранит курсор - последний полученный change_seq - и запрашивает
+только созданные после него расчёты и надгробия удалённых. Номера
+выдаёт водяной знак истории (app.services.watermark), поэтому если курсор
+совпадает с его change_seq, изменений нет и calculations не читается.
+
+Окно ответа ограничено сверху change_seq водяного знака, прочитанного
+первым: номера пользователя фиксируются по возрастанию, и все строки
+с номером не больше него уже видны. Без этой границы при READ COMMITTED
+можно увидеть позднее удаление, пропустить более раннюю вставку
+и сдвинуть курсор за неё.
+"""
+import heapq
+from typing import Sequence
+
+from sqlalchemy import Row, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.calculation import Calculation
+from app.models.calculation_tombstone import CalculationTombstone
+from app.services.calculator import HISTORY_COLUMNS
+from app.services.watermark import Watermark, WatermarkService
+
+
+class ChangesService:
+    """Сервис ленты изменений истории."""
+
+    @staticmethod
+    def created_query(user_id: int, since: int, upto: int, limit: int):
+        """Расчёты с change_seq в (since, upto] по индексу ix_calculations_user_change_seq."""
+        return (
+            select(*HISTORY_COLUMNS, Calculation.change_seq)
+            .where(
+                Calculation.user_id == user_id,
+                Calculation.change_seq > since,
+                Calculation.change_seq <= upto
+            )
+            .order_by(Calculation.change_seq)
+            .limit(limit)
+        )
+
+    @staticmethod
+    def deleted_query(user_id: int, since: int, upto: int, limit: int):
+        """Надгробия с change_seq в (since, upto] по первичному ключу."""
+        return (
+            select(CalculationTombstone.calculation_id, CalculationTombstone.change_seq)
+            .where(
+                CalculationTombstone.user_id == user_id,
+                CalculationTombstone.change_seq > since,
+                CalculationTombstone.change_seq <= upto
+            )
+            .order_by(CalculationTombstone.change_seq)
+            .limit(limit)
+        )
+
+    @staticmethod
+    def build(
+        watermark: Watermark,
+        since: int,
+        created: Sequence[Row],
+        deleted: Sequence[Row],
+        limit: int
+    ) -> dict:
+        """
+        Ответ ленты: не больше limit изменений по возрастанию change_seq.
+
+        created - строки HISTORY_COLUMNS, deleted - id удалённых расчётов.
+        created и deleted запрошены с limit + 1. Если изменений больше
+        limit, курсор - номер последнего отданного и has_more = true,
+        иначе курсор - change_seq водяного знака.
+        """
+        events = list(heapq.merge(
+            ((row.change_seq, True, row) for row in created),
+            ((row.change_seq, False, row) for row in deleted),
+            key=lambda event: event[0]
+        ))
+        has_more = len(events) > limit
+        events = events[:limit]
+        cursor = events[-1][0] if has_more else watermark.change_seq
+        return {
+            "created": [row for _, is_created, row in events if is_created],
+            "deleted": [row.calculation_id for _, is_created, row in events if not is_created],
+            "cursor": str(max(cursor, since)),
+            "has_more": has_more
+        }
+
+    @staticmethod
+    def unchanged(since: int) -> dict:
+        """Ответ без изменений."""
+        return {"created": [], "deleted": [], "cursor": str(since), "has_more": False}
+
+    @staticmethod
+    def get_changes(db: Session, user_id: int, since: int, limit: int) -> dict:
+        """
+        Изменения истории пользователя после курсора since.
+
+        Курсор не меньше change_seq водяного знака (в том числе курсор
+        с более свежей реплики) - ответ без изменений одним чтением.
+        """
+        watermark = WatermarkService.get(db, user_id)
+        if since >= watermark.change_seq:
+            return ChangesService.unchanged(since)
+        upto = watermark.change_seq
+        created = db.execute(ChangesService.created_query(user_id, since, upto, limit + 1)).all()
+        deleted = db.execute(ChangesService.deleted_query(user_id, since, upto, limit + 1)).all()
+        return ChangesService.build(watermark, since, created, deleted, limit)
+
+    @staticmethod
+    async def get_changes_async(
+        db: AsyncSession,
+        user_id: int,
+        since: int,
+        limit: int
+    ) -> dict:
+        """Async-версия get_changes."""
+        watermark = await WatermarkService.get_async(db, user_id)
+        if since >= watermark.change_seq:
+            return ChangesService.unchanged(since)
+        upto = watermark.change_seq
+        created = (
+            await db.execute(ChangesService.created_query(user_id, since, upto, limit + 1))
+        ).all()
+        deleted = (
+            await db.execute(ChangesService.deleted_query(user_id, since, upto, limit + 1))
+        ).all()
+        return ChangesService.build(watermark, since, created, deleted, limit)
@@ -0,0 +1,90 @@
+"""
+Потоковая выгрузка истории расчётов в CSV/NDJSON.
+
+Строки читаются серверным курсором порциями фиксированного размера
+и сразу уходят клиенту. В памяти находится не больше одной порции,
+поэтому потребление памяти не зависит от размера истории.
+
+Выгрузка открывает собственную сессию: сессия из get_db закрывается
+до начала отправки тела StreamingResponse.
+"""
+import csv
+import io
+from datetime import datetime
+from typing import AsyncIterator, Callable, Iterator, Optional, Sequence
+
+import orjson
+from sqlalchemy import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.services.calculator import HISTORY_COLUMNS, CalculatorService
+from app.services.streaming import CSV, NDJSON, RESPONSE_MEDIA_TYPES
+
+EXPORT_FORMATS = (CSV, NDJSON)
+EXPORT_COLUMNS = tuple(column.key for column in HISTORY_COLUMNS)
+
+
+class ExportService:
+    """Сервис выгрузки истории."""
+
+    @staticmethod
+    def media_type(fmt: str) -> str:
+        """Content-Type выгрузки."""
+        return RESPONSE_MEDIA_TYPES[fmt]
+
+    @staticmethod
+    def header(fmt: str) -> bytes:
+        """Начало выгрузки: заголовок CSV, для NDJSON пусто."""
+        if fmt == CSV:
+            return (",".join(EXPORT_COLUMNS) + "\r\n").encode()
+        return b""
+
+    @staticmethod
+    def render(rows: Sequence[Row], fmt: str) -> bytes:
+        """Порция строк истории в формате выгрузки."""
+        if fmt == NDJSON:
+            return b"".join(orjson.dumps(row._asdict()) + b"\n" for row in rows)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        # Порядок колонок - HISTORY_COLUMNS: id, total_water, created_at, ...
+        writer.writerows(
+            (row.id, row.total_water, row.created_at.isoformat(), *row[3:])
+            for row in rows
+        )
+        return buffer.getvalue().encode()
+
+    @staticmethod
+    def iter_export(
+        session_factory: Callable[[], Session],
+        user_id: int,
+        fmt: str,
+        batch_size: int,
+        since: Optional[datetime] = None
+    ) -> Iterator[bytes]:
+        """Выгрузка истории пользователя частями по batch_size строк."""
+        yield ExportService.header(fmt)
+        db = session_factory()
+        try:
+            for batch in CalculatorService.iter_user_history_batches(
+                db, user_id, batch_size=batch_size, since=since
+            ):
+                yield ExportService.render(batch, fmt)
+        finally:
+            db.close()
+
+    @staticmethod
+    async def aiter_export(
+        session_factory: Callable[[], AsyncSession],
+        user_id: int,
+        fmt: str,
+        batch_size: int,
+        since: Optional[datetime] = None
+    ) -> AsyncIterator[bytes]:
+        """Async-версия iter_export."""
+        yield ExportService.header(fmt)
+        async with session_factory() as db:
+            async for batch in CalculatorService.iter_user_history_batches_async(
+                db, user_id, batch_size=batch_size, since=since
+            ):
+                yield ExportService.render(batch, fmt)
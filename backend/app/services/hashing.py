@@ -0,0 +1,182 @@
+"""
+Хеширование паролей в отдельном пуле и лимиты попыток входа.
+
+bcrypt намеренно медленный и занимает поток на сотни миллисекунд.
+В общем пуле потоков всплеск /auth/login и /auth/register вытесняет
+остальные маршруты, поэтому хеши считаются в своём небольшом пуле
+потоков (bcrypt отпускает GIL, отдельные процессы не нужны).
+Очередь пула ограничена: при заполнении запрос сразу получает 503,
+а не ждёт в очереди дольше, чем клиент готов ждать ответа.
+
+Попытки входа и регистрации ограничены token bucket по IP и email
+(счётчики локальны для воркера).
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Hashable, Optional
+
+from app.config import get_settings
+from app.pool import WaitHistogram
+
+
+class HashingOverloaded(Exception):
+    """Очередь хеширования заполнена."""
+
+
+class RateLimited(Exception):
+    """Превышен лимит попыток; retry_after - через сколько секунд повторить."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
+
+
+class HashingExecutor:
+    """
+    Ограниченный пул потоков для bcrypt.
+
+    Одновременно принимается не больше workers + max_queue задач;
+    сверх этого submit сразу бросает HashingOverloaded.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hashing")
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.queue_wait = WaitHistogram()
+        self.latency = WaitHistogram()
+
+    def _call(self, submitted_at: float, fn: Callable, args: tuple) -> Any:
+        started_at = time.perf_counter()
+        self.queue_wait.observe((started_at - submitted_at) * 1000)
+        with self._lock:
+            self.running += 1
+        try:
+            return fn(*args)
+        finally:
+            self.latency.observe((time.perf_counter() - started_at) * 1000)
+            with self._lock:
+                self.running -= 1
+                self.in_flight -= 1
+                self.completed += 1
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """Выполняет fn(*args) в пуле; HashingOverloaded, если очередь полна."""
+        with self._lock:
+            if self.in_flight >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise HashingOverloaded()
+            self.in_flight += 1
+        try:
+            future = self._executor.submit(self._call, time.perf_counter(), fn, args)
+        except RuntimeError:
+            with self._lock:
+                self.in_flight -= 1
+            raise
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "running": self.running,
+                "queued": self.in_flight - self.running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "queue_wait_ms": self.queue_wait.snapshot(),
+                "latency_ms": self.latency.snapshot(),
+            }
+
+
+class TokenBucketLimiter:
+    """
+    Token bucket на ключ (IP или email) с вытеснением давно неактивных ключей.
+
+    Ведро вмещает burst попыток и пополняется со скоростью
+    rate_per_minute. Число хранимых ключей ограничено max_keys.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int, max_keys: int = 100_000):
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.limited = 0
+
+    def take(self, key: Hashable) -> None:
+        """Списывает попытку или бросает RateLimited."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (float(self.burst), now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                self.limited += 1
+                raise RateLimited(retry_after=(1 - tokens) / self.rate)
+            self._buckets[key] = (tokens - 1, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+            self.limited = 0
+
+
+class AuthRateLimiter:
+    """Лимиты попыток входа и регистрации по IP и по email."""
+
+    def __init__(self, by_ip: TokenBucketLimiter, by_email: TokenBucketLimiter):
+        self.by_ip = by_ip
+        self.by_email = by_email
+
+    def check(self, ip: Optional[str], email: str) -> None:
+        """Списывает попытку с обоих вёдер или бросает RateLimited."""
+        if ip:
+            self.by_ip.take(ip)
+        self.by_email.take(email.strip().lower())
+
+    def clear(self) -> None:
+        self.by_ip.clear()
+        self.by_email.clear()
+
+    def stats(self) -> dict:
+        return {"limited_ip": self.by_ip.limited, "limited_email": self.by_email.limited}
+
+
+@lru_cache
+def get_hashing_executor() -> HashingExecutor:
+    """Пул хеширования процесса (создаётся при первом обращении)."""
+    settings = get_settings()
+    return HashingExecutor(settings.hash_workers, settings.hash_max_queue)
+
+
+@lru_cache
+def get_auth_rate_limiter() -> AuthRateLimiter:
+    """Лимиты попыток аутентификации процесса."""
+    settings = get_settings()
+    return AuthRateLimiter(
+        by_ip=TokenBucketLimiter(settings.auth_rate_ip_per_minute, settings.auth_rate_ip_burst),
+        by_email=TokenBucketLimiter(settings.auth_rate_email_per_minute, settings.auth_rate_email_burst)
+    )
+
+
+def shutdown_hashing_executor() -> None:
+    """Дожидается начатых хешей при остановке приложения."""
+    if get_hashing_executor.cache_info().currsize:
+        get_hashing_executor().shutdown()
+        get_hashing_executor.cache_clear()
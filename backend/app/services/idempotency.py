@@ -0,0 +1,180 @@
+"""
+Ключи идемпотентности (заголовок Idempotency-Key) для POST /calculate.
+
+Клиент повторяет запрос с тем же ключом после таймаута - сервер
+отвечает сохранённым ответом, не пересчитывая и не записывая расчёт.
+Защита трёхуровневая:
+
+- хранилище ответов: L1 в памяти воркера и необязательный L2 в Redis,
+  записи живут idempotency_ttl_seconds; значение - отпечаток запроса
+  и тело ответа;
+- склейка: одновременные запросы с тем же ключом в одном воркере
+  ждут первый и получают его ответ;
+- БД: ключ занимает client_id в calculation_client_ids в транзакции
+  записи вместе с отпечатком запроса, поэтому даже при промахе
+  хранилища (другой воркер, Redis недоступен) расчёт фиксируется
+  один раз, а тот же ключ с другим запросом отклоняется.
+
+Ключи действуют в пределах пользователя. Анонимные расчёты ничего
+не записывают, для них ключ не нужен и игнорируется.
+"""
+import asyncio
+import hashlib
+from functools import lru_cache
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from app.config import get_settings
+from app.services.cache import CacheBackend, LRUCache, RedisCache, TieredCache, create_redis_client
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+# Признак ответа, отданного по уже обработанному ключу
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyKeyReused(Exception):
+    """Ключ уже использован с другим запросом."""
+
+
+def key_digest(key: str) -> str:
+    """Короткий отпечаток ключа клиента (ключ может быть до 255 символов)."""
+    return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+
+def client_id(key: str) -> str:
+    """client_id расчёта в calculation_client_ids для ключа идемпотентности."""
+    return f"idem:{key_digest(key)}"
+
+
+def fingerprint_digest(fingerprint: str) -> str:
+    """Отпечаток запроса для calculation_client_ids.fingerprint."""
+    return key_digest(fingerprint)
+
+
+class IdempotencyStore:
+    """
+    Хранилище ответов по ключам идемпотентности со склейкой повторов.
+
+    Значение в кэше - отпечаток запроса, перевод строки и тело ответа.
+    Склейка работает внутри event loop воркера, обращения к Redis
+    идут в пуле потоков (см. CacheBackend.get_async).
+    """
+
+    def __init__(self, cache: CacheBackend):
+        self.cache = cache
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.replays = 0
+        self.coalesced = 0
+        self.stored = 0
+        self.conflicts = 0
+
+    @staticmethod
+    def scope(user_id: int, key: str) -> str:
+        """Ключ хранилища: ключ клиента в пределах пользователя."""
+        return f"idem:{user_id}:{key_digest(key)}"
+
+    def _check(self, fingerprint: str, stored_fingerprint: str) -> None:
+        if stored_fingerprint != fingerprint:
+            self.conflicts += 1
+            raise IdempotencyKeyReused()
+
+    def _replay(self, value: Optional[bytes], fingerprint: str) -> Optional[bytes]:
+        if value is None:
+            return None
+        stored_fingerprint, _, body = value.partition(b"\n")
+        self._check(fingerprint, stored_fingerprint.decode())
+        self.replays += 1
+        return body
+
+    def get(self, scope: str, fingerprint: str) -> Optional[bytes]:
+        """Сохранённый ответ по ключу или None; другой запрос - IdempotencyKeyReused."""
+        return self._replay(self.cache.get(scope), fingerprint)
+
+    async def get_async(self, scope: str, fingerprint: str) -> Optional[bytes]:
+        """get для event loop: Redis читается в пуле потоков."""
+        return self._replay(await self.cache.get_async(scope), fingerprint)
+
+    def set(self, scope: str, fingerprint: str, body: bytes) -> None:
+        self.cache.set(scope, fingerprint.encode() + b"\n" + body)
+        self.stored += 1
+
+    async def set_async(self, scope: str, fingerprint: str, body: bytes) -> None:
+        """set для event loop: Redis пишется в пуле потоков."""
+        await self.cache.set_async(scope, fingerprint.encode() + b"\n" + body)
+        self.stored += 1
+
+    async def run(
+        self,
+        scope: str,
+        fingerprint: str,
+        produce: Callable[[], Awaitable[Tuple[bytes, bool]]]
+    ) -> Tuple[bytes, bool]:
+        """
+        Ответ по ключу: сохранённый, ответ параллельного запроса или новый.
+
+        produce возвращает (тело, False), если ключ уже был занят в БД
+        этим же запросом, и бросает IdempotencyKeyReused, если другим.
+        Возвращает (тело, True для повтора). Если первый запрос с ключом
+        завершился ошибкой, ожидавшие повторяют попытку сами.
+        """
+        while True:
+            body = await self.get_async(scope, fingerprint)
+            if body is not None:
+                return body, True
+            inflight = self._inflight.get(scope)
+            if inflight is None:
+                break
+            self.coalesced += 1
+            result = await asyncio.shield(inflight)
+            if result is not None:
+                stored_fingerprint, body = result
+                self._check(fingerprint, stored_fingerprint)
+                return body, True
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[scope] = future
+        result = None
+        try:
+            try:
+                body, created = await produce()
+            except IdempotencyKeyReused:
+                self.conflicts += 1
+                raise
+            await self.set_async(scope, fingerprint, body)
+            result = (fingerprint, body)
+            return body, not created
+        finally:
+            del self._inflight[scope]
+            future.set_result(result)
+
+    def clear_local(self) -> None:
+        """Очищает L1 этого процесса."""
+        if isinstance(self.cache, TieredCache):
+            self.cache.clear_local()
+
+    def stats(self) -> dict:
+        return {
+            "replays": self.replays,
+            "coalesced": self.coalesced,
+            "stored": self.stored,
+            "conflicts": self.conflicts,
+            "inflight": len(self._inflight),
+            "cache": self.cache.stats(),
+        }
+
+
+@lru_cache
+def get_idempotency_store() -> IdempotencyStore:
+    """Хранилище ключей идемпотентности процесса."""
+    settings = get_settings()
+    l1 = LRUCache(
+        maxsize=settings.idempotency_cache_size,
+        ttl=settings.idempotency_ttl_seconds
+    )
+    l2 = None
+    if settings.redis_url:
+        l2 = RedisCache(
+            create_redis_client(settings.redis_url),
+            default_ttl=settings.idempotency_ttl_seconds
+        )
+    return IdempotencyStore(TieredCache(l1, l2))
@@ -0,0 +1,289 @@
+"""
+Помесячные партиции таблицы calculations (PostgreSQL).
+
+Миграция 004 делает calculations таблицей, секционированной по диапазону
+created_at, с партицией на каждый месяц (calculations_yYYYYmMM) и партицией
+по умолчанию для строк вне созданных диапазонов. Сервис создаёт партиции
+заранее и убирает старые: отсоединяет их в схему archive или удаляет.
+Расчёты убранной партиции уходят из истории как удалённые: водяные знаки
+пользователей сдвигаются и пишутся надгробия, поэтому ETag, кэши страниц
+и лента /history/changes видят архивирование. Если запуск обслуживания был пропущен и строки месяца уже попали
+в партицию по умолчанию, они переносятся в созданную партицию.
+
+В остальных БД (SQLite в тестах и локально) таблица обычная,
+и обслуживание ничего не делает.
+"""
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.services.watermark import WatermarkService
+
+PARENT_TABLE = "calculations"
+DEFAULT_PARTITION = "calculations_default"
+ARCHIVE_SCHEMA = "archive"
+
+# Политики для партиций старше срока хранения
+ARCHIVE_DETACH = "detach"  # отсоединить и перенести в схему archive
+ARCHIVE_DROP = "drop"      # удалить вместе с данными
+
+_PARTITION_NAME = re.compile(r"^calculations_y(\d{4})m(\d{2})$")
+
+
+def add_months(month: date, months: int) -> date:
+    """Первое число месяца, отстоящего на months от month."""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    """Имя партиции месяца."""
+    return f"{PARENT_TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+def partition_month(name: str) -> Optional[date]:
+    """Месяц партиции по её имени (None для чужих таблиц и default)."""
+    match = _PARTITION_NAME.match(name)
+    if match is None:
+        return None
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+@dataclass
+class PartitionPlan:
+    """Что нужно сделать с партициями."""
+    create: List[date] = field(default_factory=list)
+    archive: List[date] = field(default_factory=list)
+
+
+class PartitionService:
+    """Сервис обслуживания партиций calculations."""
+
+    @staticmethod
+    def plan(
+        existing: List[date],
+        today: date,
+        months_ahead: int,
+        retention_months: Optional[int] = None
+    ) -> PartitionPlan:
+        """
+        План обслуживания.
+
+        Создаются недостающие партиции с текущего месяца на months_ahead
+        вперёд. Партиции, закончившиеся раньше, чем retention_months
+        месяцев назад, архивируются (при retention_months = None
+        хранятся бессрочно).
+        """
+        current = date(today.year, today.month, 1)
+        existing_set = set(existing)
+        plan = PartitionPlan(
+            create=[
+                month
+                for month in (add_months(current, i) for i in range(months_ahead + 1))
+                if month not in existing_set
+            ]
+        )
+        if retention_months is not None:
+            oldest_kept = add_months(current, -retention_months)
+            plan.archive = sorted(month for month in existing_set if month < oldest_kept)
+        return plan
+
+    @staticmethod
+    def is_partitioned(conn: Connection) -> bool:
+        """Секционирована ли calculations (только PostgreSQL)."""
+        if conn.dialect.name != "postgresql":
+            return False
+        return conn.execute(
+            text(
+                "SELECT 1 FROM pg_partitioned_table p "
+                "JOIN pg_class c ON c.oid = p.partrelid "
+                "WHERE c.relname = :table AND pg_table_is_visible(c.oid)"
+            ),
+            {"table": PARENT_TABLE}
+        ).first() is not None
+
+    @staticmethod
+    def existing_partitions(conn: Connection) -> List[date]:
+        """Месяцы присоединённых помесячных партиций."""
+        names = conn.execute(
+            text(
+                "SELECT c.relname FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid "
+                "JOIN pg_class p ON p.oid = i.inhparent "
+                "WHERE p.relname = :table AND pg_table_is_visible(p.oid)"
+            ),
+            {"table": PARENT_TABLE}
+        ).scalars()
+        return sorted(month for month in map(partition_month, names) if month is not None)
+
+    @staticmethod
+    def default_has_rows(conn: Connection, month: date) -> bool:
+        """Есть ли в партиции по умолчанию строки месяца month."""
+        return conn.execute(
+            text(
+                f"SELECT 1 FROM {DEFAULT_PARTITION} "
+                "WHERE created_at >= :start AND created_at < :end LIMIT 1"
+            ),
+            {"start": month, "end": add_months(month, 1)}
+        ).first() is not None
+
+    @staticmethod
+    def create_statements(month: date, move_default: bool = False) -> List[str]:
+        """
+        SQL создания партиции месяца [month, следующий месяц).
+
+        CREATE ... PARTITION OF завершается ошибкой, если в партиции
+        по умолчанию уже есть строки этого месяца. Тогда (move_default)
+        default отсоединяется, партиция создаётся, строки месяца
+        переносятся в неё, и default присоединяется обратно.
+        DETACH держит ACCESS EXCLUSIVE на calculations до конца
+        транзакции, но default содержит только строки пропущенных
+        запусков, так что перенос короткий. Без строк месяца default
+        проверяется самим PostgreSQL при CREATE, и при пустом default
+        это мгновенно.
+        """
+        name = partition_name(month)
+        start, end = month.isoformat(), add_months(month, 1).isoformat()
+        create = (
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PARENT_TABLE} "
+            f"FOR VALUES FROM ('{start}') TO ('{end}')"
+        )
+        if not move_default:
+            return [create]
+        in_month = f"created_at >= '{start}' AND created_at < '{end}'"
+        return [
+            f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {DEFAULT_PARTITION}",
+            create,
+            f"INSERT INTO {name} SELECT * FROM {DEFAULT_PARTITION} WHERE {in_month}",
+            f"DELETE FROM {DEFAULT_PARTITION} WHERE {in_month}",
+            f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT",
+        ]
+
+    @staticmethod
+    def create_partition(conn: Connection, month: date) -> None:
+        """
+        Создаёт партицию месяца, забирая его строки из партиции по умолчанию.
+
+        Выполняется в транзакции conn: при ошибке ни партиция,
+        ни перенос строк не применяются.
+        """
+        move_default = PartitionService.default_has_rows(conn, month)
+        for statement in PartitionService.create_statements(month, move_default):
+            conn.execute(text(statement))
+
+    @staticmethod
+    def detach_statements(month: date) -> List[str]:
+        """SQL отсоединения партиции месяца: её строки уходят из calculations."""
+        return [f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {partition_name(month)}"]
+
+    @staticmethod
+    def archive_statements(month: date, mode: str = ARCHIVE_DETACH) -> List[str]:
+        """SQL судьбы отсоединённой партиции: перенос в схему archive или удаление."""
+        name = partition_name(month)
+        if mode == ARCHIVE_DROP:
+            return [f"DROP TABLE {name}"]
+        return [
+            f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}",
+            f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}",
+        ]
+
+    @staticmethod
+    def record_removal(conn: Connection, source: str) -> int:
+        """
+        Учитывает строки таблицы source как удалённые из истории.
+
+        Водяной знак каждого пользователя сдвигается на число его строк
+        (row_count уменьшается, change_seq растёт), и на каждую строку
+        пишется надгробие с номером из выданного диапазона - как при
+        DELETE /history/{id}. Возвращает число учтённых строк.
+        """
+        counts = conn.execute(text(
+            f"SELECT user_id, COUNT(*) FROM {source} "
+            "WHERE user_id IS NOT NULL GROUP BY user_id ORDER BY user_id"
+        )).all()
+        now = datetime.utcnow()
+        recorded = 0
+        for user_id, count in counts:
+            last = conn.execute(
+                WatermarkService.remove_statement(user_id, count)
+            ).scalar_one_or_none()
+            if last is None:
+                continue
+            conn.execute(
+                text(
+                    "INSERT INTO calculation_tombstones "
+                    "(user_id, change_seq, calculation_id, deleted_at) "
+                    "SELECT user_id, :first + ROW_NUMBER() OVER (ORDER BY id) - 1, id, :now "
+                    f"FROM {source} WHERE user_id = :user_id"
+                ),
+                {"first": last - count + 1, "now": now, "user_id": user_id}
+            )
+            recorded += count
+        return recorded
+
+    @staticmethod
+    def archive_partition(conn: Connection, month: date, mode: str = ARCHIVE_DETACH) -> None:
+        """
+        Убирает партицию месяца из calculations.
+
+        detach отсоединяет её и переносит в схему archive: данные
+        остаются доступны для выгрузки, но не участвуют в запросах.
+        drop удаляет партицию. В той же транзакции её расчёты
+        учитываются в истории как удалённые (record_removal): одно
+        надгробие на строку. Агрегаты calculation_rollups не меняются.
+
+        Строки водяных знаков затронутых пользователей блокируются
+        до DETACH - в том же порядке, что и при записи в историю.
+        Новые строки в прошлый месяц не попадают (created_at - время
+        записи), поэтому набор пользователей после блокировки не растёт.
+        """
+        name = partition_name(month)
+        # Диапазон месяца вместо имени партиции: PostgreSQL читает только её
+        user_ids = conn.execute(
+            text(
+                f"SELECT DISTINCT user_id FROM {PARENT_TABLE} "
+                "WHERE created_at >= :start AND created_at < :end AND user_id IS NOT NULL"
+            ),
+            {"start": month, "end": add_months(month, 1)}
+        ).scalars().all()
+        if user_ids:
+            conn.execute(WatermarkService.lock_statement(user_ids))
+        for statement in PartitionService.detach_statements(month):
+            conn.execute(text(statement))
+        PartitionService.record_removal(conn, name)
+        for statement in PartitionService.archive_statements(month, mode):
+            conn.execute(text(statement))
+
+    @staticmethod
+    def maintain(
+        conn: Connection,
+        today: date,
+        months_ahead: int,
+        retention_months: Optional[int] = None,
+        archive_mode: str = ARCHIVE_DETACH,
+        dry_run: bool = False
+    ) -> Optional[PartitionPlan]:
+        """
+        Приводит партиции в соответствие с планом.
+
+        Возвращает выполненный (или, при dry_run, предлагаемый) план;
+        None, если таблица не секционирована.
+        """
+        if not PartitionService.is_partitioned(conn):
+            return None
+        plan = PartitionService.plan(
+            PartitionService.existing_partitions(conn),
+            today,
+            months_ahead,
+            retention_months
+        )
+        if not dry_run:
+            for month in plan.create:
+                PartitionService.create_partition(conn, month)
+            for month in plan.archive:
+                PartitionService.archive_partition(conn, month, archive_mode)
+        return plan
@@ -0,0 +1,176 @@
+"""
+Планировщик потребления воды за период по календарю школ.
+
+Календарь раскладывается в матрицы (школы x дни) индексов сезона,
+активности и численности. Сегменты и изменения численности
+применяются срезами, а не циклом по дням; дневные значения
+считаются одним вызовом calculate_columns, недельные и итоговые
+суммы - через префиксные суммы.
+"""
+from datetime import date, timedelta
+from typing import List
+
+import numpy as np
+
+from app.schemas.planner import CalendarSegment, PlanRequest, SchoolPlan
+from app.services.calculator import (
+    CalculatorService,
+    CATEGORIES,
+    SEASON_INDEX,
+    ACTIVITY_INDEX,
+    round2
+)
+
+_COUNT_FIELDS = tuple(f"{category}_count" for category in CATEGORIES)
+
+
+class PlanTooLarge(ValueError):
+    """План превышает допустимый размер (школы x дни)."""
+
+    def __init__(self, cells: int, limit: int):
+        super().__init__(f"План из {cells} школо-дней превышает лимит {limit}")
+        self.cells = cells
+        self.limit = limit
+
+
+class PlannerService:
+    """Сервис расчёта плана за период."""
+
+    @staticmethod
+    def _day_slice(segment: CalendarSegment, start: date, days: int) -> slice:
+        """Срез дней периода, попадающих в сегмент."""
+        first = max((segment.start - start).days, 0)
+        last = min((segment.end - start).days + 1, days)
+        return slice(first, max(first, last))
+
+    @staticmethod
+    def _apply_segment(
+        segment: CalendarSegment,
+        columns: slice,
+        season: np.ndarray,
+        activity: np.ndarray,
+        open_days: np.ndarray
+    ) -> None:
+        """Применяет сегмент к срезу матриц (одна школа или все)."""
+        if segment.season is not None:
+            season[..., columns] = SEASON_INDEX[segment.season.value]
+        if segment.activity is not None:
+            activity[..., columns] = ACTIVITY_INDEX[segment.activity.value]
+        if segment.closed:
+            open_days[..., columns] = False
+
+    @staticmethod
+    def _school_counts(school: SchoolPlan, start: date, days: int) -> np.ndarray:
+        """
+        Численность школы по дням, форма (days, 4).
+
+        Изменения численности действуют с указанной даты до следующего
+        изменения: значение на каждый день выбирается через searchsorted
+        по дням изменений, без цикла по дням.
+        """
+        counts = np.empty((days, len(CATEGORIES)), dtype=np.int64)
+        day_numbers = np.arange(days)
+        changes = sorted(school.headcount_changes, key=lambda change: change.date)
+        for column, field in enumerate(_COUNT_FIELDS):
+            points = [0] + [
+                min(max((change.date - start).days, 0), days)
+                for change in changes
+                if getattr(change, field) is not None
+            ]
+            values = [getattr(school, field)] + [
+                getattr(change, field)
+                for change in changes
+                if getattr(change, field) is not None
+            ]
+            positions = np.searchsorted(points, day_numbers, side="right") - 1
+            counts[:, column] = np.asarray(values, dtype=np.int64)[positions]
+        return counts
+
+    @staticmethod
+    def _weeks(start: date, days: int) -> np.ndarray:
+        """Индексы первых дней недель (понедельник) внутри периода."""
+        weekdays = (start.weekday() + np.arange(days)) % 7
+        return np.flatnonzero((weekdays == 0) | (np.arange(days) == 0))
+
+    @staticmethod
+    def plan(request: PlanRequest, max_cells: int) -> dict:
+        """
+        Рассчитывает дневные, недельные и итоговые объёмы по всем школам.
+
+        Дневное значение совпадает с CalculatorService.calculate для
+        параметров этого дня, закрытые дни дают 0.
+        """
+        start = request.start
+        days = (request.end - start).days + 1
+        schools = len(request.schools)
+        if schools * days > max_cells:
+            raise PlanTooLarge(schools * days, max_cells)
+
+        season = np.full((schools, days), SEASON_INDEX[request.season.value], dtype=np.intp)
+        activity = np.full((schools, days), ACTIVITY_INDEX[request.activity.value], dtype=np.intp)
+        open_days = np.ones((schools, days), dtype=bool)
+        if request.skip_weekends:
+            weekdays = (start.weekday() + np.arange(days)) % 7
+            open_days[:, weekdays >= 5] = False
+
+        for segment in request.segments:
+            PlannerService._apply_segment(
+                segment,
+                PlannerService._day_slice(segment, start, days),
+                season,
+                activity,
+                open_days
+            )
+
+        counts = np.empty((schools, days, len(CATEGORIES)), dtype=np.int64)
+        for row, school in enumerate(request.schools):
+            counts[row] = PlannerService._school_counts(school, start, days)
+            for segment in school.segments:
+                PlannerService._apply_segment(
+                    segment,
+                    PlannerService._day_slice(segment, start, days),
+                    season[row],
+                    activity[row],
+                    open_days[row]
+                )
+
+        daily = CalculatorService.calculate_columns(
+            counts.reshape(-1, len(CATEGORIES)),
+            season.ravel(),
+            activity.ravel()
+        ).total_water.reshape(schools, days)
+        daily = np.where(open_days, daily, 0.0)
+
+        # Префиксные суммы: сумма за [a, b) = prefix[b] - prefix[a]
+        prefix = np.zeros((schools, days + 1))
+        np.cumsum(daily, axis=1, out=prefix[:, 1:])
+        week_starts = PlannerService._weeks(start, days)
+        week_ends = np.append(week_starts[1:], days)
+        weekly = round2(prefix[:, week_ends] - prefix[:, week_starts])
+        totals = round2(prefix[:, -1])
+
+        week_dates: List[date] = [start + timedelta(days=int(i)) for i in week_starts]
+        weekly_all = round2(weekly.sum(axis=0))
+
+        return {
+            "start": start,
+            "end": request.end,
+            "days": days,
+            "week_starts": week_dates,
+            "total_water": float(round2(totals.sum())),
+            "weekly": weekly_all.tolist(),
+            "schools": [
+                {
+                    "name": school.name,
+                    "total_water": total,
+                    "weekly": school_weekly,
+                    "daily": school_daily,
+                }
+                for school, total, school_weekly, school_daily in zip(
+                    request.schools,
+                    totals.tolist(),
+                    weekly.tolist(),
+                    daily.tolist() if request.include_daily else [None] * schools
+                )
+            ],
+        }
@@ -0,0 +1,190 @@
+"""
+Отзыв доступа пользователей без запроса к БД на каждый запрос.
+
+Отозванные user_id хранятся в фильтре Блума (по умолчанию 8 КБ)
+и в точном множестве. Проверка токена смотрит только в локальную
+копию фильтра; точное множество проверяется лишь при попадании
+в фильтр, то есть для отозванных и редких ложных срабатываний.
+
+С REDIS_URL фильтр (строка битов) и множество общие для всех
+воркеров и подов: воркер перечитывает фильтр не реже раза
+в revocation_refresh_seconds, и отзыв доходит до всех воркеров
+с этой задержкой. Без Redis отзыв виден только в своём процессе.
+Клиент Redis синхронный: async-зависимости вызывают is_revoked_async,
+который уводит в пул потоков только проверки, идущие в сеть.
+"""
+import hashlib
+import logging
+import threading
+import time
+from functools import lru_cache
+from typing import Iterable, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+BLOOM_KEY = "auth:revoked:bloom"
+SET_KEY = "auth:revoked"
+
+
+class BloomFilter:
+    """Фильтр Блума над bytearray; биты совместимы с SETBIT/GETBIT Redis."""
+
+    def __init__(self, bits: int, hashes: int, data: Optional[bytes] = None):
+        self.bits = bits
+        self.hashes = hashes
+        self.data = bytearray((bits + 7) // 8)
+        if data:
+            self.data[:len(data)] = data[:len(self.data)]
+
+    def positions(self, item: int) -> List[int]:
+        """Номера битов элемента (двойное хеширование blake2b)."""
+        digest = hashlib.blake2b(str(item).encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:], "big") | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, item: int) -> None:
+        for position in self.positions(item):
+            # Порядок битов как в Redis: старший бит байта - первый
+            self.data[position >> 3] |= 0x80 >> (position & 7)
+
+    def __contains__(self, item: int) -> bool:
+        return all(
+            self.data[position >> 3] & (0x80 >> (position & 7))
+            for position in self.positions(item)
+        )
+
+
+class RevocationList:
+    """
+    Список отозванных пользователей.
+
+    is_revoked не обращается к сети, пока user_id не попал в фильтр.
+    При ошибке Redis на точной проверке пользователь считается
+    отозванным: ложное срабатывание фильтра лучше отклонить,
+    чем пропустить отозванный токен.
+    """
+
+    def __init__(
+        self,
+        bits: int,
+        hashes: int,
+        refresh_seconds: float,
+        client=None
+    ):
+        self.bloom = BloomFilter(bits, hashes)
+        self.refresh_seconds = refresh_seconds
+        self.client = client
+        self._local: set = set()
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+        self.checks = 0
+        self.bloom_hits = 0
+        self.rejected = 0
+        self.errors = 0
+
+    def revoke(self, user_ids: Iterable[int]) -> None:
+        """Отзывает доступ; с Redis - для всех воркеров."""
+        user_ids = list(user_ids)
+        with self._lock:
+            for user_id in user_ids:
+                self.bloom.add(user_id)
+                self._local.add(user_id)
+        if self.client is not None and user_ids:
+            pipe = self.client.pipeline()
+            pipe.sadd(SET_KEY, *user_ids)
+            for user_id in user_ids:
+                for position in self.bloom.positions(user_id):
+                    pipe.setbit(BLOOM_KEY, position, 1)
+            pipe.execute()
+
+    def refresh(self, force: bool = False) -> None:
+        """Перечитывает фильтр из Redis, если прошло refresh_seconds."""
+        if self.client is None:
+            return
+        if not force and not self._refresh_due():
+            return
+        self._refreshed_at = time.monotonic()
+        try:
+            data = self.client.get(BLOOM_KEY)
+        except Exception as exc:
+            self.errors += 1
+            logger.warning("Фильтр отзыва не обновлён: %s", exc)
+            return
+        bloom = BloomFilter(self.bloom.bits, self.bloom.hashes, data)
+        with self._lock:
+            # Локальные отзывы могли не дойти до Redis - сохраняем их
+            for user_id in self._local:
+                bloom.add(user_id)
+            self.bloom = bloom
+
+    def _refresh_due(self) -> bool:
+        return time.monotonic() - self._refreshed_at >= self.refresh_seconds
+
+    def is_revoked(self, user_id: int) -> bool:
+        """Отозван ли доступ пользователя."""
+        self.refresh()
+        self.checks += 1
+        if user_id not in self.bloom:
+            return False
+        self.bloom_hits += 1
+        if user_id in self._local:
+            revoked = True
+        elif self.client is None:
+            revoked = False
+        else:
+            try:
+                revoked = bool(self.client.sismember(SET_KEY, user_id))
+            except Exception as exc:
+                self.errors += 1
+                logger.warning("Точная проверка отзыва не удалась: %s", exc)
+                revoked = True
+        if revoked:
+            self.rejected += 1
+        return revoked
+
+    async def is_revoked_async(self, user_id: int) -> bool:
+        """
+        is_revoked для event loop.
+
+        Проверка без сети (Redis не задан или фильтр свежий и user_id
+        в него не попал) идёт на месте, иначе - в пуле потоков.
+        """
+        if self.client is None or (not self._refresh_due() and user_id not in self.bloom):
+            return self.is_revoked(user_id)
+        return await run_in_threadpool(self.is_revoked, user_id)
+
+    def clear_local(self) -> None:
+        """Сбрасывает локальное состояние (для тестов)."""
+        with self._lock:
+            self.bloom = BloomFilter(self.bloom.bits, self.bloom.hashes)
+            self._local.clear()
+            self._refreshed_at = 0.0
+
+    def stats(self) -> dict:
+        return {
+            "shared": self.client is not None,
+            "checks": self.checks,
+            "bloom_hits": self.bloom_hits,
+            "rejected": self.rejected,
+            "errors": self.errors,
+        }
+
+
+@lru_cache
+def get_revocation_list() -> RevocationList:
+    """Список отзыва процесса; общий через Redis, если задан REDIS_URL."""
+    from app.services.cache import create_redis_client
+
+    settings = get_settings()
+    client = create_redis_client(settings.redis_url) if settings.redis_url else None
+    return RevocationList(
+        bits=settings.auth_revocation_bloom_bits,
+        hashes=settings.auth_revocation_bloom_hashes,
+        refresh_seconds=settings.auth_revocation_refresh_seconds,
+        client=client
+    )
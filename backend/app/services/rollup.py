@@ -0,0 +1,190 @@
+"""
+Агрегаты истории расчётов (calculation_rollups).
+
+Каждая вставка расчётов прибавляет их количество и расход
+к корзинам (пользователь, месяц, сезон, активность) одним UPSERT
+в той же транзакции, удаление так же вычитает. Статистика читается по корзинам: стоимость
+зависит от их числа, а не от числа расчётов.
+"""
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.calculation_rollup import CalculationRollup
+
+# Ключ корзины: (user_id, месяц, сезон, активность)
+BucketKey = Tuple[int, date, str, str]
+
+_DIALECT_INSERT = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def month_start(moment: datetime) -> date:
+    """Первое число месяца, к которому относится момент."""
+    return date(moment.year, moment.month, 1)
+
+
+class RollupService:
+    """Сервис агрегатов истории расчётов."""
+
+    @staticmethod
+    def aggregate(rows: Iterable[dict]) -> Dict[BucketKey, List]:
+        """
+        Сворачивает строки calculations в приращения корзин.
+
+        Анонимные расчёты (user_id = None) в статистику не входят.
+        """
+        buckets: Dict[BucketKey, List] = defaultdict(lambda: [0, 0.0])
+        for row in rows:
+            if row["user_id"] is None:
+                continue
+            key = (
+                row["user_id"],
+                month_start(row["created_at"]),
+                row["season"],
+                row["activity"]
+            )
+            bucket = buckets[key]
+            bucket[0] += 1
+            bucket[1] += row["total_water"]
+        return buckets
+
+    @staticmethod
+    def upsert_statement(dialect_name: str, rows: Iterable[dict], sign: int = 1):
+        """
+        UPSERT приращений корзин для диалекта БД.
+
+        sign = -1 вычитает строки (удаление расчётов).
+        Возвращает None, если прибавлять нечего.
+        """
+        buckets = RollupService.aggregate(rows)
+        if not buckets:
+            return None
+        values = [
+            {
+                "user_id": user_id,
+                "month": month,
+                "season": season,
+                "activity": activity,
+                "count": sign * count,
+                "total_water": sign * total_water
+            }
+            for (user_id, month, season, activity), (count, total_water) in buckets.items()
+        ]
+        statement = _DIALECT_INSERT[dialect_name](CalculationRollup).values(values)
+        table = CalculationRollup.__table__
+        return statement.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.month, table.c.season, table.c.activity],
+            set_={
+                "count": table.c.count + statement.excluded.count,
+                "total_water": table.c.total_water + statement.excluded.total_water
+            }
+        )
+
+    @staticmethod
+    def apply(db: Session, rows: Iterable[dict]) -> None:
+        """Прибавляет строки к агрегатам; commit остаётся за вызывающим."""
+        statement = RollupService.upsert_statement(db.get_bind().dialect.name, rows)
+        if statement is not None:
+            db.execute(statement)
+
+    @staticmethod
+    async def apply_async(db: AsyncSession, rows: Iterable[dict]) -> None:
+        """Async-версия apply."""
+        statement = RollupService.upsert_statement(db.get_bind().dialect.name, rows)
+        if statement is not None:
+            await db.execute(statement)
+
+    @staticmethod
+    def prune_statement(rows: Iterable[dict]):
+        """Удаление опустевших корзин пользователей из rows."""
+        user_ids = {row["user_id"] for row in rows}
+        return delete(CalculationRollup).where(
+            CalculationRollup.user_id.in_(user_ids),
+            CalculationRollup.count <= 0
+        )
+
+    @staticmethod
+    def subtract(db: Session, rows: List[dict]) -> None:
+        """
+        Вычитает удалённые строки из агрегатов; commit остаётся за вызывающим.
+
+        Корзины, в которых не осталось расчётов, удаляются.
+        """
+        statement = RollupService.upsert_statement(db.get_bind().dialect.name, rows, -1)
+        if statement is not None:
+            db.execute(statement)
+            db.execute(RollupService.prune_statement(rows))
+
+    @staticmethod
+    async def subtract_async(db: AsyncSession, rows: List[dict]) -> None:
+        """Async-версия subtract."""
+        statement = RollupService.upsert_statement(db.get_bind().dialect.name, rows, -1)
+        if statement is not None:
+            await db.execute(statement)
+            await db.execute(RollupService.prune_statement(rows))
+
+    @staticmethod
+    def stats_query(user_id: int):
+        """Запрос всех корзин пользователя."""
+        return (
+            select(
+                CalculationRollup.month,
+                CalculationRollup.season,
+                CalculationRollup.activity,
+                CalculationRollup.count,
+                CalculationRollup.total_water
+            )
+            .where(CalculationRollup.user_id == user_id)
+            .order_by(CalculationRollup.month)
+        )
+
+    @staticmethod
+    def build_stats(buckets) -> dict:
+        """Статистика в формате HistoryStats из корзин пользователя."""
+        by_month: Dict[date, List] = {}
+        by_season_activity: Dict[Tuple[str, str], List] = {}
+        for bucket in buckets:
+            for groups, key in (
+                (by_month, bucket.month),
+                (by_season_activity, (bucket.season, bucket.activity))
+            ):
+                group = groups.setdefault(key, [0, 0.0])
+                group[0] += bucket.count
+                group[1] += bucket.total_water
+
+        return {
+            "count": sum(count for count, _ in by_month.values()),
+            "total_water": round(sum(total for _, total in by_month.values()), 2),
+            "by_month": [
+                {"month": month, "count": count, "total_water": round(total, 2)}
+                for month, (count, total) in by_month.items()
+            ],
+            "by_season_activity": [
+                {
+                    "season": season,
+                    "activity": activity,
+                    "count": count,
+                    "total_water": round(total, 2)
+                }
+                for (season, activity), (count, total) in sorted(by_season_activity.items())
+            ]
+        }
+
+    @staticmethod
+    def get_stats(db: Session, user_id: int) -> dict:
+        """Статистика истории пользователя по агрегатам."""
+        return RollupService.build_stats(db.execute(RollupService.stats_query(user_id)))
+
+    @staticmethod
+    async def get_stats_async(db: AsyncSession, user_id: int) -> dict:
+        """Async-версия get_stats."""
+        result = await db.execute(RollupService.stats_query(user_id))
+        return RollupService.build_stats(result)
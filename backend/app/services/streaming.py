@@ -0,0 +1,245 @@
+"""
+Потоковый расчёт для больших NDJSON/CSV загрузок.
+
+Тело запроса читается по частям, строки проверяются по схеме
+CalculationRequest и считаются векторно блоками фиксированного размера.
+В памяти одновременно находится не больше одного блока, поэтому
+потребление памяти не зависит от размера входа.
+"""
+import csv
+from typing import AsyncIterator, List, Optional, Tuple
+
+import orjson
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from app.schemas.calculation import CalculationRequest
+from app.services.calculator import CalculatorService
+
+NDJSON = "ndjson"
+CSV = "csv"
+
+# Content-Type -> формат потока
+STREAM_MEDIA_TYPES = {
+    "application/x-ndjson": NDJSON,
+    "application/ndjson": NDJSON,
+    "application/jsonl": NDJSON,
+    "text/csv": CSV,
+}
+
+RESPONSE_MEDIA_TYPES = {
+    NDJSON: "application/x-ndjson",
+    CSV: "text/csv",
+}
+
+CSV_OUTPUT_COLUMNS = ("line", "total_water", "base_total", "total_people", "error")
+
+
+class BodyStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse, который читает тело запроса во время ответа.
+
+    Обычный StreamingResponse параллельно ждёт disconnect через receive()
+    и перехватывает части тела, которые ещё не прочитал генератор.
+    Здесь receive() остаётся генератору: отключение клиента проявляется
+    как ClientDisconnect при чтении request.stream().
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+def detect_format(content_type: Optional[str]) -> Optional[str]:
+    """Определяет формат потока по заголовку Content-Type."""
+    if not content_type:
+        return None
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    return STREAM_MEDIA_TYPES.get(media_type)
+
+
+def _error_entry(line_number: int, errors: list) -> dict:
+    """Запись об ошибке строки для выходного потока."""
+    return {"line": line_number, "errors": errors}
+
+
+def _validation_errors(exc: ValidationError) -> list:
+    """Ошибки валидации без входных данных и ссылок на документацию."""
+    return exc.errors(include_url=False, include_context=False, include_input=False)
+
+
+async def iter_lines(
+    chunks: AsyncIterator[bytes],
+    max_line_bytes: int
+) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """
+    Разбивает поток байтов на строки.
+
+    Возвращает пары (номер строки, содержимое). Для строк длиннее
+    max_line_bytes содержимое равно None, а сама строка пропускается
+    без накопления в памяти. Пустые строки не возвращаются.
+    """
+    buffer = b""
+    line_number = 0
+    oversized = False
+
+    async for chunk in chunks:
+        buffer += chunk
+        if b"\n" in chunk:
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                line_number += 1
+                if oversized:
+                    oversized = False
+                    yield line_number, None
+                elif len(line) > max_line_bytes:
+                    yield line_number, None
+                elif line.strip():
+                    yield line_number, line.rstrip(b"\r")
+
+        if len(buffer) > max_line_bytes:
+            # Хвост уже не поместится в лимит - отбрасываем до конца строки
+            buffer = b""
+            oversized = True
+
+    if oversized:
+        yield line_number + 1, None
+    elif buffer.strip():
+        yield line_number + 1, buffer.rstrip(b"\r")
+
+
+class _Chunk:
+    """Блок строк входа, обрабатываемый за один векторный проход."""
+
+    def __init__(self, fmt: str, header: Optional[List[str]]):
+        self.fmt = fmt
+        self.header = header
+        self.lines: List[Tuple[int, Optional[bytes]]] = []
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    def _parse(self, raw: bytes) -> CalculationRequest:
+        """Разбирает одну строку входа в CalculationRequest."""
+        if self.fmt == NDJSON:
+            return CalculationRequest.model_validate_json(raw)
+
+        values = next(csv.reader([raw.decode("utf-8", errors="replace")]))
+        row = {
+            name: value.strip()
+            for name, value in zip(self.header, values)
+            if value.strip()
+        }
+        return CalculationRequest.model_validate(row)
+
+    def process(self) -> List[Tuple[int, dict, Optional[list]]]:
+        """
+        Проверяет строки и считает валидные одним вызовом calculate_columns.
+
+        Возвращает записи (номер строки, результат, ошибки) в порядке входа.
+        """
+        requests: List[CalculationRequest] = []
+        entries: List[Tuple[int, Optional[int], Optional[list]]] = []
+
+        for line_number, raw in self.lines:
+            if raw is None:
+                entries.append((line_number, None, [{
+                    "type": "line_too_long",
+                    "loc": [],
+                    "msg": "Строка превышает допустимую длину"
+                }]))
+                continue
+            try:
+                request = self._parse(raw)
+            except ValidationError as exc:
+                entries.append((line_number, None, _validation_errors(exc)))
+                continue
+            entries.append((line_number, len(requests), None))
+            requests.append(request)
+
+        results: List[dict] = []
+        if requests:
+            results = CalculatorService.calculate_columns(
+                *CalculatorService.requests_to_arrays(requests)
+            ).to_dicts()
+
+        return [
+            (line_number, results[index] if index is not None else None, errors)
+            for line_number, index, errors in entries
+        ]
+
+    def render(self) -> bytes:
+        """Обрабатывает блок и сериализует его в выходной формат."""
+        entries = self.process()
+        if self.fmt == NDJSON:
+            lines = []
+            for line_number, result, errors in entries:
+                entry = (
+                    _error_entry(line_number, errors)
+                    if errors is not None
+                    else {"line": line_number, "result": result}
+                )
+                lines.append(orjson.dumps(entry))
+            return b"\n".join(lines) + b"\n"
+
+        rows = []
+        for line_number, result, errors in entries:
+            if errors is not None:
+                message = "; ".join(
+                    ".".join(str(part) for part in error["loc"]) + ": " + error["msg"]
+                    if error["loc"] else error["msg"]
+                    for error in errors
+                )
+                message = message.replace('"', '""')
+                rows.append(f'{line_number},,,,"{message}"')
+            else:
+                rows.append(
+                    f"{line_number},{result['total_water']},"
+                    f"{result['base_total']},{result['total_people']},"
+                )
+        return ("\n".join(rows) + "\n").encode("utf-8")
+
+
+async def stream_calculations(
+    chunks: AsyncIterator[bytes],
+    fmt: str,
+    chunk_size: int,
+    max_line_bytes: int
+) -> AsyncIterator[bytes]:
+    """
+    Потоково считает строки NDJSON/CSV и отдаёт результат по блокам.
+
+    Ошибки отдельных строк попадают в выходной поток и не прерывают
+    обработку. Для CSV первая непустая строка считается заголовком.
+    Тяжёлая часть (валидация и расчёт блока) выполняется в пуле потоков,
+    чтобы не блокировать event loop.
+    """
+    header: Optional[List[str]] = None
+    chunk: Optional[_Chunk] = None
+
+    if fmt == CSV:
+        yield (",".join(CSV_OUTPUT_COLUMNS) + "\n").encode("utf-8")
+
+    async for line_number, raw in iter_lines(chunks, max_line_bytes):
+        if fmt == CSV and header is None:
+            if raw is None:
+                continue
+            header = [
+                name.strip()
+                for name in next(csv.reader([raw.decode("utf-8", errors="replace")]))
+            ]
+            continue
+
+        if chunk is None:
+            chunk = _Chunk(fmt, header)
+        chunk.lines.append((line_number, raw))
+
+        if len(chunk) >= chunk_size:
+            yield await run_in_threadpool(chunk.render)
+            chunk = None
+
+    if chunk is not None:
+        yield await run_in_threadpool(chunk.render)
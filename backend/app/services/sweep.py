@@ -0,0 +1,156 @@
+"""
+Перебор сценариев по сетке параметров.
+
+Декартово произведение осей не разворачивается в список строк:
+нормы и коэффициенты применяются к каждой оси отдельно, а сетка
+получается broadcasting-ом NumPy. Порядок операций совпадает
+с CalculatorService.calculate, поэтому значения идентичны.
+"""
+from typing import Dict, Iterator, List
+
+import numpy as np
+import orjson
+
+from app.schemas.sweep import CountAxis, SweepRange, SweepRequest
+from app.services.calculator import (
+    CATEGORIES,
+    WATER_NORMS,
+    SEASON_COEFFICIENTS,
+    ACTIVITY_COEFFICIENTS,
+    round2
+)
+
+# Порядок осей в ответе
+AXES = ("junior_count", "middle_count", "senior_count", "staff_count", "season", "activity")
+
+
+class SweepTooLarge(ValueError):
+    """Сетка превышает допустимый размер."""
+
+    def __init__(self, size: int, limit: int):
+        super().__init__(f"Сетка из {size} точек превышает лимит {limit}")
+        self.size = size
+        self.limit = limit
+
+
+def _axis_length(axis: CountAxis) -> int:
+    if isinstance(axis, SweepRange):
+        return (axis.end - axis.start) // axis.step + 1
+    return len(axis)
+
+
+def _axis_values(axis: CountAxis) -> np.ndarray:
+    if isinstance(axis, SweepRange):
+        return np.arange(axis.start, axis.end + 1, axis.step, dtype=np.int64)
+    return np.asarray(axis, dtype=np.int64)
+
+
+class SweepGrid:
+    """
+    Сетка сценариев, заданная осями.
+
+    Размер считается по длинам осей до того, как что-либо
+    материализуется, поэтому лимит проверяется бесплатно.
+    """
+
+    def __init__(self, request: SweepRequest):
+        self.request = request
+        self.shape = tuple(
+            _axis_length(getattr(request, name)) for name in AXES[:4]
+        ) + (len(request.season), len(request.activity))
+        self.size = int(np.prod(self.shape, dtype=object))
+
+    def check_limit(self, limit: int) -> None:
+        """Проверяет, что сетка не превышает лимит."""
+        if self.size > limit:
+            raise SweepTooLarge(self.size, limit)
+
+    def axes(self) -> Dict[str, list]:
+        """Значения по осям в порядке AXES."""
+        values = {
+            name: _axis_values(getattr(self.request, name)).tolist()
+            for name in AXES[:4]
+        }
+        values["season"] = [season.value for season in self.request.season]
+        values["activity"] = [activity.value for activity in self.request.activity]
+        return values
+
+    def _base_total(self, junior: np.ndarray) -> np.ndarray:
+        """Базовое потребление для среза по оси junior, форма (j, M, S, T)."""
+        subtotals = [
+            _axis_values(getattr(self.request, name)) * WATER_NORMS[category]
+            for name, category in zip(AXES[1:4], CATEGORIES[1:])
+        ]
+        junior_subtotal = junior * WATER_NORMS["junior"]
+        return (
+            junior_subtotal[:, None, None, None]
+            + subtotals[0][None, :, None, None]
+            + subtotals[1][None, None, :, None]
+            + subtotals[2][None, None, None, :]
+        )
+
+    def _coefficients(self):
+        ks = np.array([SEASON_COEFFICIENTS[s.value] for s in self.request.season])
+        ka = np.array([ACTIVITY_COEFFICIENTS[a.value] for a in self.request.activity])
+        return ks, ka
+
+    def total_water(self, junior: np.ndarray) -> np.ndarray:
+        """Итоговое потребление для среза по оси junior, форма (j, ...остальные оси)."""
+        base = self._base_total(junior)
+        ks, ka = self._coefficients()
+        return round2(base[..., None, None] * ks[:, None] * ka[None, :])
+
+    def iter_total_water(self, chunk_points: int) -> Iterator[np.ndarray]:
+        """
+        Лениво считает сетку срезами по первой оси.
+
+        Каждый срез содержит не больше chunk_points точек (но не меньше
+        одного значения junior_count) и возвращается плоским массивом.
+        """
+        junior = _axis_values(self.request.junior_count)
+        per_junior = max(1, self.size // max(1, len(junior)))
+        step = max(1, chunk_points // per_junior)
+        for start in range(0, len(junior), step):
+            yield self.total_water(junior[start:start + step]).ravel()
+
+
+class SweepService:
+    """Сервис перебора сценариев."""
+
+    @staticmethod
+    def columnar(grid: SweepGrid) -> dict:
+        """Вся сетка в столбцовом виде (total_water - массив NumPy)."""
+        junior = _axis_values(grid.request.junior_count)
+        return {
+            "axes": grid.axes(),
+            "shape": list(grid.shape),
+            "size": grid.size,
+            "total_water": grid.total_water(junior).ravel(),
+        }
+
+    @staticmethod
+    def iter_ndjson(grid: SweepGrid, chunk_points: int) -> Iterator[bytes]:
+        """
+        Поток NDJSON: одна строка на точку сетки с параметрами и результатом.
+
+        Параметры точки восстанавливаются из плоского индекса,
+        в памяти находится не больше одного среза.
+        """
+        axes = grid.axes()
+        axis_values: List[list] = [axes[name] for name in AXES]
+        offset = 0
+        for totals in grid.iter_total_water(chunk_points):
+            indices = np.unravel_index(
+                np.arange(offset, offset + len(totals)),
+                grid.shape
+            )
+            columns = [
+                np.asarray(values, dtype=object)[index].tolist()
+                for values, index in zip(axis_values, indices)
+            ]
+            lines = [
+                orjson.dumps(dict(zip(AXES, params), total_water=total))
+                for *params, total in zip(*columns, totals.tolist())
+            ]
+            yield b"\n".join(lines) + b"\n"
+            offset += len(totals)
@@ -0,0 +1,230 @@
+"""
+Водяные знаки истории расчётов (history_watermarks).
+
+Каждая вставка расчётов пользователя прибавляет их число к row_count
+и change_seq и сдвигает updated_at одним UPSERT в той же транзакции,
+удаление уменьшает row_count и тоже сдвигает change_seq. Номера
+change_seq выдаются вставленным строкам и надгробиям удалённых:
+строка водяного знака блокируется до конца транзакции, поэтому номера
+одного пользователя фиксируются по возрастанию.
+
+change_seq меняется при любой записи в историю, поэтому служит
+валидатором HTTP (ETag), версией ключей кэша страниц и курсором ленты
+изменений: неизменная история проверяется одним чтением по первичному ключу.
+"""
+from collections import Counter
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.history_watermark import HistoryWatermark
+
+_DIALECT_INSERT = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+class Watermark(NamedTuple):
+    """Состояние истории пользователя; updated_at = None - истории нет."""
+
+    user_id: int
+    row_count: int = 0
+    updated_at: Optional[datetime] = None
+    change_seq: int = 0
+
+    @property
+    def version(self) -> str:
+        """
+        Версия истории для ETag и ключей кэша.
+
+        Время последней записи отличает версии с тем же change_seq
+        после пересоздания БД или пользователя с тем же id.
+        """
+        stamp = int(self.updated_at.timestamp() * 1_000_000) if self.updated_at else 0
+        return f"{self.user_id}-{self.change_seq}-{stamp}"
+
+    @property
+    def deletions(self) -> int:
+        """
+        Число удалённых расчётов.
+
+        Вставка прибавляет единицу к row_count и change_seq, удаление
+        вычитает из row_count и прибавляет к change_seq.
+        """
+        return (self.change_seq - self.row_count) // 2
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.version}"'
+
+    @property
+    def last_modified(self) -> Optional[str]:
+        """Значение Last-Modified (updated_at хранится в UTC)."""
+        if self.updated_at is None:
+            return None
+        return format_datetime(
+            self.updated_at.replace(microsecond=0, tzinfo=timezone.utc),
+            usegmt=True
+        )
+
+
+class WatermarkService:
+    """Сервис водяных знаков истории."""
+
+    @staticmethod
+    def upsert_statement(dialect_name: str, rows: Iterable[dict]):
+        """
+        UPSERT приращений водяных знаков для диалекта БД.
+
+        Возвращает (user_id, change_seq) после приращения. Анонимные
+        расчёты не учитываются; если прибавлять нечего, возвращает None.
+        """
+        counts = Counter(row["user_id"] for row in rows if row["user_id"] is not None)
+        if not counts:
+            return None
+        now = datetime.utcnow()
+        statement = _DIALECT_INSERT[dialect_name](HistoryWatermark).values([
+            {"user_id": user_id, "row_count": count, "change_seq": count, "updated_at": now}
+            for user_id, count in counts.items()
+        ])
+        table = HistoryWatermark.__table__
+        return statement.on_conflict_do_update(
+            index_elements=[table.c.user_id],
+            set_={
+                "row_count": table.c.row_count + statement.excluded.row_count,
+                "change_seq": table.c.change_seq + statement.excluded.change_seq,
+                "updated_at": statement.excluded.updated_at
+            }
+        ).returning(table.c.user_id, table.c.change_seq)
+
+    @staticmethod
+    def assign(rows: List[dict], allocated: Iterable) -> None:
+        """
+        Раздаёт строкам номера change_seq в порядке их следования.
+
+        allocated - пары (user_id, последний выданный номер) из UPSERT.
+        """
+        counts = Counter(row["user_id"] for row in rows)
+        next_seq = {user_id: last - counts[user_id] + 1 for user_id, last in allocated}
+        for row in rows:
+            if row["user_id"] is not None:
+                row["change_seq"] = next_seq[row["user_id"]]
+                next_seq[row["user_id"]] += 1
+
+    @staticmethod
+    def apply(db: Session, rows: List[dict]) -> None:
+        """
+        Сдвигает водяные знаки и записывает в rows их change_seq.
+
+        Вызывается до вставки строк; commit остаётся за вызывающим.
+        """
+        statement = WatermarkService.upsert_statement(db.get_bind().dialect.name, rows)
+        if statement is not None:
+            WatermarkService.assign(rows, db.execute(statement).all())
+
+    @staticmethod
+    async def apply_async(db: AsyncSession, rows: List[dict]) -> None:
+        """Async-версия apply."""
+        statement = WatermarkService.upsert_statement(db.get_bind().dialect.name, rows)
+        if statement is not None:
+            WatermarkService.assign(rows, (await db.execute(statement)).all())
+
+    @staticmethod
+    def remove_statement(user_id: int, count: int):
+        """Сдвиг водяного знака на count удалений; возвращает последний номер."""
+        return (
+            update(HistoryWatermark)
+            .where(HistoryWatermark.user_id == user_id)
+            .values(
+                row_count=HistoryWatermark.row_count - count,
+                change_seq=HistoryWatermark.change_seq + count,
+                updated_at=datetime.utcnow()
+            )
+            .returning(HistoryWatermark.change_seq)
+        )
+
+    @staticmethod
+    def remove(db: Session, user_id: int, count: int = 1) -> int:
+        """Учитывает удаление count расчётов; commit остаётся за вызывающим."""
+        return db.execute(WatermarkService.remove_statement(user_id, count)).scalar_one()
+
+    @staticmethod
+    async def remove_async(db: AsyncSession, user_id: int, count: int = 1) -> int:
+        """Async-версия remove."""
+        return (await db.execute(WatermarkService.remove_statement(user_id, count))).scalar_one()
+
+    @staticmethod
+    def lock_statement(user_ids):
+        """
+        Блокировка строк водяных знаков до конца транзакции (FOR UPDATE).
+
+        Запись в историю сначала берёт строку водяного знака и только
+        потом трогает calculations; архивирование партиции держится
+        того же порядка, чтобы не попасть во взаимную блокировку.
+        """
+        return (
+            select(HistoryWatermark.user_id)
+            .where(HistoryWatermark.user_id.in_(user_ids))
+            .order_by(HistoryWatermark.user_id)
+            .with_for_update()
+        )
+
+    @staticmethod
+    def lock(db: Session, user_id: int) -> None:
+        """Блокирует строку водяного знака пользователя до конца транзакции."""
+        db.execute(WatermarkService.lock_statement([user_id]))
+
+    @staticmethod
+    async def lock_async(db: AsyncSession, user_id: int) -> None:
+        """Async-версия lock."""
+        await db.execute(WatermarkService.lock_statement([user_id]))
+
+    @staticmethod
+    def query(user_id: int):
+        """Чтение водяного знака по первичному ключу."""
+        return select(
+            HistoryWatermark.row_count,
+            HistoryWatermark.updated_at,
+            HistoryWatermark.change_seq
+        ).where(HistoryWatermark.user_id == user_id)
+
+    @staticmethod
+    def get(db: Session, user_id: int) -> Watermark:
+        """Водяной знак истории пользователя."""
+        row = db.execute(WatermarkService.query(user_id)).first()
+        return Watermark(user_id, *row) if row else Watermark(user_id)
+
+    @staticmethod
+    async def get_async(db: AsyncSession, user_id: int) -> Watermark:
+        """Async-версия get."""
+        row = (await db.execute(WatermarkService.query(user_id))).first()
+        return Watermark(user_id, *row) if row else Watermark(user_id)
+
+    @staticmethod
+    def not_modified(
+        watermark: Watermark,
+        if_none_match: Optional[str],
+        if_modified_since: Optional[str] = None
+    ) -> bool:
+        """
+        Проверка условного запроса по водяному знаку.
+
+        If-None-Match сравнивается слабо (префикс W/ игнорируется)
+        и, если передан, имеет приоритет над If-Modified-Since.
+        """
+        if if_none_match is not None:
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            return "*" in tags or watermark.etag in tags
+        if if_modified_since is None or watermark.updated_at is None:
+            return False
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return watermark.updated_at.replace(microsecond=0) <= since.replace(tzinfo=None)
@@ -0,0 +1,302 @@
+"""
+Отложенная запись расчётов в БД (write-behind).
+
+Сохранения ставятся в ограниченную очередь процесса, а фоновый поток
+пишет их пачками одним многострочным INSERT. Это заменяет commit
+на каждый запрос одним commit на пачку. При заполнении очереди
+действует политика переполнения, при остановке приложения очередь
+гарантированно выгружается.
+
+Неудачная пачка повторяется, а затем делится пополам, пока ошибка
+не локализуется в отдельных строках: битая строка (например, с
+user_id удалённого пользователя) теряет только себя.
+"""
+import logging
+import queue
+import threading
+import time
+from typing import Callable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.services.calculator import CalculatorService
+
+logger = logging.getLogger(__name__)
+
+# Политики при заполненной очереди
+OVERFLOW_BLOCK = "block"    # ждать места не дольше block_timeout, затем ошибка
+OVERFLOW_SYNC = "sync"      # записать строку сразу, в потоке запроса
+OVERFLOW_REJECT = "reject"  # сразу вернуть ошибку
+
+# Попыток записать пачку целиком, прежде чем делить её
+FLUSH_ATTEMPTS = 2
+
+
+class WriteBehindFull(Exception):
+    """Очередь заполнена, а политика не позволяет записать строку."""
+
+
+class WriteBehindQueue:
+    """
+    Ограниченная очередь строк calculations с фоновым сбросом пачками.
+
+    Пачка сбрасывается, когда набралось batch_size строк или прошло
+    flush_interval секунд с момента появления первой строки.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        batch_size: int = 500,
+        flush_interval: float = 0.5,
+        maxsize: int = 10_000,
+        overflow: str = OVERFLOW_SYNC,
+        block_timeout: float = 1.0
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        # Делает проверку _stopping и постановку в очередь атомарными
+        # относительно stop()
+        self._accepting = threading.Lock()
+        self.enqueued = 0
+        self.flushed = 0
+        self.batches = 0
+        self.sync_writes = 0
+        self.rejected = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        """Запускает фоновый поток сброса."""
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._run,
+            name="write-behind",
+            daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Останавливает поток, предварительно выгрузив всю очередь.
+
+        Новые строки после вызова не принимаются в очередь,
+        а пишутся синхронно.
+        """
+        with self._accepting:
+            self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        # Строки, поставленные во время остановки
+        self._drain()
+
+    def submit(self, row: dict) -> None:
+        """
+        Ставит строку calculations в очередь на запись.
+
+        Поднимает WriteBehindFull, если очередь заполнена
+        и политика переполнения не позволяет записать строку.
+        Синхронная запись поднимает исключение БД, если строку
+        записать не удалось.
+        """
+        with self._accepting:
+            accepting = not self._stopping.is_set() and self._thread is not None
+            if accepting:
+                try:
+                    self._queue.put_nowait(row)
+                except queue.Full:
+                    pass
+                else:
+                    with self._lock:
+                        self.enqueued += 1
+                    return
+        if not accepting:
+            self._write_sync(row)
+            return
+        self._overflow(row)
+
+    def _overflow(self, row: dict) -> None:
+        if self.overflow == OVERFLOW_SYNC:
+            self._write_sync(row)
+            return
+        if self.overflow == OVERFLOW_BLOCK:
+            try:
+                self._queue.put(row, timeout=self.block_timeout)
+            except queue.Full:
+                pass
+            else:
+                with self._lock:
+                    self.enqueued += 1
+                # Ожидание шло без _accepting: если за это время началась
+                # остановка, её последняя выгрузка могла пройти раньше
+                if self._stopping.is_set():
+                    self._drain()
+                return
+        with self._lock:
+            self.rejected += 1
+        raise WriteBehindFull("Очередь записи расчётов заполнена")
+
+    def _write_sync(self, row: dict) -> None:
+        """Пишет строку в потоке запроса; ошибку записи поднимает наверх."""
+        try:
+            self._write([row])
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        with self._lock:
+            self.sync_writes += 1
+
+    def _take_batch(self) -> List[dict]:
+        """Ждёт первую строку и добирает пачку в пределах flush_interval."""
+        try:
+            first = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(
+                    self._queue.get(timeout=remaining) if remaining > 0
+                    else self._queue.get_nowait()
+                )
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            batch = self._take_batch()
+            if batch:
+                self._flush(batch)
+        self._drain()
+
+    def _drain(self) -> None:
+        """Выгружает всё, что осталось в очереди, пачками."""
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            self._flush(batch)
+
+    def _insert(self, rows: List[dict]) -> None:
+        """Пишет строки одним INSERT в отдельной транзакции."""
+        db = self.session_factory()
+        try:
+            CalculatorService.insert_calculations(db, rows)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _write(self, rows: List[dict]) -> None:
+        """Пишет строки, повторяя до FLUSH_ATTEMPTS раз; последнюю ошибку поднимает."""
+        for attempt in range(FLUSH_ATTEMPTS):
+            try:
+                self._insert(rows)
+            except Exception:
+                if attempt == FLUSH_ATTEMPTS - 1:
+                    raise
+                logger.warning("Повтор записи %s расчётов", len(rows), exc_info=True)
+                continue
+            self._written(rows)
+            return
+
+    def _flush(self, rows: List[dict]) -> None:
+        """Пишет пачку; если она не записалась и повторно, делит её пополам."""
+        try:
+            self._write(rows)
+        except Exception:
+            if len(rows) == 1:
+                self._lost(rows[0])
+                return
+            logger.warning("Пачка из %s расчётов не записалась, делим её", len(rows))
+            middle = len(rows) // 2
+            self._bisect(rows[:middle])
+            self._bisect(rows[middle:])
+
+    def _bisect(self, rows: List[dict]) -> None:
+        """Пишет часть пачки без повторов, деля дальше до отдельных строк."""
+        try:
+            self._insert(rows)
+        except Exception:
+            if len(rows) == 1:
+                self._lost(rows[0])
+                return
+            middle = len(rows) // 2
+            self._bisect(rows[:middle])
+            self._bisect(rows[middle:])
+            return
+        self._written(rows)
+
+    def _written(self, rows: List[dict]) -> None:
+        with self._lock:
+            self.flushed += len(rows)
+            self.batches += 1
+
+    def _lost(self, row: dict) -> None:
+        with self._lock:
+            self.failed += 1
+        logger.exception("Не удалось записать расчёт пользователя %s", row.get("user_id"))
+
+    def stats(self) -> dict:
+        """Счётчики очереди для мониторинга."""
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "maxsize": self._queue.maxsize,
+                "enqueued": self.enqueued,
+                "flushed": self.flushed,
+                "batches": self.batches,
+                "sync_writes": self.sync_writes,
+                "rejected": self.rejected,
+                "failed": self.failed,
+            }
+
+
+_write_behind: Optional[WriteBehindQueue] = None
+
+
+def get_write_behind() -> Optional[WriteBehindQueue]:
+    """Очередь отложенной записи, если она запущена."""
+    return _write_behind
+
+
+def start_write_behind(session_factory: Callable[[], Session]) -> WriteBehindQueue:
+    """Создаёт и запускает очередь по настройкам приложения."""
+    global _write_behind
+    settings = get_settings()
+    _write_behind = WriteBehindQueue(
+        session_factory,
+        batch_size=settings.write_behind_batch_size,
+        flush_interval=settings.write_behind_flush_interval,
+        maxsize=settings.write_behind_queue_size,
+        overflow=settings.write_behind_overflow,
+        block_timeout=settings.write_behind_block_timeout
+    )
+    _write_behind.start()
+    return _write_behind
+
+
+def stop_write_behind() -> None:
+    """Выгружает очередь и останавливает фоновый поток."""
+    global _write_behind
+    if _write_behind is not None:
+        _write_behind.stop()
+        _write_behind = None
@@ -0,0 +1,111 @@
+"""
+Быстрый старт воркера: проверка схемы и прогрев.
+
+В режиме fast_startup вместо create_all сверяется ревизия Alembic
+в БД с head миграций (один SELECT). Прогрев открывает соединения
+пула и загружает то, что иначе загрузилось бы на первом запросе:
+jose, passlib/bcrypt, валидаторы pydantic и векторный расчёт numpy.
+До окончания прогрева /ready отвечает 503.
+"""
+import logging
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+WARMUP_REQUEST = {
+    "junior_count": 10,
+    "middle_count": 5,
+    "senior_count": 3,
+    "staff_count": 2,
+    "season": "warm",
+    "activity": "sport"
+}
+
+
+class SchemaRevisionError(RuntimeError):
+    """Ревизия схемы в БД не совпадает с head миграций."""
+
+
+def head_revisions() -> List[str]:
+    """Head-ревизии миграций из каталога alembic."""
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+
+    config = Config(str(BACKEND_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(BACKEND_DIR / "alembic"))
+    return sorted(ScriptDirectory.from_config(config).get_heads())
+
+
+def current_revisions(engine: Engine) -> List[str]:
+    """Ревизии, записанные в alembic_version (пусто - миграции не применялись)."""
+    from alembic.runtime.migration import MigrationContext
+
+    with engine.connect() as connection:
+        return sorted(MigrationContext.configure(connection).get_current_heads())
+
+
+def check_schema_revision(engine: Engine, heads: Optional[List[str]] = None) -> None:
+    """
+    Проверяет, что миграции применены до head.
+
+    Воркер не создаёт и не меняет таблицы: при расхождении старт
+    прерывается, пока не выполнен alembic upgrade head.
+    """
+    heads = heads if heads is not None else head_revisions()
+    current = current_revisions(engine)
+    if current != heads:
+        raise SchemaRevisionError(
+            f"ревизия БД {current or 'отсутствует'}, ожидается {heads}: "
+            "выполните alembic upgrade head"
+        )
+
+
+def warm_pool(engine: Engine, connections: int) -> int:
+    """
+    Открывает connections соединений одновременно и возвращает их в пул.
+
+    Возвращает число прогретых соединений (для SQLite в памяти и
+    NullPool пул не держит соединения, прогрев ничего не даёт).
+    """
+    opened = []
+    try:
+        for _ in range(connections):
+            connection = engine.connect()
+            opened.append(connection)
+            connection.execute(text("SELECT 1"))
+    finally:
+        for connection in opened:
+            connection.close()
+    return len(opened)
+
+
+def warm_code() -> None:
+    """Загружает модули и валидаторы, которые иначе грузятся на первом запросе."""
+    from app.schemas.calculation import CalculationRequest
+    from app.security import decode_user_id
+    from app.services.auth import AuthService, get_pwd_context
+    from app.services.calculator import CalculatorService
+
+    decode_user_id(AuthService.create_access_token(0))
+    # Загрузка backend bcrypt без расчёта хеша
+    get_pwd_context().handler("bcrypt").get_backend()
+    request = CalculationRequest.model_validate(WARMUP_REQUEST)
+    CalculatorService.calculate(request).model_dump(mode="json")
+    CalculatorService.calculate_batch([request])
+
+
+def warmup(engine: Engine, connections: int) -> float:
+    """Полный прогрев; возвращает затраченное время в секундах."""
+    start = time.perf_counter()
+    warmed = warm_pool(engine, connections)
+    warm_code()
+    elapsed = time.perf_counter() - start
+    logger.info("Прогрев завершён за %.3f с (соединений: %s)", elapsed, warmed)
+    return elapsed
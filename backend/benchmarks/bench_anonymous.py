@@ -0,0 +1,151 @@
+"""
+Бенчмарк анонимного POST /api/v1/calculate.
+
+Сравниваются прежний маршрут (sync def с get_db и проверкой
+пользователя по БД, как в прежнем get_current_user_optional: пул
+потоков, сессия и её закрытие на каждый запрос) и текущий (async def, ленивая сессия).
+Для каждого печатаются req/s, задержки, число созданных сессий
+и выдач соединений из пула - для анонимного трафика у текущего
+маршрута оба счётчика должны быть нулевыми.
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_anonymous
+    python -m benchmarks.bench_anonymous --requests 20000 --concurrency 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+if __name__ == "__main__":
+    # Настройки читаются при импорте app, поэтому задаются до него
+    _args = sys.argv[1:]
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+import asyncio
+import statistics
+import time
+from typing import Optional
+
+import httpx
+from fastapi import APIRouter, Depends, FastAPI, Response
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.orm import Session
+
+from app import database
+from app.database import Base, engine, get_db
+from app.models.user import User
+from app.pool import PoolStats
+from app.routers import calculate_router
+from app.schemas.calculation import CalculationRequest
+from app.services.auth import AuthService, get_token_from_header
+from app.services.calculator import CalculatorService
+from app.services.revocation import get_revocation_list
+
+PAYLOADS = [
+    {
+        "junior_count": i,
+        "middle_count": 5,
+        "senior_count": 3,
+        "staff_count": 2,
+        "season": "warm",
+        "activity": "sport"
+    }
+    for i in range(100)
+]
+
+legacy_router = APIRouter()
+
+
+def legacy_user_optional(
+    token: Optional[str] = Depends(get_token_from_header),
+    db: Session = Depends(get_db)
+) -> Optional[User]:
+    """Пользователь по токену с запросом к БД (прежняя зависимость маршрута)."""
+    if not token:
+        return None
+    user_id = AuthService.decode_user_id(token)
+    if user_id is None or get_revocation_list().is_revoked(user_id):
+        return None
+    return AuthService.get_user_by_id(db, user_id)
+
+
+@legacy_router.post("/calculate")
+def calculate_legacy(
+    request: CalculationRequest,
+    db: Session = Depends(get_db),
+    current_user: Optional[User] = Depends(legacy_user_optional)
+):
+    """Анонимная ветка прежнего маршрута /calculate."""
+    return Response(content=CalculatorService.calculate_cached(request), media_type="application/json")
+
+
+def make_app(router: APIRouter) -> FastAPI:
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.include_router(router, prefix="/api/v1")
+    return app
+
+
+async def run_load(app: FastAPI, requests: int, concurrency: int) -> dict:
+    """Отправляет requests запросов не более чем по concurrency одновременно."""
+    sessions = []
+    session_local = database.SessionLocal
+
+    def counting_session():
+        sessions.append(1)
+        return session_local()
+
+    database.SessionLocal = counting_session
+    engine.pool.stats = PoolStats()
+    semaphore = asyncio.Semaphore(concurrency)
+    timings = []
+
+    try:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app),
+            base_url="http://bench"
+        ) as client:
+            async def one(i: int):
+                async with semaphore:
+                    start = time.perf_counter()
+                    response = await client.post("/api/v1/calculate", json=PAYLOADS[i % len(PAYLOADS)])
+                    timings.append((time.perf_counter() - start) * 1000)
+                    assert response.status_code == 200
+
+            start = time.perf_counter()
+            await asyncio.gather(*(one(i) for i in range(requests)))
+            elapsed = time.perf_counter() - start
+    finally:
+        database.SessionLocal = session_local
+
+    timings.sort()
+    return {
+        "rps": requests / elapsed,
+        "p50": statistics.median(timings),
+        "p99": timings[int(len(timings) * 0.99) - 1],
+        "sessions": len(sessions),
+        "checkouts": engine.pool.metrics()["checkout_wait_ms"]["count"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args(_args)
+
+    Base.metadata.create_all(bind=engine)
+    print(
+        f"{'route':>8} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} "
+        f"{'sessions':>9} {'checkouts':>10}"
+    )
+    for name, router in (("legacy", legacy_router), ("lazy", calculate_router)):
+        result = asyncio.run(run_load(make_app(router), args.requests, args.concurrency))
+        print(
+            f"{name:>8} {result['rps']:>8.0f} {result['p50']:>8.1f} {result['p99']:>8.1f} "
+            f"{result['sessions']:>9} {result['checkouts']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
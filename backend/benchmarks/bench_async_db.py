@@ -0,0 +1,173 @@
+"""
+Бенчмарк sync- и async-стека БД при высокой конкурентности.
+
+Одни и те же запросы GET /api/v1/history идут в два приложения:
+с sync-маршрутами (Session, пул потоков) и с async-маршрутами
+(AsyncSession). Запросы отправляются через httpx.AsyncClient
+в процессе, без сети между клиентом и приложением.
+
+По умолчанию используется файл SQLite (pysqlite / aiosqlite).
+Для PostgreSQL передайте --database-url (async-URL получается
+заменой драйвера на asyncpg).
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_async_db
+    python -m benchmarks.bench_async_db --requests 5000 --concurrency 500
+    python -m benchmarks.bench_async_db --database-url postgresql://u:p@localhost/bench
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, get_async_db, get_db, to_async_url
+from app.routers import aio, history_router
+from app.schemas.calculation import CalculationRequest
+from app.services.auth import AuthService
+from app.services.calculator import CalculatorService
+
+HISTORY_ROWS = 50
+
+
+REQUEST = CalculationRequest(
+    junior_count=10,
+    middle_count=5,
+    senior_count=3,
+    staff_count=2,
+    season="warm",
+    activity="sport"
+)
+
+
+def prepare_database(url: str) -> str:
+    """Создаёт таблицы, пользователя с историей и возвращает его токен."""
+    engine = create_engine(url)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    user = AuthService.create_user(db, "bench@example.com", "benchpass123")
+    CalculatorService.insert_calculations(
+        db,
+        [CalculatorService.calculation_row(REQUEST, 42.0, user.id) for _ in range(HISTORY_ROWS)]
+    )
+    token = AuthService.create_access_token(user.id)
+    db.close()
+    engine.dispose()
+    return token
+
+
+def sync_app(url: str, pool_size: int) -> FastAPI:
+    """
+    Приложение с sync-маршрутами истории.
+
+    Sync-запрос держит соединение между переходами в пул потоков
+    (get_db, get_current_principal, маршрут, закрытие сессии). Если пул
+    соединений меньше числа одновременных запросов, все потоки ждут
+    соединения, а освободить их может только закрытие сессии, которому
+    тоже нужен поток, и запросы висят до pool_timeout. Поэтому пул
+    sync-стека в бенчмарке не меньше конкурентности.
+    """
+    engine = create_engine(url, pool_size=pool_size, max_overflow=0)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.include_router(history_router, prefix="/api/v1")
+    app.dependency_overrides[get_db] = override_get_db
+    return app
+
+
+def async_app(url: str, pool_size: int) -> FastAPI:
+    """Приложение с async-маршрутами истории (ожидание пула не блокирует потоки)."""
+    async_url = to_async_url(url)
+    if async_url.startswith("sqlite"):
+        engine = create_async_engine(async_url)
+    else:
+        engine = create_async_engine(async_url, pool_size=pool_size, max_overflow=0)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with session_factory() as db:
+            yield db
+
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.include_router(aio.history_router, prefix="/api/v1")
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    return app
+
+
+async def run_load(app: FastAPI, token: str, requests: int, concurrency: int) -> dict:
+    """Отправляет requests запросов не более чем по concurrency одновременно."""
+    semaphore = asyncio.Semaphore(concurrency)
+    headers = {"X-Auth-Token": token}
+    timings = []
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app),
+        base_url="http://bench"
+    ) as client:
+        async def one():
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get("/api/v1/history", headers=headers)
+                timings.append((time.perf_counter() - start) * 1000)
+                assert response.status_code == 200
+
+        await one()  # прогрев пула соединений
+        timings.clear()
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - start
+
+    timings.sort()
+    return {
+        "rps": requests / elapsed,
+        "p50": statistics.median(timings),
+        "p99": timings[int(len(timings) * 0.99) - 1],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument(
+        "--async-pool-size", type=int, default=15,
+        help="пул async-стека (по умолчанию как в продакшене: 5 + 10)"
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        token = prepare_database(url)
+
+        print(f"{'stack':>6} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+        for name, app in (
+            ("sync", sync_app(url, args.concurrency)),
+            ("async", async_app(url, args.async_pool_size)),
+        ):
+            result = asyncio.run(run_load(app, token, args.requests, args.concurrency))
+            print(
+                f"{name:>6} {result['rps']:>8.0f} {result['p50']:>8.1f} "
+                f"{result['p99']:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
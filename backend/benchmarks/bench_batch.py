@@ -0,0 +1,90 @@
+"""
+Бенчмарк пакетного расчёта.
+
+Сравнивает пропускную способность (строк/с) скалярного
+CalculatorService.calculate, пакетного calculate_batch и
+векторного ядра calculate_columns вместе со сборкой словарей ответа.
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_batch
+    python -m benchmarks.bench_batch --sizes 1000 100000 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.schemas.calculation import CalculationRequest
+from app.services.calculator import (
+    CalculatorService,
+    CATEGORIES,
+    SEASONS,
+    ACTIVITIES
+)
+
+# Пути через CalculationRequest слишком медленные и тяжёлые по памяти
+# для больших объёмов, их меряем только до этого размера
+OBJECTS_LIMIT = 100_000
+
+
+def make_arrays(size: int, seed: int = 42):
+    """Генерирует случайные входные столбцы."""
+    rng = np.random.default_rng(seed)
+    counts = rng.integers(0, 1000, size=(size, len(CATEGORIES)))
+    season_index = rng.integers(0, len(SEASONS), size=size)
+    activity_index = rng.integers(0, len(ACTIVITIES), size=size)
+    return counts, season_index, activity_index
+
+
+def make_requests(counts, season_index, activity_index):
+    """Собирает CalculationRequest из столбцов."""
+    return [
+        CalculationRequest(
+            junior_count=row[0],
+            middle_count=row[1],
+            senior_count=row[2],
+            staff_count=row[3],
+            season=SEASONS[s],
+            activity=ACTIVITIES[a]
+        )
+        for row, s, a in zip(counts.tolist(), season_index.tolist(), activity_index.tolist())
+    ]
+
+
+def measure(func, size: int) -> float:
+    """Возвращает пропускную способность функции в строках в секунду."""
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    return size / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    header = ("rows", "scalar rows/s", "batch rows/s", "columns rows/s", "kernel rows/s")
+    print(f"{header[0]:>10}" + "".join(f" {title:>15}" for title in header[1:]))
+    for size in args.sizes:
+        arrays = make_arrays(size)
+
+        if size <= OBJECTS_LIMIT:
+            requests = make_requests(*arrays)
+            scalar = measure(lambda: [CalculatorService.calculate(r) for r in requests], size)
+            batch = measure(lambda: CalculatorService.calculate_batch(requests), size)
+            del requests
+            scalar_text, batch_text = f"{scalar:15,.0f}", f"{batch:15,.0f}"
+        else:
+            scalar_text = batch_text = f"{'-':>15}"
+        columns = measure(
+            lambda: CalculatorService.calculate_columns(*arrays).to_dicts(),
+            size
+        )
+        kernel = measure(lambda: CalculatorService.calculate_columns(*arrays), size)
+
+        print(f"{size:>10,} {scalar_text} {batch_text} {columns:15,.0f} {kernel:15,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Бенчмарк сохранения офлайн-расчётов в историю.
+
+Сравниваются прежний путь (POST /api/v1/calculate на каждый расчёт:
+свой запрос, своя транзакция и свой commit) и POST /api/v1/history/bulk
+(векторный пересчёт и один INSERT в одной транзакции), а также повтор
+той же выгрузки. Для каждого печатаются время, число SQL-запросов
+и commit.
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_bulk
+    python -m benchmarks.bench_bulk --items 1000
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+if __name__ == "__main__":
+    # Настройки читаются при импорте app, поэтому задаются до него
+    _args = sys.argv[1:]
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import event
+
+from app.database import Base, SessionLocal, engine
+from app.models.user import User
+from app.routers import calculate_router, history_router
+from app.services.auth import AuthService
+
+
+def payload(i: int) -> dict:
+    return {
+        "junior_count": i % 50,
+        "middle_count": 5,
+        "senior_count": 3,
+        "staff_count": 2,
+        "season": "warm" if i % 2 else "cold",
+        "activity": "sport"
+    }
+
+
+def make_user(email: str) -> dict:
+    """Создаёт пользователя и возвращает заголовки авторизации."""
+    db = SessionLocal()
+    user = User(email=email, password_hash="-")
+    db.add(user)
+    db.commit()
+    token = AuthService.create_access_token(user.id)
+    db.close()
+    return {"X-Auth-Token": token}
+
+
+async def measure(app: FastAPI, send) -> dict:
+    """Время, SQL-запросы и commit за вызов send(client)."""
+    counters = {"queries": 0, "commits": 0}
+
+    def on_query(*_):
+        counters["queries"] += 1
+
+    def on_commit(*_):
+        counters["commits"] += 1
+
+    event.listen(engine, "before_cursor_execute", on_query)
+    event.listen(engine, "commit", on_commit)
+    try:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app),
+            base_url="http://bench"
+        ) as client:
+            start = time.perf_counter()
+            await send(client)
+            counters["ms"] = (time.perf_counter() - start) * 1000
+    finally:
+        event.remove(engine, "before_cursor_execute", on_query)
+        event.remove(engine, "commit", on_commit)
+    return counters
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=500)
+    args = parser.parse_args(_args)
+
+    Base.metadata.create_all(bind=engine)
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.include_router(calculate_router, prefix="/api/v1")
+    app.include_router(history_router, prefix="/api/v1")
+
+    per_item_headers = make_user("per-item@example.com")
+    bulk_headers = make_user("bulk@example.com")
+    items = [{**payload(i), "client_id": f"offline-{i}"} for i in range(args.items)]
+
+    async def per_item(client):
+        for i in range(args.items):
+            response = await client.post("/api/v1/calculate", json=payload(i), headers=per_item_headers)
+            assert response.status_code == 200
+
+    async def bulk(client):
+        response = await client.post("/api/v1/history/bulk", json={"items": items}, headers=bulk_headers)
+        assert response.status_code == 200
+
+    print(f"{args.items} расчётов")
+    print(f"{'path':>9} {'ms':>9} {'ms/item':>8} {'queries':>8} {'commits':>8}")
+    for name, send in (("per-item", per_item), ("bulk", bulk), ("retry", bulk)):
+        result = asyncio.run(measure(app, send))
+        print(
+            f"{name:>9} {result['ms']:>9.1f} {result['ms'] / args.items:>8.3f} "
+            f"{result['queries']:>8} {result['commits']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
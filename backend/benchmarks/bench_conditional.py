@@ -0,0 +1,156 @@
+"""
+Бенчмарк повторного чтения неизменной истории GET /api/v1/history.
+
+Режимы для пользователя с --rows расчётами:
+    full   - кэш страниц очищается перед каждым запросом
+             (водяной знак, страница из calculations, сериализация;
+             параллельные запросы частично попадают в кэш друг друга);
+    cached - страница из кэша по версии водяного знака;
+    304    - клиент присылает If-None-Match, ответ без тела.
+Для каждого печатаются req/s, задержки и число SQL-запросов
+на один запрос (включая проверку токена).
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_conditional
+    python -m benchmarks.bench_conditional --rows 200000 --limit 100
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+if __name__ == "__main__":
+    # Настройки читаются при импорте app, поэтому задаются до него
+    _args = sys.argv[1:]
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+import asyncio
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import event
+
+from app.database import Base, SessionLocal, engine
+from app.models.user import User
+from app.routers import history_router
+from app.schemas.calculation import CalculationRequest
+from app.services.auth import AuthService
+from app.services.cache import get_history_cache
+from app.services.calculator import CalculatorService
+
+INSERT_CHUNK = 10_000
+
+REQUEST = CalculationRequest(
+    junior_count=10,
+    middle_count=5,
+    senior_count=3,
+    staff_count=2,
+    season="warm",
+    activity="sport"
+)
+
+
+def prepare(rows: int) -> int:
+    """Создаёт пользователя с rows расчётами и возвращает его id."""
+    db = SessionLocal()
+    user = User(email="bench@example.com", password_hash="-")
+    db.add(user)
+    db.commit()
+    start = datetime(2025, 1, 1)
+    for offset in range(0, rows, INSERT_CHUNK):
+        chunk = []
+        for i in range(offset, min(offset + INSERT_CHUNK, rows)):
+            row = CalculatorService.calculation_row(REQUEST, float(i), user.id)
+            row["created_at"] = start + timedelta(seconds=i)
+            chunk.append(row)
+        CalculatorService.insert_calculations(db, chunk)
+    user_id = user.id
+    db.close()
+    return user_id
+
+
+async def run_load(app: FastAPI, headers: dict, mode: str, args) -> dict:
+    """Отправляет args.requests запросов не более чем по args.concurrency одновременно."""
+    statements = []
+
+    def count_statement(*_):
+        statements.append(1)
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    timings = []
+    expected = 304 if mode == "304" else 200
+    event.listen(engine, "before_cursor_execute", count_statement)
+    try:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app),
+            base_url="http://bench"
+        ) as client:
+            async def one():
+                async with semaphore:
+                    if mode == "full":
+                        get_history_cache().clear_local()
+                    start = time.perf_counter()
+                    response = await client.get(
+                        "/api/v1/history",
+                        params={"limit": args.limit},
+                        headers=headers
+                    )
+                    timings.append((time.perf_counter() - start) * 1000)
+                    assert response.status_code == expected, response.status_code
+
+            start = time.perf_counter()
+            await asyncio.gather(*(one() for _ in range(args.requests)))
+            elapsed = time.perf_counter() - start
+    finally:
+        event.remove(engine, "before_cursor_execute", count_statement)
+
+    timings.sort()
+    return {
+        "rps": args.requests / elapsed,
+        "p50": statistics.median(timings),
+        "p99": timings[int(len(timings) * 0.99) - 1],
+        "queries": len(statements) / args.requests,
+    }
+
+
+async def first_etag(app: FastAPI, headers: dict, limit: int) -> str:
+    """ETag первой страницы истории."""
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        response = await client.get("/api/v1/history", params={"limit": limit}, headers=headers)
+        return response.headers["etag"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args(_args)
+
+    Base.metadata.create_all(bind=engine)
+    user_id = prepare(args.rows)
+    headers = {"X-Auth-Token": AuthService.create_access_token(user_id)}
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.include_router(history_router, prefix="/api/v1")
+
+    etag = asyncio.run(first_etag(app, headers, args.limit))
+    print(f"{'mode':>7} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'SQL/req':>8}")
+    for mode, mode_headers in (
+        ("full", headers),
+        ("cached", headers),
+        ("304", {**headers, "If-None-Match": etag}),
+    ):
+        result = asyncio.run(run_load(app, mode_headers, mode, args))
+        print(
+            f"{mode:>7} {result['rps']:>8.0f} {result['p50']:>8.1f} "
+            f"{result['p99']:>8.1f} {result['queries']:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
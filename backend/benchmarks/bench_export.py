@@ -0,0 +1,124 @@
+"""
+Бенчмарк выгрузки истории (GET /history/export).
+
+Для каждого размера истории база SQLite готовится отдельно, а выгрузка
+прогоняется в отдельном процессе, чтобы пиковый RSS (ru_maxrss)
+относился только к ней. Выход потребляется и отбрасывается - как при
+передаче по сети.
+
+Выводятся время до первой порции данных, строк в секунду и пиковый RSS.
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_export
+    python -m benchmarks.bench_export --sizes 10000 1000000 --format ndjson
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.config import get_settings
+from app.database import Base
+from app.models.user import User
+from app.schemas.calculation import CalculationRequest
+from app.services.calculator import CalculatorService
+from app.services.export import ExportService
+
+INSERT_CHUNK = 20_000
+
+REQUEST = CalculationRequest(
+    junior_count=10,
+    middle_count=5,
+    senior_count=3,
+    staff_count=2,
+    season="warm",
+    activity="sport"
+)
+
+
+def prepare(path: str, rows: int) -> None:
+    """Создаёт базу с пользователем (id = 1) и rows его расчётами."""
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add(User(id=1, email="bench@example.com", password_hash="-"))
+    db.commit()
+    start = datetime(2025, 1, 1)
+    for offset in range(0, rows, INSERT_CHUNK):
+        chunk = []
+        for i in range(offset, min(offset + INSERT_CHUNK, rows)):
+            row = CalculatorService.calculation_row(REQUEST, float(i), 1)
+            row["created_at"] = start + timedelta(seconds=i)
+            chunk.append(row)
+        CalculatorService.insert_calculations(db, chunk)
+    db.close()
+    engine.dispose()
+
+
+def run(path: str, fmt: str) -> dict:
+    """Выгружает историю и возвращает метрики."""
+    engine = create_engine(f"sqlite:///{path}")
+    session_factory = sessionmaker(bind=engine)
+    output_bytes = 0
+    first_byte = None
+    start = time.perf_counter()
+    for part in ExportService.iter_export(
+        session_factory, 1, fmt, get_settings().export_batch_size
+    ):
+        # Заголовок CSV не считается: он отправляется до запроса к БД
+        if first_byte is None and len(part) > 0 and part != ExportService.header(fmt):
+            first_byte = time.perf_counter() - start
+        output_bytes += len(part)
+    elapsed = time.perf_counter() - start
+    return {
+        "first_batch_ms": (first_byte or elapsed) * 1000,
+        "seconds": elapsed,
+        "output_mb": output_bytes / 2**20,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--format", choices=["csv", "ndjson"], default="csv")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        print(json.dumps(run(args.worker, args.format)))
+        return
+
+    print(f"{'rows':>12} {'first ms':>9} {'rows/s':>10} {'output MB':>10} {'peak RSS MB':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.sizes:
+            path = os.path.join(tmp, f"bench_{rows}.db")
+            prepare(path, rows)
+            output = subprocess.run(
+                [
+                    sys.executable, "-m", "benchmarks.bench_export",
+                    "--worker", path, "--format", args.format
+                ],
+                check=True,
+                capture_output=True,
+                text=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(
+                f"{rows:>12,} {result['first_batch_ms']:>9.1f} "
+                f"{rows / result['seconds']:>10,.0f} {result['output_mb']:>10.1f} "
+                f"{result['peak_rss_mb']:>12.1f}"
+            )
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Бенчмарк входа под нагрузкой: bcrypt в общем пуле потоков и в пуле хеширования.
+
+Во время всплеска POST /api/v1/auth/login измеряется задержка
+sync-маршрута POST /api/v1/calculate/batch, которому нужны те же
+потоки AnyIO. Сравниваются прежний вход (sync def, bcrypt в потоке
+запроса) и текущий (пул хеширования с ограниченной очередью).
+Лимиты попыток в бенчмарке отключены.
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_hashing
+    python -m benchmarks.bench_hashing --logins 400 --concurrency 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+if __name__ == "__main__":
+    # Настройки читаются при импорте app, поэтому задаются до него
+    _args = sys.argv[1:]
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    os.environ["AUTH_RATE_IP_PER_MINUTE"] = "1e9"
+    os.environ["AUTH_RATE_IP_BURST"] = "1000000"
+    os.environ["AUTH_RATE_EMAIL_PER_MINUTE"] = "1e9"
+    os.environ["AUTH_RATE_EMAIL_BURST"] = "1000000"
+
+import asyncio
+import statistics
+import time
+
+import httpx
+from fastapi import APIRouter, Depends, FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.orm import Session
+
+from app.database import Base, SessionLocal, engine, get_db
+from app.routers import auth_router, calculate_router
+from app.schemas.user import Token
+from app.services.auth import AuthService
+from app.services.hashing import get_hashing_executor
+
+EMAIL = "bench@example.com"
+PASSWORD = "benchpass123"
+BATCH = {
+    "items": [
+        {
+            "junior_count": 10,
+            "middle_count": 5,
+            "senior_count": 3,
+            "staff_count": 2,
+            "season": "warm",
+            "activity": "sport"
+        }
+    ] * 10
+}
+
+legacy_router = APIRouter(prefix="/auth")
+
+
+@legacy_router.post("/login", response_model=Token)
+def login_legacy(
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: Session = Depends(get_db)
+):
+    """Прежний вход: bcrypt в потоке запроса из общего пула."""
+    user = AuthService.authenticate_user(db, form_data.username, form_data.password)
+    if not user:
+        raise HTTPException(status_code=401)
+    return Token(access_token=AuthService.create_access_token(user.id))
+
+
+def make_app(login_router: APIRouter) -> FastAPI:
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.include_router(login_router, prefix="/api/v1")
+    app.include_router(calculate_router, prefix="/api/v1")
+    return app
+
+
+async def run_load(app: FastAPI, logins: int, concurrency: int, probes: int) -> dict:
+    """Всплеск входов и параллельные замеры /calculate/batch."""
+    semaphore = asyncio.Semaphore(concurrency)
+    statuses = {}
+    probe_timings = []
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app, raise_app_exceptions=False),
+        base_url="http://bench",
+        timeout=None
+    ) as client:
+        async def one_login():
+            async with semaphore:
+                response = await client.post(
+                    "/api/v1/auth/login",
+                    data={"username": EMAIL, "password": PASSWORD}
+                )
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        async def probe():
+            for _ in range(probes):
+                start = time.perf_counter()
+                response = await client.post("/api/v1/calculate/batch", json=BATCH)
+                probe_timings.append((time.perf_counter() - start) * 1000)
+                assert response.status_code == 200
+                await asyncio.sleep(0.01)
+
+        start = time.perf_counter()
+        await asyncio.gather(probe(), *(one_login() for _ in range(logins)))
+        elapsed = time.perf_counter() - start
+
+    probe_timings.sort()
+    return {
+        "elapsed": elapsed,
+        "statuses": statuses,
+        "probe_p50": statistics.median(probe_timings),
+        "probe_max": probe_timings[-1],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--probes", type=int, default=50)
+    args = parser.parse_args(_args)
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    AuthService.create_user(db, EMAIL, PASSWORD)
+    db.close()
+
+    print(f"{'login':>8} {'time s':>7} {'batch p50 ms':>13} {'batch max ms':>13}  statuses")
+    for name, router in (("legacy", legacy_router), ("pool", auth_router)):
+        result = asyncio.run(run_load(make_app(router), args.logins, args.concurrency, args.probes))
+        print(
+            f"{name:>8} {result['elapsed']:>7.1f} {result['probe_p50']:>13.1f} "
+            f"{result['probe_max']:>13.1f}  {result['statuses']}"
+        )
+    stats = get_hashing_executor().stats()
+    print(
+        f"pool: workers {stats['workers']}, max_queue {stats['max_queue']}, "
+        f"rejected {stats['rejected']}, queue wait avg {stats['queue_wait_ms']['avg_ms']:.0f} ms, "
+        f"latency avg {stats['latency_ms']['avg_ms']:.0f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Бенчмарк чтения истории пользователя.
+
+Сравнивает прежний путь (все объекты Calculation через ORM, затем
+словари ответа) с проекцией Core (только колонки ответа, yield_per)
+для пользователя со 100 000 расчётов в файле SQLite.
+
+Для каждого пути выводятся время и пиковый объём памяти Python
+за чтение всей истории (по tracemalloc), отдельно для одной страницы
+из 50 элементов.
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_history_query
+    python -m benchmarks.bench_history_query --rows 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models.user import User
+from app.routers.history import _history_item
+from app.schemas.calculation import CalculationRequest
+from app.services.calculator import CalculatorService
+
+PAGE = 50
+INSERT_CHUNK = 10_000
+
+REQUEST = CalculationRequest(
+    junior_count=10,
+    middle_count=5,
+    senior_count=3,
+    staff_count=2,
+    season="warm",
+    activity="sport"
+)
+
+
+def prepare(session_factory, rows: int) -> int:
+    """Создаёт пользователя с rows расчётами и возвращает его id."""
+    db = session_factory()
+    user = User(email="bench@example.com", password_hash="-")
+    db.add(user)
+    db.commit()
+    start = datetime(2025, 1, 1)
+    for offset in range(0, rows, INSERT_CHUNK):
+        chunk = []
+        for i in range(offset, min(offset + INSERT_CHUNK, rows)):
+            row = CalculatorService.calculation_row(REQUEST, float(i), user.id)
+            row["created_at"] = start + timedelta(seconds=i)
+            chunk.append(row)
+        CalculatorService.insert_calculations(db, chunk)
+    user_id = user.id
+    db.close()
+    return user_id
+
+
+def orm_full(db, user_id):
+    """Прежний путь: объекты ORM для всей истории."""
+    return [_history_item(calc) for calc in CalculatorService.get_user_calculations(db, user_id)]
+
+
+def core_full(db, user_id):
+    """Проекция Core потоком через yield_per."""
+    return [_history_item(row) for row in CalculatorService.iter_user_history_rows(db, user_id)]
+
+
+def orm_page(db, user_id):
+    """Страница через объекты ORM."""
+    return [
+        _history_item(calc)
+        for calc in CalculatorService.get_user_calculations(db, user_id, PAGE)
+    ]
+
+
+def core_page(db, user_id):
+    """Страница через проекцию Core."""
+    return [
+        _history_item(row)
+        for row in CalculatorService.get_user_history_rows(db, user_id, PAGE)
+    ]
+
+
+def measure(session_factory, func, user_id, rounds: int) -> dict:
+    """Среднее время (мс) и пик памяти (МБ) одного чтения в новой сессии."""
+    timings = []
+    for _ in range(rounds):
+        db = session_factory()
+        start = time.perf_counter()
+        func(db, user_id)
+        timings.append((time.perf_counter() - start) * 1000)
+        db.close()
+
+    db = session_factory()
+    tracemalloc.start()
+    func(db, user_id)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    db.close()
+    return {"ms": sum(timings) / len(timings), "peak_mb": peak / 2 ** 20}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        user_id = prepare(session_factory, args.rows)
+
+        print(f"{'path':>10} {'ms':>10} {'peak MB':>10}")
+        for name, func, rounds in (
+            ("orm full", orm_full, 3),
+            ("core full", core_full, 3),
+            ("orm page", orm_page, 200),
+            ("core page", core_page, 200),
+        ):
+            result = measure(session_factory, func, user_id, rounds)
+            print(f"{name:>10} {result['ms']:>10.2f} {result['peak_mb']:>10.1f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
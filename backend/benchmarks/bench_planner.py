@@ -0,0 +1,79 @@
+"""
+Бенчмарк планировщика.
+
+Меряет время PlannerService.plan и сериализации ответа для
+разного числа школ на период в полгода с сегментами календаря
+и изменениями численности.
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_planner
+"""
+import random
+import time
+from datetime import date, timedelta
+
+import orjson
+
+from app.config import get_settings
+from app.schemas.planner import PlanRequest
+from app.services.planner import PlannerService
+
+START = date(2025, 9, 1)
+DAYS = 182
+
+
+def make_request(schools: int) -> PlanRequest:
+    """Полугодовой план: каникулы, смена сезона, спортивные дни и походы."""
+    rng = random.Random(schools)
+    return PlanRequest(
+        start=START,
+        end=START + timedelta(days=DAYS - 1),
+        season="warm",
+        skip_weekends=True,
+        segments=[
+            {"start": "2025-10-15", "end": "2026-02-28", "season": "cold"},
+            {"start": "2025-10-27", "end": "2025-11-04", "closed": True},
+            {"start": "2025-12-29", "end": "2026-01-11", "closed": True},
+        ],
+        schools=[
+            {
+                "name": f"Школа {i}",
+                "junior_count": rng.randint(50, 400),
+                "middle_count": rng.randint(50, 400),
+                "senior_count": rng.randint(20, 200),
+                "staff_count": rng.randint(10, 80),
+                "headcount_changes": [
+                    {"date": "2026-01-12", "junior_count": rng.randint(50, 400)}
+                ],
+                "segments": [
+                    {
+                        "start": (START + timedelta(days=day)).isoformat(),
+                        "end": (START + timedelta(days=day)).isoformat(),
+                        "activity": rng.choice(["sport", "trip"]),
+                    }
+                    for day in rng.sample(range(DAYS), 10)
+                ],
+            }
+            for i in range(schools)
+        ],
+    )
+
+
+def main() -> None:
+    max_cells = get_settings().plan_max_cells
+    print(f"{'schools':>8} {'school-days':>12} {'plan ms':>9} {'serialize ms':>13}")
+    for schools in (10, 100, 1000, 5000):
+        request = make_request(schools)
+        start = time.perf_counter()
+        result = PlannerService.plan(request, max_cells=max_cells)
+        planned = time.perf_counter()
+        orjson.dumps(result)
+        serialized = time.perf_counter()
+        print(
+            f"{schools:>8,} {schools * DAYS:>12,} {(planned - start) * 1000:>9.1f} "
+            f"{(serialized - planned) * 1000:>13.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Бенчмарк пула соединений при конкурентности выше его ёмкости.
+
+GET /api/v1/history идёт в приложение с настоящими get_db / get_read_db
+и маленьким пулом основной БД. Сравниваются два режима: со слотами
+запросов к БД (db_request_slots, лимитер в event loop) и без них -
+тогда потоки sync-маршрутов ждут соединения в пуле.
+
+Для каждого режима печатаются req/s, p99, число ошибок, таймауты
+пула и среднее/максимальное ожидание выдачи соединения
+(те же значения отдаёт /api/v1/metrics/pool).
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_pool
+    DB_POOL_SIZE=10 python -m benchmarks.bench_pool --requests 2000 --concurrency 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+if __name__ == "__main__":
+    # Настройки читаются при импорте app, поэтому задаются до него
+    _args = sys.argv[1:]
+    _tmp = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'bench.db')}"
+    os.environ.setdefault("DB_POOL_SIZE", "5")
+    os.environ.setdefault("DB_MAX_OVERFLOW", "0")
+    os.environ.setdefault("DB_POOL_TIMEOUT", "5")
+
+import asyncio
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+
+from app import database
+from app.database import Base, SessionLocal, engine
+from app.pool import PoolStats
+from app.routers import history_router
+from app.schemas.calculation import CalculationRequest
+from app.services.auth import AuthService
+from app.services.calculator import CalculatorService
+
+HISTORY_ROWS = 50
+
+REQUEST = CalculationRequest(
+    junior_count=10,
+    middle_count=5,
+    senior_count=3,
+    staff_count=2,
+    season="warm",
+    activity="sport"
+)
+
+
+def prepare_database() -> str:
+    """Создаёт таблицы, пользователя с историей и возвращает его токен."""
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    user = AuthService.create_user(db, "bench@example.com", "benchpass123")
+    CalculatorService.insert_calculations(
+        db,
+        [CalculatorService.calculation_row(REQUEST, 42.0, user.id) for _ in range(HISTORY_ROWS)]
+    )
+    token = AuthService.create_access_token(user.id)
+    db.close()
+    return token
+
+
+async def run_load(app: FastAPI, token: str, requests: int, concurrency: int, slots: bool) -> dict:
+    """Отправляет requests запросов не более чем по concurrency одновременно."""
+    database._request_slots = None
+    if slots:
+        database.init_request_slots()
+    engine.pool.stats = PoolStats()
+    semaphore = asyncio.Semaphore(concurrency)
+    headers = {"X-Auth-Token": token}
+    timings = []
+    errors = 0
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app, raise_app_exceptions=False),
+        base_url="http://bench",
+        timeout=None
+    ) as client:
+        async def one():
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get("/api/v1/history", headers=headers)
+                timings.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - start
+
+    timings.sort()
+    pool = engine.pool.metrics()
+    return {
+        "rps": requests / elapsed,
+        "p50": statistics.median(timings),
+        "p99": timings[int(len(timings) * 0.99) - 1],
+        "errors": errors,
+        "timeouts": pool["timeouts"],
+        "wait_avg": pool["checkout_wait_ms"]["avg_ms"],
+        "wait_max": pool["checkout_wait_ms"]["max_ms"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args(_args)
+
+    token = prepare_database()
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.include_router(history_router, prefix="/api/v1")
+
+    print(
+        f"pool {database.settings.db_pool_size}+{database.settings.db_max_overflow}, "
+        f"timeout {database.settings.db_pool_timeout}s, concurrency {args.concurrency}"
+    )
+    print(
+        f"{'slots':>6} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7} "
+        f"{'timeouts':>9} {'wait avg':>9} {'wait max':>9}"
+    )
+    for slots in (True, False):
+        result = asyncio.run(run_load(app, token, args.requests, args.concurrency, slots))
+        print(
+            f"{'on' if slots else 'off':>6} {result['rps']:>8.0f} {result['p50']:>8.1f} "
+            f"{result['p99']:>8.1f} {result['errors']:>7} {result['timeouts']:>9} "
+            f"{result['wait_avg']:>9.1f} {result['wait_max']:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
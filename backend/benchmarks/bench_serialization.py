@@ -0,0 +1,120 @@
+"""
+Бенчмарк сериализации истории расчётов.
+
+Сравнивает прежний путь (CalculationHistoryItem + CalculationParams
+на каждую строку, повторная валидация через response_model и
+стандартный JSON-энкодер FastAPI) с текущим (словари из строк БД
+и orjson) для истории из 1000 элементов.
+
+Для каждого пути выводятся p50/p99 задержки и пиковый объём памяти,
+выделенной за один запрос (по tracemalloc).
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_serialization
+"""
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import TypeAdapter
+
+from app.models.calculation import Calculation
+from app.routers.history import _history_item
+from app.schemas.calculation import CalculationHistoryItem, CalculationParams
+
+ITEMS = 1000
+ROUNDS = 200
+
+history_adapter = TypeAdapter(List[CalculationHistoryItem])
+
+
+def make_rows(count: int) -> List[Calculation]:
+    """Строки истории, как их возвращает ORM."""
+    now = datetime(2025, 1, 1)
+    return [
+        Calculation(
+            id=i,
+            user_id=1,
+            junior_count=i % 30,
+            middle_count=i % 25,
+            senior_count=i % 20,
+            staff_count=i % 5,
+            season=("cold", "warm")[i % 2],
+            activity=("normal", "sport", "trip")[i % 3],
+            total_water=float(i) * 1.37,
+            created_at=now - timedelta(minutes=i)
+        )
+        for i in range(count)
+    ]
+
+
+def legacy(rows) -> bytes:
+    """Прежний путь: модели на строку, затем валидация и JSONResponse."""
+    result = [
+        CalculationHistoryItem(
+            id=calc.id,
+            total_water=calc.total_water,
+            created_at=calc.created_at,
+            params=CalculationParams(
+                junior_count=calc.junior_count,
+                middle_count=calc.middle_count,
+                senior_count=calc.senior_count,
+                staff_count=calc.staff_count,
+                season=calc.season,
+                activity=calc.activity
+            )
+        )
+        for calc in rows
+    ]
+    # Так FastAPI обрабатывает возвращённое значение при response_model
+    dumped = [item.model_dump() for item in result]
+    validated = history_adapter.validate_python(dumped)
+    return JSONResponse(jsonable_encoder(history_adapter.dump_python(validated))).body
+
+
+def fast(rows) -> bytes:
+    """Текущий путь: словари из строк и orjson."""
+    return ORJSONResponse([_history_item(calc) for calc in rows]).body
+
+
+def measure(func, rows) -> dict:
+    """p50/p99 в миллисекундах и пик выделенной за запрос памяти."""
+    func(rows)
+    timings = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        func(rows)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    func(rows)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings.sort()
+    return {
+        "p50": statistics.median(timings),
+        "p99": timings[int(len(timings) * 0.99) - 1],
+        "peak_kb": peak / 1024,
+    }
+
+
+def main() -> None:
+    rows = make_rows(ITEMS)
+    assert len(legacy(rows)) > 0 and len(fast(rows)) > 0
+
+    print(f"{'path':>8} {'p50 ms':>8} {'p99 ms':>8} {'peak alloc KB':>14}")
+    for name, func in (("before", legacy), ("after", fast)):
+        result = measure(func, rows)
+        print(
+            f"{name:>8} {result['p50']:>8.2f} {result['p99']:>8.2f} "
+            f"{result['peak_kb']:>14.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Бенчмарк холодного старта воркера.
+
+Для каждого режима запускается uvicorn в отдельном процессе и
+измеряются:
+- import: время импорта app.main в чистом интерпретаторе;
+- health: от запуска процесса до первого 200 на /health;
+- ready: от запуска процесса до первого 200 на /ready;
+- first / second: задержка первого и второго запроса
+  GET /api/v1/history с токеном (JWT, пул, БД, сериализация).
+
+Режимы:
+- default: create_all при старте, без прогрева;
+- fast: FAST_STARTUP (проверка ревизии Alembic) и прогрев до /ready.
+
+По умолчанию используется файл SQLite, миграции применяются
+через alembic upgrade head. Для PostgreSQL передайте --database-url
+(миграции должны быть применены).
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --runs 5 --database-url postgresql://u:p@localhost/bench
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+MODES = {
+    "default": {"FAST_STARTUP": "false", "STARTUP_WARMUP": "false"},
+    "fast": {"FAST_STARTUP": "true", "STARTUP_WARMUP": "true"},
+}
+
+IMPORT_CODE = (
+    "import time; start = time.perf_counter(); import app.main; "
+    "print((time.perf_counter() - start) * 1000)"
+)
+
+PREPARE_CODE = """
+from app.database import SessionLocal
+from app.services.auth import AuthService
+db = SessionLocal()
+user = AuthService.get_user_by_email(db, "bench@example.com") or AuthService.create_user(
+    db, "bench@example.com", "benchpass123"
+)
+print(AuthService.create_access_token(user.id))
+"""
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def get(url: str, token: str | None = None) -> int:
+    """Код ответа GET (0 - соединение не установлено)."""
+    request = urllib.request.Request(url, headers={"X-Auth-Token": token} if token else {})
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as exc:
+        return exc.code
+    except OSError:
+        return 0
+
+
+def wait_for(url: str, start: float, timeout: float = 60.0) -> float:
+    """Опрашивает url до 200 и возвращает миллисекунды от start."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if get(url) == 200:
+            return (time.perf_counter() - start) * 1000
+        time.sleep(0.005)
+    raise TimeoutError(url)
+
+
+def timed_get(url: str, token: str) -> float:
+    start = time.perf_counter()
+    status = get(url, token)
+    assert status == 200, status
+    return (time.perf_counter() - start) * 1000
+
+
+def measure(env: dict, token: str) -> dict:
+    """Один холодный старт: импорт, /health, /ready, первые запросы."""
+    import_ms = float(subprocess.run(
+        [sys.executable, "-c", IMPORT_CODE],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout.strip())
+
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        health_ms = wait_for(f"{base}/health", start)
+        ready_ms = wait_for(f"{base}/ready", start)
+        first_ms = timed_get(f"{base}/api/v1/history", token)
+        second_ms = timed_get(f"{base}/api/v1/history", token)
+    finally:
+        server.terminate()
+        server.wait()
+    return {
+        "import": import_ms,
+        "health": health_ms,
+        "ready": ready_ms,
+        "first": first_ms,
+        "second": second_ms,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        env = {**os.environ, "DATABASE_URL": url, "PYTHONDONTWRITEBYTECODE": "1"}
+        if args.database_url is None:
+            subprocess.run(
+                [sys.executable, "-m", "alembic", "upgrade", "head"],
+                cwd=BACKEND_DIR, env=env, capture_output=True, check=True
+            )
+        token = subprocess.run(
+            [sys.executable, "-c", PREPARE_CODE],
+            cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+        ).stdout.strip()
+
+        columns = ("import", "health", "ready", "first", "second")
+        print(f"{'mode':>8} " + " ".join(f"{name + ' ms':>10}" for name in columns))
+        for mode, overrides in MODES.items():
+            runs = [measure({**env, **overrides}, token) for _ in range(args.runs)]
+            medians = {name: statistics.median(run[name] for run in runs) for name in columns}
+            print(f"{mode:>8} " + " ".join(f"{medians[name]:>10.1f}" for name in columns))
+
+
+if __name__ == "__main__":
+    main()
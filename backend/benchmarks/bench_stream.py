@@ -0,0 +1,96 @@
+"""
+Бенчмарк потокового расчёта NDJSON.
+
+Каждый размер входа прогоняется в отдельном процессе, чтобы пиковый
+RSS (ru_maxrss) не смешивался между запусками. Вход генерируется на лету,
+выход потребляется и отбрасывается - как при передаче по сети.
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_stream
+    python -m benchmarks.bench_stream --sizes 10000 10000000
+"""
+import argparse
+import asyncio
+import json
+import resource
+import subprocess
+import sys
+import time
+
+from app.config import get_settings
+from app.services.streaming import NDJSON, stream_calculations
+
+# Размер части тела запроса, как у типичного ASGI-сервера
+BODY_CHUNK_BYTES = 64 * 1024
+
+
+async def generate_body(rows: int):
+    """Генерирует NDJSON-тело частями по BODY_CHUNK_BYTES."""
+    seasons = ("cold", "warm")
+    activities = ("normal", "sport", "trip")
+    buffer = []
+    size = 0
+    for i in range(rows):
+        line = (
+            f'{{"junior_count":{i % 500},"middle_count":{i % 300},'
+            f'"senior_count":{i % 200},"staff_count":{i % 50},'
+            f'"season":"{seasons[i % 2]}","activity":"{activities[i % 3]}"}}\n'
+        )
+        buffer.append(line)
+        size += len(line)
+        if size >= BODY_CHUNK_BYTES:
+            yield "".join(buffer).encode()
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer).encode()
+
+
+async def run(rows: int) -> dict:
+    """Прогоняет один размер входа и возвращает метрики."""
+    settings = get_settings()
+    output_bytes = 0
+    start = time.perf_counter()
+    async for part in stream_calculations(
+        generate_body(rows),
+        NDJSON,
+        chunk_size=settings.stream_chunk_size,
+        max_line_bytes=settings.stream_max_line_bytes
+    ):
+        output_bytes += len(part)
+    elapsed = time.perf_counter() - start
+    return {
+        "rows": rows,
+        "seconds": elapsed,
+        "rows_per_second": rows / elapsed,
+        "output_mb": output_bytes / 2**20,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        print(json.dumps(asyncio.run(run(args.worker))))
+        return
+
+    print(f"{'rows':>12} {'rows/s':>10} {'output MB':>10} {'peak RSS MB':>12}")
+    for rows in args.sizes:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_stream", "--worker", str(rows)],
+            check=True,
+            capture_output=True,
+            text=True
+        ).stdout
+        result = json.loads(output)
+        print(
+            f"{result['rows']:>12,} {result['rows_per_second']:>10,.0f} "
+            f"{result['output_mb']:>10.1f} {result['peak_rss_mb']:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Бенчмарк перебора сценариев.
+
+Меряет время расчёта и сериализации столбцового ответа
+для сеток около 10^4, 10^5 и 10^6 точек.
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_sweep
+"""
+import time
+
+import orjson
+
+from app.schemas.sweep import SweepRequest
+from app.services.sweep import SweepGrid, SweepService
+
+GRIDS = {
+    "10^4": {"junior_count": {"start": 0, "end": 20}, "middle_count": {"start": 0, "end": 20},
+             "staff_count": {"start": 0, "end": 3}},
+    "10^5": {"junior_count": {"start": 0, "end": 99}, "middle_count": {"start": 0, "end": 19},
+             "staff_count": {"start": 0, "end": 7}},
+    "10^6": {"junior_count": {"start": 0, "end": 99}, "middle_count": {"start": 0, "end": 99},
+             "staff_count": {"start": 0, "end": 15}},
+}
+
+
+def main() -> None:
+    print(f"{'grid':>6} {'points':>10} {'compute ms':>11} {'serialize ms':>13} {'MB':>6}")
+    for name, payload in GRIDS.items():
+        grid = SweepGrid(SweepRequest(**payload))
+
+        start = time.perf_counter()
+        result = SweepService.columnar(grid)
+        computed = time.perf_counter()
+        body = orjson.dumps(result, option=orjson.OPT_SERIALIZE_NUMPY)
+        serialized = time.perf_counter()
+
+        print(
+            f"{name:>6} {grid.size:>10,} {(computed - start) * 1000:>11.1f} "
+            f"{(serialized - computed) * 1000:>13.1f} {len(body) / 2**20:>6.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
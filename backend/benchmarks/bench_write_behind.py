@@ -0,0 +1,95 @@
+"""
+Бенчмарк сохранения расчётов.
+
+Сравнивает сохранение по одной строке (save_calculation: add, commit,
+refresh на каждый запрос) с очередью write-behind, которая пишет
+пачками одним многострочным INSERT. Используется файл SQLite,
+чтобы каждый commit действительно доходил до диска.
+
+Выводит число сохранений в секунду и количество commit.
+
+Запуск из каталога backend:
+    python -m benchmarks.bench_write_behind
+    python -m benchmarks.bench_write_behind --rows 20000 --batch-size 1000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models.calculation import Calculation
+from app.schemas.calculation import CalculationRequest
+from app.services.calculator import CalculatorService
+from app.services.write_behind import WriteBehindQueue
+
+REQUEST = CalculationRequest(
+    junior_count=10,
+    middle_count=5,
+    senior_count=3,
+    staff_count=2,
+    season="warm",
+    activity="sport"
+)
+
+
+def make_session_factory(path: str):
+    """Фабрика сессий на чистом файле SQLite и счётчик commit."""
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    commits = [0]
+
+    @event.listens_for(engine, "commit")
+    def count_commit(conn):
+        commits[0] += 1
+
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine), commits
+
+
+def per_row(session_factory, rows: int) -> None:
+    """Прежний путь: commit на каждое сохранение."""
+    db = session_factory()
+    try:
+        for _ in range(rows):
+            CalculatorService.save_calculation(db, REQUEST, 42.0, None)
+    finally:
+        db.close()
+
+
+def write_behind(session_factory, rows: int, batch_size: int) -> None:
+    """Очередь write-behind, включая выгрузку при остановке."""
+    queue = WriteBehindQueue(session_factory, batch_size=batch_size, maxsize=rows)
+    queue.start()
+    for _ in range(rows):
+        queue.submit(CalculatorService.calculation_row(REQUEST, 42.0, None))
+    queue.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    cases = (
+        ("per-row", lambda factory: per_row(factory, args.rows)),
+        ("write-behind", lambda factory: write_behind(factory, args.rows, args.batch_size)),
+    )
+    print(f"{'path':>13} {'rows/s':>10} {'commits':>8}")
+    for name, func in cases:
+        with tempfile.TemporaryDirectory() as tmp:
+            factory, commits = make_session_factory(os.path.join(tmp, "bench.db"))
+            start = time.perf_counter()
+            func(factory)
+            elapsed = time.perf_counter() - start
+            db = factory()
+            assert db.query(Calculation).count() == args.rows
+            db.close()
+        print(f"{name:>13} {args.rows / elapsed:>10.0f} {commits[0]:>8}")
+
+
+if __name__ == "__main__":
+    main()
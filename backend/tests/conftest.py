@@ -4,8 +4,13 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
-from app.database import Base, get_db
+from app.config import get_settings
+from app.database import Base, get_db, get_read_db, get_session_factory
 from app.main import app
+from app.services.auth import get_principal_cache
+from app.services.cache import get_history_cache
+from app.services.hashing import get_auth_rate_limiter
+from app.services.revocation import get_revocation_list
 
 # Используем SQLite in-memory для тестов
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
@@ -19,6 +24,25 @@ engine = create_engine(
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+@pytest.fixture(autouse=True)
+def reset_auth_state():
+    """
+    Кэш principal, список отзыва и лимиты попыток входа
+    не переживают тест (id пользователей повторяются).
+    """
+    get_principal_cache().clear()
+    get_revocation_list().clear_local()
+    get_auth_rate_limiter().clear()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def reset_history_cache():
+    """Страницы истории не переживают тест: БД пересоздаётся, версии повторяются."""
+    get_history_cache().clear_local()
+    yield
+
+
 @pytest.fixture(scope="function")
 def db_session():
     """Создаёт чистую БД для каждого теста."""
@@ -41,6 +65,8 @@ def client(db_session):
             pass
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    app.dependency_overrides[get_session_factory] = lambda: TestingSessionLocal
     with TestClient(app) as test_client:
         yield test_client
     app.dependency_overrides.clear()
@@ -62,4 +88,12 @@ def auth_headers(client):
     )
     token = response.json()["access_token"]
 
-    return {"Authorization": f"Bearer {token}"}
+    # API читает токен из X-Auth-Token (см. get_token_from_header)
+    return {"X-Auth-Token": token}
+
+
+@pytest.fixture
+def metrics_headers(monkeypatch):
+    """Включает /metrics с токеном и возвращает заголовок доступа."""
+    monkeypatch.setattr(get_settings(), "metrics_token", "test-metrics-token")
+    return {"X-Metrics-Token": "test-metrics-token"}
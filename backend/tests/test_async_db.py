@@ -0,0 +1,234 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.database import (
+    Base,
+    get_async_db,
+    get_async_read_db,
+    get_async_session_factory,
+    to_async_url
+)
+from app.routers import aio
+from app.services.cache import get_cache
+from app.services.idempotency import get_idempotency_store
+
+PAYLOAD = {
+    "junior_count": 10,
+    "middle_count": 5,
+    "senior_count": 3,
+    "staff_count": 2,
+    "season": "warm",
+    "activity": "sport"
+}
+
+
+@pytest.fixture
+def async_client(tmp_path):
+    """Приложение только с async-маршрутами поверх файла SQLite (aiosqlite)."""
+    path = tmp_path / "async.db"
+    sync_engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=sync_engine)
+    sync_engine.dispose()
+
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    session_factory = async_sessionmaker(async_engine, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with session_factory() as db:
+            yield db
+
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.include_router(aio.auth_router, prefix="/api/v1")
+    app.include_router(aio.calculate_router, prefix="/api/v1")
+    app.include_router(aio.history_router, prefix="/api/v1")
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_async_read_db] = override_get_async_db
+    app.dependency_overrides[get_async_session_factory] = lambda: session_factory
+
+    get_cache().clear_local()
+    with TestClient(app) as client:
+        yield client
+    get_cache().clear_local()
+
+
+@pytest.fixture
+def async_auth_headers(async_client):
+    """Регистрирует пользователя через async-маршруты."""
+    response = async_client.post(
+        "/api/v1/auth/register",
+        json={"email": "async@example.com", "password": "testpass123"}
+    )
+    return {"X-Auth-Token": response.json()["access_token"]}
+
+
+class TestAsyncUrl:
+    """Тесты выбора async-драйвера."""
+
+    def test_driver_replaced(self):
+        """Sync-драйверы заменяются на asyncpg и aiosqlite."""
+        assert to_async_url("postgresql://u:p@db:5432/x") == "postgresql+asyncpg://u:p@db:5432/x"
+        assert to_async_url("postgresql+psycopg2://u:p@db/x") == "postgresql+asyncpg://u:p@db/x"
+        assert to_async_url("sqlite:///./test.db") == "sqlite+aiosqlite:///./test.db"
+
+    def test_async_url_unchanged(self):
+        """URL с async-драйвером не меняется."""
+        assert to_async_url("postgresql+asyncpg://db/x") == "postgresql+asyncpg://db/x"
+
+
+class TestAsyncRoutes:
+    """Тесты async-маршрутов на AsyncSession."""
+
+    def test_register_duplicate(self, async_client, async_auth_headers):
+        """Повторная регистрация отклоняется."""
+        response = async_client.post(
+            "/api/v1/auth/register",
+            json={"email": "async@example.com", "password": "testpass123"}
+        )
+        assert response.status_code == 400
+
+    def test_login(self, async_client, async_auth_headers):
+        """Вход проверяет пароль."""
+        ok = async_client.post(
+            "/api/v1/auth/login",
+            data={"username": "async@example.com", "password": "testpass123"}
+        )
+        wrong = async_client.post(
+            "/api/v1/auth/login",
+            data={"username": "async@example.com", "password": "wrongpass"}
+        )
+        assert ok.status_code == 200
+        assert "access_token" in ok.json()
+        assert wrong.status_code == 401
+
+    def test_calculate_saves_history(self, async_client, async_auth_headers):
+        """Авторизованный расчёт сохраняется и виден в истории и детализации."""
+        response = async_client.post(
+            "/api/v1/calculate",
+            json=PAYLOAD,
+            headers=async_auth_headers
+        )
+        assert response.status_code == 200
+
+        history = async_client.get("/api/v1/history", headers=async_auth_headers)
+        assert history.status_code == 200
+        items = history.json()
+        assert len(items) == 1
+        assert items[0]["total_water"] == response.json()["total_water"]
+        assert items[0]["params"] == PAYLOAD
+
+        detail = async_client.get(
+            f"/api/v1/history/{items[0]['id']}",
+            headers=async_auth_headers
+        )
+        assert detail.status_code == 200
+        assert detail.json()["total_people"] == 20
+
+    def test_history_etag(self, async_client, async_auth_headers):
+        """Async-история отдаёт ETag и отвечает 304, пока история не менялась."""
+        async_client.post("/api/v1/calculate", json=PAYLOAD, headers=async_auth_headers)
+        response = async_client.get("/api/v1/history", headers=async_auth_headers)
+        etag = response.headers["etag"]
+
+        response = async_client.get(
+            "/api/v1/history",
+            headers={**async_auth_headers, "If-None-Match": etag}
+        )
+        assert response.status_code == 304
+
+        async_client.post("/api/v1/calculate", json=PAYLOAD, headers=async_auth_headers)
+        response = async_client.get(
+            "/api/v1/history",
+            headers={**async_auth_headers, "If-None-Match": etag}
+        )
+        assert response.status_code == 200
+        assert len(response.json()) == 2
+
+    def test_delete_and_changes(self, async_client, async_auth_headers):
+        """Async-удаление оставляет надгробие в ленте изменений."""
+        async_client.post("/api/v1/calculate", json=PAYLOAD, headers=async_auth_headers)
+        synced = async_client.get("/api/v1/history/changes", headers=async_auth_headers).json()
+        calculation_id = synced["created"][0]["id"]
+
+        response = async_client.delete(f"/api/v1/history/{calculation_id}", headers=async_auth_headers)
+        assert response.status_code == 204
+
+        delta = async_client.get(
+            "/api/v1/history/changes",
+            params={"since": synced["cursor"]},
+            headers=async_auth_headers
+        ).json()
+        assert delta == {"created": [], "deleted": [calculation_id], "cursor": "2", "has_more": False}
+
+        stats = async_client.get("/api/v1/history/stats", headers=async_auth_headers).json()
+        assert stats["count"] == 0
+
+    def test_bulk_upload(self, async_client, async_auth_headers):
+        """Async-выгрузка сохраняет новые client_id и пропускает повторы."""
+        items = [{**PAYLOAD, "client_id": "a"}, {**PAYLOAD, "client_id": "b"}]
+        first = async_client.post(
+            "/api/v1/history/bulk", json={"items": items}, headers=async_auth_headers
+        ).json()
+        retry = async_client.post(
+            "/api/v1/history/bulk", json={"items": items}, headers=async_auth_headers
+        ).json()
+
+        assert (first["created"], retry["created"], retry["duplicates"]) == (2, 0, 2)
+        assert [r["id"] for r in retry["items"]] == [r["id"] for r in first["items"]]
+        history = async_client.get("/api/v1/history", headers=async_auth_headers).json()
+        assert len(history) == 2
+
+    def test_idempotent_calculate(self, async_client, async_auth_headers):
+        """Async-повтор с Idempotency-Key не создаёт второй расчёт."""
+        get_idempotency_store().clear_local()
+        headers = {**async_auth_headers, "Idempotency-Key": "async-key"}
+        first = async_client.post("/api/v1/calculate", json=PAYLOAD, headers=headers)
+        get_idempotency_store().clear_local()
+        second = async_client.post("/api/v1/calculate", json=PAYLOAD, headers=headers)
+
+        assert second.content == first.content
+        assert second.headers["idempotent-replayed"] == "true"
+        history = async_client.get("/api/v1/history", headers=async_auth_headers).json()
+        assert len(history) == 1
+
+    def test_anonymous_calculate_not_saved(self, async_client, async_auth_headers):
+        """Расчёт без токена не попадает в историю."""
+        assert async_client.post("/api/v1/calculate", json=PAYLOAD).status_code == 200
+        history = async_client.get("/api/v1/history", headers=async_auth_headers)
+        assert history.json() == []
+
+    def test_history_requires_auth(self, async_client):
+        """История без токена недоступна."""
+        assert async_client.get("/api/v1/history").status_code == 401
+
+    def test_detail_not_found(self, async_client, async_auth_headers):
+        """Чужой или несуществующий расчёт - 404."""
+        response = async_client.get("/api/v1/history/999", headers=async_auth_headers)
+        assert response.status_code == 404
+
+    def test_history_stats(self, async_client, async_auth_headers):
+        """Async-сохранение обновляет агрегаты, /history/stats их читает."""
+        for _ in range(2):
+            async_client.post("/api/v1/calculate", json=PAYLOAD, headers=async_auth_headers)
+
+        response = async_client.get("/api/v1/history/stats", headers=async_auth_headers)
+
+        assert response.status_code == 200
+        assert response.json()["count"] == 2
+
+    def test_export(self, async_client, async_auth_headers):
+        """Async-выгрузка отдаёт все расчёты пользователя."""
+        for _ in range(3):
+            async_client.post("/api/v1/calculate", json=PAYLOAD, headers=async_auth_headers)
+
+        response = async_client.get(
+            "/api/v1/history/export",
+            params={"format": "ndjson"},
+            headers=async_auth_headers
+        )
+
+        assert response.status_code == 200
+        assert len(response.text.splitlines()) == 3
@@ -0,0 +1,83 @@
+import itertools
+
+from app.schemas.calculation import CalculationRequest
+from app.services.calculator import CalculatorService, round2
+
+
+class TestCalculateBatch:
+    """Тесты пакетного расчёта."""
+
+    def test_batch_matches_scalar(self):
+        """Пакетный расчёт совпадает со скалярным для всех комбинаций."""
+        requests = [
+            CalculationRequest(
+                junior_count=junior,
+                middle_count=middle,
+                senior_count=senior,
+                staff_count=staff,
+                season=season,
+                activity=activity
+            )
+            for junior, middle, senior, staff, season, activity in itertools.product(
+                [0, 1, 7, 333],
+                [0, 3, 51],
+                [0, 2, 1001],
+                [0, 5, 17],
+                ["cold", "warm"],
+                ["normal", "sport", "trip"]
+            )
+        ]
+
+        batch = CalculatorService.calculate_batch(requests)
+
+        assert len(batch) == len(requests)
+        for request, result in zip(requests, batch):
+            assert result == CalculatorService.calculate(request).model_dump()
+
+    def test_round2_matches_builtin_round(self):
+        """Векторное округление совпадает с round(x, 2)."""
+        values = [i / 1000 for i in range(20000)] + [2.675, 1.005, 0.125, 56.285]
+
+        assert round2(values).tolist() == [round(v, 2) for v in values]
+
+    def test_batch_endpoint(self, client):
+        """Endpoint возвращает результаты в порядке запроса."""
+        items = [
+            {"junior_count": 10, "season": "cold", "activity": "normal"},
+            {"junior_count": 5, "middle_count": 5, "staff_count": 2,
+             "season": "warm", "activity": "trip"}
+        ]
+
+        response = client.post("/api/v1/calculate/batch", json={"items": items})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["count"] == 2
+        assert data["results"][0]["total_water"] == 16.0
+        assert data["results"][1] == client.post(
+            "/api/v1/calculate", json=items[1]
+        ).json()
+
+    def test_batch_endpoint_invalid_row(self, client):
+        """Невалидная строка отклоняет весь пакет."""
+        response = client.post(
+            "/api/v1/calculate/batch",
+            json={"items": [{"junior_count": -1, "season": "cold", "activity": "normal"}]}
+        )
+
+        assert response.status_code == 422
+
+    def test_batch_endpoint_count_too_large(self, client):
+        """Численность больше MAX_PEOPLE_COUNT отклоняется с 422, а не падает."""
+        item = {"junior_count": 10 ** 19, "season": "cold", "activity": "normal"}
+
+        assert client.post("/api/v1/calculate", json=item).status_code == 422
+        assert client.post(
+            "/api/v1/calculate/batch", json={"items": [item]}
+        ).status_code == 422
+
+    def test_batch_endpoint_empty(self, client):
+        """Пустой пакет не принимается."""
+        response = client.post("/api/v1/calculate/batch", json={"items": []})
+
+        assert response.status_code == 422
@@ -0,0 +1,165 @@
+from datetime import datetime, timedelta, timezone
+
+from app.models.calculation import Calculation
+from app.models.calculation_client_id import CalculationClientId
+from app.schemas.calculation import BulkCalculationItem, BulkUploadResponse
+from app.services.bulk import BulkUploadService, client_time
+from app.services.calculator import CalculatorService
+from app.services.rollup import RollupService
+from app.services.watermark import WatermarkService
+from tests.test_watermark import PAYLOAD, captured_sql
+
+
+def item(client_id, junior_count=10, **extra):
+    return {**PAYLOAD, "junior_count": junior_count, "client_id": client_id, **extra}
+
+
+def upload(client, auth_headers, items):
+    response = client.post("/api/v1/history/bulk", json={"items": items}, headers=auth_headers)
+    assert response.status_code == 200
+    return BulkUploadResponse.model_validate(response.json())
+
+
+class TestBulkUploadService:
+    """Тесты офлайн-выгрузки на уровне сервиса."""
+
+    def test_recomputes_on_server(self, db_session, auth_headers):
+        """Расход считается сервером так же, как одиночный расчёт."""
+        items = [BulkCalculationItem(**item(str(i), i)) for i in range(5)]
+
+        result = BulkUploadService.upload(db_session, 1, items)
+
+        expected = [
+            CalculatorService.calculate(BulkCalculationItem(**item("x", i))).total_water
+            for i in range(5)
+        ]
+        assert [r["total_water"] for r in result["items"]] == expected
+        assert RollupService.get_stats(db_session, 1)["count"] == 5
+
+    def test_claim_conflict_retried(self, db_session, auth_headers):
+        """client_id, сохранённый между проверкой и вставкой, - повтор без двойной записи."""
+        BulkUploadService.upload(db_session, 1, [BulkCalculationItem(**item("a"))])
+        known_query = BulkUploadService.known_query
+        calls = []
+
+        def stale_then_fresh(user_id, client_ids):
+            # Первая проверка не видит "a", как будто её сохранила параллельная выгрузка
+            calls.append(1)
+            if len(calls) == 1:
+                return known_query(user_id, ["-"])
+            return known_query(user_id, client_ids)
+
+        BulkUploadService.known_query = staticmethod(stale_then_fresh)
+        try:
+            result = BulkUploadService.upload(
+                db_session,
+                1,
+                [BulkCalculationItem(**item("a")), BulkCalculationItem(**item("b"))]
+            )
+        finally:
+            BulkUploadService.known_query = staticmethod(known_query)
+
+        assert len(calls) == 2
+        assert (result["created"], result["duplicates"]) == (1, 1)
+        assert db_session.query(Calculation).count() == 2
+        watermark = WatermarkService.get(db_session, 1)
+        assert (watermark.row_count, watermark.change_seq) == (2, 2)
+
+    def test_client_time(self):
+        """Время клиента приводится к UTC и не уходит в будущее."""
+        now = datetime(2025, 6, 1, 12, 0)
+        moment = datetime(2025, 6, 1, 14, 0, tzinfo=timezone(timedelta(hours=3)))
+
+        assert client_time(moment, now) == datetime(2025, 6, 1, 11, 0)
+        assert client_time(datetime(2030, 1, 1), now) == now
+
+
+class TestBulkUpload:
+    """Тесты POST /history/bulk."""
+
+    def test_upload_creates_history(self, client, auth_headers, db_session):
+        """Выгрузка сохраняет расчёты одной вставкой, они видны в истории."""
+        items = [item(f"c{i}", i + 1) for i in range(50)]
+
+        with captured_sql(db_session) as statements:
+            result = upload(client, auth_headers, items)
+
+        assert (result.created, result.duplicates) == (50, 0)
+        assert all(r.id is not None and not r.duplicate for r in result.items)
+        assert [r.client_id for r in result.items] == [i["client_id"] for i in items]
+        assert sum(statement.startswith("INSERT INTO calculations") for statement in statements) == 1
+
+        history = client.get("/api/v1/history", params={"limit": 100}, headers=auth_headers).json()
+        assert sorted(h["id"] for h in history) == sorted(r.id for r in result.items)
+
+    def test_retry_is_cheap_and_safe(self, client, auth_headers, db_session):
+        """Повтор выгрузки возвращает те же id и ничего не пишет."""
+        items = [item("a", 1), item("b", 2)]
+        first = upload(client, auth_headers, items)
+
+        with captured_sql(db_session) as statements:
+            second = upload(client, auth_headers, items)
+
+        assert [(r.id, r.total_water) for r in second.items] == [
+            (r.id, r.total_water) for r in first.items
+        ]
+        assert all(r.duplicate for r in second.items)
+        assert (second.created, second.duplicates) == (0, 2)
+        assert not any(
+            statement.startswith(("INSERT", "UPDATE", "DELETE")) for statement in statements
+        )
+        assert db_session.query(Calculation).count() == 2
+
+    def test_partial_retry_and_duplicates_in_request(self, client, auth_headers, db_session):
+        """Новые client_id сохраняются, повторы внутри запроса - один расчёт."""
+        upload(client, auth_headers, [item("a")])
+
+        result = upload(client, auth_headers, [item("a"), item("b"), item("b")])
+
+        assert [r.duplicate for r in result.items] == [True, False, True]
+        assert result.items[1].id == result.items[2].id
+        assert (result.created, result.duplicates) == (1, 2)
+        assert db_session.query(CalculationClientId).count() == 2
+
+    def test_client_created_at(self, client, auth_headers):
+        """Время расчёта клиента попадает в историю и статистику по месяцам."""
+        upload(client, auth_headers, [item("old", created_at="2025-01-15T10:00:00Z")])
+
+        history = client.get("/api/v1/history", headers=auth_headers).json()
+        stats = client.get("/api/v1/history/stats", headers=auth_headers).json()
+
+        assert history[0]["created_at"].startswith("2025-01-15T10:00:00")
+        assert stats["by_month"][0]["month"] == "2025-01-01"
+
+    def test_deleted_duplicate(self, client, auth_headers):
+        """Повтор удалённого расчёта не воскрешает его."""
+        result = upload(client, auth_headers, [item("a")])
+        client.delete(f"/api/v1/history/{result.items[0].id}", headers=auth_headers)
+
+        retry = upload(client, auth_headers, [item("a")])
+
+        assert retry.items[0].duplicate
+        assert retry.items[0].id is None
+        assert client.get("/api/v1/history", headers=auth_headers).json() == []
+
+    def test_validation(self, client, auth_headers):
+        """Пустая выгрузка, пустой client_id и запрос без авторизации отклоняются."""
+        assert client.post(
+            "/api/v1/history/bulk", json={"items": []}, headers=auth_headers
+        ).status_code == 422
+        assert client.post(
+            "/api/v1/history/bulk", json={"items": [item("")]}, headers=auth_headers
+        ).status_code == 422
+        assert client.post("/api/v1/history/bulk", json={"items": [item("a")]}).status_code == 401
+
+    def test_count_too_large(self, client, auth_headers, db_session):
+        """Численность вне int64 отклоняется с 422 и ничего не пишет."""
+        response = client.post(
+            "/api/v1/history/bulk",
+            json={"items": [item("a"), item("b", 10 ** 19)]},
+            headers=auth_headers,
+        )
+
+        assert response.status_code == 422
+        assert response.json()["detail"][0]["loc"][-1] == "junior_count"
+        assert db_session.query(Calculation).count() == 0
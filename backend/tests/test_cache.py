@@ -0,0 +1,223 @@
+import threading
+
+import fakeredis
+import pytest
+
+from app.services.cache import LRUCache, RedisCache, TieredCache, TTLCache, get_cache
+from app.services.calculator import CalculatorService
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Сбрасывает L1-кэш между тестами."""
+    get_cache().clear_local()
+    yield
+    get_cache().clear_local()
+
+
+@pytest.fixture
+def redis_client():
+    """In-memory Redis вместо настоящего сервера."""
+    return fakeredis.FakeRedis()
+
+
+class TestLRUCache:
+    """Тесты LRU-кэша."""
+
+    def test_eviction_order(self):
+        """Вытесняется давно не использованная запись."""
+        cache = LRUCache(maxsize=2)
+        cache.set("a", b"1")
+        cache.set("b", b"2")
+        cache.get("a")
+        cache.set("c", b"3")
+
+        assert cache.get("b") is None
+        assert cache.get("a") == b"1"
+        assert cache.get("c") == b"3"
+        assert cache.stats()["evictions"] == 1
+
+    def test_ttl_expiration(self, monkeypatch):
+        """Запись истекает по TTL."""
+        now = [1000.0]
+        monkeypatch.setattr("app.services.cache.time.monotonic", lambda: now[0])
+        cache = LRUCache(maxsize=10, ttl=5)
+        cache.set("a", b"1")
+
+        now[0] += 6
+
+        assert cache.get("a") is None
+        assert cache.stats()["expirations"] == 1
+
+    def test_disabled_cache(self):
+        """Нулевой размер отключает хранение."""
+        cache = LRUCache(maxsize=0)
+        cache.set("a", b"1")
+
+        assert cache.get("a") is None
+        assert cache.stats()["misses"] == 1
+
+
+class TestTTLCache:
+    """Тесты кэша без вытеснения по размеру."""
+
+    def test_no_size_eviction(self):
+        """Записи не вытесняются, сколько бы их ни было."""
+        cache = TTLCache(ttl=60)
+        for i in range(10_000):
+            cache.set(f"k{i}", b"1")
+
+        assert cache.get("k0") == b"1"
+        assert cache.stats()["evictions"] == 0
+
+    def test_expired_swept_on_set(self, monkeypatch):
+        """Истёкшие записи, которые никто не читает, удаляются проходом при записи."""
+        now = [1000.0]
+        monkeypatch.setattr("app.services.cache.time.monotonic", lambda: now[0])
+        cache = TTLCache(ttl=5)
+        cache.set("a", b"1")
+        cache.set("b", b"2")
+
+        now[0] += 6
+        cache.set("c", b"3")
+
+        assert len(cache) == 1
+        assert cache.stats()["expirations"] == 2
+        assert cache.get("c") == b"3"
+
+
+class TestCalculateCache:
+    """Тесты кэширования /calculate."""
+
+    def test_repeated_request_hits_cache(self, client, metrics_headers):
+        """Повторный запрос отдаётся из кэша с тем же телом."""
+        payload = {"junior_count": 10, "season": "warm", "activity": "sport"}
+
+        first = client.post("/api/v1/calculate", json=payload)
+        second = client.post("/api/v1/calculate", json=payload)
+
+        assert first.content == second.content
+        assert second.json()["total_water"] == round(10 * 1.6 * 1.3 * 1.5, 2)
+
+        stats = client.get("/api/v1/metrics/cache", headers=metrics_headers).json()["l1"]
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["size"] == 1
+
+    def test_key_is_normalized(self, client):
+        """Явные нули и значения по умолчанию дают один ключ."""
+        client.post(
+            "/api/v1/calculate",
+            json={"junior_count": 1, "season": "cold", "activity": "normal"}
+        )
+        client.post(
+            "/api/v1/calculate",
+            json={"junior_count": 1, "middle_count": 0, "senior_count": 0,
+                  "staff_count": 0, "season": "cold", "activity": "normal"}
+        )
+
+        assert get_cache().l1.stats()["hits"] == 1
+
+
+class TestTieredCache:
+    """Тесты двухуровневого кэша с Redis."""
+
+    def test_l2_shared_between_processes(self, redis_client):
+        """Значение, записанное одним воркером, видно другому через L2."""
+        worker_a = TieredCache(LRUCache(10), RedisCache(redis_client))
+        worker_b = TieredCache(LRUCache(10), RedisCache(redis_client))
+
+        worker_a.set("k", b"value")
+
+        assert worker_b.get("k") == b"value"
+        # Попадание в L2 прогревает L1
+        assert worker_b.l1.get("k") == b"value"
+
+    def test_get_many_uses_single_mget(self, redis_client, monkeypatch):
+        """Промахи L1 добираются из L2 одним MGET."""
+        l2 = RedisCache(redis_client)
+        l2.set_many({"a": b"1", "b": b"2"})
+        cache = TieredCache(LRUCache(10), l2)
+        cache.l1.set("c", b"3")
+
+        calls = []
+        original_mget = redis_client.mget
+        monkeypatch.setattr(
+            redis_client,
+            "mget",
+            lambda keys: calls.append(keys) or original_mget(keys)
+        )
+
+        assert cache.get_many(["a", "b", "c", "d"]) == [b"1", b"2", b"3", None]
+        assert len(calls) == 1
+        assert len(calls[0]) == 3
+
+    def test_l2_ttl(self, redis_client):
+        """Записи в Redis получают TTL."""
+        l2 = RedisCache(redis_client, default_ttl=60)
+        l2.set("k", b"v")
+
+        assert 0 < redis_client.pttl("hydrocalc:k") <= 60_000
+
+    def test_redis_errors_are_misses(self):
+        """Недоступный Redis не ломает кэш, L2 временно отключается."""
+        import redis
+
+        broken = redis.Redis(host="127.0.0.1", port=1, socket_connect_timeout=0.05)
+        l2 = RedisCache(broken, retry_after=60)
+        cache = TieredCache(LRUCache(10), l2)
+
+        cache.set("k", b"v")
+
+        assert cache.get("k") == b"v"
+        assert l2.get("other") is None
+        assert l2.stats()["errors"] == 1
+        assert l2.stats()["available"] is False
+
+    def test_calculate_uses_redis(self, client, redis_client, monkeypatch):
+        """Результат /calculate попадает в L2 и читается из него."""
+        monkeypatch.setattr(get_cache(), "l2", RedisCache(redis_client))
+        payload = {"junior_count": 3, "season": "cold", "activity": "trip"}
+
+        first = client.post("/api/v1/calculate", json=payload)
+        get_cache().clear_local()
+        second = client.post("/api/v1/calculate", json=payload)
+
+        assert first.content == second.content
+        assert get_cache().l2.stats()["hits"] == 1
+
+    def test_async_route_keeps_redis_off_event_loop(self, client, redis_client, monkeypatch):
+        """В async-маршруте расчёт идёт в event loop, а обращения к Redis - в пуле потоков."""
+        monkeypatch.setattr(get_cache(), "l2", RedisCache(redis_client))
+        loop_threads, redis_threads = set(), set()
+        calculate = CalculatorService.calculate
+        mget = redis_client.mget
+        pipeline = redis_client.pipeline
+        monkeypatch.setattr(
+            CalculatorService,
+            "calculate",
+            # Прогрев при старте считает свой запрос в пуле потоков - его не учитываем
+            staticmethod(lambda request: (
+                request.junior_count == 4 and loop_threads.add(threading.get_ident())
+            ) or calculate(request))
+        )
+        monkeypatch.setattr(
+            redis_client,
+            "mget",
+            lambda keys: redis_threads.add(threading.get_ident()) or mget(keys)
+        )
+        monkeypatch.setattr(
+            redis_client,
+            "pipeline",
+            lambda **kwargs: redis_threads.add(threading.get_ident()) or pipeline(**kwargs)
+        )
+
+        response = client.post(
+            "/api/v1/calculate",
+            json={"junior_count": 4, "season": "warm", "activity": "trip"}
+        )
+
+        assert response.status_code == 200
+        assert loop_threads and redis_threads
+        assert not loop_threads & redis_threads
+        assert get_cache().l2.stats()["misses"] == 1
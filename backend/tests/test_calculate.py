@@ -1,5 +1,27 @@
+from datetime import datetime, timedelta
+
 import pytest
 
+from sqlalchemy import text
+
+from app.database import LazySession, get_session_factory
+from app.main import app
+from app.models.calculation import Calculation
+from app.routers import history as history_router_module
+from app.schemas.calculation import MAX_PEOPLE_COUNT, CalculationRequest
+from app.services.auth import AuthService
+from app.services.calculator import HISTORY_COLUMNS, CalculatorService
+from tests.conftest import TestingSessionLocal
+
+PAYLOAD = {
+    "junior_count": 10,
+    "middle_count": 5,
+    "senior_count": 3,
+    "staff_count": 2,
+    "season": "warm",
+    "activity": "sport"
+}
+
 
 class TestCalculate:
     """Тесты расчёта потребления воды."""
@@ -148,6 +170,21 @@ class TestCalculate:
 
         assert response.status_code == 422
 
+    @pytest.mark.parametrize(
+        "field", ["junior_count", "middle_count", "senior_count", "staff_count"]
+    )
+    def test_calculate_people_count_boundary(self, client, field):
+        """MAX_PEOPLE_COUNT в категории принимается, на единицу больше - 422."""
+        payload = {"season": "cold", "activity": "normal"}
+
+        accepted = client.post("/api/v1/calculate", json={**payload, field: MAX_PEOPLE_COUNT})
+        rejected = client.post("/api/v1/calculate", json={**payload, field: MAX_PEOPLE_COUNT + 1})
+
+        assert accepted.status_code == 200
+        assert accepted.json()["total_people"] == MAX_PEOPLE_COUNT
+        assert rejected.status_code == 422
+        assert rejected.json()["detail"][0]["loc"][-1] == field
+
     def test_calculate_saves_for_authenticated_user(self, client, auth_headers):
         """Расчёт сохраняется для авторизованного пользователя."""
         response = client.post(
@@ -173,6 +210,68 @@ class TestCalculate:
         assert len(history_response.json()) == 1
 
 
+class TestLazySession:
+    """Тесты ленивой сессии /calculate."""
+
+    @pytest.fixture
+    def session_counter(self, client):
+        """Считает сессии, открытые через get_session_factory."""
+        created = []
+
+        def factory():
+            created.append(1)
+            return TestingSessionLocal()
+
+        app.dependency_overrides[get_session_factory] = lambda: factory
+        return created
+
+    def test_anonymous_does_not_open_session(self, client, session_counter):
+        """Анонимный расчёт не создаёт сессию БД."""
+        for _ in range(3):
+            response = client.post("/api/v1/calculate", json=PAYLOAD)
+            assert response.status_code == 200
+
+        assert session_counter == []
+
+    def test_authenticated_opens_one_session(self, client, auth_headers, session_counter):
+        """Сохранение расчёта открывает одну сессию на запрос."""
+        response = client.post("/api/v1/calculate", json=PAYLOAD, headers=auth_headers)
+
+        assert response.status_code == 200
+        assert session_counter == [1]
+
+    def test_invalid_token_is_anonymous(self, client, session_counter):
+        """Невалидный токен - анонимный расчёт без обращения к БД."""
+        response = client.post(
+            "/api/v1/calculate",
+            json=PAYLOAD,
+            headers={"X-Auth-Token": "invalid"}
+        )
+
+        assert response.status_code == 200
+        assert session_counter == []
+
+    def test_unknown_user_not_saved(self, client, db_session):
+        """Токен несуществующего пользователя не сохраняет расчёт."""
+        headers = {"X-Auth-Token": AuthService.create_access_token(999)}
+
+        response = client.post("/api/v1/calculate", json=PAYLOAD, headers=headers)
+
+        assert response.status_code == 200
+        assert db_session.query(Calculation).count() == 0
+
+    def test_lazy_session_proxies(self):
+        """LazySession создаёт сессию при первом обращении к атрибуту."""
+        db = LazySession(TestingSessionLocal)
+        assert not db.created
+        assert db.close() is None
+
+        db.execute(text("SELECT 1"))
+
+        assert db.created
+        db.close()
+
+
 class TestHistory:
     """Тесты истории расчётов."""
 
@@ -265,6 +364,35 @@ class TestHistory:
         assert "coefficients" in data
         assert data["coefficients"]["season"] == 1.3
 
+    def test_history_item_format(self, client, auth_headers):
+        """Элементы истории соответствуют схеме CalculationHistoryItem."""
+        from app.schemas.calculation import CalculationHistoryItem
+
+        client.post(
+            "/api/v1/calculate",
+            json={
+                "junior_count": 3,
+                "middle_count": 2,
+                "senior_count": 1,
+                "staff_count": 1,
+                "season": "warm",
+                "activity": "trip"
+            },
+            headers=auth_headers
+        )
+
+        item = client.get("/api/v1/history", headers=auth_headers).json()[0]
+
+        assert CalculationHistoryItem.model_validate(item).model_dump(mode="json") == item
+        assert item["params"] == {
+            "junior_count": 3,
+            "middle_count": 2,
+            "senior_count": 1,
+            "staff_count": 1,
+            "season": "warm",
+            "activity": "trip"
+        }
+
     def test_history_detail_not_found(self, client, auth_headers):
         """Расчёт не найден."""
         response = client.get(
@@ -273,3 +401,98 @@ class TestHistory:
         )
 
         assert response.status_code == 404
+
+
+class TestHistoryPagination:
+    """Тесты keyset-пагинации истории."""
+
+    @pytest.fixture
+    def history_rows(self, db_session, auth_headers):
+        """25 расчётов пользователя, по пять с одинаковым created_at."""
+        request = CalculationRequest(
+            junior_count=1,
+            middle_count=0,
+            senior_count=0,
+            staff_count=0,
+            season="cold",
+            activity="normal"
+        )
+        start = datetime(2025, 1, 1)
+        rows = []
+        for i in range(25):
+            row = CalculatorService.calculation_row(request, float(i), 1)
+            row["created_at"] = start + timedelta(minutes=i // 5)
+            rows.append(row)
+        CalculatorService.insert_calculations(db_session, rows)
+
+    def test_pages_cover_history_in_order(self, client, auth_headers, history_rows):
+        """Страницы по курсору покрывают всю историю без пропусков и повторов."""
+        items = []
+        cursor = None
+        pages = 0
+        while True:
+            params = {"limit": 7}
+            if cursor:
+                params["before"] = cursor
+            response = client.get("/api/v1/history", params=params, headers=auth_headers)
+            assert response.status_code == 200
+            assert len(response.json()) <= 7
+            items.extend(response.json())
+            pages += 1
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                break
+
+        assert pages == 4
+        keys = [(item["created_at"], item["id"]) for item in items]
+        assert keys == sorted(keys, reverse=True)
+        assert len({item["id"] for item in items}) == 25
+
+    def test_last_full_page_has_no_cursor(self, client, auth_headers, history_rows):
+        """Если строк ровно на страницу, курсора нет."""
+        response = client.get(
+            "/api/v1/history",
+            params={"limit": 25},
+            headers=auth_headers
+        )
+
+        assert len(response.json()) == 25
+        assert "X-Next-Cursor" not in response.headers
+
+    def test_default_page_size(self, client, auth_headers, history_rows, monkeypatch):
+        """Без limit используется history_page_size."""
+        monkeypatch.setattr(history_router_module.settings, "history_page_size", 10)
+        response = client.get("/api/v1/history", headers=auth_headers)
+
+        assert len(response.json()) == 10
+        assert "X-Next-Cursor" in response.headers
+
+    @pytest.mark.parametrize("cursor", ["abc", "2025-01-01T00:00:00", "2025-13-01T00:00:00,5"])
+    def test_invalid_cursor(self, client, auth_headers, cursor):
+        """Некорректный курсор - 400."""
+        response = client.get(
+            "/api/v1/history",
+            params={"before": cursor},
+            headers=auth_headers
+        )
+
+        assert response.status_code == 400
+
+    def test_limit_validated(self, client, auth_headers):
+        """limit вне допустимого диапазона - 422."""
+        response = client.get(
+            "/api/v1/history",
+            params={"limit": 0},
+            headers=auth_headers
+        )
+
+        assert response.status_code == 422
+
+    def test_iter_history_rows(self, db_session, history_rows):
+        """Потоковое чтение отдаёт всю историю в том же порядке, что и страницы."""
+        rows = list(CalculatorService.iter_user_history_rows(db_session, 1, batch_size=4))
+        page = CalculatorService.get_user_history_rows(db_session, 1, limit=25)
+
+        assert rows == page
+        assert len(rows) == 25
+        assert rows[0]._fields == tuple(column.key for column in HISTORY_COLUMNS)
@@ -0,0 +1,199 @@
+from sqlalchemy import literal, select
+
+from app.models.calculation import Calculation
+from app.models.calculation_tombstone import CalculationTombstone
+from app.models.user import User
+from app.schemas.calculation import CalculationRequest, HistoryChanges
+from app.services.calculator import CalculatorService
+from app.services.rollup import RollupService
+from app.services.watermark import WatermarkService
+from tests.test_watermark import PAYLOAD, captured_sql, make_row
+
+
+def calculate(client, auth_headers, junior_count=10):
+    client.post(
+        "/api/v1/calculate",
+        json={**PAYLOAD, "junior_count": junior_count},
+        headers=auth_headers
+    )
+
+
+def changes(client, auth_headers, **params):
+    response = client.get("/api/v1/history/changes", params=params, headers=auth_headers)
+    assert response.status_code == 200
+    return HistoryChanges.model_validate(response.json())
+
+
+class TestChangeSequence:
+    """Тесты выдачи номеров изменений."""
+
+    def test_insert_assigns_sequence(self, db_session, auth_headers):
+        """Пакет нескольких пользователей нумеруется по порядку внутри каждого."""
+        db_session.add(User(email="other@example.com", password_hash="-"))
+        db_session.commit()
+
+        CalculatorService.insert_calculations(
+            db_session,
+            [make_row(1), make_row(2), make_row(None), make_row(1)]
+        )
+        CalculatorService.save_calculation(db_session, CalculationRequest(**PAYLOAD), 16.0, 1)
+
+        seqs = sorted(
+            (calc.user_id or 0, calc.change_seq or 0)
+            for calc in db_session.query(Calculation).all()
+        )
+        assert seqs == [(0, 0), (1, 1), (1, 2), (1, 3), (2, 1)]
+        assert WatermarkService.get(db_session, 1).change_seq == 3
+
+    def test_delete_updates_rollups_and_watermark(self, db_session, auth_headers):
+        """Удаление вычитает из статистики, сдвигает change_seq и уменьшает row_count."""
+        first = CalculatorService.save_calculation(db_session, CalculationRequest(**PAYLOAD), 16.0, 1)
+        CalculatorService.save_calculation(db_session, CalculationRequest(**PAYLOAD), 16.0, 1)
+
+        assert CalculatorService.delete_calculation(db_session, first.id, 1)
+        assert not CalculatorService.delete_calculation(db_session, first.id, 1)
+
+        watermark = WatermarkService.get(db_session, 1)
+        assert (watermark.row_count, watermark.change_seq, watermark.deletions) == (1, 3, 1)
+        stats = RollupService.get_stats(db_session, 1)
+        assert stats["count"] == 1
+        assert stats["total_water"] == 16.0
+
+        CalculatorService.delete_calculation(db_session, first.id + 1, 1)
+        assert RollupService.get_stats(db_session, 1)["by_month"] == []
+
+
+    def test_concurrent_delete_counted_once(self, db_session, auth_headers, monkeypatch):
+        """Второе удаление, прочитавшее строку до первого, ничего не сдвигает и не вычитает."""
+        first = CalculatorService.save_calculation(db_session, CalculationRequest(**PAYLOAD), 16.0, 1)
+        CalculatorService.save_calculation(db_session, CalculationRequest(**PAYLOAD), 16.0, 1)
+        stale = db_session.execute(CalculatorService.deletion_target(first.id, 1)).first()
+        columns = Calculation.__table__.c
+
+        assert CalculatorService.delete_calculation(db_session, first.id, 1)
+        # Параллельный запрос прочитал строку до того, как первый её удалил
+        monkeypatch.setattr(
+            CalculatorService,
+            "deletion_target",
+            staticmethod(lambda calculation_id, user_id: select(*(
+                literal(value, columns[name].type).label(name)
+                for name, value in stale._asdict().items()
+            )))
+        )
+        assert not CalculatorService.delete_calculation(db_session, first.id, 1)
+
+        watermark = WatermarkService.get(db_session, 1)
+        assert (watermark.row_count, watermark.change_seq, watermark.deletions) == (1, 3, 1)
+        assert db_session.query(CalculationTombstone).count() == 1
+        stats = RollupService.get_stats(db_session, 1)
+        assert stats["count"] == 1
+        assert stats["total_water"] == 16.0
+
+
+class TestHistoryChanges:
+    """Тесты GET /history/changes и DELETE /history/{id}."""
+
+    def test_full_sync_then_empty(self, client, auth_headers, db_session):
+        """Без курсора - вся история; с актуальным курсором - пустой ответ без calculations."""
+        calculate(client, auth_headers, 1)
+        calculate(client, auth_headers, 2)
+
+        first = changes(client, auth_headers)
+        assert [item.params.junior_count for item in first.created] == [1, 2]
+        assert first.deleted == []
+        assert first.cursor == "2"
+        assert not first.has_more
+
+        with captured_sql(db_session) as statements:
+            response = client.get(
+                "/api/v1/history/changes",
+                params={"since": first.cursor},
+                headers=auth_headers
+            )
+        assert response.json() == {"created": [], "deleted": [], "cursor": "2", "has_more": False}
+        assert len(response.content) < 64
+        assert len(statements) == 1
+        assert "history_watermarks" in statements[0]
+
+    def test_created_and_deleted_after_cursor(self, client, auth_headers):
+        """После курсора приходят новые расчёты и id удалённых."""
+        calculate(client, auth_headers, 1)
+        calculate(client, auth_headers, 2)
+        synced = changes(client, auth_headers)
+        deleted_id = synced.created[0].id
+
+        response = client.delete(f"/api/v1/history/{deleted_id}", headers=auth_headers)
+        assert response.status_code == 204
+        calculate(client, auth_headers, 3)
+
+        delta = changes(client, auth_headers, since=synced.cursor)
+        assert delta.deleted == [deleted_id]
+        assert [item.params.junior_count for item in delta.created] == [3]
+        assert delta.cursor == "4"
+
+        history = client.get("/api/v1/history", headers=auth_headers).json()
+        assert deleted_id not in [item["id"] for item in history]
+
+    def test_created_then_deleted_only_tombstone(self, client, auth_headers):
+        """Расчёт, удалённый до синхронизации, приходит только надгробием."""
+        calculate(client, auth_headers)
+        calculation_id = client.get("/api/v1/history", headers=auth_headers).json()[0]["id"]
+        client.delete(f"/api/v1/history/{calculation_id}", headers=auth_headers)
+
+        delta = changes(client, auth_headers)
+        assert delta.created == []
+        assert delta.deleted == [calculation_id]
+        assert delta.cursor == "2"
+
+    def test_pages_by_limit(self, client, auth_headers):
+        """Больше limit изменений - has_more и курсор последнего отданного."""
+        for junior_count in range(1, 6):
+            calculate(client, auth_headers, junior_count)
+
+        seen = []
+        cursor = None
+        while True:
+            params = {"limit": 2} if cursor is None else {"limit": 2, "since": cursor}
+            page = changes(client, auth_headers, **params)
+            seen += [item.params.junior_count for item in page.created]
+            cursor = page.cursor
+            if not page.has_more:
+                break
+
+        assert seen == [1, 2, 3, 4, 5]
+        assert cursor == "5"
+
+    def test_cursor_ahead_is_unchanged(self, client, auth_headers):
+        """Курсор новее водяного знака (другая реплика) - изменений нет, курсор прежний."""
+        calculate(client, auth_headers)
+        assert changes(client, auth_headers, since="10").cursor == "10"
+
+    def test_bad_cursor(self, client, auth_headers):
+        """Некорректный курсор - 400."""
+        for since in ("abc", "-1"):
+            response = client.get(
+                "/api/v1/history/changes",
+                params={"since": since},
+                headers=auth_headers
+            )
+            assert response.status_code == 400
+
+    def test_delete_foreign_or_missing(self, client, auth_headers):
+        """Чужой или несуществующий расчёт - 404, без авторизации - 401."""
+        assert client.delete("/api/v1/history/999", headers=auth_headers).status_code == 404
+        assert client.delete("/api/v1/history/999").status_code == 401
+
+    def test_delete_invalidates_detail_and_etag(self, client, auth_headers):
+        """После удаления детали - 404 (кэш по числу удалений), ETag истории меняется."""
+        calculate(client, auth_headers)
+        response = client.get("/api/v1/history", headers=auth_headers)
+        etag = response.headers["etag"]
+        calculation_id = response.json()[0]["id"]
+        assert client.get(f"/api/v1/history/{calculation_id}", headers=auth_headers).status_code == 200
+
+        client.delete(f"/api/v1/history/{calculation_id}", headers=auth_headers)
+
+        assert client.get(f"/api/v1/history/{calculation_id}", headers=auth_headers).status_code == 404
+        response = client.get("/api/v1/history", headers={**auth_headers, "If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.json() == []
@@ -0,0 +1,105 @@
+import csv
+import io
+from datetime import datetime, timedelta
+
+import orjson
+import pytest
+
+from app.routers import history as history_router_module
+from app.schemas.calculation import CalculationRequest
+from app.services.calculator import CalculatorService
+from app.services.export import EXPORT_COLUMNS
+
+
+@pytest.fixture
+def history_rows(db_session, auth_headers, monkeypatch):
+    """10 расчётов пользователя; выгрузка порциями по 3 строки."""
+    monkeypatch.setattr(history_router_module.settings, "export_batch_size", 3)
+    request = CalculationRequest(
+        junior_count=2,
+        middle_count=1,
+        senior_count=0,
+        staff_count=1,
+        season="warm",
+        activity="trip"
+    )
+    rows = []
+    for i in range(10):
+        row = CalculatorService.calculation_row(request, i + 0.25, 1)
+        row["created_at"] = datetime(2025, 1, 1) + timedelta(hours=i)
+        rows.append(row)
+    CalculatorService.insert_calculations(db_session, rows)
+
+
+class TestHistoryExport:
+    """Тесты выгрузки истории."""
+
+    def test_csv(self, client, auth_headers, history_rows):
+        """CSV содержит заголовок и все строки, новые сначала."""
+        response = client.get(
+            "/api/v1/history/export",
+            params={"format": "csv"},
+            headers=auth_headers
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        assert 'filename="history.csv"' in response.headers["content-disposition"]
+        table = list(csv.reader(io.StringIO(response.text)))
+        assert tuple(table[0]) == EXPORT_COLUMNS
+        assert len(table) == 11
+        first = dict(zip(table[0], table[1]))
+        assert first["total_water"] == "9.25"
+        assert first["created_at"] == "2025-01-01T09:00:00"
+        assert (first["season"], first["activity"]) == ("warm", "trip")
+
+    def test_ndjson(self, client, auth_headers, history_rows):
+        """NDJSON - по объекту на строку с теми же колонками."""
+        response = client.get(
+            "/api/v1/history/export",
+            params={"format": "ndjson"},
+            headers=auth_headers
+        )
+
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        items = [orjson.loads(line) for line in response.text.splitlines()]
+        assert len(items) == 10
+        assert tuple(items[0]) == EXPORT_COLUMNS
+        assert [item["total_water"] for item in items] == [i + 0.25 for i in range(9, -1, -1)]
+
+    def test_export_matches_history(self, client, auth_headers, history_rows):
+        """Выгрузка содержит те же расчёты, что и история."""
+        history = client.get(
+            "/api/v1/history",
+            params={"limit": 100},
+            headers=auth_headers
+        ).json()
+        export = client.get(
+            "/api/v1/history/export",
+            params={"format": "ndjson"},
+            headers=auth_headers
+        )
+
+        assert [orjson.loads(line)["id"] for line in export.text.splitlines()] == [
+            item["id"] for item in history
+        ]
+
+    def test_empty_csv(self, client, auth_headers):
+        """Пустая история - только заголовок."""
+        response = client.get("/api/v1/history/export", headers=auth_headers)
+
+        assert response.text == ",".join(EXPORT_COLUMNS) + "\r\n"
+
+    def test_invalid_format(self, client, auth_headers):
+        """Неизвестный формат - 422."""
+        response = client.get(
+            "/api/v1/history/export",
+            params={"format": "xml"},
+            headers=auth_headers
+        )
+
+        assert response.status_code == 422
+
+    def test_requires_auth(self, client):
+        """Выгрузка без токена недоступна."""
+        assert client.get("/api/v1/history/export").status_code == 401
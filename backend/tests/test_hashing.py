@@ -0,0 +1,210 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.config import get_settings
+from app.models.user import User
+from app.routers.auth import check_rate_limit, client_ip, trusted_proxies
+from app.services import auth as auth_service
+from app.services.auth import get_pwd_context
+from app.services.hashing import (
+    HashingExecutor,
+    HashingOverloaded,
+    RateLimited,
+    TokenBucketLimiter,
+    get_auth_rate_limiter
+)
+
+
+@pytest.fixture
+def bcrypt_rounds(monkeypatch):
+    """Меняет bcrypt_rounds и пересоздаёт контекст passlib."""
+    def set_rounds(rounds: int):
+        monkeypatch.setattr(get_settings(), "bcrypt_rounds", rounds)
+        get_pwd_context.cache_clear()
+
+    yield set_rounds
+    get_pwd_context.cache_clear()
+
+
+@pytest.fixture
+def proxies(monkeypatch):
+    """Задаёт auth_trusted_proxies и сбрасывает разобранный список."""
+    def set_proxies(value: str):
+        monkeypatch.setattr(get_settings(), "auth_trusted_proxies", value)
+        trusted_proxies.cache_clear()
+
+    yield set_proxies
+    trusted_proxies.cache_clear()
+
+
+def login(client, email="test@example.com", password="testpass123"):
+    return client.post("/api/v1/auth/login", data={"username": email, "password": password})
+
+
+def make_request(host, forwarded=None):
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "client": (host, 40000), "headers": headers})
+
+
+class TestHashingExecutor:
+    """Тесты пула хеширования."""
+
+    def test_rejects_when_full(self):
+        """Сверх workers + max_queue задачи сразу отклоняются."""
+        executor = HashingExecutor(workers=1, max_queue=1)
+        release = threading.Event()
+
+        async def main():
+            running = [asyncio.ensure_future(executor.run(release.wait)) for _ in range(2)]
+            await asyncio.sleep(0.05)
+            with pytest.raises(HashingOverloaded):
+                await executor.run(release.wait)
+            stats = executor.stats()
+            release.set()
+            await asyncio.gather(*running)
+            return stats
+
+        stats = asyncio.run(main())
+        executor.shutdown()
+
+        assert stats["running"] == 1
+        assert stats["queued"] == 1
+        assert stats["rejected"] == 1
+
+    def test_metrics(self):
+        """Ожидание в очереди и время выполнения попадают в гистограммы."""
+        executor = HashingExecutor(workers=1, max_queue=4)
+
+        async def main():
+            return await asyncio.gather(*(executor.run(pow, 2, 10) for _ in range(3)))
+
+        assert asyncio.run(main()) == [1024] * 3
+        executor.shutdown()
+        stats = executor.stats()
+        assert stats["completed"] == 3
+        assert stats["queue_wait_ms"]["count"] == 3
+        assert stats["latency_ms"]["count"] == 3
+
+
+class TestTokenBucket:
+    """Тесты token bucket."""
+
+    def test_burst_then_limited(self, monkeypatch):
+        """После burst попыток - RateLimited, ведро пополняется со временем."""
+        now = [1000.0]
+        monkeypatch.setattr("app.services.hashing.time.monotonic", lambda: now[0])
+        limiter = TokenBucketLimiter(rate_per_minute=60, burst=2)
+
+        limiter.take("ip")
+        limiter.take("ip")
+        with pytest.raises(RateLimited) as exc_info:
+            limiter.take("ip")
+        assert exc_info.value.retry_after == pytest.approx(1.0)
+
+        limiter.take("other")
+        now[0] += 1
+        limiter.take("ip")
+
+    def test_max_keys(self):
+        """Число хранимых ключей ограничено."""
+        limiter = TokenBucketLimiter(rate_per_minute=60, burst=1, max_keys=2)
+        for key in ("a", "b", "c"):
+            limiter.take(key)
+
+        # "a" вытеснен и снова получает полное ведро
+        limiter.take("a")
+
+
+class TestAuthAdmission:
+    """Тесты ограничений /auth."""
+
+    def test_login_rate_limited_by_email(self, client, auth_headers):
+        """Лишние попытки входа для одного email получают 429."""
+        burst = get_settings().auth_rate_email_burst
+        # Регистрация и вход в auth_headers уже потратили две попытки
+        for _ in range(burst - 2):
+            assert login(client, password="wrong").status_code == 401
+
+        response = login(client, password="wrong")
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+
+    def test_client_ip_from_trusted_proxy(self, proxies):
+        """X-Forwarded-For читается только от доверенных прокси, справа налево."""
+        proxies("10.0.0.0/8")
+
+        assert client_ip(make_request("10.0.0.5", "1.1.1.1, 2.2.2.2, 10.0.0.7")) == "2.2.2.2"
+        # Клиент не прокси: заголовок мог подставить он сам
+        assert client_ip(make_request("8.8.8.8", "1.1.1.1")) == "8.8.8.8"
+        assert client_ip(make_request("10.0.0.5")) == "10.0.0.5"
+
+        # "*" доверяет соединению, но не адресам из заголовка
+        proxies("*")
+        assert client_ip(make_request("9.9.9.9", "6.6.6.6, 7.7.7.7")) == "7.7.7.7"
+
+    def test_ip_limit_behind_proxy(self, proxies, monkeypatch):
+        """За прокси у каждого клиента своё ведро; без доверия - одно общее на прокси."""
+        monkeypatch.setattr(get_auth_rate_limiter(), "by_ip", TokenBucketLimiter(1, 1))
+
+        def limited(ip, n):
+            try:
+                check_rate_limit(make_request("10.0.0.5", ip), f"user{n}@example.com")
+            except HTTPException as exc:
+                assert exc.status_code == 429
+                return True
+            return False
+
+        proxies("10.0.0.0/8")
+        assert not limited("1.1.1.1", 1)
+        assert limited("1.1.1.1", 2)
+        assert not limited("2.2.2.2", 3)
+
+        get_auth_rate_limiter().clear()
+        proxies("")
+        assert not limited("3.3.3.3", 4)
+        assert limited("4.4.4.4", 5)
+
+    def test_register_overloaded(self, client, monkeypatch):
+        """Заполненная очередь хеширования - 503 с Retry-After."""
+        class FullExecutor:
+            async def run(self, *args):
+                raise HashingOverloaded()
+
+        monkeypatch.setattr(auth_service, "get_hashing_executor", lambda: FullExecutor())
+
+        response = client.post(
+            "/api/v1/auth/register",
+            json={"email": "new@example.com", "password": "testpass123"}
+        )
+
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+
+    def test_rehash_on_login(self, client, db_session, bcrypt_rounds):
+        """После смены bcrypt_rounds хеш обновляется при входе."""
+        bcrypt_rounds(4)
+        client.post(
+            "/api/v1/auth/register",
+            json={"email": "test@example.com", "password": "testpass123"}
+        )
+        user = db_session.query(User).one()
+        assert user.password_hash.startswith("$2b$04$")
+
+        bcrypt_rounds(5)
+        assert login(client).status_code == 200
+
+        db_session.refresh(user)
+        assert user.password_hash.startswith("$2b$05$")
+        assert login(client).status_code == 200
+
+    def test_hashing_metrics(self, client, auth_headers, metrics_headers):
+        """/metrics/hashing показывает выполненные хеши."""
+        data = client.get("/api/v1/metrics/hashing", headers=metrics_headers).json()
+
+        assert data["completed"] >= 2
+        assert data["latency_ms"]["count"] >= 2
+        assert "limited_email" in data["rate_limits"]
@@ -0,0 +1,184 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from app.models.calculation import Calculation
+from app.services.cache import LRUCache, RedisCache, TieredCache
+from app.services.calculator import CalculatorService
+from app.services.idempotency import (
+    IdempotencyKeyReused,
+    IdempotencyStore,
+    get_idempotency_store
+)
+from tests.test_watermark import PAYLOAD
+
+
+def make_store(l2=None) -> IdempotencyStore:
+    return IdempotencyStore(TieredCache(LRUCache(maxsize=100, ttl=60), l2))
+
+
+def post(client, headers, key, payload=PAYLOAD):
+    return client.post(
+        "/api/v1/calculate",
+        json=payload,
+        headers={**headers, "Idempotency-Key": key}
+    )
+
+
+class TestIdempotencyStore:
+    """Тесты хранилища ключей идемпотентности."""
+
+    def test_concurrent_duplicates_coalesced(self):
+        """Одновременные запросы с одним ключом - один вызов produce."""
+        store = make_store()
+        calls = []
+
+        async def produce():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return b"body", True
+
+        async def main():
+            return await asyncio.gather(*(
+                store.run("idem:1:k", "fp", produce) for _ in range(5)
+            ))
+
+        results = asyncio.run(main())
+
+        assert len(calls) == 1
+        assert results[0] == (b"body", False)
+        assert results[1:] == [(b"body", True)] * 4
+        assert store.stats()["coalesced"] == 4
+        assert store.stats()["inflight"] == 0
+
+    def test_failed_leader_retried_by_waiter(self):
+        """Если первый запрос упал, ожидающий выполняет produce сам."""
+        store = make_store()
+        calls = []
+
+        async def produce():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            if len(calls) == 1:
+                raise RuntimeError("db down")
+            return b"body", True
+
+        async def main():
+            return await asyncio.gather(
+                store.run("idem:1:k", "fp", produce),
+                store.run("idem:1:k", "fp", produce),
+                return_exceptions=True
+            )
+
+        first, second = asyncio.run(main())
+
+        assert isinstance(first, RuntimeError)
+        assert second == (b"body", False)
+        assert len(calls) == 2
+
+    def test_reused_key(self):
+        """Тот же ключ с другим отпечатком запроса - IdempotencyKeyReused."""
+        store = make_store()
+        store.set("idem:1:k", "fp", b"body")
+
+        assert store.get("idem:1:k", "fp") == b"body"
+        with pytest.raises(IdempotencyKeyReused):
+            store.get("idem:1:k", "other")
+
+    def test_redis_ttl(self):
+        """Запись в Redis живёт TTL и видна другому воркеру."""
+        redis = fakeredis.FakeRedis()
+        store = make_store(RedisCache(redis, default_ttl=60))
+        store.set(IdempotencyStore.scope(1, "k"), "fp", b"body")
+
+        other_worker = make_store(RedisCache(redis, default_ttl=60))
+        key = "hydrocalc:" + IdempotencyStore.scope(1, "k")
+
+        assert other_worker.get(IdempotencyStore.scope(1, "k"), "fp") == b"body"
+        assert 0 < redis.pttl(key) <= 60_000
+
+
+class TestIdempotentCalculate:
+    """Тесты Idempotency-Key на POST /calculate."""
+
+    def setup_method(self):
+        get_idempotency_store().clear_local()
+
+    def test_replay_without_recalculation(self, client, auth_headers, db_session, monkeypatch):
+        """Повтор отдаёт тот же ответ без расчёта и без новой записи."""
+        first = post(client, auth_headers, "key-1")
+        assert first.status_code == 200
+        assert "idempotent-replayed" not in first.headers
+
+        calculate = CalculatorService.calculate_cached_async
+        calls = []
+
+        async def counting(request):
+            calls.append(1)
+            return await calculate(request)
+
+        monkeypatch.setattr(CalculatorService, "calculate_cached_async", staticmethod(counting))
+        second = post(client, auth_headers, "key-1")
+
+        assert second.status_code == 200
+        assert second.content == first.content
+        assert second.headers["idempotent-replayed"] == "true"
+        assert calls == []
+        assert db_session.query(Calculation).count() == 1
+
+    def test_store_miss_deduplicated_in_db(self, client, auth_headers, db_session):
+        """Без записи в хранилище (другой воркер) ключ отсекается в БД."""
+        post(client, auth_headers, "key-1")
+        get_idempotency_store().clear_local()
+
+        response = post(client, auth_headers, "key-1")
+
+        assert response.status_code == 200
+        assert response.headers["idempotent-replayed"] == "true"
+        assert db_session.query(Calculation).count() == 1
+        history = client.get("/api/v1/history", headers=auth_headers).json()
+        assert len(history) == 1
+
+    def test_different_keys_write(self, client, auth_headers, db_session):
+        """Разные ключи и запросы без ключа сохраняются как обычно."""
+        post(client, auth_headers, "key-1")
+        post(client, auth_headers, "key-2")
+        client.post("/api/v1/calculate", json=PAYLOAD, headers=auth_headers)
+
+        assert db_session.query(Calculation).count() == 3
+
+    def test_reused_key_with_other_payload(self, client, auth_headers):
+        """Тот же ключ с другим запросом - 422."""
+        post(client, auth_headers, "key-1")
+
+        response = post(client, auth_headers, "key-1", {**PAYLOAD, "junior_count": 11})
+
+        assert response.status_code == 422
+
+    def test_store_miss_reused_key_with_other_payload(self, client, auth_headers, db_session):
+        """При промахе хранилища другой запрос с тем же ключом отсекается по отпечатку в БД."""
+        post(client, auth_headers, "key-1")
+        get_idempotency_store().clear_local()
+
+        response = post(client, auth_headers, "key-1", {**PAYLOAD, "junior_count": 11})
+
+        assert response.status_code == 422
+        assert "idempotent-replayed" not in response.headers
+        assert db_session.query(Calculation).count() == 1
+        # Ответ на другой запрос не сохранился под ключом: повтор исходного - снова из БД
+        get_idempotency_store().clear_local()
+        assert post(client, auth_headers, "key-1").headers["idempotent-replayed"] == "true"
+
+    def test_invalid_key(self, client, auth_headers):
+        """Слишком длинный ключ - 400."""
+        assert post(client, auth_headers, "k" * 256).status_code == 400
+
+    def test_anonymous_ignores_key(self, client, db_session):
+        """Анонимный расчёт ничего не пишет, ключ не нужен."""
+        first = post(client, {}, "key-1")
+        second = post(client, {}, "key-1", {**PAYLOAD, "junior_count": 11})
+
+        assert first.status_code == second.status_code == 200
+        assert "idempotent-replayed" not in second.headers
+        assert db_session.query(Calculation).count() == 0
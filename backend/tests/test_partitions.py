@@ -0,0 +1,177 @@
+from datetime import date, datetime
+
+from app.schemas.calculation import CalculationRequest
+from app.services.calculator import CalculatorService
+from app.services.partitions import (
+    ARCHIVE_DROP,
+    PartitionService,
+    add_months,
+    partition_month,
+    partition_name
+)
+from app.services.watermark import WatermarkService
+from tests.conftest import engine
+
+
+def sqlite_detach(month: date) -> list:
+    """DETACH PARTITION для обычной таблицы SQLite: строки месяца переходят в таблицу партиции."""
+    start, end = month.isoformat(), add_months(month, 1).isoformat()
+    in_month = f"created_at >= '{start}' AND created_at < '{end}'"
+    return [
+        f"CREATE TABLE {partition_name(month)} AS SELECT * FROM calculations WHERE {in_month}",
+        f"DELETE FROM calculations WHERE {in_month}",
+    ]
+
+
+class TestPartitionPlan:
+    """Тесты плана обслуживания партиций."""
+
+    def test_names_roundtrip(self):
+        """Имя партиции однозначно задаёт месяц."""
+        assert partition_name(date(2025, 3, 1)) == "calculations_y2025m03"
+        assert partition_month("calculations_y2025m03") == date(2025, 3, 1)
+        assert partition_month("calculations_default") is None
+
+    def test_add_months_crosses_year(self):
+        """Сдвиг месяцев переходит через границу года."""
+        assert add_months(date(2025, 11, 1), 3) == date(2026, 2, 1)
+        assert add_months(date(2025, 1, 1), -1) == date(2024, 12, 1)
+
+    def test_creates_missing_ahead(self):
+        """Создаются только недостающие партиции с текущего месяца вперёд."""
+        plan = PartitionService.plan(
+            existing=[date(2025, 12, 1), date(2026, 1, 1)],
+            today=date(2025, 12, 17),
+            months_ahead=3
+        )
+
+        assert plan.create == [date(2026, 2, 1), date(2026, 3, 1)]
+        assert plan.archive == []
+
+    def test_archives_after_retention(self):
+        """Архивируются партиции старше срока хранения."""
+        existing = [add_months(date(2024, 1, 1), i) for i in range(24)]
+        plan = PartitionService.plan(
+            existing=existing,
+            today=date(2025, 12, 17),
+            months_ahead=0,
+            retention_months=12
+        )
+
+        assert plan.archive == [add_months(date(2024, 1, 1), i) for i in range(11)]
+        assert date(2024, 12, 1) not in plan.archive
+
+    def test_create_statements(self):
+        """Партиция создаётся одним CREATE ... PARTITION OF."""
+        assert PartitionService.create_statements(date(2026, 2, 1)) == [
+            "CREATE TABLE IF NOT EXISTS calculations_y2026m02 PARTITION OF calculations "
+            "FOR VALUES FROM ('2026-02-01') TO ('2026-03-01')"
+        ]
+
+    def test_create_moves_rows_from_default(self):
+        """Строки месяца из default переносятся в новую партицию при отсоединённом default."""
+        statements = PartitionService.create_statements(date(2026, 2, 1), move_default=True)
+
+        assert statements[0] == "ALTER TABLE calculations DETACH PARTITION calculations_default"
+        assert statements[1].startswith("CREATE TABLE IF NOT EXISTS calculations_y2026m02 ")
+        in_month = "created_at >= '2026-02-01' AND created_at < '2026-03-01'"
+        assert statements[2] == (
+            "INSERT INTO calculations_y2026m02 SELECT * FROM calculations_default "
+            f"WHERE {in_month}"
+        )
+        assert statements[3] == f"DELETE FROM calculations_default WHERE {in_month}"
+        assert statements[4] == (
+            "ALTER TABLE calculations ATTACH PARTITION calculations_default DEFAULT"
+        )
+
+    def test_noop_without_partitioning(self):
+        """В SQLite таблица не секционирована, обслуживание ничего не делает."""
+        with engine.connect() as conn:
+            assert PartitionService.maintain(conn, date.today(), 3) is None
+
+
+class TestHistorySince:
+    """Тесты фильтра since в истории."""
+
+    def test_since_filters_history(self, client, auth_headers, db_session):
+        """since отбрасывает расчёты раньше указанного момента."""
+        request = CalculationRequest(season="cold", activity="normal", junior_count=1)
+        rows = []
+        for month in (1, 2, 3):
+            row = CalculatorService.calculation_row(request, float(month), 1)
+            row["created_at"] = datetime(2025, month, 10)
+            rows.append(row)
+        CalculatorService.insert_calculations(db_session, rows)
+
+        response = client.get(
+            "/api/v1/history",
+            params={"since": "2025-02-01T00:00:00"},
+            headers=auth_headers
+        )
+
+        assert [item["total_water"] for item in response.json()] == [3.0, 2.0]
+
+
+class TestArchiveHistory:
+    """Архивирование партиции видно в истории как удаление её расчётов."""
+
+    def test_archive_updates_watermark_and_changes(
+        self, client, auth_headers, db_session, monkeypatch
+    ):
+        """После архивирования меняется ETag, кэш не отдаёт строки, лента сообщает об удалении."""
+        request = CalculationRequest(season="cold", activity="normal", junior_count=1)
+        rows = []
+        for created_at, total_water in (
+            (datetime(2024, 1, 10), 1.0),
+            (datetime(2024, 1, 20), 2.0),
+            (datetime(2025, 3, 10), 3.0),
+        ):
+            row = CalculatorService.calculation_row(request, total_water, 1)
+            row["created_at"] = created_at
+            rows.append(row)
+        CalculatorService.insert_calculations(db_session, rows)
+
+        before = client.get("/api/v1/history", headers=auth_headers)
+        synced = client.get("/api/v1/history/changes", headers=auth_headers).json()
+        archived_ids = sorted(item["id"] for item in before.json() if item["total_water"] < 3)
+        assert client.get(f"/api/v1/history/{archived_ids[0]}", headers=auth_headers).status_code == 200
+
+        monkeypatch.setattr(PartitionService, "detach_statements", staticmethod(sqlite_detach))
+        with engine.begin() as conn:
+            PartitionService.archive_partition(conn, date(2024, 1, 1), ARCHIVE_DROP)
+
+        response = client.get(
+            "/api/v1/history",
+            headers={**auth_headers, "If-None-Match": before.headers["etag"]}
+        )
+        assert response.status_code == 200
+        assert response.headers["etag"] != before.headers["etag"]
+        assert [item["total_water"] for item in response.json()] == [3.0]
+        assert client.get(
+            f"/api/v1/history/{archived_ids[0]}", headers=auth_headers
+        ).status_code == 404
+
+        delta = client.get(
+            "/api/v1/history/changes",
+            params={"since": synced["cursor"]},
+            headers=auth_headers
+        ).json()
+        assert sorted(delta["deleted"]) == archived_ids
+        assert delta["created"] == []
+        assert delta["cursor"] == "5"
+
+        watermark = WatermarkService.get(db_session, 1)
+        assert (watermark.row_count, watermark.deletions) == (1, 2)
+
+    def test_anonymous_rows_not_recorded(self, db_session):
+        """Анонимные расчёты в истории не участвуют и надгробий не получают."""
+        request = CalculationRequest(season="cold", activity="normal", junior_count=1)
+        row = CalculatorService.calculation_row(request, 1.0, None)
+        row["created_at"] = datetime(2024, 1, 10)
+        CalculatorService.insert_calculations(db_session, [row])
+
+        with engine.begin() as conn:
+            for statement in sqlite_detach(date(2024, 1, 1)):
+                conn.exec_driver_sql(statement)
+            assert PartitionService.record_removal(conn, partition_name(date(2024, 1, 1))) == 0
+            conn.exec_driver_sql(f"DROP TABLE {partition_name(date(2024, 1, 1))}")
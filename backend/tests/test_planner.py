@@ -0,0 +1,116 @@
+from datetime import date, timedelta
+
+from app.schemas.calculation import CalculationRequest
+from app.services.calculator import CalculatorService
+
+
+def daily_value(**params) -> float:
+    """Скалярный расчёт на один день для сравнения."""
+    return CalculatorService.calculate(CalculationRequest(**params)).total_water
+
+
+class TestPlanner:
+    """Тесты планировщика за период."""
+
+    def test_plan_with_segments_and_headcount(self, client):
+        """Сегменты и изменения численности применяются по дням."""
+        payload = {
+            # Понедельник 2025-09-01 - воскресенье 2025-09-14
+            "start": "2025-09-01",
+            "end": "2025-09-14",
+            "season": "warm",
+            "segments": [
+                {"start": "2025-09-08", "end": "2025-09-14", "season": "cold"},
+                {"start": "2025-09-03", "end": "2025-09-03", "activity": "sport"},
+            ],
+            "schools": [
+                {
+                    "name": "Школа 1",
+                    "junior_count": 10,
+                    "staff_count": 2,
+                    "headcount_changes": [{"date": "2025-09-10", "junior_count": 20}],
+                    "segments": [{"start": "2025-09-12", "end": "2025-09-12", "activity": "trip"}]
+                },
+                {"name": "Школа 2", "senior_count": 5, "segments": [
+                    {"start": "2025-09-13", "end": "2025-09-20", "closed": True}
+                ]}
+            ],
+            "include_daily": True
+        }
+
+        response = client.post("/api/v1/plan", json=payload)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["days"] == 14
+
+        expected = []
+        for offset in range(14):
+            day = date(2025, 9, 1) + timedelta(days=offset)
+            season = "cold" if day >= date(2025, 9, 8) else "warm"
+            activity = "sport" if day == date(2025, 9, 3) else "normal"
+            first_activity = "trip" if day == date(2025, 9, 12) else activity
+            first = daily_value(
+                junior_count=20 if day >= date(2025, 9, 10) else 10,
+                staff_count=2,
+                season=season,
+                activity=first_activity
+            )
+            second = 0.0 if day >= date(2025, 9, 13) else daily_value(
+                senior_count=5, season=season, activity=activity
+            )
+            expected.append((first, second))
+
+        first_school, second_school = data["schools"]
+        assert first_school["daily"] == [first for first, _ in expected]
+        assert second_school["daily"] == [second for _, second in expected]
+        assert first_school["total_water"] == round(sum(first for first, _ in expected), 2)
+
+        assert data["week_starts"] == ["2025-09-01", "2025-09-08"]
+        week_one = sum(first + second for first, second in expected[:7])
+        assert data["weekly"][0] == round(week_one, 2)
+        assert first_school["weekly"][1] == round(sum(first for first, _ in expected[7:]), 2)
+        assert data["total_water"] == round(
+            first_school["total_water"] + second_school["total_water"], 2
+        )
+
+    def test_plan_skip_weekends_partial_week(self, client):
+        """Выходные исключаются, первая неделя может быть неполной."""
+        response = client.post("/api/v1/plan", json={
+            "start": "2025-09-04",
+            "end": "2025-09-09",
+            "season": "cold",
+            "skip_weekends": True,
+            "schools": [{"name": "Школа", "junior_count": 10}]
+        })
+
+        data = response.json()
+        assert data["week_starts"] == ["2025-09-04", "2025-09-08"]
+        # Чт, Пт в первой неделе; Пн, Вт во второй
+        assert data["weekly"] == [32.0, 32.0]
+        assert data["schools"][0]["daily"] is None
+
+    def test_plan_limit(self, client, monkeypatch):
+        """Слишком большой план отклоняется."""
+        from app.routers import planner
+
+        monkeypatch.setattr(planner.settings, "plan_max_cells", 10)
+        response = client.post("/api/v1/plan", json={
+            "start": "2025-09-01",
+            "end": "2025-09-30",
+            "season": "cold",
+            "schools": [{"name": "Школа"}]
+        })
+
+        assert response.status_code == 413
+
+    def test_plan_invalid_dates(self, client):
+        """Конец периода раньше начала."""
+        response = client.post("/api/v1/plan", json={
+            "start": "2025-09-10",
+            "end": "2025-09-01",
+            "season": "cold",
+            "schools": [{"name": "Школа"}]
+        })
+
+        assert response.status_code == 422
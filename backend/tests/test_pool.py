@@ -0,0 +1,166 @@
+import anyio
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, exc
+from sqlalchemy.orm import Session
+
+from app import database
+from app.config import get_settings
+from app.database import ReplicaRouter
+from app.pool import InstrumentedQueuePool, WaitHistogram
+from app.routers import metrics as metrics_module
+
+
+def make_engine(path, **kw):
+    """Движок SQLite-файла с инструментированным пулом."""
+    return create_engine(f"sqlite:///{path}", poolclass=InstrumentedQueuePool, **kw)
+
+
+class TestWaitHistogram:
+    """Тесты гистограммы времени ожидания."""
+
+    def test_buckets(self):
+        """Значения попадают в корзину с ближайшей верхней границей."""
+        histogram = WaitHistogram(buckets_ms=(1, 10))
+        for ms in (0.5, 1, 5, 50):
+            histogram.observe(ms)
+
+        snapshot = histogram.snapshot()
+        assert snapshot["buckets"] == {"1": 2, "10": 1, "inf": 1}
+        assert snapshot["count"] == 4
+        assert snapshot["max_ms"] == 50
+
+    def test_empty(self):
+        """Пустая гистограмма не делит на ноль."""
+        assert WaitHistogram().snapshot()["avg_ms"] == 0.0
+
+
+class TestInstrumentedPool:
+    """Тесты учёта выдачи соединений."""
+
+    def test_checkout_counters(self, tmp_path):
+        """Пул считает выдачи и занятые соединения."""
+        engine = make_engine(tmp_path / "pool.db", pool_size=2, max_overflow=1)
+        with engine.connect():
+            with engine.connect():
+                metrics = engine.pool.metrics()
+                assert metrics["checked_out"] == 2
+                assert metrics["size"] == 2
+        metrics = engine.pool.metrics()
+        assert metrics["checked_out"] == 0
+        assert metrics["checkout_wait_ms"]["count"] == 2
+        engine.dispose()
+
+    def test_timeout_counted(self, tmp_path):
+        """Таймаут ожидания соединения попадает в счётчик."""
+        engine = make_engine(tmp_path / "pool.db", pool_size=1, max_overflow=0, pool_timeout=0.05)
+        with engine.connect():
+            with pytest.raises(exc.TimeoutError):
+                engine.connect()
+        metrics = engine.pool.metrics()
+        assert metrics["timeouts"] == 1
+        assert metrics["checkout_wait_ms"]["max_ms"] >= 50
+        engine.dispose()
+
+    def test_stats_survive_recreate(self, tmp_path):
+        """Счётчики сохраняются при пересоздании пула."""
+        engine = make_engine(tmp_path / "pool.db")
+        with engine.connect():
+            pass
+        assert engine.pool.recreate().stats is engine.pool.stats
+        engine.dispose()
+
+    def test_pool_options_skip_memory_sqlite(self):
+        """Для SQLite в памяти и aiosqlite параметры пула не передаются."""
+        assert database.pool_options("sqlite://") == {}
+        assert database.pool_options("sqlite+aiosqlite:///x.db", async_=True) == {}
+        assert database.pool_options("postgresql://u@h/db")["poolclass"] is InstrumentedQueuePool
+
+
+class TestRequestSlots:
+    """Тесты слотов запросов к БД."""
+
+    def test_slots_limit_concurrency(self, monkeypatch):
+        """Слот заняли не больше запросов, чем есть слотов; остальные ждут."""
+        active = []
+        peak = []
+
+        async def request():
+            async with database.hold_request_slot():
+                active.append(1)
+                peak.append(len(active))
+                await anyio.sleep(0.01)
+                active.pop()
+
+        async def main():
+            monkeypatch.setattr(database, "_request_slots", anyio.CapacityLimiter(2))
+            async with anyio.create_task_group() as tg:
+                for _ in range(6):
+                    tg.start_soon(request)
+
+        anyio.run(main)
+        assert max(peak) == 2
+
+    def test_one_slot_per_request(self, monkeypatch, db_session):
+        """get_db и get_read_db одного запроса занимают один слот и одну сессию."""
+        app = FastAPI()
+
+        @app.get("/both")
+        def both(
+            db: Session = Depends(database.get_db),
+            read_db: Session = Depends(database.get_read_db)
+        ):
+            return {"same": db is read_db}
+
+        monkeypatch.setattr(database, "SessionLocal", lambda: db_session)
+        with TestClient(app) as client:
+            monkeypatch.setattr(database, "_request_slots", None)
+            database.init_request_slots().total_tokens = 1
+            response = client.get("/both")
+
+        assert response.json() == {"same": True}
+
+
+class TestPoolMetrics:
+    """Тесты эндпоинта /metrics/pool."""
+
+    def test_pool_metrics(self, client, metrics_headers):
+        """Метрики содержат пул потоков, слоты и ёмкость воркера."""
+        response = client.get("/api/v1/metrics/pool", headers=metrics_headers)
+
+        assert response.status_code == 200
+        data = response.json()
+        settings = database.settings
+        assert data["threadpool"]["total"] == settings.threadpool_tokens
+        assert data["request_slots"]["total"] == database.request_slots_total()
+        assert data["connections_per_worker"] >= settings.db_pool_size + settings.db_max_overflow
+        assert "primary" in data
+
+    @pytest.mark.parametrize("path", ["/api/v1/metrics/pool", "/api/v1/metrics/replicas"])
+    def test_requires_token(self, client, metrics_headers, path):
+        """Без токена или с чужим токеном - 401."""
+        assert client.get(path).status_code == 401
+        assert client.get(path, headers={"X-Metrics-Token": "other"}).status_code == 401
+        assert client.get(path, headers=metrics_headers).status_code == 200
+
+    def test_disabled_without_token_setting(self, client, monkeypatch):
+        """Если METRICS_TOKEN не задан, метрик нет (404)."""
+        monkeypatch.setattr(get_settings(), "metrics_token", None)
+
+        response = client.get("/api/v1/metrics/cache", headers={"X-Metrics-Token": ""})
+
+        assert response.status_code == 404
+
+    def test_replica_urls_hidden(self, client, metrics_headers, tmp_path, monkeypatch):
+        """Адреса реплик не попадают в ответы метрик."""
+        url = f"sqlite:///{tmp_path / 'secret-replica-host.db'}"
+        router = ReplicaRouter([url])
+        monkeypatch.setattr(metrics_module, "get_replica_router", lambda: router)
+
+        for path in ("/api/v1/metrics/pool", "/api/v1/metrics/replicas"):
+            response = client.get(path, headers=metrics_headers)
+            assert response.status_code == 200
+            assert "secret-replica-host" not in response.text
+        replicas = client.get("/api/v1/metrics/replicas", headers=metrics_headers).json()
+        assert len(replicas["replicas"]) == 1
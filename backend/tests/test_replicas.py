@@ -0,0 +1,170 @@
+import pytest
+from sqlalchemy import create_engine
+
+from app import database
+from app.database import Base, ReplicaRouter, get_read_db
+from app.main import app
+from app.models.user import User
+from app.services.cache import LRUCache, get_cache
+from tests.conftest import TestingSessionLocal
+
+PAYLOAD = {
+    "junior_count": 10,
+    "middle_count": 5,
+    "senior_count": 3,
+    "staff_count": 2,
+    "season": "warm",
+    "activity": "sport"
+}
+
+
+def make_database(path) -> str:
+    """Пустая БД SQLite со схемой приложения."""
+    url = f"sqlite:///{path}"
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    engine.dispose()
+    return url
+
+
+def database_name(db) -> str:
+    """Файл БД, к которой привязана сессия."""
+    return db.get_bind().url.database or ""
+
+
+@pytest.fixture
+def replica_urls(tmp_path):
+    return [make_database(tmp_path / "replica_a.db"), make_database(tmp_path / "replica_b.db")]
+
+
+@pytest.fixture
+def dead_url(tmp_path):
+    """URL реплики, к которой нельзя подключиться."""
+    return f"sqlite:///{tmp_path / 'missing' / 'replica.db'}"
+
+
+class TestReplicaRouter:
+    """Тесты выбора реплики для чтения."""
+
+    def test_round_robin(self, replica_urls):
+        """Чтения распределяются по репликам по кругу."""
+        router = ReplicaRouter(replica_urls, primary=TestingSessionLocal)
+
+        names = []
+        for _ in range(4):
+            db = router.read_session()
+            names.append(database_name(db).rsplit("/", 1)[-1])
+            db.close()
+
+        assert names == ["replica_a.db", "replica_b.db", "replica_a.db", "replica_b.db"]
+        assert [replica["reads"] for replica in router.stats()["replicas"]] == [2, 2]
+
+    def test_unhealthy_replica_skipped(self, replica_urls, dead_url):
+        """Недоступная реплика исключается, чтение идёт на следующую."""
+        router = ReplicaRouter([dead_url, replica_urls[0]], primary=TestingSessionLocal)
+
+        for _ in range(3):
+            db = router.read_session()
+            assert database_name(db) == replica_urls[0].removeprefix("sqlite:///")
+            db.close()
+
+        dead, alive = router.stats()["replicas"]
+        assert dead["healthy"] is False
+        assert dead["failures"] == 1
+        assert alive["reads"] == 3
+
+    def test_fallback_to_primary(self, dead_url):
+        """Без доступных реплик чтение идёт на основную БД."""
+        router = ReplicaRouter([dead_url], retry_after=60, primary=TestingSessionLocal)
+
+        for _ in range(2):
+            db = router.read_session()
+            assert database_name(db) == ":memory:"
+            db.close()
+
+        stats = router.stats()
+        assert stats["fallbacks"] == 2
+        assert stats["replicas"][0]["failures"] == 1
+
+    def test_no_replicas_uses_primary(self):
+        """Без настроенных реплик используется основная БД."""
+        router = ReplicaRouter([], primary=TestingSessionLocal)
+        db = router.read_session()
+
+        assert database_name(db) == ":memory:"
+        db.close()
+        assert router.stats()["fallbacks"] == 0
+
+
+class TestReadYourWrites:
+    """Тесты чтения своих записей при отстающей реплике."""
+
+    @pytest.fixture
+    def lagging_replica(self, client, replica_urls, monkeypatch):
+        """Подключает реплику, на которую не доходят записи (бесконечное отставание)."""
+        def use_router(read_your_writes):
+            router = ReplicaRouter(
+                replica_urls[:1],
+                read_your_writes=read_your_writes,
+                primary=TestingSessionLocal
+            )
+            monkeypatch.setattr(database, "get_replica_router", lambda: router)
+            return router
+
+        app.dependency_overrides.pop(get_read_db)
+        return use_router
+
+    def _history_after_write(self, client, auth_headers, db_session):
+        # Пользователь есть и на реплике, расчётов на ней нет
+        engine = create_engine(database.get_replica_router().replicas[0].url)
+        with engine.begin() as conn:
+            user = db_session.query(User).one()
+            conn.execute(User.__table__.insert().values(
+                id=user.id,
+                email=user.email,
+                password_hash=user.password_hash,
+                created_at=user.created_at
+            ))
+        engine.dispose()
+
+        client.post("/api/v1/calculate", json=PAYLOAD, headers=auth_headers)
+        return client.get("/api/v1/history", headers=auth_headers).json()
+
+    def test_replica_lag_visible_without_window(self, client, auth_headers, db_session, lagging_replica):
+        """Без окна read-your-writes история читается с реплики."""
+        lagging_replica(0)
+
+        assert self._history_after_write(client, auth_headers, db_session) == []
+
+    def test_window_reads_primary(self, client, auth_headers, db_session, lagging_replica):
+        """В окне после своей записи история читается с основной БД."""
+        router = lagging_replica(30)
+
+        history = self._history_after_write(client, auth_headers, db_session)
+
+        assert len(history) == 1
+        assert router.stats()["primary_reads"] == 1
+
+    def test_window_without_result_cache(
+        self, client, auth_headers, db_session, lagging_replica, monkeypatch
+    ):
+        """Окно действует и без кэша результатов (CALC_CACHE_SIZE=0, без Redis)."""
+        monkeypatch.setattr(get_cache(), "l1", LRUCache(maxsize=0))
+        router = lagging_replica(30)
+
+        history = self._history_after_write(client, auth_headers, db_session)
+
+        assert len(history) == 1
+        assert router.stats()["primary_reads"] == 1
+
+    def test_mark_survives_result_cache_churn(self, monkeypatch):
+        """Отметку о записи не вытесняют расчёты, прошедшие через кэш результатов."""
+        monkeypatch.setattr(get_cache(), "l1", LRUCache(maxsize=2))
+        router = ReplicaRouter(["sqlite://"], read_your_writes=30)
+        router.note_write(7)
+
+        for i in range(10):
+            get_cache().set(f"calc:{i}", b"{}")
+
+        assert router._recent_write(7)
+        assert not router._recent_write(8)
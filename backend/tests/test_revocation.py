@@ -0,0 +1,187 @@
+import asyncio
+import threading
+
+import fakeredis
+import pytest
+from sqlalchemy import event
+
+from app.config import get_settings
+from app.services.auth import AuthService, get_principal_cache
+from app.services.revocation import BloomFilter, RevocationList
+from tests.conftest import engine
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis()
+
+
+@pytest.fixture
+def user_queries():
+    """Считает запросы к таблице users."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        if "FROM users" in statement:
+            statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def make_list(client=None, refresh_seconds=0.0) -> RevocationList:
+    return RevocationList(bits=1024, hashes=4, refresh_seconds=refresh_seconds, client=client)
+
+
+class TestBloomFilter:
+    """Тесты фильтра Блума."""
+
+    def test_membership(self):
+        """Добавленные элементы всегда в фильтре, ложных срабатываний мало."""
+        bloom = BloomFilter(bits=65_536, hashes=4)
+        for user_id in range(1000):
+            bloom.add(user_id)
+
+        assert all(user_id in bloom for user_id in range(1000))
+        false_positives = sum(user_id in bloom for user_id in range(1000, 11_000))
+        assert false_positives < 100
+
+    def test_redis_bit_order(self, redis_client):
+        """Биты, выставленные SETBIT в Redis, читаются фильтром."""
+        bloom = BloomFilter(bits=1024, hashes=4)
+        for position in bloom.positions(42):
+            redis_client.setbit("bloom", position, 1)
+
+        assert 42 in BloomFilter(1024, 4, redis_client.get("bloom"))
+
+
+class TestRevocationList:
+    """Тесты списка отзыва."""
+
+    def test_local_revoke(self):
+        """Без Redis отзыв действует в своём процессе."""
+        revocations = make_list()
+        revocations.revoke([7])
+
+        assert revocations.is_revoked(7)
+        assert not revocations.is_revoked(8)
+
+    def test_shared_between_workers(self, redis_client):
+        """Отзыв в одном воркере виден другому после обновления фильтра."""
+        worker_a = make_list(redis_client, refresh_seconds=60)
+        worker_b = make_list(redis_client, refresh_seconds=60)
+        worker_b.refresh(force=True)
+
+        worker_a.revoke([7])
+
+        # Пока фильтр не перечитан, отзыв в другом воркере не виден
+        assert not worker_b.is_revoked(7)
+        worker_b.refresh(force=True)
+        assert worker_b.is_revoked(7)
+        assert not worker_b.is_revoked(8)
+
+    def test_redis_error_fails_closed(self, redis_client):
+        """Ошибка точной проверки при попадании в фильтр - отказ."""
+        worker_a = make_list(redis_client)
+        worker_a.revoke([7])
+        worker_b = make_list(redis_client)
+        worker_b.refresh(force=True)
+
+        def broken_sismember(*args):
+            raise ConnectionError("redis недоступен")
+
+        redis_client.sismember = broken_sismember
+
+        assert worker_b.is_revoked(7)
+        assert worker_b.stats()["errors"] == 1
+
+
+    def test_async_check_network_off_event_loop(self, redis_client):
+        """is_revoked_async уходит в пул потоков только ради обращений к Redis."""
+        worker_a = make_list(redis_client)
+        worker_a.revoke([7])
+        worker = make_list(redis_client, refresh_seconds=60)
+        worker.refresh(force=True)
+        threads = []
+        sismember = redis_client.sismember
+        redis_client.sismember = lambda *args: threads.append(threading.get_ident()) or sismember(*args)
+
+        async def check(user_id):
+            return threading.get_ident(), await worker.is_revoked_async(user_id)
+
+        loop_thread, revoked = asyncio.run(check(7))
+        assert revoked
+        assert threads and loop_thread not in threads
+
+        # Фильтр свежий, 8 в него не попал - проверка без сети и без пула
+        threads.clear()
+        assert asyncio.run(check(8))[1] is False
+        assert threads == []
+
+
+class TestPrincipalFastPath:
+    """Тесты аутентификации без запроса к БД."""
+
+    def test_cached_principal(self, client, auth_headers, user_queries):
+        """Повторные запросы не читают пользователя из БД."""
+        for _ in range(3):
+            assert client.get("/api/v1/history", headers=auth_headers).status_code == 200
+
+        assert len(user_queries) == 1
+
+    def test_revoked_token_rejected(self, client, auth_headers, db_session):
+        """Отозванный токен отклоняется, даже если principal в кэше."""
+        assert client.get("/api/v1/history", headers=auth_headers).status_code == 200
+        user_id = AuthService.decode_user_id(auth_headers["X-Auth-Token"])
+
+        AuthService.revoke_users([user_id])
+
+        assert client.get("/api/v1/history", headers=auth_headers).status_code == 401
+        assert get_principal_cache().get(user_id) is None
+
+    def test_deleted_user_rejected(self, client, auth_headers, db_session):
+        """Удаление пользователя отзывает его токены."""
+        user_id = AuthService.decode_user_id(auth_headers["X-Auth-Token"])
+
+        assert AuthService.delete_user(db_session, user_id)
+
+        assert client.get("/api/v1/history", headers=auth_headers).status_code == 401
+
+    def test_trust_claims(self, client, auth_headers, user_queries, monkeypatch):
+        """С auth_trust_claims пользователь не читается из БД совсем."""
+        monkeypatch.setattr(get_settings(), "auth_trust_claims", True)
+        user_queries.clear()
+
+        assert client.get("/api/v1/history", headers=auth_headers).status_code == 200
+        assert user_queries == []
+
+    def test_revoked_calculate_is_anonymous(self, client, auth_headers, db_session):
+        """Расчёт с отозванным токеном не сохраняется."""
+        user_id = AuthService.decode_user_id(auth_headers["X-Auth-Token"])
+        AuthService.revoke_users([user_id])
+
+        response = client.post(
+            "/api/v1/calculate",
+            json={
+                "junior_count": 1,
+                "middle_count": 0,
+                "senior_count": 0,
+                "staff_count": 0,
+                "season": "warm",
+                "activity": "normal"
+            },
+            headers=auth_headers
+        )
+
+        assert response.status_code == 200
+        assert client.get("/api/v1/history", headers=auth_headers).status_code == 401
+
+    def test_auth_metrics(self, client, auth_headers, metrics_headers):
+        """/metrics/auth показывает попадания в кэш principal."""
+        client.get("/api/v1/history", headers=auth_headers)
+        client.get("/api/v1/history", headers=auth_headers)
+
+        data = client.get("/api/v1/metrics/auth", headers=metrics_headers).json()
+        assert data["principals"]["hits"] >= 1
+        assert data["revocations"]["shared"] is False
@@ -0,0 +1,131 @@
+from datetime import datetime
+
+from app.models.calculation_rollup import CalculationRollup
+from app.schemas.calculation import CalculationRequest, HistoryStats
+from app.services.calculator import CalculatorService
+from app.services.rollup import RollupService
+
+
+def make_request(season="cold", activity="normal", junior_count=10):
+    return CalculationRequest(
+        junior_count=junior_count,
+        middle_count=0,
+        senior_count=0,
+        staff_count=0,
+        season=season,
+        activity=activity
+    )
+
+
+def make_row(user_id, created_at, season="cold", activity="normal", total_water=10.0):
+    row = CalculatorService.calculation_row(make_request(season, activity), total_water, user_id)
+    row["created_at"] = created_at
+    return row
+
+
+class TestRollupService:
+    """Тесты агрегатов истории."""
+
+    def test_insert_updates_buckets(self, db_session, auth_headers):
+        """Пакетная вставка прибавляет к корзинам по месяцу, сезону и активности."""
+        CalculatorService.insert_calculations(db_session, [
+            make_row(1, datetime(2025, 1, 3), total_water=1.5),
+            make_row(1, datetime(2025, 1, 31, 23, 59), total_water=2.5),
+            make_row(1, datetime(2025, 2, 1), total_water=4.0),
+            make_row(1, datetime(2025, 2, 2), "warm", "sport", 8.0),
+            make_row(None, datetime(2025, 1, 3), total_water=100.0),
+        ])
+        CalculatorService.insert_calculations(db_session, [
+            make_row(1, datetime(2025, 1, 10), total_water=3.0),
+        ])
+
+        buckets = {
+            (b.month.isoformat(), b.season, b.activity): (b.count, b.total_water)
+            for b in db_session.query(CalculationRollup).all()
+        }
+        assert buckets == {
+            ("2025-01-01", "cold", "normal"): (3, 7.0),
+            ("2025-02-01", "cold", "normal"): (1, 4.0),
+            ("2025-02-01", "warm", "sport"): (1, 8.0),
+        }
+
+    def test_save_calculation_updates_buckets(self, db_session, auth_headers):
+        """Одиночное сохранение тоже обновляет агрегаты."""
+        CalculatorService.save_calculation(db_session, make_request(), 16.0, 1)
+        CalculatorService.save_calculation(db_session, make_request(), 16.0, 1)
+
+        stats = RollupService.get_stats(db_session, 1)
+        assert stats["count"] == 2
+        assert stats["total_water"] == 32.0
+
+    def test_stats_grouping(self, db_session, auth_headers):
+        """Статистика группирует корзины по месяцу и по сезону с активностью."""
+        CalculatorService.insert_calculations(db_session, [
+            make_row(1, datetime(2025, 1, 3), "cold", "normal", 1.0),
+            make_row(1, datetime(2025, 1, 4), "warm", "trip", 2.0),
+            make_row(1, datetime(2025, 3, 4), "cold", "normal", 4.0),
+        ])
+
+        stats = RollupService.get_stats(db_session, 1)
+
+        assert HistoryStats.model_validate(stats)
+        assert stats["count"] == 3
+        assert stats["total_water"] == 7.0
+        assert [(m["month"].isoformat(), m["count"], m["total_water"]) for m in stats["by_month"]] == [
+            ("2025-01-01", 2, 3.0),
+            ("2025-03-01", 1, 4.0),
+        ]
+        assert [
+            (g["season"], g["activity"], g["count"], g["total_water"])
+            for g in stats["by_season_activity"]
+        ] == [
+            ("cold", "normal", 2, 5.0),
+            ("warm", "trip", 1, 2.0),
+        ]
+
+
+class TestHistoryStatsEndpoint:
+    """Тесты GET /history/stats."""
+
+    def test_stats_after_calculations(self, client, auth_headers):
+        """Расчёты через API попадают в статистику."""
+        payload = {
+            "junior_count": 10,
+            "middle_count": 0,
+            "senior_count": 0,
+            "staff_count": 0,
+            "season": "warm",
+            "activity": "sport"
+        }
+        total = 0.0
+        for _ in range(3):
+            total += client.post(
+                "/api/v1/calculate",
+                json=payload,
+                headers=auth_headers
+            ).json()["total_water"]
+
+        response = client.get("/api/v1/history/stats", headers=auth_headers)
+
+        assert response.status_code == 200
+        stats = response.json()
+        assert stats["count"] == 3
+        assert stats["total_water"] == round(total, 2)
+        assert stats["by_season_activity"] == [
+            {"season": "warm", "activity": "sport", "count": 3, "total_water": round(total, 2)}
+        ]
+
+    def test_stats_empty(self, client, auth_headers):
+        """Пустая история - нулевая статистика."""
+        response = client.get("/api/v1/history/stats", headers=auth_headers)
+
+        assert response.json() == {
+            "count": 0,
+            "total_water": 0,
+            "by_month": [],
+            "by_season_activity": []
+        }
+
+    def test_stats_requires_auth(self, client):
+        """Статистика без токена недоступна."""
+        assert client.get("/api/v1/history/stats").status_code == 401
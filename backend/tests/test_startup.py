@@ -0,0 +1,111 @@
+import subprocess
+import sys
+import time
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.main import app
+from app.pool import InstrumentedQueuePool
+from app.startup import (
+    BACKEND_DIR,
+    SchemaRevisionError,
+    check_schema_revision,
+    head_revisions,
+    warm_pool
+)
+
+
+def wait_ready(client, timeout: float = 10.0):
+    """Ждёт окончания фонового прогрева и возвращает ответ /ready."""
+    deadline = time.monotonic() + timeout
+    response = client.get("/ready")
+    while response.status_code != 200 and time.monotonic() < deadline:
+        time.sleep(0.05)
+        response = client.get("/ready")
+    return response
+
+
+def stamp(engine, revision: str) -> None:
+    """Записывает ревизию в alembic_version, как это делает alembic."""
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL)"))
+        connection.execute(text("INSERT INTO alembic_version VALUES (:rev)"), {"rev": revision})
+
+
+class TestSchemaRevision:
+    """Тесты проверки ревизии Alembic вместо create_all."""
+
+    def test_head_matches(self, tmp_path):
+        """Ревизия head проходит проверку."""
+        engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+        stamp(engine, head_revisions()[0])
+
+        check_schema_revision(engine)
+
+    def test_outdated_revision(self, tmp_path):
+        """Устаревшая ревизия прерывает старт."""
+        engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+        stamp(engine, "001_initial")
+
+        with pytest.raises(SchemaRevisionError, match="alembic upgrade head"):
+            check_schema_revision(engine)
+
+    def test_not_migrated(self, tmp_path):
+        """БД без alembic_version не проходит проверку."""
+        engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+
+        with pytest.raises(SchemaRevisionError, match="отсутствует"):
+            check_schema_revision(engine, heads=["head"])
+
+
+class TestWarmup:
+    """Тесты прогрева после старта."""
+
+    def test_warm_pool(self, tmp_path):
+        """Прогретые соединения остаются в пуле и возвращены в него."""
+        engine = create_engine(
+            f"sqlite:///{tmp_path / 'db.sqlite'}",
+            poolclass=InstrumentedQueuePool,
+            pool_size=3
+        )
+
+        assert warm_pool(engine, 3) == 3
+        metrics = engine.pool.metrics()
+        assert metrics["checked_in"] == 3
+        assert metrics["checked_out"] == 0
+
+    def test_ready_after_warmup(self, client):
+        """/ready отвечает 200 после прогрева."""
+        response = wait_ready(client)
+
+        assert response.status_code == 200
+        assert response.json() == {"status": "ready"}
+
+    def test_not_ready(self, client):
+        """До окончания прогрева /ready отвечает 503, /health - 200."""
+        wait_ready(client)
+        app.state.ready = False
+
+        assert client.get("/ready").status_code == 503
+        assert client.get("/health").status_code == 200
+
+
+class TestLazyImports:
+    """Тесты отложенной загрузки зависимостей."""
+
+    def test_optional_modules_not_imported(self):
+        """Импорт приложения не загружает jose, passlib и sentry_sdk."""
+        code = (
+            "import sys, app.main; "
+            "print(','.join(m for m in ('jose', 'passlib', 'bcrypt', 'sentry_sdk') if m in sys.modules))"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=BACKEND_DIR,
+            capture_output=True,
+            text=True,
+            check=True
+        )
+
+        assert result.stdout.strip() == ""
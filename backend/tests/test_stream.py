@@ -0,0 +1,112 @@
+import json
+
+
+NDJSON_HEADERS = {"Content-Type": "application/x-ndjson"}
+
+
+class TestCalculateStream:
+    """Тесты потокового расчёта."""
+
+    def test_stream_ndjson(self, client):
+        """NDJSON: результаты идут по строкам в порядке входа."""
+        body = "\n".join([
+            json.dumps({"junior_count": 10, "season": "cold", "activity": "normal"}),
+            json.dumps({"junior_count": 5, "middle_count": 5, "staff_count": 2,
+                        "season": "warm", "activity": "trip"}),
+        ])
+
+        response = client.post("/api/v1/calculate/stream", content=body, headers=NDJSON_HEADERS)
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["line"] for line in lines] == [1, 2]
+        assert lines[0]["result"]["total_water"] == 16.0
+        assert lines[1]["result"] == client.post(
+            "/api/v1/calculate", json=json.loads(body.splitlines()[1])
+        ).json()
+
+    def test_stream_ndjson_errors_do_not_abort(self, client):
+        """Ошибки отдельных строк попадают в поток и не прерывают расчёт."""
+        body = "\n".join([
+            '{"junior_count": 1, "season": "cold", "activity": "normal"}',
+            '{"junior_count": -1, "season": "cold", "activity": "normal"}',
+            "not json",
+            "",
+            '{"staff_count": 2, "season": "warm", "activity": "sport"}',
+        ])
+
+        response = client.post("/api/v1/calculate/stream", content=body, headers=NDJSON_HEADERS)
+
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["line"] for line in lines] == [1, 2, 3, 5]
+        assert "result" in lines[0]
+        assert lines[1]["errors"][0]["loc"] == ["junior_count"]
+        assert lines[2]["errors"][0]["type"] == "json_invalid"
+        assert lines[3]["result"]["total_water"] == round(2 * 2.25 * 1.3 * 1.5, 2)
+
+    def test_stream_chunks(self, client, monkeypatch):
+        """Вход больше одного блока обрабатывается целиком."""
+        from app.routers import calculate
+
+        monkeypatch.setattr(calculate.settings, "stream_chunk_size", 3)
+        body = "\n".join(
+            json.dumps({"junior_count": i, "season": "cold", "activity": "normal"})
+            for i in range(10)
+        )
+
+        response = client.post("/api/v1/calculate/stream", content=body, headers=NDJSON_HEADERS)
+
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["result"]["total_people"] for line in lines] == list(range(10))
+
+    def test_stream_oversized_count_in_chunk(self, client, monkeypatch):
+        """Численность вне int64 посреди блока - ошибка строки, соседние считаются."""
+        from app.routers import calculate
+
+        monkeypatch.setattr(calculate.settings, "stream_chunk_size", 3)
+        counts = [1, 2, 10 ** 19, 4, 5]
+        body = "\n".join(
+            json.dumps({"junior_count": count, "season": "cold", "activity": "normal"})
+            for count in counts
+        )
+
+        response = client.post("/api/v1/calculate/stream", content=body, headers=NDJSON_HEADERS)
+
+        assert response.status_code == 200
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["line"] for line in lines] == [1, 2, 3, 4, 5]
+        assert lines[2]["errors"][0]["loc"] == ["junior_count"]
+        assert [
+            line["result"]["total_people"] for line in lines if "result" in line
+        ] == [1, 2, 4, 5]
+
+    def test_stream_csv(self, client):
+        """CSV: заголовок в первой строке, ответ тоже CSV."""
+        body = (
+            "junior_count,middle_count,senior_count,staff_count,season,activity\n"
+            "10,0,0,0,cold,normal\n"
+            "1,,,,summer,normal\n"
+        )
+
+        response = client.post(
+            "/api/v1/calculate/stream",
+            content=body,
+            headers={"Content-Type": "text/csv"}
+        )
+
+        assert response.status_code == 200
+        rows = response.text.splitlines()
+        assert rows[0] == "line,total_water,base_total,total_people,error"
+        assert rows[1] == "2,16.0,16.0,10,"
+        assert rows[2].startswith('3,,,,"season:')
+
+    def test_stream_unsupported_media_type(self, client):
+        """Неподдерживаемый Content-Type отклоняется."""
+        response = client.post(
+            "/api/v1/calculate/stream",
+            content="{}",
+            headers={"Content-Type": "application/json"}
+        )
+
+        assert response.status_code == 415
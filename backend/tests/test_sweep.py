@@ -0,0 +1,102 @@
+import itertools
+import json
+
+import pytest
+
+from app.schemas.calculation import MAX_PEOPLE_COUNT, CalculationRequest
+from app.services.calculator import CalculatorService
+
+
+class TestCalculateSweep:
+    """Тесты перебора сценариев."""
+
+    def test_sweep_matches_scalar(self, client):
+        """Каждая точка сетки совпадает со скалярным расчётом."""
+        payload = {
+            "junior_count": [0, 7, 120],
+            "middle_count": {"start": 0, "end": 10, "step": 5},
+            "senior_count": [3],
+            "staff_count": {"start": 0, "end": 3},
+            "activity": ["sport", "trip"]
+        }
+
+        response = client.post("/api/v1/calculate/sweep", json=payload)
+
+        assert response.status_code == 200
+        data = response.json()
+        axes = data["axes"]
+        assert axes["middle_count"] == [0, 5, 10]
+        assert axes["season"] == ["cold", "warm"]
+        assert data["shape"] == [3, 3, 1, 4, 2, 2]
+        assert data["size"] == len(data["total_water"]) == 144
+
+        expected = [
+            CalculatorService.calculate(CalculationRequest(
+                junior_count=j, middle_count=m, senior_count=s,
+                staff_count=st, season=season, activity=activity
+            )).total_water
+            for j, m, s, st, season, activity in itertools.product(
+                *(axes[name] for name in (
+                    "junior_count", "middle_count", "senior_count",
+                    "staff_count", "season", "activity"
+                ))
+            )
+        ]
+        assert data["total_water"] == expected
+
+    def test_sweep_ndjson(self, client):
+        """Потоковый формат: одна строка на точку с параметрами."""
+        response = client.post(
+            "/api/v1/calculate/sweep?format=ndjson",
+            json={"staff_count": {"start": 0, "end": 50}, "activity": ["normal"]}
+        )
+
+        assert response.status_code == 200
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert len(lines) == 51 * 2
+        assert lines[0] == {
+            "junior_count": 0, "middle_count": 0, "senior_count": 0,
+            "staff_count": 0, "season": "cold", "activity": "normal",
+            "total_water": 0.0
+        }
+        assert lines[-1]["staff_count"] == 50
+        assert lines[-1]["total_water"] == round(50 * 2.25 * 1.3, 2)
+
+    def test_sweep_limit(self, client):
+        """Слишком большая сетка отклоняется до расчёта."""
+        response = client.post(
+            "/api/v1/calculate/sweep",
+            json={
+                "junior_count": {"start": 0, "end": MAX_PEOPLE_COUNT},
+                "middle_count": {"start": 0, "end": MAX_PEOPLE_COUNT}
+            }
+        )
+
+        assert response.status_code == 413
+
+    def test_sweep_invalid_range(self, client):
+        """Диапазон с end < start не принимается."""
+        response = client.post(
+            "/api/v1/calculate/sweep",
+            json={"junior_count": {"start": 5, "end": 1}}
+        )
+
+        assert response.status_code == 422
+
+    @pytest.mark.parametrize("axis", [
+        [10**19],
+        [0, MAX_PEOPLE_COUNT + 1],
+        {"start": 0, "end": 10**19},
+        {"start": MAX_PEOPLE_COUNT + 1, "end": MAX_PEOPLE_COUNT + 2},
+    ])
+    def test_sweep_count_too_large(self, client, axis):
+        """Значение оси больше MAX_PEOPLE_COUNT - 422, а не 500."""
+        response = client.post("/api/v1/calculate/sweep", json={"junior_count": axis})
+
+        assert response.status_code == 422
+
+    def test_sweep_negative_count(self, client):
+        """Отрицательное значение в списке не принимается."""
+        response = client.post("/api/v1/calculate/sweep", json={"junior_count": [1, -1]})
+
+        assert response.status_code == 422
@@ -0,0 +1,167 @@
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import event
+
+from app.models.history_watermark import HistoryWatermark
+from app.schemas.calculation import CalculationRequest
+from app.services.cache import get_cache
+from app.services.calculator import CalculatorService
+from app.services.watermark import Watermark, WatermarkService
+
+PAYLOAD = {
+    "junior_count": 10,
+    "middle_count": 0,
+    "senior_count": 0,
+    "staff_count": 0,
+    "season": "cold",
+    "activity": "normal"
+}
+
+
+def make_row(user_id):
+    return CalculatorService.calculation_row(CalculationRequest(**PAYLOAD), 16.0, user_id)
+
+
+@contextmanager
+def captured_sql(db_session):
+    """Собирает SQL, выполненный через движок тестовой БД."""
+    statements = []
+
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db_session.get_bind()
+    event.listen(engine, "before_cursor_execute", before_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_execute)
+
+
+class TestWatermarkService:
+    """Тесты водяных знаков истории."""
+
+    def test_insert_moves_watermark(self, db_session, auth_headers):
+        """Вставка прибавляет число строк и сдвигает время; анонимные не учитываются."""
+        assert WatermarkService.get(db_session, 1) == Watermark(1)
+
+        CalculatorService.insert_calculations(db_session, [make_row(1), make_row(1), make_row(None)])
+        first = WatermarkService.get(db_session, 1)
+        CalculatorService.save_calculation(db_session, CalculationRequest(**PAYLOAD), 16.0, 1)
+        second = WatermarkService.get(db_session, 1)
+
+        assert first.row_count == 2
+        assert second.row_count == 3
+        assert second.updated_at >= first.updated_at
+        assert second.etag != first.etag
+        assert db_session.query(HistoryWatermark).count() == 1
+
+    def test_not_modified(self):
+        """If-None-Match сравнивается слабо и важнее If-Modified-Since."""
+        watermark = Watermark(1, 2, datetime(2025, 1, 2, 3, 4, 5, 678))
+
+        assert WatermarkService.not_modified(watermark, watermark.etag)
+        assert WatermarkService.not_modified(watermark, f'"x", W/{watermark.etag}')
+        assert WatermarkService.not_modified(watermark, "*")
+        assert not WatermarkService.not_modified(watermark, '"1-1-0"')
+        assert not WatermarkService.not_modified(watermark, '"1-1-0"', watermark.last_modified)
+        assert WatermarkService.not_modified(watermark, None, watermark.last_modified)
+        assert not WatermarkService.not_modified(watermark, None, "Thu, 02 Jan 2025 03:04:04 GMT")
+        assert not WatermarkService.not_modified(watermark, None, "вчера")
+        assert not WatermarkService.not_modified(Watermark(1), None, watermark.last_modified)
+
+
+class TestConditionalHistory:
+    """Тесты ETag, 304 и кэша страниц истории."""
+
+    def setup_method(self):
+        get_cache().clear_local()
+
+    def test_history_etag_and_304(self, client, auth_headers, db_session):
+        """Повтор с If-None-Match - 304 одним чтением водяного знака, без calculations."""
+        client.post("/api/v1/calculate", json=PAYLOAD, headers=auth_headers)
+        response = client.get("/api/v1/history", headers=auth_headers)
+        etag = response.headers["etag"]
+        assert response.status_code == 200
+        assert len(response.json()) == 1
+        assert "last-modified" in response.headers
+
+        with captured_sql(db_session) as statements:
+            response = client.get(
+                "/api/v1/history",
+                headers={**auth_headers, "If-None-Match": etag}
+            )
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+        assert response.content == b""
+        assert len(statements) == 1
+        assert "history_watermarks" in statements[0]
+        assert "calculations" not in statements[0]
+
+    def test_write_changes_etag(self, client, auth_headers):
+        """Новый расчёт меняет ETag, и старый ETag получает полную страницу."""
+        client.post("/api/v1/calculate", json=PAYLOAD, headers=auth_headers)
+        etag = client.get("/api/v1/history", headers=auth_headers).headers["etag"]
+
+        client.post("/api/v1/calculate", json=PAYLOAD, headers=auth_headers)
+        response = client.get("/api/v1/history", headers={**auth_headers, "If-None-Match": etag})
+
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+        assert len(response.json()) == 2
+
+    def test_page_cached_by_watermark(self, client, auth_headers, db_session):
+        """Страница без If-None-Match отдаётся из кэша вместе с курсором."""
+        for _ in range(3):
+            client.post("/api/v1/calculate", json=PAYLOAD, headers=auth_headers)
+        first = client.get("/api/v1/history?limit=2", headers=auth_headers)
+
+        with captured_sql(db_session) as statements:
+            second = client.get("/api/v1/history?limit=2", headers=auth_headers)
+
+        assert second.content == first.content
+        assert second.headers["x-next-cursor"] == first.headers["x-next-cursor"]
+        assert not any("FROM calculations" in statement for statement in statements)
+
+        last = client.get(
+            "/api/v1/history",
+            params={"limit": 2, "before": first.headers["x-next-cursor"]},
+            headers=auth_headers
+        )
+        assert len(last.json()) == 1
+        assert "x-next-cursor" not in last.headers
+
+    def test_pages_do_not_touch_result_cache(self, client, auth_headers, metrics_headers):
+        """Страницы истории лежат в своём кэше и не меняют счётчики кэша результатов."""
+        client.post("/api/v1/calculate", json=PAYLOAD, headers=auth_headers)
+        before = get_cache().l1.stats()
+
+        for _ in range(2):
+            client.get("/api/v1/history", headers=auth_headers)
+
+        assert get_cache().l1.stats() == before
+        history = client.get("/api/v1/metrics/history-cache", headers=metrics_headers).json()["l1"]
+        assert (history["size"], history["hits"]) == (1, 1)
+
+    def test_empty_history_skips_calculations(self, client, auth_headers, db_session):
+        """Без водяного знака история пуста, calculations не читается."""
+        with captured_sql(db_session) as statements:
+            response = client.get("/api/v1/history", headers=auth_headers)
+
+        assert response.json() == []
+        assert not any("FROM calculations" in statement for statement in statements)
+
+    def test_detail_etag(self, client, auth_headers):
+        """Детали расчёта отдают ETag истории и отвечают 304 на совпадение."""
+        client.post("/api/v1/calculate", json=PAYLOAD, headers=auth_headers)
+        calculation_id = client.get("/api/v1/history", headers=auth_headers).json()[0]["id"]
+
+        response = client.get(f"/api/v1/history/{calculation_id}", headers=auth_headers)
+        assert response.status_code == 200
+
+        response = client.get(
+            f"/api/v1/history/{calculation_id}",
+            headers={**auth_headers, "If-None-Match": response.headers["etag"]}
+        )
+        assert response.status_code == 304
@@ -0,0 +1,181 @@
+import threading
+
+import pytest
+from sqlalchemy import event
+
+from app.models.calculation import Calculation
+from app.schemas.calculation import CalculationRequest
+from app.services import write_behind as write_behind_module
+from app.services.calculator import CalculatorService
+from app.services.write_behind import (
+    OVERFLOW_REJECT,
+    OVERFLOW_SYNC,
+    WriteBehindFull,
+    WriteBehindQueue
+)
+from tests.conftest import TestingSessionLocal, engine
+
+REQUEST = CalculationRequest(
+    junior_count=10,
+    middle_count=5,
+    senior_count=3,
+    staff_count=2,
+    season="warm",
+    activity="sport"
+)
+
+
+def make_row(user_id=None):
+    return CalculatorService.calculation_row(REQUEST, 42.0, user_id)
+
+
+def poison_row():
+    """Строка, которую БД не примет (NOT NULL season)."""
+    return {**make_row(), "season": None}
+
+
+@pytest.fixture
+def insert_statements():
+    """Список выполненных INSERT в calculations."""
+    statements = []
+
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("INSERT INTO CALCULATIONS"):
+            statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", listener)
+    yield statements
+    event.remove(engine, "before_cursor_execute", listener)
+
+
+class TestWriteBehindQueue:
+    """Тесты очереди отложенной записи."""
+
+    def test_batch_single_insert(self, db_session, insert_statements):
+        """Пачка строк пишется одним INSERT."""
+        queue = WriteBehindQueue(TestingSessionLocal, batch_size=100, flush_interval=0.05)
+        queue.start()
+        for _ in range(50):
+            queue.submit(make_row())
+        queue.stop()
+
+        assert db_session.query(Calculation).count() == 50
+        assert len(insert_statements) == 1
+        assert queue.stats()["batches"] == 1
+
+    def test_stop_drains_queue(self, db_session):
+        """Остановка выгружает все строки, даже если пачка не набралась."""
+        queue = WriteBehindQueue(TestingSessionLocal, batch_size=1000, flush_interval=60)
+        queue.start()
+        for _ in range(7):
+            queue.submit(make_row())
+        queue.stop()
+
+        assert db_session.query(Calculation).count() == 7
+        assert queue.stats()["queued"] == 0
+
+    def test_overflow_sync_writes_immediately(self, db_session):
+        """При политике sync переполнение пишется в потоке запроса."""
+        queue = WriteBehindQueue(TestingSessionLocal, maxsize=1, overflow=OVERFLOW_SYNC)
+        queue._thread = object()  # поток не запущен, очередь не разбирается
+        queue.submit(make_row())
+        queue.submit(make_row())
+
+        assert db_session.query(Calculation).count() == 1
+        assert queue.stats()["sync_writes"] == 1
+
+    def test_overflow_reject_raises(self, db_session):
+        """При политике reject переполнение поднимает WriteBehindFull."""
+        queue = WriteBehindQueue(TestingSessionLocal, maxsize=1, overflow=OVERFLOW_REJECT)
+        queue._thread = object()
+        queue.submit(make_row())
+        with pytest.raises(WriteBehindFull):
+            queue.submit(make_row())
+
+        assert queue.stats()["rejected"] == 1
+
+    def test_poison_row_costs_only_itself(self, db_session):
+        """Битая строка в пачке теряется одна, остальные записываются."""
+        queue = WriteBehindQueue(TestingSessionLocal)
+        rows = [make_row() for _ in range(9)]
+        rows.insert(4, poison_row())
+
+        queue._flush(rows)
+
+        assert db_session.query(Calculation).count() == 9
+        stats = queue.stats()
+        assert stats["flushed"] == 9
+        assert stats["failed"] == 1
+
+    def test_transient_error_retried(self, db_session, monkeypatch):
+        """Пачка, не записанная с первой попытки, повторяется целиком."""
+        queue = WriteBehindQueue(TestingSessionLocal)
+        insert = CalculatorService.insert_calculations
+        calls = []
+
+        def flaky(db, rows):
+            calls.append(len(rows))
+            if len(calls) == 1:
+                raise RuntimeError("соединение сброшено")
+            return insert(db, rows)
+
+        monkeypatch.setattr(CalculatorService, "insert_calculations", staticmethod(flaky))
+        queue._flush([make_row() for _ in range(5)])
+
+        assert calls == [5, 5]
+        assert db_session.query(Calculation).count() == 5
+        assert queue.stats()["batches"] == 1
+        assert queue.stats()["failed"] == 0
+
+    def test_sync_write_error_raised(self, db_session):
+        """Синхронная запись не сообщает об успехе, если строка не записана."""
+        queue = WriteBehindQueue(TestingSessionLocal)
+        with pytest.raises(Exception):
+            queue.submit(poison_row())
+
+        assert db_session.query(Calculation).count() == 0
+        assert queue.stats()["sync_writes"] == 0
+        assert queue.stats()["failed"] == 1
+
+    def test_submit_during_stop_not_lost(self, db_session):
+        """Строки, поставленные параллельно с остановкой, все записываются."""
+        queue = WriteBehindQueue(TestingSessionLocal, batch_size=50, flush_interval=0.05)
+        queue.start()
+        errors = []
+
+        def producer():
+            try:
+                for _ in range(25):
+                    queue.submit(make_row())
+            except Exception as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=producer) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        queue.stop()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        assert db_session.query(Calculation).count() == 100
+        assert queue.stats()["queued"] == 0
+
+    def test_calculate_route_uses_queue(self, client, auth_headers, db_session, monkeypatch):
+        """Авторизованный расчёт попадает в историю через очередь."""
+        queue = WriteBehindQueue(TestingSessionLocal, flush_interval=0.05)
+        queue.start()
+        monkeypatch.setattr(write_behind_module, "_write_behind", queue)
+
+        response = client.post(
+            "/api/v1/calculate",
+            json=REQUEST.model_dump(mode="json"),
+            headers=auth_headers
+        )
+        queue.stop()
+
+        assert response.status_code == 200
+        assert queue.stats()["flushed"] == 1
+        history = client.get("/api/v1/history", headers=auth_headers).json()
+        assert len(history) == 1
+        assert history[0]["total_water"] == response.json()["total_water"]
@@ -13,6 +13,18 @@ class Config:
     BOT_TOKEN: str = os.getenv("BOT_TOKEN", "")
     API_URL: str = os.getenv("API_URL", "http://localhost:8000")
 
+    # HTTP-клиент Backend API: одна сессия на всё время работы бота
+    API_CONNECT_TIMEOUT: float = float(os.getenv("API_CONNECT_TIMEOUT", "3"))  # секунды
+    API_READ_TIMEOUT: float = float(os.getenv("API_READ_TIMEOUT", "10"))  # секунды
+    API_POOL_SIZE: int = int(os.getenv("API_POOL_SIZE", "20"))  # соединений с бэкендом
+    API_KEEPALIVE_SECONDS: float = float(os.getenv("API_KEEPALIVE_SECONDS", "30"))
+    API_DNS_CACHE_SECONDS: int = int(os.getenv("API_DNS_CACHE_SECONDS", "300"))
+    # Повторы при сетевых ошибках и 502/503/504: пауза - случайная
+    # в [0, min(max, base * 2^попытка)] (full jitter)
+    API_RETRIES: int = int(os.getenv("API_RETRIES", "2"))
+    API_RETRY_BASE_DELAY: float = float(os.getenv("API_RETRY_BASE_DELAY", "0.2"))
+    API_RETRY_MAX_DELAY: float = float(os.getenv("API_RETRY_MAX_DELAY", "2"))
+
     @classmethod
     def validate(cls) -> None:
         """Проверяет наличие обязательных переменных."""
@@ -8,10 +8,9 @@ from aiogram.fsm.context import FSMContext
 
 from app.states import CalculationStates
 from app.keyboards import get_season_keyboard, get_activity_keyboard
-from app.services import ApiClient, save_calculation
+from app.services import api_client, save_calculation
 
 router = Router()
-api_client = ApiClient()
 
 
 @router.message(Command("calculate"))
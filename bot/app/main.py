@@ -12,6 +12,7 @@ from aiogram.fsm.storage.memory import MemoryStorage
 
 from app.config import config
 from app.handlers import setup_routers
+from app.services import api_client
 
 
 logging.basicConfig(
@@ -44,11 +45,15 @@ async def main() -> None:
     # Запускаем бота
     logger.info("Бот запускается...")
 
+    # Одна сессия Backend API на всё время работы бота
+    await api_client.start()
+
     try:
         # Удаляем вебхук и запускаем polling
         await bot.delete_webhook(drop_pending_updates=True)
         await dp.start_polling(bot)
     finally:
+        await api_client.close()
         await bot.session.close()
         logger.info("Бот остановлен")
 
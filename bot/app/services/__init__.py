@@ -1,7 +1,7 @@
 """
 Модуль сервисов для взаимодействия с внешними API.
 """
-from .api_client import ApiClient
+from .api_client import ApiClient, api_client
 from .session_storage import save_calculation, get_history, clear_history
 
-__all__ = ["ApiClient", "save_calculation", "get_history", "clear_history"]
+__all__ = ["ApiClient", "api_client", "save_calculation", "get_history", "clear_history"]
@@ -1,13 +1,28 @@
 """
 Клиент для взаимодействия с Backend API.
+
+Одна aiohttp-сессия живёт всё время работы бота: соединения
+с бэкендом переиспользуются (keep-alive), адрес резолвится
+из кэша DNS, а каждый запрос ограничен таймаутами.
 """
-import aiohttp
+import asyncio
+import logging
+import random
+import uuid
 from typing import Optional
 from dataclasses import dataclass
 
+import aiohttp
+
 from app.config import config
 
 
+logger = logging.getLogger(__name__)
+
+# Ответы, после которых запрос имеет смысл повторить
+RETRY_STATUSES = frozenset({502, 503, 504})
+
+
 @dataclass
 class CalculationResult:
     """Результат расчёта потребления воды."""
@@ -21,11 +36,77 @@ class ApiClient:
     """
     HTTP клиент для вызова Backend API.
 
-    Использует aiohttp для асинхронных запросов к серверу расчёта.
+    Использует одну aiohttp.ClientSession с пулом соединений:
+    start() создаёт её при запуске бота, close() закрывает при остановке.
+    Если start() не вызывался, сессия создаётся при первом запросе.
     """
 
-    def __init__(self):
-        self.base_url = config.API_URL
+    def __init__(self, base_url: Optional[str] = None):
+        self.base_url = base_url or config.API_URL
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self) -> None:
+        """Создаёт сессию с пулом соединений, кэшем DNS и таймаутами."""
+        if self._session is not None and not self._session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=config.API_POOL_SIZE,
+            keepalive_timeout=config.API_KEEPALIVE_SECONDS,
+            use_dns_cache=True,
+            ttl_dns_cache=config.API_DNS_CACHE_SECONDS,
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=None,
+            # connect включает ожидание свободного соединения в пуле
+            connect=config.API_CONNECT_TIMEOUT,
+            sock_read=config.API_READ_TIMEOUT,
+        )
+        self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+    async def close(self) -> None:
+        """Закрывает сессию и все соединения пула."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            await self.start()
+        return self._session
+
+    @staticmethod
+    def retry_delay(attempt: int) -> float:
+        """Пауза перед повтором attempt (с нуля): full jitter."""
+        cap = min(config.API_RETRY_MAX_DELAY, config.API_RETRY_BASE_DELAY * 2 ** attempt)
+        return random.uniform(0, cap)
+
+    async def _post_json(self, path: str, payload: dict) -> Optional[dict]:
+        """
+        POST с повторами; JSON ответа 200 или None.
+
+        Повторяются сетевые ошибки, таймауты и ответы 502/503/504,
+        не больше API_RETRIES раз. Все попытки несут один
+        Idempotency-Key, поэтому повтор не создаёт вторую запись.
+        """
+        session = await self._get_session()
+        url = f"{self.base_url}{path}"
+        headers = {"Idempotency-Key": uuid.uuid4().hex}
+
+        for attempt in range(config.API_RETRIES + 1):
+            last = attempt == config.API_RETRIES
+            try:
+                async with session.post(url, json=payload, headers=headers) as response:
+                    if response.status == 200:
+                        return await response.json()
+                    if response.status not in RETRY_STATUSES or last:
+                        logger.warning("API %s ответил %s", path, response.status)
+                        return None
+            except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                if last:
+                    logger.warning("API %s недоступен: %r", path, exc)
+                    return None
+            await asyncio.sleep(self.retry_delay(attempt))
+        return None
 
     async def calculate_water(
         self,
@@ -50,8 +131,6 @@ class ApiClient:
         Returns:
             CalculationResult при успехе, None при ошибке.
         """
-        url = f"{self.base_url}/api/v1/calculate"
-
         payload = {
             "junior_count": junior_count,
             "middle_count": middle_count,
@@ -61,21 +140,15 @@ class ApiClient:
             "activity": activity,
         }
 
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, json=payload) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return CalculationResult(
-                            total_water=data.get("total_water", 0),
-                            breakdown=data.get("breakdown", {}),
-                            total_people=data.get("total_people", 0),
-                        )
-                    else:
-                        return None
-        except aiohttp.ClientError:
+        data = await self._post_json("/api/v1/calculate", payload)
+        if data is None:
             return None
+        return CalculationResult(
+            total_water=data.get("total_water", 0),
+            breakdown=data.get("breakdown", {}),
+            total_people=data.get("total_people", 0),
+        )
 
 
-# Глобальный экземпляр клиента
+# Глобальный экземпляр клиента: сессию открывает и закрывает app.main
 api_client = ApiClient()
@@ -0,0 +1,145 @@
+"""
+Бенчмарк ApiClient.calculate_water против локальной заглушки бэкенда.
+
+Сравниваются прежний клиент (новая aiohttp.ClientSession на каждый
+вызов: резолв имени, новое TCP-соединение, без таймаутов) и текущий
+(одна сессия с пулом keep-alive соединений и кэшем DNS). Заглушка
+отвечает на POST /api/v1/calculate готовым JSON и считает
+TCP-соединения. С --fail-rate часть ответов - 503, и видно,
+что текущий клиент добирает их повторами.
+
+Запросы идут на localhost без TLS: в реальной сети к каждому новому
+соединению прежнего клиента добавляются RTT рукопожатий TCP и TLS.
+
+Запуск из каталога bot:
+    python -m benchmarks.bench_api_client
+    python -m benchmarks.bench_api_client --calls 2000 --concurrency 20 --fail-rate 0.05
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+import aiohttp
+from aiohttp import web
+
+from app.services.api_client import ApiClient
+
+PAYLOAD = {
+    "junior_count": 10,
+    "middle_count": 5,
+    "senior_count": 3,
+    "staff_count": 2,
+    "season": "warm",
+    "activity": "sport",
+}
+
+RESPONSE = {
+    "total_water": 41.15,
+    "base_total": 37.75,
+    "breakdown": {"junior": {"count": 10, "norm": 1.6, "subtotal": 16.0}},
+    "coefficients": {"season": 1.0, "activity": 1.1},
+    "total_people": 20,
+}
+
+
+class LegacyApiClient(ApiClient):
+    """Прежний calculate_water: новая сессия на каждый вызов."""
+
+    async def calculate_water(self, **payload):
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.post(f"{self.base_url}/api/v1/calculate", json=payload) as response:
+                    if response.status == 200:
+                        return await response.json()
+                    return None
+        except aiohttp.ClientError:
+            return None
+
+
+async def start_stub(fail_rate: float):
+    """Заглушка бэкенда на свободном порту; возвращает (runner, порт, счётчики)."""
+    counters = {"connections": set(), "requests": 0}
+
+    async def calculate(request: web.Request) -> web.Response:
+        counters["connections"].add(request.transport.get_extra_info("peername"))
+        counters["requests"] += 1
+        if random.random() < fail_rate:
+            return web.json_response({"detail": "overloaded"}, status=503)
+        return web.json_response(RESPONSE)
+
+    app = web.Application()
+    app.router.add_post("/api/v1/calculate", calculate)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, port, counters
+
+
+async def run(client: ApiClient, calls: int, concurrency: int, counters: dict) -> dict:
+    """calls вызовов не более чем по concurrency одновременно."""
+    counters["connections"].clear()
+    counters["requests"] = 0
+    semaphore = asyncio.Semaphore(concurrency)
+    timings = []
+    failures = 0
+
+    async def one():
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            result = await client.calculate_water(**PAYLOAD)
+            timings.append((time.perf_counter() - start) * 1000)
+            failures += result is None
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(calls)))
+    elapsed = time.perf_counter() - start
+    timings.sort()
+    return {
+        "rps": calls / elapsed,
+        "mean": statistics.fmean(timings),
+        "p50": statistics.median(timings),
+        "p99": timings[int(len(timings) * 0.99) - 1],
+        "connections": len(counters["connections"]),
+        "requests": counters["requests"],
+        "failures": failures,
+    }
+
+
+async def main(args) -> None:
+    runner, port, counters = await start_stub(args.fail_rate)
+    base_url = f"http://{args.host}:{port}"
+    print(
+        f"{args.calls} вызовов, параллельно {args.concurrency}, "
+        f"доля 503: {args.fail_rate}, {base_url}"
+    )
+    print(
+        f"{'client':>7} {'req/s':>7} {'mean ms':>8} {'p50 ms':>7} {'p99 ms':>7} "
+        f"{'conns':>6} {'requests':>9} {'failed':>7}"
+    )
+    try:
+        pooled = ApiClient(base_url)
+        await pooled.start()
+        for name, client in (("legacy", LegacyApiClient(base_url)), ("pooled", pooled)):
+            result = await run(client, args.calls, args.concurrency, counters)
+            print(
+                f"{name:>7} {result['rps']:>7.0f} {result['mean']:>8.2f} {result['p50']:>7.2f} "
+                f"{result['p99']:>7.2f} {result['connections']:>6} {result['requests']:>9} "
+                f"{result['failures']:>7}"
+            )
+        await pooled.close()
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--host", default="localhost", help="имя, которое резолвит клиент")
+    asyncio.run(main(parser.parse_args()))
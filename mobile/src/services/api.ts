@@ -110,13 +110,26 @@ export async function calculateWater(data: CalculateRequest): Promise<CalculateR
   }
 }
 
+// Размер страницы истории: максимум, который принимает сервер
+const HISTORY_PAGE_SIZE = 500;
+
 /**
  * Получение истории расчётов
+ * Сервер отдаёт историю страницами: курсор следующей страницы
+ * приходит в заголовке X-Next-Cursor, идём по нему до конца
  */
 export async function getHistory(): Promise<HistoryItem[]> {
   try {
-    const response = await api.get<HistoryItem[]>('/history');
-    return response.data;
+    const items: HistoryItem[] = [];
+    let before: string | undefined;
+    do {
+      const response = await api.get<HistoryItem[]>('/history', {
+        params: { limit: HISTORY_PAGE_SIZE, before }
+      });
+      items.push(...response.data);
+      before = response.headers['x-next-cursor'] as string | undefined;
+    } while (before);
+    return items;
   } catch (error) {
     const axiosError = error as AxiosError<{ detail: string }>;
     if (axiosError.response?.status === 401) {